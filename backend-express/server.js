@@ -325,6 +325,8 @@ app.post('/api/recommend', async (req, res) => {
         budget_category: req.body.budget_category || 'medium',
         preferred_crops: req.body.preferred_crops || []
       },
+      // Lets the ML service rescore only the factors changed since the form's last submit
+      session_id: req.body.session_id,
       market_snapshot: {
         Rice: 2100, Wheat: 2000, Maize: 1800, Cotton: 5500,
         Sugarcane: 350, Soybean: 4200, Groundnut: 5000
@@ -29,6 +29,8 @@ export interface MLRequest {
   market_snapshot: any;
   weather_data: WeatherData;
   forecast_data: WeatherForecast;
+  // Input form session, for incremental rescoring
+  session_id?: string;
 }
 
 export interface CropRecommendation {
@@ -6,6 +6,7 @@ import { saveRecommendation } from "./history";
 
 export interface RecommendRequest {
   userId: string;
+  session_id?: string;
   location: {
     lat: number;
     lon: number;
@@ -101,7 +102,9 @@ export const recommend = api<RecommendRequest, RecommendResponse>(
         trends: marketData.trends
       },
       weather_data: weather,
-      forecast_data: forecast
+      forecast_data: forecast,
+      // Lets the ML service rescore only the factors changed since the form's last submit
+      session_id: req.session_id
     };
     
     const prediction = await predictCrops(mlRequest);
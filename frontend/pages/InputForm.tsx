@@ -73,6 +73,8 @@ export function InputForm() {
   const [weatherPreview, setWeatherPreview] = useState<WeatherPreview | null>(null);
   const [loadingWeather, setLoadingWeather] = useState(false);
   const [loadingSoil, setLoadingSoil] = useState(false);
+  // One scoring session per form, so re-submits after small edits are rescored incrementally
+  const [sessionId] = useState(() => `form_${Date.now()}_${Math.random().toString(36).slice(2, 10)}`);
   
   const [formData, setFormData] = useState<FormData>({
     latitude: '',
@@ -271,6 +273,7 @@ export function InputForm() {
       
       const response = await postJSON(`${API_BASE}/api/recommend`, {
         userId,
+        session_id: sessionId,
         location: {
           lat: parseFloat(formData.latitude),
           lon: parseFloat(formData.longitude)
@@ -0,0 +1,177 @@
+import ipaddress
+import os
+import threading
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import FileResponse
+from pydantic import BaseModel
+from typing import Optional
+from profiler import DEFAULT_INTERVAL_SECONDS, MAX_WINDOW_SECONDS, ProfileController
+from memory_diagnostics import DEFAULT_TRACE_FRAMES, MemoryDiagnostics
+
+def _is_loopback(host: Optional[str]) -> bool:
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except (TypeError, ValueError):
+        return False
+
+def require_admin(request: Request, x_admin_token: Optional[str] = Header(None)):
+    """
+    Admin endpoints need X-Admin-Token to match ML_ADMIN_TOKEN. Without a
+    configured token they only answer loopback clients; Unix socket peers
+    and clients forwarded by a proxy are refused.
+    """
+    token = os.environ.get("ML_ADMIN_TOKEN")
+    if token:
+        if x_admin_token != token:
+            raise HTTPException(status_code=403, detail="Admin token required")
+    elif request.client is None or not _is_loopback(request.client.host):
+        raise HTTPException(status_code=403, detail="Admin endpoints only answer localhost unless ML_ADMIN_TOKEN is set")
+
+router = APIRouter(prefix="/admin", dependencies=[Depends(require_admin)])
+
+# Shared by the middleware and the endpoints below
+profile_controller = ProfileController()
+# Apps register their loaded models and caches here
+memory_diagnostics = MemoryDiagnostics()
+
+class ProfilerRequest(BaseModel):
+    mode: str = "sample"  # "sample": a fraction of requests, "window": everything for a while
+    duration_s: float = 60
+    fraction: float = 0.1
+    interval_ms: float = DEFAULT_INTERVAL_SECONDS * 1000
+
+@router.post("/profiler")
+async def enable_profiler(request: ProfilerRequest):
+    """Start a profiling window or sample a fraction of requests"""
+    if not 0 < request.duration_s <= MAX_WINDOW_SECONDS:
+        raise HTTPException(status_code=400, detail=f"duration_s must be in (0, {MAX_WINDOW_SECONDS}]")
+    if not 1 <= request.interval_ms <= 1000:
+        raise HTTPException(status_code=400, detail="interval_ms must be between 1 and 1000")
+    interval = request.interval_ms / 1000
+
+    if request.mode == "window":
+        try:
+            # Endpoints run on the event loop thread, which is the one to sample
+            name = profile_controller.start_window(threading.get_ident(), request.duration_s, interval)
+        except RuntimeError as e:
+            raise HTTPException(status_code=409, detail=str(e))
+        return {"profile": name, **profile_controller.status()}
+    if request.mode == "sample":
+        if not 0 < request.fraction <= 1:
+            raise HTTPException(status_code=400, detail="fraction must be in (0, 1]")
+        profile_controller.sample_requests(request.fraction, request.duration_s, interval)
+        return profile_controller.status()
+    raise HTTPException(status_code=400, detail="mode must be 'sample' or 'window'")
+
+@router.delete("/profiler")
+async def disable_profiler():
+    profile_controller.disable()
+    return profile_controller.status()
+
+@router.get("/profiler")
+async def profiler_status():
+    return profile_controller.status()
+
+@router.get("/profiles")
+async def list_profiles():
+    """Saved collapsed-stack profiles, newest first"""
+    return {"profiles": profile_controller.list_profiles()}
+
+@router.get("/profiles/{name}")
+async def download_profile(name: str):
+    path = profile_controller.profile_path(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return FileResponse(path, media_type="text/plain", filename=name)
+
+class TracingRequest(BaseModel):
+    enabled: bool = True
+    frames: int = DEFAULT_TRACE_FRAMES
+
+class SnapshotRequest(BaseModel):
+    name: Optional[str] = None
+
+@router.get("/memory")
+async def memory_report():
+    """Resident memory, size of every loaded artifact and allocation tracing state"""
+    sizes = memory_diagnostics.artifact_sizes()
+    return {
+        **memory_diagnostics.status(),
+        "artifacts": {name: {"bytes": size, "mb": round(size / 2 ** 20, 1)}
+                      for name, size in sorted(sizes.items(), key=lambda item: -item[1])},
+    }
+
+@router.post("/memory/tracing")
+async def memory_tracing(request: TracingRequest):
+    """Start or stop tracemalloc allocation tracing (slows allocations while on)"""
+    if not 1 <= request.frames <= 50:
+        raise HTTPException(status_code=400, detail="frames must be between 1 and 50")
+    if request.enabled:
+        memory_diagnostics.start_tracing(request.frames)
+    else:
+        memory_diagnostics.stop_tracing()
+    return memory_diagnostics.status()
+
+@router.post("/memory/snapshots")
+async def take_memory_snapshot(request: SnapshotRequest):
+    try:
+        name = memory_diagnostics.take_snapshot(request.name)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"snapshot": name, **memory_diagnostics.status()}
+
+@router.get("/memory/diff")
+async def memory_diff(base: str, target: Optional[str] = None, group_by: str = "lineno", limit: int = 20):
+    """Allocation changes between two snapshots, or from `base` to now"""
+    try:
+        return memory_diagnostics.diff(base, target, group_by, limit)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=f"Unknown snapshot {e}")
+    except (ValueError, RuntimeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+class EngineConfig(BaseModel):
+    primary: Optional[str] = None
+    shadow: Optional[str] = None  # "" turns shadowing off
+    shadow_fraction: Optional[float] = None
+
+@router.get("/engines")
+async def engine_status(request: Request):
+    """Available prediction engines, the primary and shadow engine and their measured agreement"""
+    return request.app.state.engines.status()
+
+@router.post("/engines")
+async def configure_engines(config: EngineConfig, request: Request):
+    """Switch the primary or shadow engine without a restart"""
+    engines = request.app.state.engines
+    try:
+        engines.configure(config.primary, config.shadow, config.shadow_fraction)
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return engines.status()
+
+@router.get("/admission")
+async def admission_status(request: Request):
+    """Concurrency, queue depth, estimated wait and rejections of the scoring endpoints"""
+    return request.app.state.admission.status()
+
+@router.get("/cpu")
+async def cpu_layout(request: Request):
+    """CPU budget of this worker: its share of cores, pinning and the native thread pools in use"""
+    state = request.app.state
+    return {**state.cpu_budget.layout(), "engine_threads": state.engines.executor_threads,
+            "job_workers": state.jobs.workers}
+
+@router.get("/drift")
+async def drift_report(request: Request):
+    """Request input statistics and their drift (PSI per field) from the training reference"""
+    return request.app.state.drift_monitor.report()
+
+@router.post("/drift/reset")
+async def reset_drift(request: Request):
+    """Start a new observation window, e.g. after retraining or a known input change"""
+    monitor = request.app.state.drift_monitor
+    monitor.reset()
+    return monitor.report()
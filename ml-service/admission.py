@@ -0,0 +1,178 @@
+import asyncio
+import json
+import math
+import os
+import time
+from collections import deque
+from typing import Dict, Optional, Sequence
+from metrics import registry
+
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_MAX_QUEUE = 64
+DEFAULT_MAX_WAIT_SECONDS = 2.0
+# Weight of the latest request in the moving average service time
+SERVICE_TIME_SMOOTHING = 0.1
+INITIAL_SERVICE_TIME_SECONDS = 0.05
+
+# Only these path prefixes are admission controlled; health, metrics and
+# admin requests never wait behind prediction traffic
+CONTROLLED_PATHS = ("/predict", "/internal/predict", "/optimize/", "/plan/")
+
+in_flight = registry.gauge("ml_admission_in_flight", "Admitted requests currently being served")
+queue_depth = registry.gauge("ml_admission_queue_depth", "Requests waiting for a concurrency slot")
+rejections = registry.counter(
+    "ml_admission_rejected_total", "Requests rejected with 503 by admission control", labels=("reason",))
+queue_wait = registry.histogram(
+    "ml_admission_wait_seconds", "Time admitted requests spent waiting for a slot",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+
+class Rejected(Exception):
+    """Raised when a request is shed; `retry_after` is a hint in seconds"""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+class AdmissionController:
+    """
+    Bounded concurrency with a bounded FIFO wait queue.
+
+    A request is rejected up front when the queue is full or when the
+    estimated wait (requests ahead of it / concurrency * average service
+    time) exceeds `max_wait`, and also if it actually waits longer than
+    that. All state lives on the event loop, so no locks are needed.
+    """
+
+    def __init__(self, max_concurrency: int = DEFAULT_MAX_CONCURRENCY, max_queue: int = DEFAULT_MAX_QUEUE,
+                 max_wait: float = DEFAULT_MAX_WAIT_SECONDS):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.active = 0
+        self.service_time = INITIAL_SERVICE_TIME_SECONDS
+        self._waiters = deque()
+
+    def estimated_wait(self, ahead: Optional[int] = None) -> float:
+        """Seconds a new request would wait behind `ahead` queued ones"""
+        ahead = len(self._waiters) if ahead is None else ahead
+        if self.active < self.max_concurrency and ahead == 0:
+            return 0.0
+        return (ahead + 1) / self.max_concurrency * self.service_time
+
+    async def acquire(self):
+        if self.active < self.max_concurrency and not self._waiters:
+            self.active += 1
+            in_flight.set(self.active)
+            queue_wait.observe(0.0)
+            return
+        if len(self._waiters) >= self.max_queue:
+            self._reject('queue_full')
+        if self.estimated_wait() > self.max_wait:
+            self._reject('wait_estimate')
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        queue_depth.set(len(self._waiters))
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.max_wait)
+        except asyncio.TimeoutError:
+            self._remove(waiter)
+            if not waiter.done():
+                waiter.cancel()
+                self._reject('timeout')
+        except asyncio.CancelledError:
+            # Client went away while queued; pass on a slot it may have been given
+            self._remove(waiter)
+            if waiter.done() and not waiter.cancelled():
+                self.release(None)
+            raise
+        queue_wait.observe(time.perf_counter() - start)
+
+    def release(self, service_seconds: Optional[float]):
+        if service_seconds is not None:
+            self.service_time += SERVICE_TIME_SMOOTHING * (service_seconds - self.service_time)
+        # Hand the slot straight to the oldest waiter so it cannot be overtaken
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                queue_depth.set(len(self._waiters))
+                return
+        queue_depth.set(0)
+        self.active -= 1
+        in_flight.set(self.active)
+
+    def _remove(self, waiter):
+        try:
+            self._waiters.remove(waiter)
+        except ValueError:
+            pass
+        queue_depth.set(len(self._waiters))
+
+    def _reject(self, reason: str):
+        rejections.inc(reason=reason)
+        raise Rejected(reason, max(1, math.ceil(self.estimated_wait())))
+
+    def status(self) -> Dict:
+        return {
+            'max_concurrency': self.max_concurrency,
+            'max_queue': self.max_queue,
+            'max_wait_seconds': self.max_wait,
+            'in_flight': self.active,
+            'queued': len(self._waiters),
+            'mean_service_ms': round(self.service_time * 1000, 2),
+            'estimated_wait_ms': round(self.estimated_wait() * 1000, 1),
+            'rejected': {reason: rejections.value(reason=reason) for reason in ('queue_full', 'wait_estimate', 'timeout')},
+        }
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        """Limits from ML_MAX_CONCURRENCY, ML_MAX_QUEUE and ML_MAX_QUEUE_WAIT_MS"""
+        return cls(
+            max_concurrency=int(os.environ.get("ML_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)),
+            max_queue=int(os.environ.get("ML_MAX_QUEUE", DEFAULT_MAX_QUEUE)),
+            max_wait=float(os.environ.get("ML_MAX_QUEUE_WAIT_MS", DEFAULT_MAX_WAIT_SECONDS * 1000)) / 1000,
+        )
+
+class AdmissionMiddleware:
+    """ASGI middleware shedding scoring requests with 503 + Retry-After when the service is saturated"""
+
+    def __init__(self, app, controller: AdmissionController, paths: Sequence[str] = CONTROLLED_PATHS):
+        self.app = app
+        self.controller = controller
+        self.paths = tuple(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.paths):
+            return await self.app(scope, receive, send)
+
+        try:
+            await self.controller.acquire()
+        except Rejected as e:
+            return await self._send_rejection(send, e)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(time.perf_counter() - start)
+
+    @staticmethod
+    async def _send_rejection(send, rejection: Rejected):
+        body = json.dumps({
+            "detail": "Service overloaded, retry later",
+            "reason": rejection.reason,
+            "retry_after_seconds": rejection.retry_after,
+        }).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(rejection.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 import numpy as np
@@ -7,7 +7,22 @@ import pickle
 import json
 from datetime import datetime
 import logging
-from crop_predictor import CropPredictor
+from profiler import ProfilingMiddleware
+from memory_diagnostics import AllocationMiddleware
+from admission import AdmissionController, AdmissionMiddleware
+import admin
+import metrics
+import region_tiles
+import jobs
+from services import Services, router as services_router
+from cpu_budget import CpuBudget, limit_estimator_jobs
+from engines import (
+    EngineRegistry, FunctionEngine, NeighbourEngine, ParetoEngine, Prediction, RuleEngine, SklearnEngine,
+    TreeAttributions, deadline_seconds
+)
+from neighbour_index import NeighbourIndex
+from schemas import PredictRequest, WeatherData, validate_predict_request
+from tree_explainer import TreeExplainer
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -15,6 +30,27 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Comprehensive Crop Recommendation ML Service", version="2.0.0")
 
+# This worker's share of the cores (ML_WORKERS, ML_THREADS_PER_WORKER, ML_PIN_CPUS); sizes
+# the BLAS/OpenMP pools, sklearn n_jobs and engine threads below
+app.state.cpu_budget = cpu_budget = CpuBudget.from_env().apply()
+
+# Admin endpoints and opt-in request profiling (idle unless armed via /admin/profiler)
+app.include_router(admin.router)
+app.add_middleware(ProfilingMiddleware, controller=admin.profile_controller)
+# Prometheus metrics, including net memory blocks allocated per request
+app.include_router(metrics.router)
+app.add_middleware(AllocationMiddleware)
+# Load shedding for scoring endpoints (ML_MAX_CONCURRENCY, ML_MAX_QUEUE, ML_MAX_QUEUE_WAIT_MS);
+# outermost, so rejected requests cost as little as possible
+app.state.admission = AdmissionController.from_env()
+app.add_middleware(AdmissionMiddleware, controller=app.state.admission)
+# Region lookups answered from precomputed tiles (python region_tiles.py, ML_REGION_TILES)
+app.include_router(region_tiles.router)
+app.state.region_tiles = region_tiles.RegionTiles.load()
+# Bulk scoring and what-if jobs on a worker process pool (ML_JOBS_DIR, ML_JOB_WORKERS, ML_JOB_QUEUE)
+app.include_router(jobs.router)
+app.state.jobs = jobs.JobManager.from_env()
+
 @app.get("/")
 async def root():
     """Root endpoint to avoid 404 errors"""
@@ -24,13 +60,26 @@ async def root():
         "status": "running",
         "endpoints": {
             "health": "/health",
-            "predict": "/predict"
+            "predict": "/predict",
+            "predict_packed": "/internal/predict",
+            "market_prices": "/market/prices",
+            "optimize_fertilizer": "/optimize/fertilizer",
+            "plan_rotation": "/plan/rotation",
+            "optimize_portfolio": "/optimize/portfolio",
+            "region_suitability": "/region/suitability",
+            "jobs": "/jobs",
+            "metrics": "/metrics",
+            "feature_importance": "/model/feature-importance"
         }
     }
 
-# Initialize the intelligent crop predictor
-crop_predictor = CropPredictor()
-logger.info("Intelligent crop predictor initialized")
+# Rule-based predictor, optimizers, soil raster, forecast cache, risk simulator and drift
+# monitor; the endpoints served straight from them come from the shared services router
+app.state.services = services = Services.load()
+app.include_router(services_router)
+app.state.drift_monitor = services.drift_monitor
+crop_predictor = services.crop_predictor
+price_table = services.price_table
 
 # Load models and preprocessor at startup (optional for advanced features)
 try:
@@ -44,6 +93,9 @@ try:
         model_metadata = json.load(f)
     logger.info("Advanced ML models loaded successfully")
     use_advanced_models = True
+    # Models trained with n_jobs=-1 would otherwise predict on every core
+    limit_estimator_jobs(crop_model, cpu_budget.threads)
+    limit_estimator_jobs(yield_model, cpu_budget.threads)
 except Exception as e:
     logger.info(f"Advanced models not available: {e}")
     logger.info("Using intelligent rule-based predictor")
@@ -54,46 +106,41 @@ except Exception as e:
     model_metadata = {"version": "v2.0.0-intelligent", "features": []}
     use_advanced_models = False
 
-class Location(BaseModel):
-    lat: float
-    lon: float
-
-class Features(BaseModel):
-    N: float
-    P: float
-    K: float
-    ph: float
-    temperature: float
-    humidity: float
-    rainfall: float
-    organic_carbon: float
-    soil_type: str
-    area_ha: float
-    farming_method: str
-    irrigation_type: str
-    previous_crops: List[str]
-    experience_years: int
-    budget_category: str
-    preferred_crops: List[str]
-
-class WeatherData(BaseModel):
-    temperature: float
-    humidity: float
-    rainfall: float
-    wind_speed: float
-    solar_radiation: float
-    pressure: float
+# Tree attributions for shap_top_features (well under a millisecond per model per request);
+# without them the rule-based factor importances are reported instead
+tree_explainer = None
+if use_advanced_models:
+    try:
+        with open("models/tree_explainer.pkl", "rb") as f:
+            tree_explainer = pickle.load(f)
+        if not tree_explainer.matches(crop_model, yield_model):
+            logger.info("Tree explainer was built for other models, ignoring it")
+            tree_explainer = None
+        else:
+            logger.info("Tree explainer loaded")
+    except FileNotFoundError:
+        pass
+    if tree_explainer is None:
+        try:
+            tree_explainer = TreeExplainer(crop_model, yield_model)
+            logger.info("Tree explainer built from loaded models")
+        except TypeError as e:
+            logger.info(f"Tree attributions not available: {e}")
 
-class ForecastData(BaseModel):
-    daily_forecast: List[Dict]
-    seasonal_outlook: str
+for name, artifact in (('crop_model', crop_model), ('yield_model', yield_model),
+                       ('preprocessor', preprocessor), ('tree_explainer', tree_explainer)):
+    admin.memory_diagnostics.register(name, artifact)
 
-class PredictRequest(BaseModel):
-    location: Location
-    features: Features
-    market_snapshot: Dict[str, float]
-    weather_data: WeatherData
-    forecast_data: ForecastData
+class ClimateRisk(BaseModel):
+    scenarios: int
+    loss_probability: float
+    expected_profit_inr: float
+    yield_p10_kg_per_ha: float
+    yield_p50_kg_per_ha: float
+    yield_p90_kg_per_ha: float
+    profit_p10_inr: float
+    profit_p50_inr: float
+    profit_p90_inr: float
 
 class CropRecommendation(BaseModel):
     crop: str
@@ -106,6 +153,9 @@ class CropRecommendation(BaseModel):
     season_suitability: str
     water_requirement: str
     market_demand: str
+    climate_risk: Optional[ClimateRisk] = None
+    pareto_rank: Optional[int] = None
+    weighted_score: Optional[float] = None
 
 class ShapFeature(BaseModel):
     feature: str
@@ -117,6 +167,12 @@ class PredictResponse(BaseModel):
     recommendations: List[CropRecommendation]
     explanation: str
     shap_top_features: List[ShapFeature]
+    yield_shap_top_features: Optional[List[ShapFeature]] = None
+    forecast_summary: Optional[Dict[str, Optional[float]]] = None
+    engine: Optional[str] = None
+    degraded: bool = False
+    soil_filled: Dict[str, str] = {}
+    session: Optional[Dict] = None
 
 @app.get("/health")
 async def health_check():
@@ -126,61 +182,35 @@ async def health_check():
         "yield_model_loaded": yield_model is not None
     }
 
+@app.get("/model/feature-importance")
+async def model_feature_importance():
+    """Global feature importances precomputed at training time"""
+    return {
+        "model_version": model_metadata.get("version"),
+        "global_feature_importance": model_metadata.get("global_feature_importance", {})
+    }
+
 @app.post("/predict", response_model=PredictResponse)
-async def predict_crops(request: PredictRequest):
+async def predict_crops(request: PredictRequest, x_deadline_ms: Optional[float] = Header(None)):
     try:
-        if crop_model is None or yield_model is None:
-            # Return dynamic mock predictions for development
-            return get_mock_prediction(request)
-        
-        # Prepare features for prediction
-        features_dict = {
-            "N": request.features.N,
-            "P": request.features.P,
-            "K": request.features.K,
-            "ph": request.features.ph,
-            "temperature": request.features.temperature,
-        }
-        
-        # Use the intelligent crop predictor
-        recommendations = crop_predictor.predict_crops(features_dict)
-        
-        if not recommendations:
-            # Fallback if no suitable crops found
-            recommendations = [{
-                "crop": "Rice",
-                "score": 0.6,
-                "predicted_yield_kg_per_ha": 3000,
-                "estimated_profit_inr": 25000,
-                "sustainability_score": 0.7,
-                "confidence": 0.7,
-                "risk_level": "Medium",
-                "season_suitability": "Kharif",
-                "water_requirement": "High",
-                "market_demand": "High"
-            }]
-        
-        # Generate intelligent explanation
-        top_crop = recommendations[0]["crop"]
-        explanation = crop_predictor.generate_explanation(top_crop, features_dict)
+        deadline = deadline_seconds(x_deadline_ms)
+        validate_predict_request(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        features_dict = request.features.model_dump()
+        # Soil fields the client left out (or sent as static defaults) come from the soil raster
+        soil_filled = services.fill_soil(features_dict, request.location)
+        if soil_filled:
+            # Engines that read the request itself (the heuristic rules) see the filled values too
+            request.features = request.features.model_copy(update={f: features_dict[f] for f in soil_filled})
+        services.drift_monitor.observe(features_dict, request.weather_data.model_dump())
         
-        # Get feature importance
-        shap_features = crop_predictor.get_feature_importance(features_dict)
+        response = await services.recommend(engines, request, features_dict, deadline)
+        response["soil_filled"] = soil_filled
         
-        response = {
-            "model_version": "v2.0.0-intelligent",
-            "timestamp": datetime.now().isoformat(),
-            "recommendations": recommendations,
-            "explanation": explanation,
-            "shap_top_features": shap_features,
-            "location_analysis": {
-                "latitude": request.location.lat,
-                "longitude": request.location.lon,
-                "region_suitability": "Good" if recommendations[0]["score"] > 0.7 else "Moderate"
-            }
-        }
-        
-        logger.info(f"Generated {len(recommendations)} intelligent recommendations")
+        logger.info(f"Generated {len(response['recommendations'])} recommendations with the {response['engine']} engine")
         return response
         
     except Exception as e:
@@ -192,7 +222,9 @@ def get_mock_prediction(request: PredictRequest = None) -> PredictResponse:
     if request is None:
         # Fallback static data
         crops = ["Rice", "Soybean", "Maize"]
-        features = {"ph": 6.8, "N": 45, "temperature": 25, "humidity": 65, "rainfall": 100}
+        features = {"ph": 6.8, "N": 45, "temperature": 25, "humidity": 65, "rainfall": 100,
+                    "organic_carbon": 0.8, "irrigation_type": "rainfed", "farming_method": "conventional",
+                    "experience_years": 5}
         weather = WeatherData(temperature=25, humidity=65, rainfall=100, wind_speed=10, solar_radiation=200, pressure=1013)
     else:
         # Use actual request data for dynamic predictions
@@ -204,28 +236,34 @@ def get_mock_prediction(request: PredictRequest = None) -> PredictResponse:
             "temperature": request.features.temperature,
             "humidity": request.features.humidity,
             "rainfall": request.features.rainfall,
-            "organic_carbon": request.features.organic_carbon
+            "organic_carbon": request.features.organic_carbon,
+            "irrigation_type": request.features.irrigation_type,
+            "farming_method": request.features.farming_method,
+            "experience_years": request.features.experience_years
         }
         weather = request.weather_data
         
         # Determine best crops based on conditions
         crops = select_crops_based_on_conditions(features, weather, request.features.soil_type)
     
+    # Table prices with the request's snapshot applied, and their demand classes, once for all crops
+    prices = price_table.prices(request.market_snapshot if request else None)
+    demand = price_table.demand(prices)
+    
     # Generate dynamic recommendations
     recommendations = []
     for i, crop in enumerate(crops[:3]):
         # Calculate dynamic scores based on actual conditions
         score = calculate_crop_score(crop, features, weather)
         yield_estimate = adjust_yield_for_crop(crop, 3000, features)
-        profit = calculate_profit_estimate(crop, yield_estimate, 
-                                         request.market_snapshot if request else {"Rice": 2000, "Soybean": 4000, "Maize": 1800}, 
+        profit = calculate_profit_estimate(crop, yield_estimate, price_table.value_of(crop, prices),
                                          request.features.area_ha if request else 1.0)
         sustainability = calculate_sustainability_score(crop, features, 
                                                        request.features.farming_method if request else "conventional")
         risk = determine_risk_level(crop, features, weather)
         season = determine_season_suitability(crop, datetime.now().month)
         water_req = get_water_requirement(crop)
-        market_demand = determine_market_demand(crop, request.market_snapshot if request else {"Rice": 2000, "Soybean": 4000, "Maize": 1800})
+        market_demand = determine_market_demand(crop, demand)
         
         recommendations.append(CropRecommendation(
             crop=crop,
@@ -378,9 +416,9 @@ def adjust_yield_for_crop(crop: str, base_yield: float, features: dict) -> float
     
     return base_yield_for_crop * adjustment_factor
 
-def calculate_profit_estimate(crop: str, yield_kg_per_ha: float, market_prices: dict, area_ha: float) -> float:
+def calculate_profit_estimate(crop: str, yield_kg_per_ha: float, price_per_quintal: float, area_ha: float) -> float:
     """Calculate comprehensive profit estimate"""
-    price_per_kg = market_prices.get(crop, 2000) / 100  # Convert from per quintal to per kg
+    price_per_kg = price_per_quintal / 100  # Convert from per quintal to per kg
     
     # Comprehensive cost estimates (per hectare) including all farming costs
     cost_estimates = {
@@ -505,19 +543,9 @@ def get_water_requirement(crop: str) -> str:
     }
     return water_requirements.get(crop, "Medium")
 
-def determine_market_demand(crop: str, market_prices: dict) -> str:
-    """Determine market demand based on current prices"""
-    avg_price = sum(market_prices.values()) / len(market_prices)
-    crop_price = market_prices.get(crop, avg_price)
-    
-    if crop_price > avg_price * 1.2:
-        return "Very Strong"
-    elif crop_price > avg_price * 1.1:
-        return "Strong"
-    elif crop_price < avg_price * 0.9:
-        return "Weak"
-    else:
-        return "Moderate"
+def determine_market_demand(crop: str, demand: np.ndarray) -> str:
+    """Market demand class for a crop from the price table's demand column"""
+    return price_table.value_of(crop, demand, default="Moderate")
 
 def generate_comprehensive_explanation(features: dict, top_recommendation: CropRecommendation, weather: WeatherData) -> str:
     """Generate comprehensive human-readable explanation"""
@@ -575,6 +603,40 @@ def generate_feature_importance(features: dict, top_recommendation: CropRecommen
         for feature, impact in importance_scores.items()
     ]
 
+def heuristic_prediction(features: Dict, top_k: int = 5, forecast=None, market_snapshot=None,
+                         request: PredictRequest = None) -> Prediction:
+    """The hand-written rules above as a prediction engine"""
+    response = get_mock_prediction(request)
+    return Prediction(
+        "heuristic", response.model_version,
+        [recommendation.model_dump() for recommendation in response.recommendations[:top_k]],
+        response.explanation, [feature.model_dump() for feature in response.shap_top_features]
+    )
+
+# Prediction engines: ML_ENGINE selects the primary (rule scoring by default when the
+# trained models are loaded, the heuristic rules otherwise), ML_SHADOW_ENGINE and
+# ML_SHADOW_FRACTION a shadow engine compared against it in the background
+attributions = TreeAttributions(crop_predictor, tree_explainer, model_metadata.get("features"))
+engines = EngineRegistry(engine_threads=cpu_budget.threads)
+engines.register(RuleEngine(crop_predictor, attributions, services.scoring_sessions))
+# Multi-objective ranking, used by /predict requests with ranking="pareto"
+engines.register(ParetoEngine(crop_predictor, services.risk_simulator, attributions))
+engines.register(FunctionEngine("heuristic", "v2.0.0-dynamic-mock", heuristic_prediction))
+# Answers requests whose primary engine misses its deadline (X-Deadline-Ms / ML_PREDICT_DEADLINE_MS);
+# without tree attributions, which cost more than the scoring itself
+engines.fallback = RuleEngine(crop_predictor)
+if use_advanced_models:
+    engines.register(SklearnEngine(crop_model, yield_model, crop_predictor, model_metadata["features"],
+                                   model_metadata.get("version", "v2.1.0"), attributions))
+# Neighbour voting over the labelled dataset, restricted to crops the catalog can score
+neighbour_index = NeighbourIndex.from_env(crops=set(services.catalog.crops) | set(services.catalog.names))
+if neighbour_index is not None:
+    engines.register(NeighbourEngine(neighbour_index, crop_predictor))
+    admin.memory_diagnostics.register('neighbour_index', neighbour_index)
+engines.configure_from_env(default_primary="rules" if use_advanced_models else "heuristic")
+app.state.engines = engines
+
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    # TCP on port 8001 by default; --uds or ML_SERVICE_SOCKET serves on a Unix socket
+    from serving import run
+    run(app)
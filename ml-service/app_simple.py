@@ -1,10 +1,18 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import List, Dict, Optional
-import json
-from datetime import datetime
+from fastapi import FastAPI, Header, HTTPException
+from typing import Optional
 import logging
-from crop_predictor import CropPredictor
+from profiler import ProfilingMiddleware
+from memory_diagnostics import AllocationMiddleware
+from admission import AdmissionController, AdmissionMiddleware
+import admin
+import metrics
+import region_tiles
+import jobs
+from services import Services, router as services_router
+from cpu_budget import CpuBudget
+from engines import EngineRegistry, NeighbourEngine, ParetoEngine, RuleEngine, deadline_seconds
+from neighbour_index import NeighbourIndex
+from schemas import PredictRequest, validate_predict_request
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -12,50 +20,48 @@ logger = logging.getLogger(__name__)
 
 app = FastAPI(title="Smart Crop Recommendation ML Service", version="2.0.0")
 
-# Initialize the intelligent crop predictor
-crop_predictor = CropPredictor()
-logger.info("Intelligent crop predictor initialized")
+# This worker's share of the cores (ML_WORKERS, ML_THREADS_PER_WORKER, ML_PIN_CPUS); sizes
+# the BLAS/OpenMP pools, sklearn n_jobs and engine threads below
+app.state.cpu_budget = cpu_budget = CpuBudget.from_env().apply()
 
-class Location(BaseModel):
-    lat: float
-    lon: float
+# Admin endpoints and opt-in request profiling (idle unless armed via /admin/profiler)
+app.include_router(admin.router)
+app.add_middleware(ProfilingMiddleware, controller=admin.profile_controller)
+# Prometheus metrics, including net memory blocks allocated per request
+app.include_router(metrics.router)
+app.add_middleware(AllocationMiddleware)
+# Load shedding for scoring endpoints (ML_MAX_CONCURRENCY, ML_MAX_QUEUE, ML_MAX_QUEUE_WAIT_MS);
+# outermost, so rejected requests cost as little as possible
+app.state.admission = AdmissionController.from_env()
+app.add_middleware(AdmissionMiddleware, controller=app.state.admission)
+# Region lookups answered from precomputed tiles (python region_tiles.py, ML_REGION_TILES)
+app.include_router(region_tiles.router)
+app.state.region_tiles = region_tiles.RegionTiles.load()
+# Bulk scoring and what-if jobs on a worker process pool (ML_JOBS_DIR, ML_JOB_WORKERS, ML_JOB_QUEUE)
+app.include_router(jobs.router)
+app.state.jobs = jobs.JobManager.from_env()
 
-class Features(BaseModel):
-    N: float
-    P: float
-    K: float
-    ph: float
-    temperature: float
-    humidity: float
-    rainfall: float
-    organic_carbon: float
-    soil_type: str
-    area_ha: float
-    farming_method: str
-    irrigation_type: str
-    previous_crops: List[str]
-    experience_years: int
-    budget_category: str
-    preferred_crops: List[str]
+# Rule-based predictor, optimizers, soil raster, forecast cache, risk simulator and drift
+# monitor; the endpoints served straight from them come from the shared services router
+app.state.services = services = Services.load()
+app.include_router(services_router)
+app.state.drift_monitor = services.drift_monitor
+crop_predictor = services.crop_predictor
 
-class WeatherData(BaseModel):
-    temperature: float
-    humidity: float
-    rainfall: float
-    wind_speed: float
-    solar_radiation: float
-    pressure: float
-
-class ForecastData(BaseModel):
-    daily_forecast: List[Dict]
-    seasonal_outlook: str
-
-class PredictRequest(BaseModel):
-    location: Location
-    features: Features
-    market_snapshot: Dict[str, float]
-    weather_data: WeatherData
-    forecast_data: ForecastData
+# Prediction engines (ML_ENGINE / ML_SHADOW_ENGINE): rule scoring, and neighbour voting when the dataset is present
+engines = EngineRegistry(engine_threads=cpu_budget.threads)
+engines.register(RuleEngine(crop_predictor, sessions=services.scoring_sessions))
+# Multi-objective ranking, used by /predict requests with ranking="pareto"
+engines.register(ParetoEngine(crop_predictor, services.risk_simulator))
+# Rule scoring is already the cheap path, so deadlines never need a fallback here
+engines.fallback = engines.get("rules")
+# Neighbour voting over the labelled dataset, restricted to crops the catalog can score
+neighbour_index = NeighbourIndex.from_env(crops=set(services.catalog.crops) | set(services.catalog.names))
+if neighbour_index is not None:
+    engines.register(NeighbourEngine(neighbour_index, crop_predictor))
+    admin.memory_diagnostics.register('neighbour_index', neighbour_index)
+engines.configure_from_env()
+app.state.engines = engines
 
 @app.get("/")
 async def root():
@@ -66,7 +72,15 @@ async def root():
         "status": "running",
         "endpoints": {
             "health": "/health",
-            "predict": "/predict"
+            "predict": "/predict",
+            "predict_packed": "/internal/predict",
+            "market_prices": "/market/prices",
+            "optimize_fertilizer": "/optimize/fertilizer",
+            "plan_rotation": "/plan/rotation",
+            "optimize_portfolio": "/optimize/portfolio",
+            "region_suitability": "/region/suitability",
+            "jobs": "/jobs",
+            "metrics": "/metrics"
         }
     }
 
@@ -80,22 +94,32 @@ async def health_check():
     }
 
 @app.post("/predict")
-async def predict_crops(request: PredictRequest):
+async def predict_crops(request: PredictRequest, x_deadline_ms: Optional[float] = Header(None)):
     """Generate intelligent crop recommendations"""
+    try:
+        deadline = deadline_seconds(x_deadline_ms)
+        validate_predict_request(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
     try:
         logger.info(f"Prediction request for location: {request.location.lat}, {request.location.lon}")
         
+        # Soil fields the client left out (or sent as static defaults) come from the soil raster
+        features = request.features.model_dump()
+        soil_filled = services.fill_soil(features, request.location)
+        
         # Extract features for the intelligent predictor
         features_dict = {
             'temperature': request.weather_data.temperature,
             'humidity': request.weather_data.humidity,
             'rainfall': request.weather_data.rainfall,
-            'ph': request.features.ph,
-            'N': request.features.N,
-            'P': request.features.P,
-            'K': request.features.K,
-            'organic_carbon': request.features.organic_carbon,
-            'soil_type': request.features.soil_type,
+            'ph': features['ph'],
+            'N': features['N'],
+            'P': features['P'],
+            'K': features['K'],
+            'organic_carbon': features['organic_carbon'],
+            'soil_type': features['soil_type'],
             'area_ha': request.features.area_ha,
             'farming_method': request.features.farming_method,
             'irrigation_type': request.features.irrigation_type,
@@ -104,50 +128,16 @@ async def predict_crops(request: PredictRequest):
             'preferred_crops': request.features.preferred_crops
         }
         
+        services.drift_monitor.observe(features, request.weather_data.model_dump())
+        
         # Use the intelligent crop predictor
         logger.info(f"Input features: {features_dict}")
-        recommendations = crop_predictor.predict_crops(features_dict)
-        logger.info(f"ML predictions returned: {len(recommendations)} crops")
-        
-        if not recommendations:
-            logger.warning("No crops met suitability threshold, using fallback")
-            # Fallback if no suitable crops found
-            recommendations = [{
-                "crop": "Rice",
-                "score": 0.6,
-                "predicted_yield_kg_per_ha": 3000,
-                "estimated_profit_inr": 25000,
-                "sustainability_score": 0.7,
-                "confidence": 0.7,
-                "risk_level": "Medium",
-                "season_suitability": "Kharif",
-                "water_requirement": "High",
-                "market_demand": "High"
-            }]
-        else:
-            logger.info(f"Top recommendation: {recommendations[0]['crop']} with score {recommendations[0]['score']}")
-        
-        # Generate intelligent explanation
-        top_crop = recommendations[0]["crop"]
-        explanation = crop_predictor.generate_explanation(top_crop, features_dict)
-        
-        # Get feature importance for the top recommended crop
-        shap_features = crop_predictor.get_feature_importance(top_crop, features_dict)
-        
-        response = {
-            "model_version": "v2.0.0-intelligent",
-            "timestamp": datetime.now().isoformat(),
-            "recommendations": recommendations,
-            "explanation": explanation,
-            "shap_top_features": shap_features,
-            "location_analysis": {
-                "latitude": request.location.lat,
-                "longitude": request.location.lon,
-                "region_suitability": "Good" if recommendations[0]["score"] > 0.7 else "Moderate"
-            }
-        }
+        response = await services.recommend(engines, request, features_dict, deadline)
+        response["soil_filled"] = soil_filled
         
-        logger.info(f"Generated {len(recommendations)} intelligent recommendations")
+        top = response["recommendations"][0]
+        logger.info(f"Top recommendation: {top['crop']} with score {top['score']}")
+        logger.info(f"Generated {len(response['recommendations'])} intelligent recommendations")
         return response
         
     except Exception as e:
@@ -155,5 +145,6 @@ async def predict_crops(request: PredictRequest):
         raise HTTPException(status_code=500, detail=f"Prediction failed: {str(e)}")
 
 if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8001)
+    # TCP on port 8001 by default; --uds or ML_SERVICE_SOCKET serves on a Unix socket
+    from serving import run
+    run(app)
@@ -0,0 +1,96 @@
+"""
+Compare request latency over TCP loopback and a Unix domain socket.
+
+Starts the service twice (one TCP port, one socket) and sends the same
+requests through a persistent MLServiceClient connection to each:
+
+    python benchmark_transport.py --app app_simple:app --requests 2000
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+from binary_protocol import encode_request
+from ml_client import MLServiceClient
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+SAMPLE_REQUEST = {
+    "location": {"lat": 22.57, "lon": 88.36},
+    "features": {
+        "N": 40, "P": 20, "K": 120, "ph": 6.8, "temperature": 28, "humidity": 75, "rainfall": 80,
+        "organic_carbon": 0.8, "soil_type": "Loamy", "area_ha": 2.5, "farming_method": "organic",
+        "irrigation_type": "drip", "previous_crops": [], "experience_years": 5,
+        "budget_category": "medium", "preferred_crops": []
+    },
+    "market_snapshot": {"Rice": 2000},
+    "weather_data": {
+        "temperature": 28, "humidity": 75, "rainfall": 80, "wind_speed": 3.0,
+        "solar_radiation": 200, "pressure": 1013
+    },
+    "forecast_data": {"daily_forecast": [], "seasonal_outlook": "Normal"},
+}
+
+def start_server(app: str, args) -> subprocess.Popen:
+    command = [sys.executable, "-m", "uvicorn", app, "--app-dir", HERE, "--log-level", "warning",
+               "--timeout-keep-alive", "75"] + args
+    return subprocess.Popen(command, cwd=HERE)
+
+def wait_until_ready(client: MLServiceClient, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            client.health()
+            return
+        except (ConnectionError, FileNotFoundError, OSError):
+            client.close()
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+def measure(call, n: int) -> np.ndarray:
+    for _ in range(min(100, n)):  # warm up
+        call()
+    latencies = np.empty(n)
+    for i in range(n):
+        start = time.perf_counter()
+        call()
+        latencies[i] = time.perf_counter() - start
+    return latencies * 1000
+
+def report(name: str, latencies: np.ndarray):
+    p50, p99 = np.percentile(latencies, [50, 99])
+    print(f"{name:<18} mean {latencies.mean():7.3f} ms   p50 {p50:7.3f} ms   p99 {p99:7.3f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--app", default="app_simple:app")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--port", type=int, default=8011)
+    options = parser.parse_args()
+
+    socket_path = os.path.join(tempfile.mkdtemp(), "ml-service.sock")
+    servers = [
+        start_server(options.app, ["--host", "127.0.0.1", "--port", str(options.port)]),
+        start_server(options.app, ["--uds", socket_path]),
+    ]
+    features = dict(SAMPLE_REQUEST["features"], **SAMPLE_REQUEST["location"])
+    packed = encode_request(features)
+    try:
+        for name, client in (("tcp", MLServiceClient(port=options.port)),
+                             ("uds", MLServiceClient(socket_path=socket_path))):
+            with client:
+                wait_until_ready(client)
+                report(f"{name} /health", measure(client.health, options.requests))
+                report(f"{name} /predict", measure(lambda: client.predict(SAMPLE_REQUEST), options.requests))
+                report(f"{name} packed", measure(lambda: client.predict_packed(packed), options.requests))
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+if __name__ == "__main__":
+    main()
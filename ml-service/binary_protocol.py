@@ -0,0 +1,120 @@
+import math
+import struct
+import numpy as np
+from datetime import date, timedelta
+from typing import Dict, Optional, Sequence, Tuple
+from forecast_features import FORECAST_FIELDS
+
+# Packed request layout for backend-to-service calls. The version travels in
+# the SCHEMA_HEADER HTTP header; any layout change gets a new version.
+SCHEMA_VERSION = 1
+SCHEMA_HEADER = "X-Feature-Schema"
+CONTENT_TYPE = "application/octet-stream"
+
+# Little-endian float64 fields, in payload order
+NUMERIC_FIELDS = (
+    'lat', 'lon', 'N', 'P', 'K', 'ph', 'temperature', 'humidity', 'rainfall',
+    'organic_carbon', 'area_ha', 'experience_years'
+)
+
+# uint8 categorical codes: 0 means "not given", n means CODES[field][n - 1]
+CODES = {
+    'soil_type': ('Alluvial', 'Black', 'Clayey', 'Loamy', 'Peaty', 'Red', 'Sandy', 'Silty'),
+    'farming_method': ('conventional', 'mixed', 'organic'),
+    'irrigation_type': ('drip', 'irrigated', 'rainfed', 'sprinkler'),
+    'season': ('Kharif', 'Rabi', 'Year-round'),
+    'water_req': ('Low', 'Medium', 'High', 'Very High'),
+}
+CODE_FIELDS = tuple(CODES)
+
+# Fixed part: numeric fields, codes, top_k (uint8), forecast start as days
+# since 1970-01-01 (int32) and forecast day count (uint16). It is followed by
+# one float32 row of FORECAST_FIELDS per forecast day.
+HEADER_FORMAT = struct.Struct('<' + 'd' * len(NUMERIC_FIELDS) + 'B' * len(CODE_FIELDS) + 'BiH')
+FORECAST_DTYPE = np.dtype('<f4')
+EPOCH = date(1970, 1, 1)
+
+_NUMERIC_POSITIONS = {name: i for i, name in enumerate(NUMERIC_FIELDS)}
+_CODE_POSITIONS = {name: i for i, name in enumerate(CODE_FIELDS)}
+
+class ProtocolError(ValueError):
+    """Raised for payloads that do not match the packed layout"""
+
+class PackedFeatures:
+    """
+    Decoded packed request. Values stay in the unpacked tuple; get() reads
+    them by fixed position so the scoring engine can use it in place of a
+    feature dict.
+    """
+
+    __slots__ = ('values', 'codes', 'top_k', 'forecast_start', 'forecast_days')
+
+    def __init__(self, values: Tuple[float, ...], codes: Tuple[int, ...], top_k: int,
+                 forecast_start: Optional[str], forecast_days: np.ndarray):
+        self.values = values
+        self.codes = codes
+        self.top_k = top_k
+        self.forecast_start = forecast_start
+        self.forecast_days = forecast_days
+
+    def get(self, name: str, default=None):
+        position = _NUMERIC_POSITIONS.get(name)
+        if position is not None:
+            return self.values[position]
+        position = _CODE_POSITIONS.get(name)
+        if position is not None:
+            code = self.codes[position]
+            return CODES[name][code - 1] if code else default
+        return default
+
+    def __getitem__(self, name: str):
+        value = self.get(name)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def __repr__(self) -> str:
+        return f"PackedFeatures({dict(zip(NUMERIC_FIELDS, self.values))})"
+
+def decode_request(payload: bytes, version: Optional[str]) -> PackedFeatures:
+    """Decode a packed request body; `version` is the SCHEMA_HEADER value"""
+    if version is None:
+        raise ProtocolError(f"Missing {SCHEMA_HEADER} header")
+    if version != str(SCHEMA_VERSION):
+        raise ProtocolError(f"Unsupported feature schema version: {version}")
+    if len(payload) < HEADER_FORMAT.size:
+        raise ProtocolError(f"Payload too short: {len(payload)} bytes")
+
+    fields = HEADER_FORMAT.unpack_from(payload)
+    n_numeric, n_codes = len(NUMERIC_FIELDS), len(CODE_FIELDS)
+    values = fields[:n_numeric]
+    codes = fields[n_numeric:n_numeric + n_codes]
+    top_k, start_day, n_days = fields[n_numeric + n_codes:]
+
+    for name, code in zip(CODE_FIELDS, codes):
+        if code > len(CODES[name]):
+            raise ProtocolError(f"Unknown {name} code: {code}")
+    if not all(map(math.isfinite, values)):
+        raise ProtocolError("Numeric fields must be finite")
+
+    expected = HEADER_FORMAT.size + n_days * len(FORECAST_FIELDS) * FORECAST_DTYPE.itemsize
+    if len(payload) != expected:
+        raise ProtocolError(f"Payload is {len(payload)} bytes, expected {expected} for {n_days} forecast days")
+    forecast_days = np.frombuffer(payload, dtype=FORECAST_DTYPE, offset=HEADER_FORMAT.size)
+    forecast_days = forecast_days.reshape(n_days, len(FORECAST_FIELDS)).astype(float)
+
+    # Same ISO date key as JSON requests so both share forecast cache entries
+    forecast_start = (EPOCH + timedelta(days=start_day)).isoformat() if n_days else None
+    return PackedFeatures(values, codes, top_k or 5, forecast_start, forecast_days)
+
+def encode_request(features: Dict, top_k: int = 5, daily_forecast: Sequence[Dict] = ()) -> bytes:
+    """Pack a feature dict (plus lat/lon) and optional daily forecast"""
+    values = [float(features.get(name, 0.0)) for name in NUMERIC_FIELDS]
+    codes = [CODES[name].index(features[name]) + 1 if features.get(name) else 0 for name in CODE_FIELDS]
+    start_day = 0
+    if daily_forecast:
+        start_day = (date.fromisoformat(daily_forecast[0]['date']) - EPOCH).days
+    header = HEADER_FORMAT.pack(*values, *codes, top_k, start_day, len(daily_forecast))
+    rows = [[day.get(field) for field in FORECAST_FIELDS] for day in daily_forecast]
+    rows = [[float('nan') if value is None else value for value in row] for row in rows]
+    return header + np.array(rows, dtype=FORECAST_DTYPE).tobytes()
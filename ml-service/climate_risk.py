@@ -0,0 +1,119 @@
+import os
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from crop_predictor import CropPredictor
+from engines import catalog_positions
+from forecast_features import ForecastFeatures
+
+DEFAULT_SCENARIOS = 2000
+PERCENTILES = (10, 50, 90)
+
+# Spread of the season's weather around the current reading when no forecast
+# narrows it down: temperature in °C, rainfall as a coefficient of variation
+TEMPERATURE_SD = 2.0
+RAINFALL_CV = 0.35
+# Hot seasons tend to be dry ones
+TEMPERATURE_RAINFALL_CORRELATION = -0.3
+# With a forecast, the temperature spread is this share of the gap between its
+# warmest and coolest windows, and the rainfall CV grows with its dry days
+FORECAST_TEMPERATURE_SHARE = 0.25
+MIN_TEMPERATURE_SD = 0.5
+DRY_DAY_RAINFALL_CV = 0.4
+
+class ClimateRiskSimulator:
+    """
+    Monte Carlo climate risk for recommended crops. Temperature and rainfall
+    scenarios become (scenarios, 1) columns that broadcast against the
+    recommended catalog entries, so all scenarios and crops go through the
+    suitability and yield model in one pass.
+
+    Cultivation cost is fixed before the season at the cost factor times
+    the revenue expected under the central scenario; a scenario is a loss
+    when its revenue does not cover that. The standard normal draws are
+    made once, so the same request always gets the same answer and crops
+    are compared under the same weather.
+    """
+
+    def __init__(self, predictor: CropPredictor, n_scenarios: int = DEFAULT_SCENARIOS, seed: int = 42):
+        self.predictor = predictor
+        self.n_scenarios = n_scenarios
+        draws = np.random.default_rng(seed).standard_normal((n_scenarios, 2))
+        rho = TEMPERATURE_RAINFALL_CORRELATION
+        # Scenario 0 is the central one (no shock)
+        draws[0] = 0.0
+        self._temperature_shock = draws[:, 0:1]
+        self._rainfall_shock = rho * draws[:, 0:1] + np.sqrt(1 - rho ** 2) * draws[:, 1:2]
+
+    @classmethod
+    def from_env(cls, predictor: CropPredictor) -> Optional["ClimateRiskSimulator"]:
+        """Simulator with ML_RISK_SCENARIOS scenarios; None when set to 0"""
+        n_scenarios = int(os.environ.get("ML_RISK_SCENARIOS", DEFAULT_SCENARIOS))
+        return cls(predictor, n_scenarios) if n_scenarios > 0 else None
+
+    @staticmethod
+    def spread(forecast: Optional[ForecastFeatures] = None) -> Tuple[float, float]:
+        """Temperature standard deviation and rainfall coefficient of variation of the scenarios"""
+        if forecast is None or not forecast.summary.get('days'):
+            return TEMPERATURE_SD, RAINFALL_CV
+        summary = forecast.summary
+        # Window means are None when no forecast day has a temperature
+        warmest, coolest = summary['warmest_window_mean'], summary['coolest_window_mean']
+        temperature_sd = max(MIN_TEMPERATURE_SD, FORECAST_TEMPERATURE_SHARE * (warmest - coolest)) \
+            if warmest is not None and coolest is not None else TEMPERATURE_SD
+        return temperature_sd, RAINFALL_CV + DRY_DAY_RAINFALL_CV * summary['dry_days'] / summary['days']
+
+    def outcomes(self, features: Dict, idx: np.ndarray, weather: Optional[Dict] = None,
+                 forecast: Optional[ForecastFeatures] = None,
+                 market_snapshot: Optional[Dict] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(scenarios, entries) yields and profits of the catalog entries at `idx`"""
+        predictor = self.predictor
+        weather = weather or {}
+        temperature = weather.get('temperature', features.get('temperature', 25))
+        rainfall = weather.get('rainfall', features.get('rainfall', 50))
+        temperature_sd, rainfall_cv = self.spread(forecast)
+
+        # Lognormal rainfall keeps scenarios positive and centred on the reading
+        sigma = np.sqrt(np.log1p(rainfall_cv ** 2))
+        scenario_features = dict(features)
+        scenario_features['temperature'] = temperature + temperature_sd * self._temperature_shock
+        scenario_features['rainfall'] = rainfall * np.exp(sigma * self._rainfall_shock - sigma ** 2 / 2)
+
+        scores = predictor.score_factors(scenario_features, idx=idx, forecast=forecast)
+        yields = predictor._predict_yields(scores)
+        prices = predictor.price_table.prices(market_snapshot)
+        revenue = yields * scores.area_ha * prices[idx] / 100
+        cost = predictor._cost_factor[idx] * revenue[0]
+        return yields, revenue - cost
+
+    def loss_probabilities(self, features: Dict, idx: np.ndarray, weather: Optional[Dict] = None,
+                           forecast: Optional[ForecastFeatures] = None,
+                           market_snapshot: Optional[Dict] = None) -> np.ndarray:
+        """Share of scenarios in which each entry at `idx` loses money"""
+        _, profits = self.outcomes(features, idx, weather, forecast, market_snapshot)
+        return (profits < 0).mean(axis=0)
+
+    def simulate(self, features: Dict, idx: np.ndarray, weather: Optional[Dict] = None,
+                 forecast: Optional[ForecastFeatures] = None, market_snapshot: Optional[Dict] = None) -> List[Dict]:
+        """Loss probability and yield/profit percentiles for the catalog entries at `idx`"""
+        yields, profits = self.outcomes(features, idx, weather, forecast, market_snapshot)
+        loss_probability = (profits < 0).mean(axis=0)
+        yield_percentiles = np.percentile(yields, PERCENTILES, axis=0)
+        profit_percentiles = np.percentile(profits, PERCENTILES, axis=0)
+        return [{
+            'scenarios': self.n_scenarios,
+            'loss_probability': round(float(loss_probability[c]), 4),
+            'expected_profit_inr': int(profits[:, c].mean()),
+            **{f'yield_p{q}_kg_per_ha': int(yield_percentiles[j, c]) for j, q in enumerate(PERCENTILES)},
+            **{f'profit_p{q}_inr': int(profit_percentiles[j, c]) for j, q in enumerate(PERCENTILES)},
+        } for c in range(len(idx))]
+
+    def annotate(self, recommendations: List[Dict], features: Dict, weather: Optional[Dict] = None,
+                 forecast: Optional[ForecastFeatures] = None, market_snapshot: Optional[Dict] = None):
+        """Add a 'climate_risk' entry to every recommendation of a crop the catalog knows"""
+        positions = catalog_positions(self.predictor.catalog, [r.get('variety') or r['crop'] for r in recommendations])
+        known = np.flatnonzero(positions >= 0)
+        if not known.size:
+            return
+        risks = self.simulate(features, positions[known], weather, forecast, market_snapshot)
+        for i, risk in zip(known, risks):
+            recommendations[i]['climate_risk'] = risk
@@ -0,0 +1,9 @@
+import pytest
+
+# TestClient requests do not come from a loopback address, so admin calls need a token
+ADMIN_TOKEN = "test-admin-token"
+ADMIN_HEADERS = {"X-Admin-Token": ADMIN_TOKEN}
+
+@pytest.fixture(autouse=True)
+def admin_token(monkeypatch):
+    monkeypatch.setenv("ML_ADMIN_TOKEN", ADMIN_TOKEN)
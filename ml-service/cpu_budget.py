@@ -0,0 +1,115 @@
+import fcntl
+import logging
+import os
+import tempfile
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Native thread pools sized through the environment; read by libraries when
+# they load, so they also reach job worker processes started later
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "BLIS_NUM_THREADS",
+                   "VECLIB_MAXIMUM_THREADS", "NUMEXPR_NUM_THREADS")
+
+def available_cpus() -> List[int]:
+    """CPUs this process may run on (respects container and taskset limits)"""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:
+        return list(range(os.cpu_count() or 1))
+
+def limit_estimator_jobs(estimator, n_jobs: int) -> int:
+    """Set n_jobs on every step of a (possibly pipelined) sklearn estimator; returns how many were set"""
+    if estimator is None:
+        return 0
+    limited = 0
+    for step in [estimator, *[s for _, s in getattr(estimator, 'steps', [])]]:
+        if hasattr(step, 'n_jobs'):
+            step.n_jobs = n_jobs
+            limited += 1
+    return limited
+
+class CpuBudget:
+    """
+    Share of the host's cores for one serving worker process.
+
+    The available CPUs are divided evenly across `workers` processes and
+    every thread pool in the process (OpenMP/BLAS, sklearn n_jobs, engine
+    executor threads) is sized to that share, so N workers do not each
+    start a pool as wide as the machine. With `pin`, each worker claims a
+    slot through a lock file and is bound to that slot's CPUs; a slot is
+    released when its process exits.
+    """
+
+    def __init__(self, workers: int = 1, threads: Optional[int] = None, pin: bool = False,
+                 cpus: Optional[List[int]] = None, slot_dir: Optional[str] = None):
+        self.cpus = cpus if cpus is not None else available_cpus()
+        self.workers = max(1, workers)
+        self.threads = max(1, threads or len(self.cpus) // self.workers)
+        self.pin = pin
+        self.slot_dir = slot_dir or tempfile.gettempdir()
+        self.slot = None
+        self.pinned_cpus = None
+        self._slot_file = None
+
+    @classmethod
+    def from_env(cls) -> "CpuBudget":
+        """ML_WORKERS (else WEB_CONCURRENCY, as uvicorn --workers reads it), ML_THREADS_PER_WORKER, ML_PIN_CPUS"""
+        workers = int(os.environ.get("ML_WORKERS", os.environ.get("WEB_CONCURRENCY", 1)))
+        threads = os.environ.get("ML_THREADS_PER_WORKER")
+        return cls(workers, int(threads) if threads else None,
+                   pin=os.environ.get("ML_PIN_CPUS", "").lower() in ("1", "true", "yes"),
+                   slot_dir=os.environ.get("ML_CPU_SLOT_DIR"))
+
+    def apply(self) -> "CpuBudget":
+        """Limit this process's thread pools to the budget, and pin it when configured"""
+        for name in THREAD_ENV_VARS:
+            os.environ[name] = str(self.threads)
+        # Libraries already loaded (NumPy's BLAS) no longer read the environment
+        try:
+            from threadpoolctl import threadpool_limits
+            threadpool_limits(limits=self.threads)
+        except ImportError:
+            logger.info("threadpoolctl not installed; only new processes pick up the thread limits")
+        if self.pin:
+            self._pin()
+        logger.info(f"CPU budget: {self.threads} threads of {len(self.cpus)} CPUs for each of {self.workers} workers"
+                    + (f", pinned to {self.pinned_cpus}" if self.pinned_cpus else ""))
+        return self
+
+    def _pin(self):
+        # Slots are claimed first come first served; workers beyond the CPU
+        # count (or a full set of slots) stay unpinned
+        per_slot = min(self.threads, len(self.cpus))
+        for slot in range(min(self.workers, len(self.cpus) // per_slot)):
+            slot_file = open(os.path.join(self.slot_dir, f"ml-service-cpu-slot-{slot}.lock"), "w")
+            try:
+                fcntl.flock(slot_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                slot_file.close()
+                continue
+            cpus = self.cpus[slot * per_slot:(slot + 1) * per_slot]
+            os.sched_setaffinity(0, cpus)
+            self.slot, self.pinned_cpus, self._slot_file = slot, cpus, slot_file
+            return
+        logger.warning("No free CPU slot, running unpinned")
+
+    def layout(self) -> Dict:
+        """Effective layout for this worker process, including the thread pools loaded right now"""
+        try:
+            from threadpoolctl import threadpool_info
+            threadpools = threadpool_info()
+        except ImportError:
+            threadpools = []
+        return {
+            'pid': os.getpid(),
+            'available_cpus': self.cpus,
+            'workers': self.workers,
+            'threads_per_worker': self.threads,
+            'pinned': self.pinned_cpus is not None,
+            'slot': self.slot,
+            'affinity': available_cpus(),
+            'env': {name: os.environ.get(name) for name in THREAD_ENV_VARS},
+            'threadpools': [{'api': pool['internal_api'], 'library': os.path.basename(pool['filepath']),
+                             'threads': pool['num_threads']} for pool in threadpools],
+        }
@@ -0,0 +1,152 @@
+import csv
+import json
+import os
+import numpy as np
+from typing import Dict, List, Optional
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "crop_catalog.json")
+
+# Temperature and pH distances at which the suitability factors reach zero
+TEMP_ZERO_DISTANCE = 10.0
+PH_ZERO_DISTANCE = 2.0
+
+# Season label of crops that can be sown in any season
+YEAR_ROUND = 'Year-round'
+
+_EMPTY = np.empty(0, dtype=np.intp)
+
+class CropCatalog:
+    """Columnar crop (or crop variety) requirement table with lookup indexes"""
+
+    def __init__(self, entries: List[Dict]):
+        if not entries:
+            raise ValueError("Crop catalog is empty")
+
+        self.entries = entries
+        self.crops = [entry['crop'] for entry in entries]
+        self.names = [entry.get('variety') or entry['crop'] for entry in entries]
+        self.varieties = [entry.get('variety') for entry in entries]
+        self._positions = {name: i for i, name in enumerate(self.names)}
+        if len(self._positions) != len(self.names):
+            raise ValueError("Crop catalog contains duplicate crop/variety names")
+
+        # Requirement columns, one element per entry
+        self.temp_min = np.array([e['temp_range'][0] for e in entries], dtype=float)
+        self.temp_max = np.array([e['temp_range'][1] for e in entries], dtype=float)
+        self.ph_min = np.array([e['ph_range'][0] for e in entries], dtype=float)
+        self.ph_max = np.array([e['ph_range'][1] for e in entries], dtype=float)
+        self.temp_opt = (self.temp_min + self.temp_max) / 2
+        self.ph_opt = (self.ph_min + self.ph_max) / 2
+        self.rainfall_min = np.array([e['rainfall_min'] for e in entries], dtype=float)
+        self.N_min = np.array([e['N_min'] for e in entries], dtype=float)
+        self.P_min = np.array([e['P_min'] for e in entries], dtype=float)
+        self.K_min = np.array([e['K_min'] for e in entries], dtype=float)
+        self.base_yield = np.array([e['base_yield'] for e in entries], dtype=float)
+        self.water_req = [e['water_req'] for e in entries]
+
+        # Inverted indexes: attribute value -> sorted entry positions
+        self.by_soil = self._build_index(e['soil_types'] for e in entries)
+        self.by_season = self._build_index(e['seasons'] for e in entries)
+        self.by_water = self._build_index([e['water_req']] for e in entries)
+        self._soil_masks = {}
+        for soil_type, positions in self.by_soil.items():
+            mask = np.zeros(len(entries), dtype=bool)
+            mask[positions] = True
+            self._soil_masks[soil_type] = mask
+        self._no_soil = np.zeros(len(entries), dtype=bool)
+
+        # Entries sorted by optimum so bound checks only touch a window
+        self._temp_order = np.argsort(self.temp_opt, kind='stable')
+        self._temp_sorted = self.temp_opt[self._temp_order]
+        self._temp_reach = max(TEMP_ZERO_DISTANCE, float(np.max(self.temp_max - self.temp_opt)))
+        self._ph_order = np.argsort(self.ph_opt, kind='stable')
+        self._ph_sorted = self.ph_opt[self._ph_order]
+        self._ph_reach = max(PH_ZERO_DISTANCE, float(np.max(self.ph_max - self.ph_opt)))
+
+    @staticmethod
+    def _build_index(values_per_entry) -> Dict[str, np.ndarray]:
+        index = {}
+        for i, values in enumerate(values_per_entry):
+            for value in values:
+                index.setdefault(value, []).append(i)
+        return {value: np.array(positions, dtype=np.intp) for value, positions in index.items()}
+
+    @classmethod
+    def load(cls, path: str = DEFAULT_CATALOG_PATH) -> "CropCatalog":
+        """Load a catalog from a JSON (list or {"crops": [...]}) or CSV file"""
+        if path.endswith('.csv'):
+            return cls(cls._read_csv(path))
+        with open(path, "r") as f:
+            data = json.load(f)
+        return cls(data['crops'] if isinstance(data, dict) else data)
+
+    @staticmethod
+    def _read_csv(path: str) -> List[Dict]:
+        """Read one entry per row; list columns are '|' separated"""
+        entries = []
+        with open(path, newline='') as f:
+            for row in csv.DictReader(f):
+                entries.append({
+                    'crop': row['crop'],
+                    'variety': row.get('variety') or None,
+                    'temp_range': (float(row['temp_min']), float(row['temp_max'])),
+                    'ph_range': (float(row['ph_min']), float(row['ph_max'])),
+                    'rainfall_min': float(row['rainfall_min']),
+                    'N_min': float(row['N_min']),
+                    'P_min': float(row['P_min']),
+                    'K_min': float(row['K_min']),
+                    'seasons': row['seasons'].split('|'),
+                    'soil_types': row['soil_types'].split('|'),
+                    'water_req': row['water_req'],
+                    'base_yield': float(row['base_yield']),
+                })
+        return entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def index_of(self, name: str) -> int:
+        """Position of a crop or variety name in the catalog"""
+        return self._positions[name]
+
+    def requirements(self) -> Dict[str, Dict]:
+        """Requirements keyed by crop/variety name, in the legacy dict layout"""
+        return {
+            name: {
+                'temp_range': tuple(entry['temp_range']), 'ph_range': tuple(entry['ph_range']),
+                'rainfall_min': entry['rainfall_min'], 'N_min': entry['N_min'],
+                'P_min': entry['P_min'], 'K_min': entry['K_min'],
+                'seasons': list(entry['seasons']), 'soil_types': list(entry['soil_types']),
+                'water_req': entry['water_req']
+            }
+            for name, entry in zip(self.names, self.entries)
+        }
+
+    def soil_mask(self, soil_type: str) -> np.ndarray:
+        """Boolean mask of entries that list `soil_type` as preferred"""
+        return self._soil_masks.get(soil_type, self._no_soil)
+
+    def _window(self, order: np.ndarray, sorted_opt: np.ndarray, value: float, reach: float) -> np.ndarray:
+        lo = np.searchsorted(sorted_opt, value - reach, side='left')
+        hi = np.searchsorted(sorted_opt, value + reach, side='right')
+        return order[lo:hi]
+
+    def candidates(self, temperature: float, ph: float, season: Optional[str] = None,
+                   water_req: Optional[str] = None) -> np.ndarray:
+        """
+        Sorted positions of entries whose temperature and pH factors can be
+        non-zero, optionally restricted to a season and water requirement.
+        Only the entries whose optimum lies within reach of the request are
+        visited, so the cost grows with the window rather than the catalog.
+        """
+        temp_window = self._window(self._temp_order, self._temp_sorted, temperature, self._temp_reach)
+        ph_window = self._window(self._ph_order, self._ph_sorted, ph, self._ph_reach)
+        positions = np.intersect1d(temp_window, ph_window, assume_unique=True)
+
+        if season is not None:
+            eligible = np.union1d(self.by_season.get(season, _EMPTY), self.by_season.get(YEAR_ROUND, _EMPTY))
+            positions = np.intersect1d(positions, eligible, assume_unique=True)
+        if water_req is not None:
+            positions = np.intersect1d(positions, self.by_water.get(water_req, _EMPTY), assume_unique=True)
+
+        return positions
@@ -1,201 +1,365 @@
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 import json
+import logging
+from crop_catalog import CropCatalog, DEFAULT_CATALOG_PATH
+from forecast_features import ForecastFeatures
+from market_prices import PriceTable
+
+logger = logging.getLogger(__name__)
+
+# Minimum suitability for a crop to be recommended at all
+MIN_SUITABILITY = 0.1
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Positions of the `k` highest scores, best first, using a partial
+    selection. Ties keep their original order, as a stable sort would.
+    """
+    if scores.size <= k:
+        return np.argsort(-scores, kind='stable')
+    kth = -np.partition(-scores, k - 1)[k - 1]
+    above = np.flatnonzero(scores > kth)
+    ties = np.flatnonzero(scores == kth)[:k - above.size]
+    selected = np.sort(np.concatenate([above, ties]))
+    return selected[np.argsort(-scores[selected], kind='stable')]
+
+class CropScores:
+    """
+    Per-entry factor breakdown for one request. Every intermediate ratio is
+    computed once here and then shared by the suitability score, the yield
+    model, the feature importances and the explanation.
+    """
+
+    # Per-entry arrays, all aligned with `idx`
+    FIELDS = (
+        'idx', 'temp_distance', 'temp_score', 'ph_distance', 'ph_score', 'rain_ratio',
+        'N_ratio', 'P_ratio', 'K_ratio', 'nutrient_score', 'soil_match', 'forecast_score', 'suitability'
+    )
+    # Factor groups and the request values each depends on (the forecast group depends on the forecast)
+    FACTOR_INPUTS = {
+        'temperature': ('temperature',),
+        'ph': ('ph',),
+        'rainfall': ('rainfall',),
+        'nutrients': ('N', 'P', 'K'),
+        'soil': ('soil_type',),
+    }
+
+    def __init__(self, catalog: CropCatalog, features: Dict, idx: np.ndarray,
+                 forecast: Optional[ForecastFeatures] = None):
+        self.catalog = catalog
+        self.idx = idx
+        self.forecast = forecast
+        self._read_values(features)
+        
+        # Factors the bound check needs; rainfall and nutrients wait for complete()
+        self._temperature_factors()
+        self._ph_factors()
+        self._soil_factors()
+        self._forecast_factors()
+        self.rain_ratio = None
+        self.N_ratio = self.P_ratio = self.K_ratio = None
+        self.nutrient_score = None
+        self.suitability = None
+
+    def _read_values(self, features: Dict):
+        """Request values with the defaults used throughout the predictor"""
+        self.features = features
+        self.temperature = features.get('temperature', 25)
+        self.ph = features.get('ph', 6.5)
+        self.rainfall = features.get('rainfall', 50)
+        self.N = features.get('N', 30)
+        self.P = features.get('P', 15)
+        self.K = features.get('K', 80)
+        self.soil_type = features.get('soil_type', 'Loamy')
+        self.area_ha = features.get('area_ha', 1)
+        self.experience_years = features.get('experience_years', 5)
+
+    def _temperature_factors(self):
+        catalog, idx = self.catalog, self.idx
+        self.temp_distance = np.abs(self.temperature - catalog.temp_opt[idx])
+        self.temp_score = np.where(
+            (catalog.temp_min[idx] <= self.temperature) & (self.temperature <= catalog.temp_max[idx]),
+            1.0, np.maximum(0, 1 - self.temp_distance / 10)
+        )
+
+    def _ph_factors(self):
+        catalog, idx = self.catalog, self.idx
+        self.ph_distance = np.abs(self.ph - catalog.ph_opt[idx])
+        self.ph_score = np.where(
+            (catalog.ph_min[idx] <= self.ph) & (self.ph <= catalog.ph_max[idx]),
+            1.0, np.maximum(0, 1 - self.ph_distance / 2)
+        )
+
+    def _soil_factors(self):
+        self.soil_match = self.catalog.soil_mask(self.soil_type)[self.idx]
+
+    def _forecast_factors(self):
+        # Share of forecast days without temperature stress (cached per location cell)
+        self.forecast_score = self.forecast.crop_score[self.idx] if self.forecast is not None else None
+
+    def _rainfall_factors(self):
+        self.rain_ratio = self.rainfall / self.catalog.rainfall_min[self.idx]
+
+    def _nutrients_factors(self):
+        catalog, idx = self.catalog, self.idx
+        self.N_ratio = self.N / catalog.N_min[idx]
+        self.P_ratio = self.P / catalog.P_min[idx]
+        self.K_ratio = self.K / catalog.K_min[idx]
+        self.nutrient_score = (
+            np.minimum(1.0, self.N_ratio) * 0.4 +
+            np.minimum(1.0, self.P_ratio) * 0.3 +
+            np.minimum(1.0, self.K_ratio) * 0.3
+        )
+
+    def _combine(self):
+        score = self.temp_score * self.ph_score * np.minimum(1.0, self.rain_ratio) * self.nutrient_score
+        if self.forecast_score is not None:
+            score = score * self.forecast_score
+        
+        # Soil type bonus
+        score = np.where(self.soil_match, score * 1.2, score)
+        self.suitability = np.minimum(1.0, score)
+
+    def upper_bound(self) -> np.ndarray:
+        """Cap on suitability: rainfall and nutrient factors never exceed 1"""
+        bound = self.temp_score * self.ph_score * np.where(self.soil_match, 1.2, 1.0)
+        if self.forecast_score is not None:
+            bound = bound * self.forecast_score
+        return bound
+
+    def complete(self) -> "CropScores":
+        """Compute the rainfall and nutrient ratios and the final suitability"""
+        self._rainfall_factors()
+        self._nutrients_factors()
+        self._combine()
+        return self
+
+    def update(self, features: Dict, forecast: Optional[ForecastFeatures] = None) -> Tuple["CropScores", List[str]]:
+        """
+        Completed breakdown of another request over the same entries,
+        recomputing only the factor groups whose inputs differ from this
+        (completed) one's; the other arrays are shared, never modified.
+        Returns the new breakdown and the names of the recomputed groups.
+        """
+        updated = CropScores.__new__(CropScores)
+        updated.__dict__.update(self.__dict__)
+        updated.forecast = forecast
+        updated._read_values(features)
+        recomputed = [
+            group for group, inputs in self.FACTOR_INPUTS.items()
+            if any(getattr(updated, name) != getattr(self, name) for name in inputs)
+        ]
+        if forecast is not self.forecast:
+            recomputed.append('forecast')
+        for group in recomputed:
+            getattr(updated, f'_{group}_factors')()
+        if recomputed:
+            updated._combine()
+        return updated, recomputed
+
+    def take(self, positions: np.ndarray) -> "CropScores":
+        """Breakdown restricted to `positions` (indices or mask into the arrays)"""
+        subset = CropScores.__new__(CropScores)
+        subset.__dict__.update(self.__dict__)
+        for field in self.FIELDS:
+            values = getattr(self, field)
+            if values is not None:
+                setattr(subset, field, values[positions])
+        return subset
+
+    def position(self, name: str) -> int:
+        """Array position of a crop/variety name within this breakdown"""
+        matches = np.flatnonzero(self.idx == self.catalog.index_of(name))
+        if not matches.size:
+            raise KeyError(name)
+        return int(matches[0])
+
+    def breakdown(self, name: str) -> Dict[str, float]:
+        """Structured factor breakdown for one crop/variety"""
+        i = self.position(name)
+        factors = {
+            'temperature': round(float(self.temp_score[i]), 3),
+            'ph': round(float(self.ph_score[i]), 3),
+            'rainfall': round(float(min(1.0, self.rain_ratio[i])), 3),
+            'nutrients': round(float(self.nutrient_score[i]), 3),
+            'soil_match': bool(self.soil_match[i]),
+            'suitability': round(float(self.suitability[i]), 3),
+        }
+        if self.forecast_score is not None:
+            factors['forecast'] = round(float(self.forecast_score[i]), 3)
+        return factors
+
+    def feature_importance(self, name: str, top_n: int = 5) -> List[Dict]:
+        """Normalized feature impacts for one crop/variety, from the cached ratios"""
+        i = self.position(name)
+        importance = {
+            'temperature': max(0, 1 - self.temp_distance[i] / 15),  # Closer to optimal is better
+            'ph': max(0, 1 - self.ph_distance[i] / 2),
+            'rainfall': min(1.0, self.rain_ratio[i]),
+            'nitrogen (N)': min(1.0, self.N_ratio[i]),
+            'phosphorus (P)': min(1.0, self.P_ratio[i]),
+            'potassium (K)': min(1.0, self.K_ratio[i]),
+            'soil type': 1.2 if self.soil_match[i] else 0.8,  # Soil type impact (bonus)
+        }
+        
+        # Normalize impacts to sum to 1 (or close to it for interpretation)
+        total_impact = sum(importance.values())
+        normalized_importance = [{'feature': k, 'impact': round(float(v / total_impact), 2)} for k, v in importance.items()]
+        
+        # Sort by impact and return top entries
+        normalized_importance.sort(key=lambda x: x['impact'], reverse=True)
+        return normalized_importance[:top_n]
+
+    def limiting_factor(self, name: str) -> Tuple[str, float]:
+        """Weakest suitability component for one crop/variety"""
+        factors = self.breakdown(name)
+        components = {k: factors[k] for k in ('temperature', 'ph', 'rainfall', 'nutrients', 'forecast') if k in factors}
+        weakest = min(components, key=components.get)
+        return weakest, components[weakest]
+
+class ScoredRecommendations:
+    """Top-k recommendations together with the factor breakdown they were ranked on"""
+
+    def __init__(self, recommendations: List[Dict], scores: CropScores):
+        self.recommendations = recommendations
+        self.scores = scores
+
+    def names(self) -> List[str]:
+        return [self.scores.catalog.names[i] for i in self.scores.idx]
+
+    def feature_importance(self, name: Optional[str] = None) -> List[Dict]:
+        """Importances for any recommended crop (the top one by default)"""
+        return self.scores.feature_importance(name or self.names()[0])
+
+    def explanation(self) -> str:
+        """Explanation for the top recommendation"""
+        return describe_recommendation(self.scores, self.names()[0])
+
+FACTOR_LABELS = {
+    'temperature': 'temperature', 'ph': 'soil pH', 'rainfall': 'rainfall', 'nutrients': 'soil nutrients',
+    'forecast': 'temperature stress in the forecast'
+}
+
+def describe_recommendation(scores: CropScores, name: str) -> str:
+    """Generate human-readable explanation from a factor breakdown"""
+    explanation = f"Based on your location's conditions - temperature of {scores.temperature:.1f}°C, soil pH of {scores.ph:.1f}, "
+    explanation += f"rainfall of {scores.rainfall:.0f}mm, and {scores.soil_type} soil - {name} is the most suitable crop. "
+    
+    weakest, value = scores.limiting_factor(name)
+    if value < 1.0:
+        explanation += f"The main limiting factor for this crop is {FACTOR_LABELS[weakest]} "
+        explanation += f"({value:.0%} of its optimum)."
+    else:
+        explanation += f"This crop thrives in your current environmental conditions and soil nutrient levels."
+    
+    return explanation
 
 class CropPredictor:
-    def __init__(self):
+    def __init__(self, catalog: Optional[CropCatalog] = None, price_table: Optional[PriceTable] = None):
         # Crop suitability database based on Indian agricultural data
-        self.crop_requirements = {
-            'Rice': {
-                'temp_range': (20, 35), 'ph_range': (5.5, 7.0), 'rainfall_min': 100,
-                'N_min': 40, 'P_min': 20, 'K_min': 20, 'seasons': ['Kharif'],
-                'soil_types': ['Clayey', 'Loamy', 'Alluvial'], 'water_req': 'High'
-            },
-            'Wheat': {
-                'temp_range': (15, 25), 'ph_range': (6.0, 7.5), 'rainfall_min': 50,
-                'N_min': 80, 'P_min': 25, 'K_min': 30, 'seasons': ['Rabi'],
-                'soil_types': ['Loamy', 'Clayey', 'Alluvial'], 'water_req': 'Medium'
-            },
-            'Maize': {
-                'temp_range': (21, 27), 'ph_range': (5.8, 7.0), 'rainfall_min': 60,
-                'N_min': 120, 'P_min': 60, 'K_min': 40, 'seasons': ['Kharif', 'Rabi'],
-                'soil_types': ['Loamy', 'Sandy', 'Alluvial'], 'water_req': 'Medium'
-            },
-            'Cotton': {
-                'temp_range': (21, 30), 'ph_range': (5.8, 8.0), 'rainfall_min': 50,
-                'N_min': 60, 'P_min': 30, 'K_min': 30, 'seasons': ['Kharif'],
-                'soil_types': ['Black', 'Alluvial', 'Red'], 'water_req': 'Medium'
-            },
-            'Sugarcane': {
-                'temp_range': (21, 27), 'ph_range': (6.5, 7.5), 'rainfall_min': 75,
-                'N_min': 200, 'P_min': 80, 'K_min': 100, 'seasons': ['Year-round'],
-                'soil_types': ['Loamy', 'Clayey', 'Alluvial'], 'water_req': 'Very High'
-            },
-            'Soybean': {
-                'temp_range': (20, 30), 'ph_range': (6.0, 7.0), 'rainfall_min': 45,
-                'N_min': 20, 'P_min': 60, 'K_min': 70, 'seasons': ['Kharif'],
-                'soil_types': ['Black', 'Red', 'Loamy'], 'water_req': 'Medium'
-            },
-            'Groundnut': {
-                'temp_range': (20, 30), 'ph_range': (6.0, 7.0), 'rainfall_min': 50,
-                'N_min': 25, 'P_min': 50, 'K_min': 75, 'seasons': ['Kharif', 'Rabi'],
-                'soil_types': ['Sandy', 'Red', 'Black'], 'water_req': 'Low'
-            },
-            'Sunflower': {
-                'temp_range': (20, 25), 'ph_range': (6.0, 7.2), 'rainfall_min': 50,
-                'N_min': 60, 'P_min': 30, 'K_min': 40, 'seasons': ['Kharif', 'Rabi'],
-                'soil_types': ['Black', 'Red', 'Alluvial'], 'water_req': 'Medium'
-            },
-            'Chickpea': {
-                'temp_range': (20, 30), 'ph_range': (6.2, 7.8), 'rainfall_min': 40,
-                'N_min': 20, 'P_min': 40, 'K_min': 30, 'seasons': ['Rabi'],
-                'soil_types': ['Black', 'Loamy', 'Sandy'], 'water_req': 'Low'
-            },
-            'Mustard': {
-                'temp_range': (15, 25), 'ph_range': (6.0, 7.5), 'rainfall_min': 25,
-                'N_min': 60, 'P_min': 40, 'K_min': 30, 'seasons': ['Rabi'],
-                'soil_types': ['Loamy', 'Sandy', 'Alluvial'], 'water_req': 'Low'
-            },
-            'Barley': {
-                'temp_range': (12, 22), 'ph_range': (6.0, 7.8), 'rainfall_min': 30,
-                'N_min': 50, 'P_min': 25, 'K_min': 25, 'seasons': ['Rabi'],
-                'soil_types': ['Loamy', 'Sandy', 'Clayey'], 'water_req': 'Low'
-            },
-            'Pigeon Pea': {
-                'temp_range': (20, 30), 'ph_range': (6.0, 7.5), 'rainfall_min': 60,
-                'N_min': 25, 'P_min': 50, 'K_min': 40, 'seasons': ['Kharif'],
-                'soil_types': ['Black', 'Red', 'Loamy'], 'water_req': 'Medium'
-            }
-        }
+        self.catalog = catalog if catalog is not None else CropCatalog.load(DEFAULT_CATALOG_PATH)
+        self.crop_requirements = self.catalog.requirements()
         
-        # Market prices (INR per quintal) - realistic Indian prices
+        # Default market prices (INR per quintal) - realistic Indian prices
         self.market_prices = {
             'Rice': 2100, 'Wheat': 2000, 'Maize': 1800, 'Cotton': 5500,
             'Sugarcane': 350, 'Soybean': 4200, 'Groundnut': 5000, 'Sunflower': 6000,
             'Chickpea': 5200, 'Mustard': 4800, 'Barley': 1700, 'Pigeon Pea': 6500
         }
         
-        # Average yields (kg/ha) under good conditions
-        self.base_yields = {
-            'Rice': 4000, 'Wheat': 3200, 'Maize': 5500, 'Cotton': 500,
-            'Sugarcane': 70000, 'Soybean': 1200, 'Groundnut': 1500, 'Sunflower': 1200,
-            'Chickpea': 1000, 'Mustard': 1200, 'Barley': 2500, 'Pigeon Pea': 800
+        # Cultivation cost as a fraction of revenue (simplified)
+        self.cost_factors = {
+            'Rice': 0.6, 'Wheat': 0.5, 'Maize': 0.55, 'Cotton': 0.7,
+            'Sugarcane': 0.65, 'Soybean': 0.5, 'Groundnut': 0.6,
+            'Sunflower': 0.55, 'Chickpea': 0.45, 'Mustard': 0.4,
+            'Barley': 0.4, 'Pigeon Pea': 0.5
         }
-
-    def calculate_suitability_score(self, crop: str, features: Dict) -> float:
-        """Calculate how suitable a crop is for given conditions"""
-        req = self.crop_requirements[crop]
-        score = 1.0
-        
-        # Temperature suitability
-        temp = features.get('temperature', 25)
-        temp_min, temp_max = req['temp_range']
-        if temp_min <= temp <= temp_max:
-            temp_score = 1.0
-        else:
-            temp_score = max(0, 1 - abs(temp - (temp_min + temp_max)/2) / 10)
-        score *= temp_score
-        
-        # pH suitability
-        ph = features.get('ph', 6.5)
-        ph_min, ph_max = req['ph_range']
-        if ph_min <= ph <= ph_max:
-            ph_score = 1.0
-        else:
-            ph_score = max(0, 1 - abs(ph - (ph_min + ph_max)/2) / 2)
-        score *= ph_score
         
-        # Rainfall suitability
-        rainfall = features.get('rainfall', 50)
-        if rainfall >= req['rainfall_min']:
-            rain_score = min(1.0, rainfall / req['rainfall_min'])
-        else:
-            rain_score = rainfall / req['rainfall_min']
-        score *= rain_score
+        # Average yields (kg/ha) under good conditions
+        self.base_yields = {name: entry['base_yield'] for name, entry in zip(self.catalog.names, self.catalog.entries)}
         
-        # Nutrient suitability
-        N = features.get('N', 30)
-        P = features.get('P', 15)
-        K = features.get('K', 80)
+        # Shared price table aligned with the catalog (varieties use their crop's price)
+        self.price_table = price_table if price_table is not None else PriceTable(self.catalog.crops, self.market_prices)
         
-        nutrient_score = (
-            min(1.0, N / req['N_min']) * 0.4 +
-            min(1.0, P / req['P_min']) * 0.3 +
-            min(1.0, K / req['K_min']) * 0.3
+        # Per-entry cost column aligned with the catalog
+        self._cost_factor = np.array([self.cost_factors.get(crop, 0.5) for crop in self.catalog.crops], dtype=float)
+        self._sustainability = np.array(
+            [0.9 if w == 'Low' else (0.7 if w == 'Medium' else 0.5) for w in self.catalog.water_req]
         )
-        score *= nutrient_score
-        
-        # Soil type bonus
-        soil_type = features.get('soil_type', 'Loamy')
-        if soil_type in req['soil_types']:
-            score *= 1.2
-        
-        return min(1.0, score)
 
-    def predict_yield(self, crop: str, features: Dict, suitability: float) -> int:
-        """Predict crop yield based on conditions"""
-        base_yield = self.base_yields[crop]
+    def score_factors(self, features: Dict, idx: Optional[np.ndarray] = None, season: Optional[str] = None,
+                      water_req: Optional[str] = None, forecast: Optional[ForecastFeatures] = None) -> CropScores:
+        """
+        Factor breakdown for the given catalog positions. Without `idx` the
+        catalog indexes and the temperature/pH bound check select candidates,
+        and only entries that can clear MIN_SUITABILITY are fully scored.
+        """
+        if idx is not None:
+            return CropScores(self.catalog, features, idx, forecast).complete()
         
-        # Yield factors
-        factors = []
+        idx = self.catalog.candidates(features.get('temperature', 25), features.get('ph', 6.5),
+                                      season=season, water_req=water_req)
+        scores = CropScores(self.catalog, features, idx, forecast)
+        return scores.take(scores.upper_bound() > MIN_SUITABILITY).complete()
+
+    def _predict_yields(self, scores: CropScores) -> np.ndarray:
+        """Vectorized yield prediction (kg/ha) from a factor breakdown"""
+        base_yield = self.catalog.base_yield[scores.idx]
         
         # Temperature factor
-        temp = features.get('temperature', 25)
-        req = self.crop_requirements[crop]
-        temp_optimal = (req['temp_range'][0] + req['temp_range'][1]) / 2
-        temp_factor = 1 - abs(temp - temp_optimal) / 15
-        factors.append(max(0.5, temp_factor))
+        temp_factor = np.maximum(0.5, 1 - scores.temp_distance / 15)
         
         # Nutrient factor
-        N = features.get('N', 30)
-        P = features.get('P', 15) 
-        K = features.get('K', 80)
         nutrient_factor = (
-            min(1.5, N / req['N_min']) * 0.4 +
-            min(1.5, P / req['P_min']) * 0.3 +
-            min(1.5, K / req['K_min']) * 0.3
+            np.minimum(1.5, scores.N_ratio) * 0.4 +
+            np.minimum(1.5, scores.P_ratio) * 0.3 +
+            np.minimum(1.5, scores.K_ratio) * 0.3
         )
-        factors.append(nutrient_factor)
         
         # Rainfall factor
-        rainfall = features.get('rainfall', 50)
-        rain_factor = min(1.3, rainfall / req['rainfall_min'])
-        factors.append(rain_factor)
+        rain_factor = np.minimum(1.3, scores.rain_ratio)
         
         # Area efficiency (smaller farms often have higher yields per hectare)
-        area = features.get('area_ha', 1)
+        area = scores.area_ha
         area_factor = 1.1 if area < 2 else (1.05 if area < 5 else 1.0)
-        factors.append(area_factor)
         
         # Experience factor
-        experience = features.get('experience_years', 5)
-        exp_factor = min(1.2, 0.8 + experience * 0.08)
-        factors.append(exp_factor)
+        exp_factor = min(1.2, 0.8 + scores.experience_years * 0.08)
         
         # Calculate final yield
-        yield_multiplier = np.mean(factors) * suitability
-        predicted_yield = int(base_yield * yield_multiplier)
+        yield_multiplier = (temp_factor + nutrient_factor + rain_factor + area_factor + exp_factor) / 5 * scores.suitability
+        predicted_yield = (base_yield * yield_multiplier).astype(np.int64)
         
-        return max(int(base_yield * 0.3), predicted_yield)  # Minimum 30% of base yield
+        return np.maximum((base_yield * 0.3).astype(np.int64), predicted_yield)  # Minimum 30% of base yield
+
+    def _calculate_profits(self, idx: np.ndarray, yield_kg_ha: np.ndarray, area_ha: float,
+                           prices: Optional[np.ndarray] = None) -> np.ndarray:
+        """Vectorized profit estimate for the catalog entries at `idx` (prices in INR/quintal)"""
+        if prices is None:
+            prices = self.price_table.prices()
+        revenue = yield_kg_ha * area_ha * prices[idx] / 100
+        cost = revenue * self._cost_factor[idx]
+        return (revenue - cost).astype(np.int64)
+
+    def calculate_suitability_score(self, crop: str, features: Dict) -> float:
+        """Calculate how suitable a crop is for given conditions"""
+        scores = self.score_factors(features, idx=np.array([self.catalog.index_of(crop)]))
+        return float(scores.suitability[0])
 
-    def calculate_profit(self, crop: str, yield_kg_ha: int, area_ha: float) -> int:
+    def predict_yield(self, crop: str, features: Dict, suitability: float) -> int:
+        """Predict crop yield based on conditions"""
+        scores = self.score_factors(features, idx=np.array([self.catalog.index_of(crop)]))
+        scores.suitability = np.array([suitability])
+        return int(self._predict_yields(scores)[0])
+
+    def calculate_profit(self, crop: str, yield_kg_ha: int, area_ha: float,
+                         market_snapshot: Optional[Dict] = None) -> int:
         """Calculate estimated profit"""
-        price_per_kg = self.market_prices[crop] / 100  # Convert quintal to kg price
-        revenue = yield_kg_ha * area_ha * price_per_kg
-        
-        # Estimate costs (simplified)
-        cost_factors = {
-            'Rice': 0.6, 'Wheat': 0.5, 'Maize': 0.55, 'Cotton': 0.7,
-            'Sugarcane': 0.65, 'Soybean': 0.5, 'Groundnut': 0.6,
-            'Sunflower': 0.55, 'Chickpea': 0.45, 'Mustard': 0.4,
-            'Barley': 0.4, 'Pigeon Pea': 0.5
-        }
-        
-        cost = revenue * cost_factors.get(crop, 0.5)
-        profit = revenue - cost
-        
-        return int(profit)
+        idx = np.array([self.catalog.index_of(crop)])
+        prices = self.price_table.prices(market_snapshot)
+        return int(self._calculate_profits(idx, np.array([yield_kg_ha], dtype=float), area_ha, prices)[0])
 
     def get_risk_level(self, suitability: float, crop: str, features: Dict) -> str:
         """Determine risk level"""
@@ -206,10 +370,11 @@ class CropPredictor:
         else:
             return "High"
 
-    def get_season_suitability(self, crop: str) -> str:
+    def get_season_suitability(self, crop: str, current_month: Optional[int] = None) -> str:
         """Get appropriate season for crop"""
         seasons = self.crop_requirements[crop]['seasons']
-        current_month = pd.Timestamp.now().month
+        if current_month is None:
+            current_month = pd.Timestamp.now().month
         
         if current_month in [6, 7, 8, 9, 10]:  # Kharif season
             return seasons[0] if 'Kharif' in seasons else seasons[0]
@@ -218,92 +383,71 @@ class CropPredictor:
         else:
             return seasons[0]
 
-    def predict_crops(self, features: Dict) -> List[Dict]:
-        """Main prediction function"""
-        results = []
-        print(f"DEBUG: Input features: {features}")
-        
-        for crop in self.crop_requirements.keys():
-            suitability = self.calculate_suitability_score(crop, features)
-            print(f"DEBUG: {crop} suitability: {suitability:.3f}")
-            
-            if suitability > 0.1:  # Include more crops with lower threshold
-                yield_kg_ha = self.predict_yield(crop, features, suitability)
-                area_ha = features.get('area_ha', 1)
-                profit = self.calculate_profit(crop, yield_kg_ha, area_ha)
-                
-                # Calculate sustainability score (simplified)
-                water_req = self.crop_requirements[crop]['water_req']
-                sustainability = 0.9 if water_req == 'Low' else (0.7 if water_req == 'Medium' else 0.5)
-                
-                result = {
-                    'crop': crop,
-                    'score': round(suitability, 3),
-                    'predicted_yield_kg_per_ha': yield_kg_ha,
-                    'estimated_profit_inr': profit,
-                    'sustainability_score': sustainability,
-                    'confidence': round(min(0.95, suitability + 0.1), 2),
-                    'risk_level': self.get_risk_level(suitability, crop, features),
-                    'season_suitability': self.get_season_suitability(crop),
-                    'water_requirement': self.crop_requirements[crop]['water_req'],
-                    'market_demand': 'High' if crop in ['Rice', 'Wheat', 'Cotton'] else 'Medium'
-                }
-                results.append(result)
+    def score(self, features: Dict, top_k: int = 5, season: Optional[str] = None,
+              water_req: Optional[str] = None, forecast: Optional[ForecastFeatures] = None,
+              market_snapshot: Optional[Dict] = None) -> ScoredRecommendations:
+        """Score the catalog once and keep the breakdown of the top-k entries"""
+        logger.debug(f"Input features: {features}")
+        scores = self.score_factors(features, season=season, water_req=water_req, forecast=forecast)
+        return self.rank(scores, features, top_k, market_snapshot)
+
+    def rank(self, scores: CropScores, features: Dict, top_k: int = 5,
+             market_snapshot: Optional[Dict] = None) -> ScoredRecommendations:
+        """Top-k recommendations of a completed breakdown"""
+        eligible = np.flatnonzero(scores.suitability > MIN_SUITABILITY)  # Include more crops with lower threshold
         
-        # Sort by suitability score
-        results.sort(key=lambda x: x['score'], reverse=True)
-        return results[:5]  # Return top 5 recommendations
-
-    def get_feature_importance(self, crop: str, features: Dict) -> List[Dict]:
-        """Dynamically calculate feature importance for the given crop and features."""
-        req = self.crop_requirements[crop]
-        importance = {}
-
-        # Temperature impact
-        temp = features.get('temperature', 25)
-        temp_min, temp_max = req['temp_range']
-        temp_optimal = (temp_min + temp_max) / 2
-        importance['temperature'] = max(0, 1 - abs(temp - temp_optimal) / 15) # Closer to optimal is better
-
-        # pH impact
-        ph = features.get('ph', 6.5)
-        ph_min, ph_max = req['ph_range']
-        ph_optimal = (ph_min + ph_max) / 2
-        importance['ph'] = max(0, 1 - abs(ph - ph_optimal) / 2)
-
-        # Rainfall impact
-        rainfall = features.get('rainfall', 50)
-        importance['rainfall'] = min(1.0, rainfall / req['rainfall_min'])
-
-        # Nutrient impacts (N, P, K)
-        N = features.get('N', 30)
-        P = features.get('P', 15)
-        K = features.get('K', 80)
-        importance['nitrogen (N)'] = min(1.0, N / req['N_min'])
-        importance['phosphorus (P)'] = min(1.0, P / req['P_min'])
-        importance['potassium (K)'] = min(1.0, K / req['K_min'])
+        # Partial selection of the best entries instead of sorting them all,
+        # ranked on the displayed (rounded) score; only those rows are copied
+        scores = scores.take(eligible[top_k_indices(np.round(scores.suitability[eligible], 3), top_k)])
         
-        # Soil type impact (bonus)
-        soil_type = features.get('soil_type', 'Loamy')
-        importance['soil type'] = 1.2 if soil_type in req['soil_types'] else 0.8
+        return ScoredRecommendations(self.recommend(scores, features, market_snapshot), scores)
 
-        # Normalize impacts to sum to 1 (or close to it for interpretation)
-        total_impact = sum(importance.values())
-        normalized_importance = [{'feature': k, 'impact': round(v / total_impact, 2)} for k, v in importance.items()]
+    def recommend(self, scores: CropScores, features: Dict, market_snapshot: Optional[Dict] = None) -> List[Dict]:
+        """Recommendation entries for the scored catalog positions, in their order"""
+        yields = self._predict_yields(scores)
         
-        # Sort by impact and return top 5
-        normalized_importance.sort(key=lambda x: x['impact'], reverse=True)
-        return normalized_importance[:5]
-
-    def generate_explanation(self, top_crop: str, features: Dict) -> str:
-        """Generate human-readable explanation"""
-        temp = features.get('temperature', 25)
-        ph = features.get('ph', 6.5)
-        rainfall = features.get('rainfall', 50)
-        soil_type = features.get('soil_type', 'Loamy')
+        # Table prices with the request's snapshot applied, and the demand classes they imply
+        prices = self.price_table.prices(market_snapshot)
+        demand = self.price_table.demand(prices)
+        profits = self._calculate_profits(scores.idx, yields, scores.area_ha, prices)
+        current_month = pd.Timestamp.now().month
         
-        explanation = f"Based on your location's conditions - temperature of {temp:.1f}°C, soil pH of {ph:.1f}, "
-        explanation += f"rainfall of {rainfall:.0f}mm, and {soil_type} soil - {top_crop} is the most suitable crop. "
-        explanation += f"This crop thrives in your current environmental conditions and soil nutrient levels."
+        results = []
+        for i, score, yield_kg_ha, profit in zip(scores.idx, scores.suitability, yields, profits):
+            name = self.catalog.names[i]
+            crop = self.catalog.crops[i]
+            score = float(score)
+            result = {
+                'crop': crop,
+                'score': round(score, 3),
+                'predicted_yield_kg_per_ha': int(yield_kg_ha),
+                'estimated_profit_inr': int(profit),
+                'sustainability_score': float(self._sustainability[i]),
+                'confidence': round(min(0.95, score + 0.1), 2),
+                'risk_level': self.get_risk_level(score, name, features),
+                'season_suitability': self.get_season_suitability(name, current_month),
+                'water_requirement': self.catalog.water_req[i],
+                'market_demand': str(demand[i])
+            }
+            if self.catalog.varieties[i]:
+                result['variety'] = self.catalog.varieties[i]
+            results.append(result)
         
-        return explanation
+        return results
+
+    def predict_crops(self, features: Dict, top_k: int = 5, season: Optional[str] = None,
+                      water_req: Optional[str] = None, market_snapshot: Optional[Dict] = None) -> List[Dict]:
+        """Main prediction function"""
+        return self.score(features, top_k, season, water_req, market_snapshot=market_snapshot).recommendations
+
+    def get_feature_importance(self, crop: str, features: Dict, scores: Optional[CropScores] = None) -> List[Dict]:
+        """Feature importance for the given crop, reusing `scores` when it covers that crop"""
+        if scores is None or self.catalog.index_of(crop) not in scores.idx:
+            scores = self.score_factors(features, idx=np.array([self.catalog.index_of(crop)]))
+        return scores.feature_importance(crop)
+
+    def generate_explanation(self, top_crop: str, features: Dict, scores: Optional[CropScores] = None) -> str:
+        """Generate human-readable explanation"""
+        if scores is None or self.catalog.index_of(top_crop) not in scores.idx:
+            scores = self.score_factors(features, idx=np.array([self.catalog.index_of(top_crop)]))
+        return describe_recommendation(scores, top_crop)
@@ -0,0 +1,317 @@
+import json
+import logging
+import time
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_STATS_PATH = "models/reference_stats.json"
+DEFAULT_BINS = 10
+REFERENCE_SAMPLE_ROWS = 20000
+
+# Request fields monitored, in sketch column order. Weather readings are
+# compared against the training columns they stand in for.
+NUMERIC_FIELDS = [
+    'N', 'P', 'K', 'ph', 'temperature', 'humidity', 'rainfall', 'organic_carbon', 'area_ha', 'experience_years'
+]
+WEATHER_FIELDS = ['temperature', 'humidity', 'rainfall', 'wind_speed', 'solar_radiation', 'pressure']
+CATEGORICAL_FIELDS = ['soil_type', 'farming_method', 'irrigation_type']
+MONITORED_FIELDS = NUMERIC_FIELDS + [f'weather_{name}' for name in WEATHER_FIELDS]
+REFERENCE_COLUMN = {**{name: name for name in NUMERIC_FIELDS},
+                    **{f'weather_{name}': name for name in WEATHER_FIELDS}}
+
+# Distinct values kept per categorical field; the rest are counted as OTHER
+MAX_CATEGORIES = 64
+OTHER = '__other__'
+
+# Population stability index thresholds and the traffic needed before judging
+PSI_MODERATE = 0.1
+PSI_DRIFT = 0.25
+MIN_OBSERVATIONS = 100
+_EPSILON = 1e-4
+
+def population_stability_index(expected: np.ndarray, observed: np.ndarray) -> float:
+    """PSI between two vectors of bin proportions"""
+    expected = np.maximum(expected, _EPSILON)
+    observed = np.maximum(observed, _EPSILON)
+    return float(np.sum((observed - expected) * np.log(observed / expected)))
+
+def drift_status(psi: Optional[float], count: int) -> str:
+    if psi is None:
+        return 'no_reference'
+    if count < MIN_OBSERVATIONS:
+        return 'insufficient_data'
+    return 'drift' if psi >= PSI_DRIFT else ('moderate' if psi >= PSI_MODERATE else 'ok')
+
+class NumericSketch:
+    """
+    Running count, mean, variance (Welford), min and max of several numeric
+    columns, plus bin counts over fixed bin edges. Updates are a handful of
+    array operations over all columns at once; memory does not grow.
+    """
+
+    def __init__(self, n_columns: int, edges: Optional[np.ndarray] = None):
+        # edges: (columns, bins - 1) inner bin edges; rows of NaN mean "no bins"
+        self.count = np.zeros(n_columns)
+        self.mean = np.zeros(n_columns)
+        self.m2 = np.zeros(n_columns)
+        self.min = np.full(n_columns, np.inf)
+        self.max = np.full(n_columns, -np.inf)
+        self.edges = edges
+        self.bins = np.zeros((n_columns, edges.shape[1] + 1)) if edges is not None else None
+        if edges is not None:
+            self._flat_bins = self.bins.reshape(-1)
+            self._row_offsets = np.arange(n_columns) * self.bins.shape[1]
+
+    def update(self, values: np.ndarray):
+        """Add one complete row (no missing values)"""
+        self.count += 1
+        delta = values - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (values - self.mean)
+        np.minimum(self.min, values, out=self.min)
+        np.maximum(self.max, values, out=self.max)
+        if self.bins is not None:
+            self._flat_bins[self._row_offsets + (values[:, None] >= self.edges).sum(axis=1)] += 1
+
+    def update_partial(self, values: np.ndarray):
+        """Add one row whose NaN or infinite entries (missing values) are skipped"""
+        present = np.isfinite(values)
+        values = np.where(present, values, 0.0)
+        self.count += present
+        delta = (values - self.mean) * present
+        self.mean += delta / np.maximum(self.count, 1)
+        self.m2 += delta * (values - self.mean)
+        np.minimum(self.min, np.where(present, values, np.inf), out=self.min)
+        np.maximum(self.max, np.where(present, values, -np.inf), out=self.max)
+        if self.bins is not None:
+            self.bins[np.arange(values.size), (values[:, None] >= self.edges).sum(axis=1)] += present
+
+    def update_batch(self, values: np.ndarray):
+        """Add many rows at once (Chan et al. parallel combination)"""
+        for j in range(values.shape[1]):
+            column = values[:, j]
+            column = column[np.isfinite(column)]
+            if column.size == 0:
+                continue
+            n, mean = column.size, column.mean()
+            m2 = ((column - mean) ** 2).sum()
+            total = self.count[j] + n
+            delta = mean - self.mean[j]
+            self.mean[j] += delta * n / total
+            self.m2[j] += m2 + delta ** 2 * self.count[j] * n / total
+            self.count[j] = total
+            self.min[j] = min(self.min[j], column.min())
+            self.max[j] = max(self.max[j], column.max())
+            if self.bins is not None:
+                self.bins[j] += np.bincount((column[:, None] >= self.edges[j]).sum(axis=1),
+                                            minlength=self.bins.shape[1])
+
+    @property
+    def std(self) -> np.ndarray:
+        return np.sqrt(self.m2 / np.maximum(self.count - 1, 1))
+
+    def quantile(self, j: int, q: float) -> Optional[float]:
+        """Quantile of column `j` interpolated within its bins"""
+        if self.bins is None or self.count[j] == 0:
+            return None
+        bounds = np.concatenate([[self.min[j]], np.clip(self.edges[j], self.min[j], self.max[j]), [self.max[j]]])
+        cumulative = np.cumsum(self.bins[j])
+        target = q * cumulative[-1]
+        b = int(np.searchsorted(cumulative, target))
+        below = cumulative[b - 1] if b > 0 else 0.0
+        share = (target - below) / self.bins[j, b] if self.bins[j, b] else 0.0
+        return float(bounds[b] + share * (bounds[b + 1] - bounds[b]))
+
+class CategoricalCounts:
+    """Value counts for a few categorical fields, with a cap on distinct values"""
+
+    def __init__(self, fields: List[str]):
+        self.counts = {field: {} for field in fields}
+
+    def update(self, values: Dict):
+        for field, counts in self.counts.items():
+            value = values.get(field)
+            if value is None:
+                continue
+            if value not in counts and len(counts) >= MAX_CATEGORIES:
+                value = OTHER
+            counts[value] = counts.get(value, 0) + 1
+
+    def update_batch(self, frame: pd.DataFrame):
+        for field in self.counts:
+            for value, count in frame[field].astype(str).value_counts().items():
+                self.counts[field][value] = self.counts[field].get(value, 0) + int(count)
+
+    def proportions(self, field: str) -> Dict[str, float]:
+        total = sum(self.counts[field].values())
+        return {value: count / total for value, count in self.counts[field].items()} if total else {}
+
+class ReferenceBuilder:
+    """
+    Reference statistics of the training data, built with the same sketches
+    the monitor uses. Bin edges are deciles of a uniform sample of the data:
+    a streamed dataset is sampled in one pass (sample()) and counted in a
+    later one (add()); otherwise the first frame added sets the edges.
+    """
+
+    def __init__(self, n_bins: int = DEFAULT_BINS, sample_size: int = REFERENCE_SAMPLE_ROWS, seed: int = 42):
+        self.n_bins = n_bins
+        self.numeric = None
+        self.categorical = CategoricalCounts(CATEGORICAL_FIELDS)
+        self.sample_size = sample_size
+        self._sample = None
+        self._sampled = 0
+        self._rng = np.random.default_rng(seed)
+
+    def sample(self, frame: pd.DataFrame):
+        """Reservoir sample of the numeric columns, for the bin edges"""
+        values = frame[NUMERIC_FIELDS].to_numpy(dtype=float)
+        if self._sample is None:
+            self._sample = np.empty((0, len(NUMERIC_FIELDS)))
+        room = self.sample_size - len(self._sample)
+        self._sample = np.vstack([self._sample, values[:room]])
+        rest = values[room:] if room > 0 else values
+        if len(rest):
+            # Row t of the stream replaces a random sample row with probability size / t
+            seen = self._sampled + max(room, 0) + np.arange(1, len(rest) + 1)
+            slots = (self._rng.random(len(rest)) * seen).astype(np.int64)
+            keep = slots < self.sample_size
+            self._sample[slots[keep]] = rest[keep]
+        self._sampled += len(values)
+
+    def add(self, frame: pd.DataFrame):
+        values = frame[NUMERIC_FIELDS].to_numpy(dtype=float)
+        if self.numeric is None:
+            sample = self._sample if self._sample is not None else values
+            quantiles = np.linspace(0, 1, self.n_bins + 1)[1:-1]
+            self.numeric = NumericSketch(len(NUMERIC_FIELDS), np.nanquantile(sample, quantiles, axis=0).T)
+        self.numeric.update_batch(values)
+        self.categorical.update_batch(frame)
+
+    def stats(self) -> Dict:
+        sketch = self.numeric
+        total = sketch.bins.sum(axis=1, keepdims=True)
+        return {
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'n_samples': int(sketch.count.max()),
+            'numeric': {
+                name: {
+                    'count': int(sketch.count[j]),
+                    'mean': float(sketch.mean[j]),
+                    'std': float(sketch.std[j]),
+                    'min': float(sketch.min[j]),
+                    'max': float(sketch.max[j]),
+                    'edges': sketch.edges[j].tolist(),
+                    'proportions': (sketch.bins[j] / max(total[j, 0], 1)).tolist(),
+                }
+                for j, name in enumerate(NUMERIC_FIELDS)
+            },
+            'categorical': {field: self.categorical.proportions(field) for field in CATEGORICAL_FIELDS},
+        }
+
+def save_reference_stats(stats: Dict, path: str = REFERENCE_STATS_PATH):
+    with open(path, "w") as f:
+        json.dump(stats, f, indent=2)
+
+class DriftMonitor:
+    """
+    Streaming comparison of request inputs with the training distribution.
+
+    Every request updates one NumericSketch row (Features and WeatherData
+    fields) and the categorical counts; bins use the reference's edges so
+    the population stability index per field is a direct comparison of
+    bin proportions. Drift scores are computed only when reported.
+    """
+
+    def __init__(self, reference: Optional[Dict] = None):
+        self.reference = reference
+        self.started = time.time()
+        self._reference_columns = []
+        edges = None
+        if reference is not None:
+            numeric = reference['numeric']
+            self._reference_columns = [j for j, name in enumerate(MONITORED_FIELDS) if REFERENCE_COLUMN[name] in numeric]
+            n_bins = len(next(iter(numeric.values()))['proportions'])
+            edges = np.full((len(MONITORED_FIELDS), n_bins - 1), np.inf)
+            for j in self._reference_columns:
+                edges[j] = numeric[REFERENCE_COLUMN[MONITORED_FIELDS[j]]]['edges']
+        self.numeric = NumericSketch(len(MONITORED_FIELDS), edges)
+        self.categorical = CategoricalCounts(CATEGORICAL_FIELDS)
+
+    @classmethod
+    def load(cls, path: str = REFERENCE_STATS_PATH) -> "DriftMonitor":
+        """Monitor against the reference saved by train.py; without one only running stats are kept"""
+        try:
+            with open(path, "r") as f:
+                return cls(json.load(f))
+        except FileNotFoundError:
+            logger.info(f"No drift reference at {path}, tracking input statistics only")
+            return cls()
+
+    def observe(self, features: Dict, weather: Optional[Dict] = None):
+        """Record one request's Features (and WeatherData) values"""
+        weather = weather or {}
+        row = [features.get(name) for name in NUMERIC_FIELDS] + [weather.get(name) for name in WEATHER_FIELDS]
+        values = np.array([np.nan if v is None else v for v in row], dtype=float)
+        # NaN or infinite inputs would poison the running mean, count them as missing
+        if np.isfinite(values).all():
+            self.numeric.update(values)
+        else:
+            self.numeric.update_partial(values)
+        self.categorical.update(features)
+
+    def reset(self):
+        self.__init__(self.reference)
+
+    def report(self) -> Dict:
+        sketch = self.numeric
+        std = sketch.std
+        numeric = {}
+        for j, name in enumerate(MONITORED_FIELDS):
+            count = int(sketch.count[j])
+            entry = {'count': count}
+            if count:
+                entry.update({'mean': round(float(sketch.mean[j]), 4), 'std': round(float(std[j]), 4),
+                              'min': float(sketch.min[j]), 'max': float(sketch.max[j])})
+            psi = None
+            if j in self._reference_columns:
+                reference = self.reference['numeric'][REFERENCE_COLUMN[name]]
+                entry['reference'] = {'mean': reference['mean'], 'std': reference['std']}
+                if count:
+                    entry['p50'] = sketch.quantile(j, 0.5)
+                    entry['p90'] = sketch.quantile(j, 0.9)
+                    entry['mean_shift_std'] = round((float(sketch.mean[j]) - reference['mean']) / (reference['std'] or 1), 3)
+                    psi = population_stability_index(np.array(reference['proportions']), sketch.bins[j] / count)
+                    entry['psi'] = round(psi, 4)
+            entry['status'] = drift_status(psi, count)
+            numeric[name] = entry
+
+        categorical = {}
+        for field in CATEGORICAL_FIELDS:
+            observed = self.categorical.proportions(field)
+            count = sum(self.categorical.counts[field].values())
+            entry = {'count': count, 'proportions': {k: round(v, 4) for k, v in observed.items()}}
+            psi = None
+            if self.reference is not None and count:
+                expected = self.reference['categorical'].get(field, {})
+                values = sorted(set(expected) | set(observed))
+                psi = population_stability_index(np.array([expected.get(v, 0.0) for v in values]),
+                                                  np.array([observed.get(v, 0.0) for v in values]))
+                entry['psi'] = round(psi, 4)
+                entry['unseen_values'] = sorted(set(observed) - set(expected))
+            entry['status'] = drift_status(psi, count) if self.reference is not None else 'no_reference'
+            categorical[field] = entry
+
+        scores = {name: e['psi'] for name, e in {**numeric, **categorical}.items() if 'psi' in e}
+        return {
+            'reference_created': self.reference.get('created') if self.reference else None,
+            'observing_since': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'requests': int(sketch.count.max()) if sketch.count.size else 0,
+            'drifted_fields': sorted(name for name, e in {**numeric, **categorical}.items() if e['status'] == 'drift'),
+            'max_psi': max(scores.values()) if scores else None,
+            'numeric': numeric,
+            'categorical': categorical,
+        }
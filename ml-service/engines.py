@@ -0,0 +1,526 @@
+import asyncio
+import logging
+import math
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from crop_predictor import MIN_SUITABILITY, CropPredictor, top_k_indices
+from forecast_features import ForecastFeatures
+from metrics import registry
+from neighbour_index import NeighbourIndex
+from pareto import normalise, pareto_ranks, validate_weights, weighted_scores
+from scoring_sessions import ScoringSessions
+from tree_explainer import top_features
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHADOW_FRACTION = 0.05
+# Threads running engines that answer under a deadline (ML_ENGINE_THREADS)
+DEFAULT_ENGINE_THREADS = 2
+DEADLINE_HEADER = "X-Deadline-Ms"
+# Shadow runs waiting for the shadow thread; further samples are skipped
+MAX_PENDING_SHADOW_RUNS = 8
+
+engine_latency = registry.histogram(
+    "ml_engine_latency_seconds", "Prediction engine latency", labels=("engine", "role"))
+shadow_comparisons = registry.counter(
+    "ml_shadow_comparisons_total", "Requests scored by both the primary and the shadow engine",
+    labels=("primary", "shadow"))
+shadow_top1_agreements = registry.counter(
+    "ml_shadow_top1_agreements_total", "Shadow comparisons where both engines ranked the same crop first",
+    labels=("primary", "shadow"))
+shadow_topk_overlap = registry.histogram(
+    "ml_shadow_topk_overlap", "Share of the primary engine's top-k crops also in the shadow engine's top-k",
+    labels=("primary", "shadow"), buckets=(0.0, 0.2, 0.4, 0.6, 0.8, 1.0))
+degraded_responses = registry.counter(
+    "ml_degraded_responses_total", "Requests answered by the fallback engine instead of the primary",
+    labels=("engine", "reason"))
+shadow_skipped = registry.counter(
+    "ml_shadow_skipped_total", "Sampled shadow runs dropped because the shadow thread was busy or failed",
+    labels=("reason",))
+
+class Prediction:
+    """Recommendations produced by one engine for one request"""
+
+    def __init__(self, engine: str, model_version: str, recommendations: List[Dict],
+                 explanation: Optional[str] = None, shap_top_features: Optional[List[Dict]] = None,
+                 yield_shap_top_features: Optional[List[Dict]] = None):
+        self.engine = engine
+        self.model_version = model_version
+        self.recommendations = recommendations
+        self.explanation = explanation
+        self.shap_top_features = shap_top_features or []
+        self.yield_shap_top_features = yield_shap_top_features
+        # Set when the fallback engine answered because the primary was too slow or failed
+        self.degraded = False
+        # Session id and the factor groups recomputed, when rule scoring reused a session (ScoringSessions)
+        self.session = None
+
+    def top_crops(self, k: int) -> List[str]:
+        """First `k` distinct crops, ignoring varieties"""
+        crops = []
+        for recommendation in self.recommendations:
+            if recommendation['crop'] not in crops:
+                crops.append(recommendation['crop'])
+        return crops[:k]
+
+class PredictionEngine:
+    """
+    Interface of the interchangeable prediction paths. `features` is the
+    flat feature dict used by CropPredictor; `request` is the parsed API
+    request for engines that need more than the features.
+    """
+
+    name = 'engine'
+    model_version = 'unknown'
+
+    def predict(self, features: Dict, top_k: int = 5, forecast: Optional[ForecastFeatures] = None,
+                market_snapshot: Optional[Dict] = None, request=None) -> Prediction:
+        raise NotImplementedError
+
+def entry_name(recommendation: Dict) -> str:
+    """Catalog name of a recommendation: its variety when the catalog has varieties, its crop otherwise"""
+    return recommendation.get('variety') or recommendation['crop']
+
+class TreeAttributions:
+    """Per-request attributions from the tree explainer, rule importances when it does not know the crop"""
+
+    def __init__(self, predictor: CropPredictor, explainer=None, feature_columns: Optional[List[str]] = None):
+        self.predictor = predictor
+        self.explainer = explainer
+        self.feature_columns = feature_columns or []
+
+    def explain(self, top_crop: str, features: Dict, scores):
+        """(crop attributions, yield attributions or None) for the top crop or variety"""
+        # The classifier knows crops, not varieties
+        crop = self.predictor.catalog.crops[self.predictor.catalog.index_of(top_crop)]
+        if self.explainer is not None and crop in self.explainer.classes and self.feature_columns:
+            model_input = self.explainer.transform(model_input_frame(features, self.feature_columns))[0]
+            return (top_features(self.explainer.explain_crop(model_input, crop)),
+                    top_features(self.explainer.explain_yield(model_input)))
+        return self.predictor.get_feature_importance(top_crop, features, scores), None
+
+def model_input_frame(features: Dict, feature_columns: List[str]) -> pd.DataFrame:
+    """Single-row DataFrame with the columns the trained pipelines expect"""
+    return pd.DataFrame([{name: features.get(name) for name in feature_columns}])
+
+class RuleEngine(PredictionEngine):
+    """Vectorized rule scoring over the crop catalog (CropPredictor)"""
+
+    name = 'rules'
+    model_version = 'v2.0.0-intelligent'
+
+    def __init__(self, predictor: CropPredictor, attributions: Optional[TreeAttributions] = None,
+                 sessions: Optional[ScoringSessions] = None):
+        self.predictor = predictor
+        self.attributions = attributions or TreeAttributions(predictor)
+        # Requests naming a session_id rescore incrementally from the session's previous request
+        self.sessions = sessions
+
+    def predict(self, features: Dict, top_k: int = 5, forecast: Optional[ForecastFeatures] = None,
+                market_snapshot: Optional[Dict] = None, request=None) -> Prediction:
+        session_id = getattr(request, 'session_id', None)
+        session = None
+        if self.sessions is not None and session_id:
+            scored, recomputed = self.sessions.score(session_id, features, top_k, forecast, market_snapshot)
+            session = {'id': session_id, 'recomputed': recomputed}
+        else:
+            scored = self.predictor.score(features, top_k=top_k, forecast=forecast, market_snapshot=market_snapshot)
+        if not scored.recommendations:
+            prediction = Prediction(self.name, self.model_version, [])
+        else:
+            top_crop = entry_name(scored.recommendations[0])
+            shap_features, yield_shap_features = self.attributions.explain(top_crop, features, scored.scores)
+            prediction = Prediction(self.name, self.model_version, scored.recommendations,
+                                    self.predictor.generate_explanation(top_crop, features, scored.scores),
+                                    shap_features, yield_shap_features)
+        prediction.session = session
+        return prediction
+
+def catalog_positions(catalog, classes) -> np.ndarray:
+    """Catalog entry of each crop or variety name (the first variety for a crop name, -1 if unknown)"""
+    return np.array([
+        catalog.index_of(c) if c in catalog.names else (catalog.crops.index(c) if c in catalog.crops else -1)
+        for c in classes
+    ], dtype=np.intp)
+
+class SklearnEngine(PredictionEngine):
+    """
+    Crops ranked by the trained classifier's class probabilities. Yield,
+    profit and the other recommendation fields come from the rule model
+    for just those crops, since the yield model is not crop specific.
+    """
+
+    name = 'sklearn'
+
+    def __init__(self, crop_model, yield_model, predictor: CropPredictor, feature_columns: List[str],
+                 model_version: str = 'v2.1.0', attributions: Optional[TreeAttributions] = None):
+        self.crop_model = crop_model
+        self.yield_model = yield_model
+        self.predictor = predictor
+        self.feature_columns = feature_columns
+        self.model_version = model_version
+        self.attributions = attributions or TreeAttributions(predictor)
+
+        # Catalog entry of every model class (-1 for crops the catalog does not know)
+        self._positions = catalog_positions(predictor.catalog, crop_model.classes_)
+
+    def predict(self, features: Dict, top_k: int = 5, forecast: Optional[ForecastFeatures] = None,
+                market_snapshot: Optional[Dict] = None, request=None) -> Prediction:
+        probabilities = self.crop_model.predict_proba(model_input_frame(features, self.feature_columns))[0]
+        probabilities = np.where(self._positions >= 0, probabilities, -1.0)
+        order = top_k_indices(probabilities, top_k)
+        order = order[probabilities[order] > 0]
+        if order.size == 0:
+            return Prediction(self.name, self.model_version, [])
+
+        scores = self.predictor.score_factors(features, idx=self._positions[order], forecast=forecast)
+        recommendations = self.predictor.recommend(scores, features, market_snapshot)
+        for recommendation, probability in zip(recommendations, probabilities[order]):
+            recommendation['score'] = round(float(probability), 3)
+            recommendation['confidence'] = round(float(probability), 2)
+
+        top_crop = entry_name(recommendations[0])
+        shap_features, yield_shap_features = self.attributions.explain(top_crop, features, scores)
+        return Prediction(self.name, self.model_version, recommendations,
+                          self.predictor.generate_explanation(top_crop, features, scores),
+                          shap_features, yield_shap_features)
+
+class NeighbourEngine(PredictionEngine):
+    """
+    Crops ranked by neighbour votes in a labelled dataset (NeighbourIndex);
+    the other recommendation fields come from the rule model, as for the
+    sklearn engine. Batches of requests share one index query.
+    """
+
+    name = 'knn'
+
+    def __init__(self, index: NeighbourIndex, predictor: CropPredictor, model_version: str = 'v1.0.0-knn',
+                 attributions: Optional[TreeAttributions] = None):
+        self.predictor = predictor
+        self.model_version = model_version
+        self.attributions = attributions or TreeAttributions(predictor)
+        self.set_index(index)
+
+    @property
+    def index(self) -> NeighbourIndex:
+        return self._state[0]
+
+    def set_index(self, index: NeighbourIndex):
+        """Serve a rebuilt index (e.g. from NeighbourIndex.extend) from the next request on"""
+        # Swapped in one assignment so a request never pairs a new index with old positions
+        self._state = (index, catalog_positions(self.predictor.catalog, index.classes))
+
+    def predict(self, features: Dict, top_k: int = 5, forecast: Optional[ForecastFeatures] = None,
+                market_snapshot: Optional[Dict] = None, request=None) -> Prediction:
+        return self.predict_batch([features], top_k, forecast, market_snapshot)[0]
+
+    def predict_batch(self, features: List[Dict], top_k: int = 5, forecast: Optional[ForecastFeatures] = None,
+                      market_snapshot: Optional[Dict] = None) -> List[Prediction]:
+        index, positions = self._state
+        shares = index.vote(np.array([index.query_values(f) for f in features]))
+        shares[:, positions < 0] = 0.0
+        return [self._prediction(request_features, positions, row, top_k, forecast, market_snapshot)
+                for request_features, row in zip(features, shares)]
+
+    def _prediction(self, features: Dict, positions: np.ndarray, shares: np.ndarray, top_k: int,
+                    forecast: Optional[ForecastFeatures], market_snapshot: Optional[Dict]) -> Prediction:
+        order = top_k_indices(shares, top_k)
+        order = order[shares[order] > 0]
+        if order.size == 0:
+            return Prediction(self.name, self.model_version, [])
+
+        scores = self.predictor.score_factors(features, idx=positions[order], forecast=forecast)
+        recommendations = self.predictor.recommend(scores, features, market_snapshot)
+        for recommendation, share in zip(recommendations, shares[order]):
+            recommendation['score'] = round(float(share), 3)
+            recommendation['confidence'] = round(float(share), 2)
+
+        top_crop = entry_name(recommendations[0])
+        shap_features, yield_shap_features = self.attributions.explain(top_crop, features, scores)
+        return Prediction(self.name, self.model_version, recommendations,
+                          self.predictor.generate_explanation(top_crop, features, scores),
+                          shap_features, yield_shap_features)
+
+class FunctionEngine(PredictionEngine):
+    """Adapts a plain prediction function (e.g. the heuristic rules in app.py) to the interface"""
+
+    def __init__(self, name: str, model_version: str, function: Callable[..., Prediction]):
+        self.name = name
+        self.model_version = model_version
+        self.function = function
+
+    def predict(self, features: Dict, top_k: int = 5, forecast: Optional[ForecastFeatures] = None,
+                market_snapshot: Optional[Dict] = None, request=None) -> Prediction:
+        return self.function(features, top_k=top_k, forecast=forecast, market_snapshot=market_snapshot, request=request)
+
+class ParetoEngine(PredictionEngine):
+    """
+    Recommendations ranked on several objectives instead of suitability
+    alone: suitability, estimated profit, sustainability and risk (the
+    simulated loss probability when a ClimateRiskSimulator is given, the
+    suitability risk level otherwise). Every candidate the rule model
+    scores above MIN_SUITABILITY is ranked by Pareto front; the first
+    front is returned whole, later fronts fill up to top_k, and within a
+    front entries are ordered by the request's objective `weights`.
+    """
+
+    name = 'pareto'
+    model_version = 'v2.0.0-pareto'
+    # Cap on the answer when the first front alone is larger than this
+    MAX_FRONT = 25
+
+    def __init__(self, predictor: CropPredictor, risk_simulator=None, attributions: Optional[TreeAttributions] = None):
+        self.predictor = predictor
+        self.risk_simulator = risk_simulator
+        self.attributions = attributions or TreeAttributions(predictor)
+
+    def objectives(self, features: Dict, scores, forecast: Optional[ForecastFeatures] = None,
+                   market_snapshot: Optional[Dict] = None) -> np.ndarray:
+        """(candidates, OBJECTIVES) values of scored catalog entries"""
+        predictor = self.predictor
+        yields = predictor._predict_yields(scores)
+        profits = predictor._calculate_profits(scores.idx, yields, scores.area_ha,
+                                               predictor.price_table.prices(market_snapshot))
+        if self.risk_simulator is not None:
+            risk = self.risk_simulator.loss_probabilities(features, scores.idx, forecast=forecast,
+                                                          market_snapshot=market_snapshot)
+        else:
+            # Same thresholds as CropPredictor.get_risk_level
+            risk = np.where(scores.suitability > 0.8, 0.0, np.where(scores.suitability > 0.6, 0.5, 1.0))
+        return np.column_stack([scores.suitability, profits, predictor._sustainability[scores.idx], risk])
+
+    def predict(self, features: Dict, top_k: int = 5, forecast: Optional[ForecastFeatures] = None,
+                market_snapshot: Optional[Dict] = None, request=None) -> Prediction:
+        weights = validate_weights(getattr(request, 'weights', None))
+        scores = self.predictor.score_factors(features, forecast=forecast)
+        scores = scores.take(scores.suitability > MIN_SUITABILITY)
+        if not scores.idx.size:
+            return Prediction(self.name, self.model_version, [])
+
+        values = normalise(self.objectives(features, scores, forecast, market_snapshot))
+        ranks = pareto_ranks(values, min_ranked=top_k)
+        weighted = weighted_scores(values, weights)
+        ranked = np.flatnonzero(ranks >= 0)
+        order = ranked[np.lexsort((-weighted[ranked], ranks[ranked]))]
+        order = order[:max(top_k, min((ranks == 0).sum(), self.MAX_FRONT))]
+
+        chosen = scores.take(order)
+        recommendations = self.predictor.recommend(chosen, features, market_snapshot)
+        for recommendation, rank, score in zip(recommendations, ranks[order], weighted[order]):
+            recommendation['pareto_rank'] = int(rank)
+            recommendation['weighted_score'] = round(float(score), 3)
+
+        top_crop = entry_name(recommendations[0])
+        shap_features, yield_shap_features = self.attributions.explain(top_crop, features, chosen)
+        return Prediction(self.name, self.model_version, recommendations,
+                          self.predictor.generate_explanation(top_crop, features, chosen),
+                          shap_features, yield_shap_features)
+
+def deadline_seconds(header_ms: Optional[float] = None) -> Optional[float]:
+    """Deadline for one request from the X-Deadline-Ms header, else ML_PREDICT_DEADLINE_MS (unset: none)"""
+    if header_ms is None:
+        header_ms = os.environ.get("ML_PREDICT_DEADLINE_MS")
+        if not header_ms:
+            return None
+    deadline = float(header_ms)
+    if not (math.isfinite(deadline) and deadline > 0):
+        raise ValueError(f"{DEADLINE_HEADER} must be a positive number of milliseconds")
+    return deadline / 1000
+
+class EngineRegistry:
+    """
+    Named engines, the primary one answering requests and an optional
+    shadow engine. A sampled fraction of requests is re-scored by the
+    shadow engine on a background thread after the primary has answered,
+    recording its latency and how well its top-k agrees with the primary.
+
+    Requests with a deadline run the primary engine on a worker thread; if
+    it has not answered in time the `fallback` engine (cheap rule scoring)
+    answers instead and the primary's result is discarded.
+    """
+
+    def __init__(self, primary: Optional[str] = None, shadow: Optional[str] = None,
+                 shadow_fraction: float = DEFAULT_SHADOW_FRACTION, engine_threads: Optional[int] = None):
+        self.engines = {}
+        self.primary_name = primary
+        self.shadow_name = shadow
+        self.shadow_fraction = shadow_fraction
+        self.fallback = None
+        self._executor = None
+        self._engine_executor = None
+        self.engine_threads = engine_threads
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    @property
+    def executor_threads(self) -> int:
+        """Threads for deadline-bound engine runs: ML_ENGINE_THREADS, else the configured count"""
+        return int(os.environ.get("ML_ENGINE_THREADS", self.engine_threads or DEFAULT_ENGINE_THREADS))
+
+    def register(self, engine: PredictionEngine, primary: bool = False):
+        self.engines[engine.name] = engine
+        if primary or self.primary_name is None:
+            self.primary_name = engine.name
+
+    def get(self, name: str) -> PredictionEngine:
+        if name not in self.engines:
+            raise KeyError(f"Unknown engine '{name}', available: {', '.join(self.engines)}")
+        return self.engines[name]
+
+    @property
+    def primary(self) -> PredictionEngine:
+        return self.get(self.primary_name)
+
+    @property
+    def shadow(self) -> Optional[PredictionEngine]:
+        if not self.shadow_name or self.shadow_name == self.primary_name:
+            return None
+        return self.engines.get(self.shadow_name)
+
+    def configure(self, primary: Optional[str] = None, shadow: Optional[str] = None,
+                  shadow_fraction: Optional[float] = None):
+        """Switch engines at runtime; an empty shadow name disables shadowing"""
+        if primary is not None:
+            self.get(primary)
+            self.primary_name = primary
+        if shadow is not None:
+            if shadow:
+                self.get(shadow)
+            self.shadow_name = shadow or None
+        if shadow_fraction is not None:
+            if not 0 <= shadow_fraction <= 1:
+                raise ValueError("shadow_fraction must be between 0 and 1")
+            self.shadow_fraction = shadow_fraction
+
+    def configure_from_env(self, default_primary: Optional[str] = None):
+        """ML_ENGINE selects the primary engine, ML_SHADOW_ENGINE and ML_SHADOW_FRACTION the shadow"""
+        primary = os.environ.get("ML_ENGINE", default_primary)
+        if primary not in self.engines:
+            if primary:
+                logger.warning(f"Engine '{primary}' is not available, using '{self.primary_name}'")
+            primary = None
+        self.configure(primary, os.environ.get("ML_SHADOW_ENGINE"),
+                       float(os.environ.get("ML_SHADOW_FRACTION", self.shadow_fraction)))
+
+    def predict(self, features: Dict, top_k: int = 5, forecast: Optional[ForecastFeatures] = None,
+                market_snapshot: Optional[Dict] = None, request=None,
+                engine: Optional[PredictionEngine] = None) -> Prediction:
+        """Predict with the primary engine (or `engine`) and maybe schedule a shadow run"""
+        engine = engine or self.primary
+        start = time.perf_counter()
+        prediction = engine.predict(features, top_k, forecast, market_snapshot, request)
+        elapsed = time.perf_counter() - start
+        engine_latency.observe(elapsed, engine=engine.name, role='primary')
+
+        shadow = self.shadow
+        if shadow is not None and shadow is not engine and random.random() < self.shadow_fraction:
+            self._submit_shadow(shadow, prediction, elapsed, (features, top_k, forecast, market_snapshot, request))
+        return prediction
+
+    async def predict_async(self, features: Dict, top_k: int = 5, forecast: Optional[ForecastFeatures] = None,
+                            market_snapshot: Optional[Dict] = None, request=None,
+                            deadline: Optional[float] = None) -> Prediction:
+        """Predict with the primary engine, falling back when it misses `deadline` (seconds)"""
+        engine = self.primary
+        if deadline is None or self.fallback is None or engine is self.fallback:
+            return self.predict(features, top_k, forecast, market_snapshot, request)
+
+        if self._engine_executor is None:
+            self._engine_executor = ThreadPoolExecutor(max_workers=self.executor_threads, thread_name_prefix="engine")
+        future = self._engine_executor.submit(self.predict, features, top_k, forecast, market_snapshot, request, engine)
+        try:
+            # On timeout the future is cancelled: dropped if it has not started, ignored if it has
+            return await asyncio.wait_for(asyncio.wrap_future(future), deadline)
+        except asyncio.TimeoutError:
+            reason = 'deadline'
+        except Exception as e:
+            logger.warning(f"Engine {engine.name} failed, answering with {self.fallback.name}: {e}")
+            reason = 'error'
+
+        degraded_responses.inc(engine=engine.name, reason=reason)
+        prediction = self.fallback.predict(features, top_k, forecast, market_snapshot, request)
+        prediction.degraded = True
+        return prediction
+
+    def degraded_count(self) -> Dict[str, float]:
+        return {reason: sum(degraded_responses.value(engine=name, reason=reason) for name in self.engines)
+                for reason in ('deadline', 'error')}
+
+    def _submit_shadow(self, shadow: PredictionEngine, primary: Prediction, primary_seconds: float, args):
+        with self._lock:
+            if self._pending >= MAX_PENDING_SHADOW_RUNS:
+                shadow_skipped.inc(reason='busy')
+                return
+            self._pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="shadow-engine")
+        self._executor.submit(self._run_shadow, shadow, primary, primary_seconds, args)
+
+    def _run_shadow(self, shadow: PredictionEngine, primary: Prediction, primary_seconds: float, args):
+        try:
+            start = time.perf_counter()
+            prediction = shadow.predict(*args)
+            elapsed = time.perf_counter() - start
+            engine_latency.observe(elapsed, engine=shadow.name, role='shadow')
+            self.record_comparison(primary, prediction, args[1], primary_seconds, elapsed)
+        except Exception as e:
+            shadow_skipped.inc(reason='error')
+            logger.warning(f"Shadow engine {shadow.name} failed: {e}")
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def record_comparison(self, primary: Prediction, shadow: Prediction, top_k: int,
+                          primary_seconds: float, shadow_seconds: float):
+        primary_top = primary.top_crops(top_k)
+        shadow_top = shadow.top_crops(top_k)
+        top1 = bool(primary_top and shadow_top and primary_top[0] == shadow_top[0])
+        overlap = len(set(primary_top) & set(shadow_top)) / len(primary_top) if primary_top else float(not shadow_top)
+
+        labels = {'primary': primary.engine, 'shadow': shadow.engine}
+        shadow_comparisons.inc(**labels)
+        shadow_top1_agreements.inc(int(top1), **labels)
+        shadow_topk_overlap.observe(overlap, **labels)
+        with self._lock:
+            stats = self._stats.setdefault((primary.engine, shadow.engine), [0, 0, 0.0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += top1
+            stats[2] += overlap
+            stats[3] += primary_seconds
+            stats[4] += shadow_seconds
+
+    def wait_for_shadow_runs(self, timeout: float = 10.0):
+        """Block until queued shadow runs finished (tests, shutdown)"""
+        deadline = time.monotonic() + timeout
+        while self._pending and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def status(self) -> Dict:
+        comparisons = []
+        for (primary, shadow), (n, top1, overlap, primary_seconds, shadow_seconds) in self._stats.items():
+            comparisons.append({
+                'primary': primary,
+                'shadow': shadow,
+                'comparisons': n,
+                'top1_agreement': round(top1 / n, 3),
+                'mean_topk_overlap': round(overlap / n, 3),
+                'mean_primary_ms': round(primary_seconds / n * 1000, 2),
+                'mean_shadow_ms': round(shadow_seconds / n * 1000, 2),
+            })
+        return {
+            'engines': {name: engine.model_version for name, engine in self.engines.items()},
+            'primary': self.primary_name,
+            'shadow': self.shadow.name if self.shadow is not None else None,
+            'shadow_fraction': self.shadow_fraction,
+            'pending_shadow_runs': self._pending,
+            'fallback': self.fallback.name if self.fallback is not None else None,
+            'degraded_responses': self.degraded_count(),
+            'comparisons': comparisons,
+        }
@@ -0,0 +1,117 @@
+import numpy as np
+from typing import Dict, List, Optional
+from crop_predictor import CropPredictor
+
+NUTRIENTS = ('N', 'P', 'K')
+
+# Cost of one kg of nutrient (INR): N from urea, P as P2O5 from DAP, K as K2O from MOP
+FERTILIZER_COST_PER_KG = {'N': 13.0, 'P': 59.0, 'K': 57.0}
+
+# Default grid: additions from 0 to the maximum (kg/ha) in fixed steps
+DEFAULT_MAX_ADDITION = {'N': 120.0, 'P': 80.0, 'K': 80.0}
+DEFAULT_STEP = 10.0
+MAX_SCENARIOS = 250000
+# Scenario x crop cells scored at once; larger requests are evaluated in chunks of scenarios
+MAX_EVALUATION_CELLS = 250000
+
+def nutrient_grid(max_addition: Optional[Dict[str, float]] = None, step: float = DEFAULT_STEP) -> np.ndarray:
+    """(scenarios, 3) array of every N/P/K addition combination on the grid"""
+    max_addition = {**DEFAULT_MAX_ADDITION, **(max_addition or {})}
+    if step <= 0:
+        raise ValueError("Grid step must be positive")
+    axes = [np.arange(0.0, max_addition[n] + step / 2, step) for n in NUTRIENTS]
+    n_scenarios = int(np.prod([axis.size for axis in axes]))
+    if n_scenarios > MAX_SCENARIOS:
+        raise ValueError(f"Grid has {n_scenarios} scenarios, at most {MAX_SCENARIOS} are allowed")
+    return np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, len(NUTRIENTS))
+
+class FertilizerOptimizer:
+    """
+    What-if scoring of fertilizer additions. Scenarios and crops are scored
+    together: the request's N, P and K become (scenarios, 1) columns that
+    broadcast against the catalog arrays in the scoring engine. At most
+    MAX_EVALUATION_CELLS scenario x crop cells are scored at once, so memory
+    does not grow with the grid size times the catalog size.
+    """
+
+    def __init__(self, predictor: CropPredictor):
+        self.predictor = predictor
+
+    def evaluate(self, features: Dict, additions: np.ndarray, idx: np.ndarray,
+                 market_snapshot: Optional[Dict] = None) -> Dict[str, np.ndarray]:
+        """Suitability, yield and profit as (scenarios, crops) arrays"""
+        predictor = self.predictor
+        scenario_features = dict(features)
+        for j, nutrient in enumerate(NUTRIENTS):
+            scenario_features[nutrient] = features.get(nutrient, 0) + additions[:, j:j + 1]
+        scores = predictor.score_factors(scenario_features, idx=idx)
+        yields = predictor._predict_yields(scores)
+        profits = predictor._calculate_profits(idx, yields, scores.area_ha, predictor.price_table.prices(market_snapshot))
+        return {'suitability': scores.suitability, 'yield': yields, 'profit': profits}
+
+    def optimize(self, features: Dict, additions: Optional[np.ndarray] = None,
+                 target_crops: Optional[List[str]] = None, min_suitability: float = 0.5,
+                 cost_per_kg: Optional[Dict[str, float]] = None,
+                 market_snapshot: Optional[Dict] = None) -> List[Dict]:
+        """
+        Best amendment per target crop: the scenario with the highest profit
+        net of fertilizer cost among those reaching `min_suitability`.
+        Scenario 0 (no addition) is the baseline each result is compared to.
+        """
+        catalog = self.predictor.catalog
+        if additions is None:
+            additions = nutrient_grid()
+        names = target_crops or catalog.names
+        idx = np.array([catalog.index_of(name) for name in names], dtype=np.intp)
+        costs = {**FERTILIZER_COST_PER_KG, **(cost_per_kg or {})}
+        area = features.get('area_ha', 1)
+
+        # Baseline first so "no amendment" is always a candidate
+        additions = np.vstack([np.zeros((1, len(NUTRIENTS))), additions])
+        fertilizer_cost = additions @ np.array([costs[n] for n in NUTRIENTS]) * area
+
+        # Best viable scenario per crop so far; the first one wins ties
+        columns = np.arange(len(idx))
+        best = np.zeros(len(idx), dtype=np.intp)
+        best_net = np.full(len(idx), -np.inf)
+        reachable = np.zeros(len(idx), dtype=bool)
+        best_outcome = {key: np.zeros(len(idx)) for key in ('suitability', 'yield', 'profit')}
+        chunk = max(1, MAX_EVALUATION_CELLS // len(idx))
+        for start in range(0, len(additions), chunk):
+            outcome = self.evaluate(features, additions[start:start + chunk], idx, market_snapshot)
+            if start == 0:
+                baseline = {key: values[0] for key, values in outcome.items()}
+            viable = outcome['suitability'] >= min_suitability
+            net_profit = np.where(viable, outcome['profit'] - fertilizer_cost[start:start + chunk, None], -np.inf)
+            s = np.argmax(net_profit, axis=0)
+            better = viable[s, columns] & (net_profit[s, columns] > best_net)
+            best[better] = start + s[better]
+            best_net[better] = net_profit[s, columns][better]
+            for key, values in best_outcome.items():
+                values[better] = outcome[key][s, columns][better]
+            reachable |= better
+
+        results = []
+        for c, name in enumerate(names):
+            s = best[c]
+            result = {
+                'crop': catalog.crops[idx[c]],
+                'viable': bool(reachable[c]),
+                'baseline_suitability': round(float(baseline['suitability'][c]), 3),
+                'baseline_profit_inr': int(baseline['profit'][c]),
+            }
+            if catalog.varieties[idx[c]]:
+                result['variety'] = catalog.varieties[idx[c]]
+            if reachable[c]:
+                result.update({
+                    'addition_kg_per_ha': {n: float(additions[s, j]) for j, n in enumerate(NUTRIENTS)},
+                    'fertilizer_cost_inr': int(fertilizer_cost[s]),
+                    'suitability': round(float(best_outcome['suitability'][c]), 3),
+                    'predicted_yield_kg_per_ha': int(best_outcome['yield'][c]),
+                    'estimated_profit_inr': int(best_outcome['profit'][c]),
+                    'net_profit_inr': int(best_net[c]),
+                })
+            results.append(result)
+
+        results.sort(key=lambda r: r.get('net_profit_inr', -np.inf), reverse=True)
+        return results
@@ -0,0 +1,135 @@
+import threading
+import warnings
+import numpy as np
+from collections import OrderedDict
+from typing import Dict, List, Optional
+from crop_catalog import CropCatalog
+
+# Numeric fields of a daily_forecast entry, in array column order
+FORECAST_FIELDS = ('temperature_max', 'temperature_min', 'rainfall', 'humidity', 'wind_speed')
+TMAX, TMIN, RAIN, HUMIDITY, WIND = range(len(FORECAST_FIELDS))
+
+# Days at or above this maximum temperature count as heat-stress days
+HEAT_STRESS_TEMP = 35.0
+# Days with less rain than this (mm) count as dry days
+DRY_DAY_RAINFALL = 1.0
+# Length (days) of the warmest/coolest running-mean temperature windows
+TEMP_WINDOW_DAYS = 3
+# Night-time lows this far below a crop's minimum count as cold stress
+COLD_TOLERANCE = 5.0
+# Largest suitability reduction when every forecast day stresses a crop
+FORECAST_STRESS_WEIGHT = 0.5
+
+# Location cell size (degrees) used to share forecasts between nearby farms
+FORECAST_CELL_DEG = 0.25
+FORECAST_CACHE_SIZE = 4096
+
+def forecast_array(daily_forecast: List[Dict]) -> np.ndarray:
+    """(days, FORECAST_FIELDS) float array in one pass; missing values are NaN"""
+    nan = float('nan')
+    values = [day.get(field, nan) for day in daily_forecast for field in FORECAST_FIELDS]
+    array = np.array([nan if v is None else v for v in values], dtype=float)
+    return array.reshape(len(daily_forecast), len(FORECAST_FIELDS))
+
+def _finite(value) -> Optional[float]:
+    """Rounded value, or None when no day provided the field (NaN is not valid JSON)"""
+    value = float(value)
+    return round(value, 2) if np.isfinite(value) else None
+
+def summarize_forecast(days: np.ndarray) -> Dict[str, Optional[float]]:
+    """Aggregate forecast features: cumulative rain, stress days and temperature windows"""
+    tmax, tmin, rain = days[:, TMAX], days[:, TMIN], days[:, RAIN]
+    daily_mean = (tmax + tmin) / 2
+    window = min(TEMP_WINDOW_DAYS, len(days))
+    running = np.convolve(np.nan_to_num(daily_mean, nan=np.nanmean(daily_mean)), np.ones(window) / window, mode='valid')
+    return {
+        'days': float(len(days)),
+        'rainfall_total': round(float(np.nansum(rain)), 2),
+        'rainfall_max_day': _finite(np.nanmax(rain)),
+        'dry_days': float(np.sum(rain < DRY_DAY_RAINFALL)),
+        'heat_stress_days': float(np.sum(tmax >= HEAT_STRESS_TEMP)),
+        'temperature_max_peak': _finite(np.nanmax(tmax)),
+        'temperature_min_low': _finite(np.nanmin(tmin)),
+        'warmest_window_mean': _finite(running.max()),
+        'coolest_window_mean': _finite(running.min()),
+        'humidity_mean': _finite(np.nanmean(days[:, HUMIDITY])),
+        'wind_speed_max': _finite(np.nanmax(days[:, WIND])),
+    }
+
+class ForecastFeatures:
+    """Aggregated forecast plus a per-catalog-entry temperature stress factor"""
+
+    def __init__(self, days: np.ndarray, catalog: CropCatalog):
+        # Fields no day provides are all-NaN columns; their statistics come out as None
+        with np.errstate(all='ignore'), warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            self.summary = summarize_forecast(days)
+
+        # Heat stress above the crop's range and cold stress well below it,
+        # one row per catalog entry, one column per forecast day
+        tmax, tmin = days[:, TMAX], days[:, TMIN]
+        heat = tmax[None, :] > catalog.temp_max[:, None]
+        cold = tmin[None, :] < (catalog.temp_min - COLD_TOLERANCE)[:, None]
+        self.stress_days = np.sum(heat | cold, axis=1)
+        self.crop_score = 1.0 - FORECAST_STRESS_WEIGHT * self.stress_days / len(days)
+
+class ForecastCache:
+    """
+    LRU cache of forecast features keyed by coarse location cell and forecast
+    start date. Farms in the same district receive the same forecast, so
+    only the first request per cell and day parses and aggregates it.
+    Forecasts without a start date cannot be told apart from later ones for
+    the same cell, so they are aggregated per request and never cached.
+    """
+
+    def __init__(self, catalog: CropCatalog, cell_deg: float = FORECAST_CELL_DEG,
+                 max_entries: int = FORECAST_CACHE_SIZE):
+        self.catalog = catalog
+        self.cell_deg = cell_deg
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, lat: float, lon: float, daily_forecast: List[Dict]):
+        return (
+            int(np.floor(lat / self.cell_deg)), int(np.floor(lon / self.cell_deg)),
+            daily_forecast[0].get('date'), len(daily_forecast)
+        )
+
+    def get(self, lat: float, lon: float, daily_forecast: List[Dict]) -> Optional[ForecastFeatures]:
+        """Forecast features for a request, or None when there is no forecast"""
+        if not daily_forecast:
+            return None
+        key = self.key(lat, lon, daily_forecast)
+        return self._get_or_build(key, lambda: forecast_array(daily_forecast))
+
+    def get_array(self, lat: float, lon: float, start, days: np.ndarray) -> Optional[ForecastFeatures]:
+        """Like get() for a forecast already decoded into a FORECAST_FIELDS array"""
+        if not len(days):
+            return None
+        key = (int(np.floor(lat / self.cell_deg)), int(np.floor(lon / self.cell_deg)), start, len(days))
+        return self._get_or_build(key, lambda: days)
+
+    def _get_or_build(self, key, build_days) -> ForecastFeatures:
+        if key[2] is None:
+            return ForecastFeatures(build_days(), self.catalog)
+        with self._lock:
+            features = self._entries.get(key)
+            if features is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return features
+            self.misses += 1
+
+        features = ForecastFeatures(build_days(), self.catalog)
+        with self._lock:
+            self._entries[key] = features
+            if len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return features
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
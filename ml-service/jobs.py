@@ -0,0 +1,471 @@
+import json
+import logging
+import os
+import queue
+import shutil
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+JOBS_DIR = "jobs"
+DEFAULT_JOB_WORKERS = 2
+DEFAULT_JOB_QUEUE = 16
+# Items per unit of work sent to a worker process, and per results file
+DEFAULT_CHUNK_ITEMS = 100
+MAX_JOB_ITEMS = 100000
+MAX_PAGE_ITEMS = 1000
+MAX_TOP_K = 50
+# Worker processes run at lower CPU priority than the request handlers, and
+# single-threaded so they stay out of the serving workers' CPU budget
+JOB_WORKER_NICENESS = 10
+JOB_WORKER_THREADS = 1
+# Finished jobs kept on disk; older ones are deleted each time a job finishes
+MAX_KEPT_JOBS = 200
+
+JOB_KINDS = ('predict', 'fertilizer', 'rotation')
+# File in a job's directory asking the owning process to cancel it
+CANCEL_MARKER = "cancel"
+QUEUED, RUNNING, SUCCEEDED, FAILED, CANCELLED = 'queued', 'running', 'succeeded', 'failed', 'cancelled'
+FINISHED = (SUCCEEDED, FAILED, CANCELLED)
+
+jobs_submitted = registry.counter("ml_jobs_submitted_total", "Jobs accepted by the job API", labels=("kind",))
+jobs_finished = registry.counter("ml_jobs_finished_total", "Jobs that reached a final state", labels=("kind", "state"))
+jobs_rejected = registry.counter("ml_jobs_rejected_total", "Job submissions rejected because the queue was full")
+jobs_queued = registry.gauge("ml_jobs_queued", "Jobs waiting for the job runner")
+
+class QueueFull(Exception):
+    """The job queue is at capacity"""
+
+# Worker process side: models are built once per process, not per chunk
+_worker_state = {}
+
+def _init_worker(niceness: int, threads: int):
+    try:
+        os.nice(niceness)
+    except OSError:
+        pass
+    from cpu_budget import CpuBudget
+    CpuBudget(threads=threads).apply()
+
+def _worker_models() -> Dict:
+    if not _worker_state:
+        from crop_predictor import CropPredictor
+        from engines import ParetoEngine, RuleEngine
+        from fertilizer_optimizer import FertilizerOptimizer
+        from rotation_planner import RotationPlanner
+        from soil_raster import SoilRaster
+        predictor = CropPredictor()
+        _worker_state.update(predictor=predictor, fertilizer=FertilizerOptimizer(predictor),
+                             rotation=RotationPlanner(predictor), soil_raster=SoilRaster.load(),
+                             engines={'suitability': RuleEngine(predictor), 'pareto': ParetoEngine(predictor)})
+    return _worker_state
+
+def _run_item(kind: str, item: Dict, models: Dict) -> Dict:
+    """
+    One item, parsed and validated as the matching interactive endpoint's
+    request. Predict items are scored by the rule engine (the Pareto engine
+    for ranking="pareto") whatever the serving app's primary engine is, and
+    may set `top_k` (default 5).
+    """
+    from forecast_features import ForecastFeatures, forecast_array
+    from rotation_planner import rotation_seasons
+    from schemas import (
+        FertilizerRequest, PredictRequest, RotationRequest, fertilizer_additions, validate_predict_request
+    )
+
+    predictor = models['predictor']
+    if kind == 'predict':
+        request = PredictRequest.model_validate(item)
+        validate_predict_request(request)
+        top_k = item.get('top_k', 5)
+        if not isinstance(top_k, int) or not 1 <= top_k <= MAX_TOP_K:
+            raise ValueError(f"top_k must be 1-{MAX_TOP_K}")
+        daily_forecast = request.forecast_data.daily_forecast
+        forecast = ForecastFeatures(forecast_array(daily_forecast), predictor.catalog) if daily_forecast else None
+        prediction = models['engines'][request.ranking].predict(
+            request.features.model_dump(), top_k=top_k, forecast=forecast,
+            market_snapshot=request.market_snapshot, request=request
+        )
+        return {'recommendations': prediction.recommendations, 'explanation': prediction.explanation,
+                'forecast_summary': forecast.summary if forecast is not None else None}
+    if kind == 'fertilizer':
+        request = FertilizerRequest.model_validate(item)
+        additions = fertilizer_additions(request, predictor.crop_requirements)
+        results = models['fertilizer'].optimize(
+            request.features.model_dump(), additions, target_crops=request.target_crops,
+            min_suitability=request.min_suitability, cost_per_kg=request.fertilizer_cost_per_kg,
+            market_snapshot=request.market_snapshot
+        )
+        return {'scenarios': len(additions), 'results': results}
+    request = RotationRequest.model_validate(item)
+    seasons = rotation_seasons(request.years, request.start_season, request.seasons)
+    return models['rotation'].plan(request.features.model_dump(), seasons,
+                                   previous_crops=request.features.previous_crops,
+                                   season_conditions=request.season_conditions,
+                                   market_snapshot=request.market_snapshot)
+
+def run_chunk(kind: str, items: List[Dict]) -> List[Dict]:
+    """Results for a chunk of items; a failing item yields an error entry instead of failing the job"""
+    from soil_raster import fill_soil_batch
+    models = _worker_models()
+    # Missing soil fields of the whole chunk in one raster lookup, by each item's location
+    located = [item for item in items if isinstance(item.get('features'), dict)]
+    locations = [item.get('location') or {} for item in located]
+    fill_soil_batch([item['features'] for item in located], models['soil_raster'],
+                    [location.get('lat', float('nan')) for location in locations],
+                    [location.get('lon', float('nan')) for location in locations])
+    results = []
+    for item in items:
+        try:
+            results.append(_run_item(kind, item, models))
+        except Exception as e:
+            results.append({'error': f"{type(e).__name__}: {e}"})
+    return results
+
+class JobManager:
+    """
+    Background jobs on a process pool, with results on disk.
+
+    Submissions go into a bounded queue served by one runner thread. The
+    runner splits a job into chunks and keeps at most one chunk per worker
+    in flight. Results are written chunk by chunk (results-<n>.jsonl) next
+    to status.json, so status and pages are served from disk, including
+    for jobs from before a restart. Cancelling stops a job between chunks.
+
+    Every serving worker has its own manager on the same directory. A job
+    belongs to the process that accepted it (owner_host/owner_pid in its
+    status) and only that process keeps it in memory; the others read its
+    status from disk and ask for cancellation with a marker file. A
+    starting manager fails unfinished jobs only when their owner is gone.
+    """
+
+    def __init__(self, root: str = JOBS_DIR, workers: int = DEFAULT_JOB_WORKERS,
+                 max_queue: int = DEFAULT_JOB_QUEUE, chunk_items: int = DEFAULT_CHUNK_ITEMS,
+                 max_kept: int = MAX_KEPT_JOBS):
+        self.root = root
+        self.workers = workers
+        self.chunk_items = chunk_items
+        self.max_kept = max_kept
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._status = {}
+        self._cancelled = set()
+        self._pool = None
+        self._runner = None
+        self._host = socket.gethostname()
+        if os.path.isdir(root):
+            self._recover()
+
+    @classmethod
+    def from_env(cls) -> "JobManager":
+        """Jobs under ML_JOBS_DIR, with ML_JOB_WORKERS processes and ML_JOB_QUEUE waiting jobs"""
+        return cls(
+            root=os.environ.get("ML_JOBS_DIR", JOBS_DIR),
+            workers=int(os.environ.get("ML_JOB_WORKERS", DEFAULT_JOB_WORKERS)),
+            max_queue=int(os.environ.get("ML_JOB_QUEUE", DEFAULT_JOB_QUEUE)),
+        )
+
+    def _owner_alive(self, status: Dict) -> bool:
+        """Whether the process that accepted a job may still be running it"""
+        if status.get('owner_host') != self._host:
+            # Another machine sharing the directory; only it can tell
+            return True
+        pid = status.get('owner_pid')
+        if pid is None or pid == os.getpid():
+            # This process has just started, so an earlier one with its pid accepted the job
+            return False
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            pass
+        return True
+
+    def _recover(self):
+        """Fail unfinished jobs on disk whose owning process is gone"""
+        for job_id in self._job_ids():
+            try:
+                status = self._read_status(job_id)
+            except (OSError, ValueError):
+                continue
+            if status['state'] not in FINISHED and not self._owner_alive(status):
+                status.update(state=FAILED, error="Interrupted by a service restart", finished=time.time())
+                self._write_status(status)
+
+    def _job_dir(self, job_id: str) -> str:
+        return os.path.join(self.root, job_id)
+
+    def _job_ids(self) -> List[str]:
+        try:
+            return os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+
+    def _cancel_requested(self, job_id: str) -> bool:
+        return job_id in self._cancelled or os.path.exists(os.path.join(self._job_dir(job_id), CANCEL_MARKER))
+
+    def _read_status(self, job_id: str) -> Dict:
+        with open(os.path.join(self._job_dir(job_id), "status.json")) as f:
+            return json.load(f)
+
+    def _write_status(self, status: Dict):
+        # Written to a temporary file and renamed, so readers never see half a file
+        path = os.path.join(self._job_dir(status['id']), "status.json")
+        with open(path + ".tmp", "w") as f:
+            json.dump(status, f)
+        os.replace(path + ".tmp", path)
+
+    def _update(self, job_id: str, **changes) -> Dict:
+        with self._lock:
+            status = {**self._status[job_id], **changes}
+            self._status[job_id] = status
+        self._write_status(status)
+        return status
+
+    def submit(self, kind: str, items: List[Dict]) -> Dict:
+        if kind not in JOB_KINDS:
+            raise ValueError(f"kind must be one of {', '.join(JOB_KINDS)}")
+        if not items or len(items) > MAX_JOB_ITEMS:
+            raise ValueError(f"A job needs 1 to {MAX_JOB_ITEMS} items")
+        if self._queue.full():
+            jobs_rejected.inc()
+            raise QueueFull()
+
+        job_id = uuid.uuid4().hex
+        os.makedirs(self._job_dir(job_id), exist_ok=True)
+        with open(os.path.join(self._job_dir(job_id), "items.json"), "w") as f:
+            json.dump(items, f)
+        status = {'id': job_id, 'kind': kind, 'state': QUEUED, 'items': len(items), 'completed': 0,
+                  'failed_items': 0, 'chunk_items': self.chunk_items, 'submitted': time.time(),
+                  'started': None, 'finished': None, 'error': None,
+                  'owner_host': self._host, 'owner_pid': os.getpid()}
+        with self._lock:
+            self._status[job_id] = status
+        self._write_status(status)
+        try:
+            self._queue.put_nowait(job_id)
+        except queue.Full:
+            shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+            with self._lock:
+                del self._status[job_id]
+            jobs_rejected.inc()
+            raise QueueFull()
+        jobs_submitted.inc(kind=kind)
+        jobs_queued.set(self._queue.qsize())
+        self._ensure_runner()
+        return self.status(job_id)
+
+    def _ensure_runner(self):
+        with self._lock:
+            if self._runner is None or not self._runner.is_alive():
+                self._runner = threading.Thread(target=self._run, name="job-runner", daemon=True)
+                self._runner.start()
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers, initializer=_init_worker,
+                                             initargs=(JOB_WORKER_NICENESS, JOB_WORKER_THREADS))
+        return self._pool
+
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            jobs_queued.set(self._queue.qsize())
+            if job_id is None:
+                return
+            try:
+                self._run_job(job_id)
+            except Exception as e:
+                logger.exception(f"Job {job_id} failed")
+                self._finish(job_id, FAILED, error=str(e))
+            # Pruning reads every job's status, so it runs here rather than on the submit path
+            try:
+                self._prune()
+            except OSError:
+                logger.exception("Pruning old jobs failed")
+
+    def _run_job(self, job_id: str):
+        if self._cancel_requested(job_id):
+            with self._lock:
+                queued = self._status[job_id]['state'] == QUEUED
+            return self._finish(job_id, CANCELLED) if queued else None
+        with self._lock:
+            # Cancelled while it was waiting
+            if self._status[job_id]['state'] != QUEUED:
+                return
+            self._status[job_id] = status = {**self._status[job_id], 'state': RUNNING, 'started': time.time()}
+        self._write_status(status)
+        with open(os.path.join(self._job_dir(job_id), "items.json")) as f:
+            items = json.load(f)
+        chunks = [items[i:i + self.chunk_items] for i in range(0, len(items), self.chunk_items)]
+
+        pool = self._executor()
+        pending = {}
+        next_chunk = 0
+        completed = failed = 0
+        for n in range(len(chunks)):
+            # Keep every worker busy without queueing the whole job in the pool
+            cancelled = self._cancel_requested(job_id)
+            while next_chunk < len(chunks) and len(pending) < self.workers and not cancelled:
+                pending[next_chunk] = pool.submit(run_chunk, status['kind'], chunks[next_chunk])
+                next_chunk += 1
+            if cancelled:
+                for future in pending.values():
+                    future.cancel()
+                return self._finish(job_id, CANCELLED)
+            results = pending.pop(n).result()
+            with open(os.path.join(self._job_dir(job_id), f"results-{n:05d}.jsonl"), "w") as f:
+                f.writelines(json.dumps(result) + "\n" for result in results)
+            completed += len(results)
+            failed += sum('error' in result for result in results)
+            self._update(job_id, completed=completed, failed_items=failed)
+        self._finish(job_id, SUCCEEDED)
+
+    def _finish(self, job_id: str, state: str, error: Optional[str] = None):
+        status = self._update(job_id, state=state, error=error, finished=time.time())
+        self._cancelled.discard(job_id)
+        jobs_finished.inc(kind=status['kind'], state=state)
+
+    def _load(self, job_id: str) -> Dict:
+        """Status from memory for jobs this process owns, from disk for the others"""
+        with self._lock:
+            status = self._status.get(job_id)
+        if status is not None:
+            return dict(status)
+        # Job ids are generated hex strings; anything else cannot name a job directory
+        if not job_id.isalnum():
+            raise KeyError(job_id)
+        try:
+            return self._read_status(job_id)
+        except (OSError, ValueError):
+            raise KeyError(job_id)
+
+    def status(self, job_id: str) -> Dict:
+        status = self._load(job_id)
+        status['progress'] = round(status['completed'] / status['items'], 4) if status['items'] else 1.0
+        return status
+
+    def _statuses(self) -> List[Dict]:
+        statuses = []
+        for job_id in self._job_ids():
+            try:
+                statuses.append(self._load(job_id))
+            except KeyError:
+                continue
+        return statuses
+
+    def list(self, limit: int = 50) -> List[Dict]:
+        statuses = sorted(self._statuses(), key=lambda s: s['submitted'], reverse=True)[:limit]
+        return [self.status(status['id']) for status in statuses]
+
+    def cancel(self, job_id: str) -> Dict:
+        with self._lock:
+            status = self._status.get(job_id)
+            if status is not None:
+                if status['state'] == RUNNING:
+                    self._cancelled.add(job_id)
+                elif status['state'] == QUEUED:
+                    # The runner skips it when it gets to it
+                    self._status[job_id] = status = {**status, 'state': CANCELLED, 'finished': time.time()}
+                    jobs_finished.inc(kind=status['kind'], state=CANCELLED)
+        if status is not None:
+            self._write_status(status)
+        elif self._load(job_id)['state'] not in FINISHED:
+            # Owned by another worker process, whose runner picks up the marker between chunks
+            open(os.path.join(self._job_dir(job_id), CANCEL_MARKER), "w").close()
+        return self.status(job_id)
+
+    def results(self, job_id: str, offset: int = 0, limit: int = 100) -> Dict:
+        """A page of results in item order; only completed items are available"""
+        status = self.status(job_id)
+        if offset < 0 or not 1 <= limit <= MAX_PAGE_ITEMS:
+            raise ValueError(f"offset must be >= 0 and limit 1-{MAX_PAGE_ITEMS}")
+        chunk_items = status['chunk_items']
+        end = max(offset, min(offset + limit, status['completed']))
+        page = []
+        for n in range(offset // chunk_items, -(-end // chunk_items)):
+            with open(os.path.join(self._job_dir(job_id), f"results-{n:05d}.jsonl")) as f:
+                lines = f.readlines()
+            first = max(offset - n * chunk_items, 0)
+            last = min(end - n * chunk_items, len(lines))
+            page.extend(json.loads(line) for line in lines[first:last])
+        return {'id': job_id, 'state': status['state'], 'offset': offset, 'limit': limit,
+                'total': status['items'], 'available': status['completed'],
+                'next_offset': end if end < status['items'] else None, 'results': page}
+
+    def _prune(self):
+        """Delete the oldest finished jobs beyond `max_kept`, whichever process ran them"""
+        statuses = self._statuses()
+        finished = sorted((s['finished'] or 0, s['id']) for s in statuses if s['state'] in FINISHED)
+        excess = finished[:max(0, len(statuses) - self.max_kept)]
+        with self._lock:
+            for _, job_id in excess:
+                self._status.pop(job_id, None)
+        for _, job_id in excess:
+            shutil.rmtree(self._job_dir(job_id), ignore_errors=True)
+
+    def shutdown(self):
+        if self._runner is not None and self._runner.is_alive():
+            self._queue.put(None)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+
+router = APIRouter(prefix="/jobs")
+
+class JobRequest(BaseModel):
+    kind: str  # predict, fertilizer or rotation
+    items: List[Dict]  # request bodies of /predict-style scoring, /optimize/fertilizer or /plan/rotation
+
+def _jobs(request: Request) -> JobManager:
+    return request.app.state.jobs
+
+# Plain def handlers: FastAPI runs them in its threadpool, so the job files they
+# write and read (up to MAX_JOB_ITEMS items) never block the event loop
+
+@router.post("", status_code=202)
+def submit_job(job: JobRequest, request: Request):
+    """Queue a bulk scoring, fertilizer or rotation job; poll GET /jobs/{id} for progress"""
+    try:
+        return _jobs(request).submit(job.kind, job.items)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except QueueFull:
+        raise HTTPException(status_code=503, detail="Job queue is full, retry later", headers={"Retry-After": "30"})
+
+@router.get("")
+def list_jobs(request: Request, limit: int = 50):
+    return {'jobs': _jobs(request).list(limit)}
+
+@router.get("/{job_id}")
+def job_status(job_id: str, request: Request):
+    try:
+        return _jobs(request).status(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown job")
+
+@router.get("/{job_id}/results")
+def job_results(job_id: str, request: Request, offset: int = 0, limit: int = 100):
+    """Results of completed items, `limit` at a time from `offset`"""
+    try:
+        return _jobs(request).results(job_id, offset, limit)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown job")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.delete("/{job_id}")
+def cancel_job(job_id: str, request: Request):
+    """Cancel a queued or running job; results completed so far stay available"""
+    try:
+        return _jobs(request).cancel(job_id)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Unknown job")
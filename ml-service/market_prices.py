@@ -0,0 +1,142 @@
+import csv
+import io
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+import numpy as np
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRICES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "market_prices.json")
+DEFAULT_PRICE_TTL_SECONDS = 900
+
+# Price (INR per quintal) of crops missing from the table and the snapshot
+FALLBACK_PRICE = 2000.0
+
+# Price relative to the average crop price above which demand is very strong / strong;
+# below WEAK_DEMAND_RATIO it is weak, otherwise moderate
+VERY_STRONG_DEMAND_RATIO = 1.2
+STRONG_DEMAND_RATIO = 1.1
+WEAK_DEMAND_RATIO = 0.9
+
+def parse_prices(text: str, source: str = '') -> Dict[str, float]:
+    """Crop -> price from JSON ({"prices": {...}} or a flat object) or crop,price CSV"""
+    if source.endswith('.csv'):
+        return {row['crop']: float(row['price']) for row in csv.DictReader(io.StringIO(text))}
+    data = json.loads(text)
+    prices = data.get('prices', data)
+    return {crop: float(price) for crop, price in prices.items() if isinstance(price, (int, float))}
+
+def read_prices(source: str) -> Dict[str, float]:
+    """Read a price file or fetch an http(s) price feed"""
+    if source.startswith(('http://', 'https://')):
+        with urllib.request.urlopen(source, timeout=10) as response:
+            return parse_prices(response.read().decode(), source.split('?')[0])
+    with open(source, 'r') as f:
+        return parse_prices(f.read(), source)
+
+class PriceTable:
+    """
+    Crop prices stored as an array aligned with a crop list (e.g. the crop of
+    every catalog entry), refreshed from a file or feed in the background.
+    Request snapshots override individual prices without touching the table.
+    """
+
+    def __init__(self, crops: List[str], prices: Optional[Dict[str, float]] = None,
+                 source: Optional[str] = None, ttl: float = DEFAULT_PRICE_TTL_SECONDS):
+        self.crops = list(crops)
+        self.source = source
+        self.ttl = ttl
+        self._positions = {}
+        for i, crop in enumerate(self.crops):
+            self._positions.setdefault(crop, []).append(i)
+        self._positions = {crop: np.array(p, dtype=np.intp) for crop, p in self._positions.items()}
+        # One position per distinct crop, so averages are not skewed by varieties
+        self._distinct = np.array([p[0] for p in self._positions.values()], dtype=np.intp)
+
+        self._prices = np.full(len(self.crops), FALLBACK_PRICE)
+        self.loaded_at = None
+        self._stop = threading.Event()
+        self._thread = None
+        if prices is not None:
+            self.update(prices)
+        elif source is not None:
+            self.refresh()
+
+    def update(self, prices: Dict[str, float]):
+        """Replace the table with new crop prices; crops not listed keep their price"""
+        table = self._prices.copy()
+        for crop, price in prices.items():
+            positions = self._positions.get(crop)
+            if positions is not None:
+                table[positions] = price
+        self._prices = table  # swapped in one assignment, readers never see a partial update
+        self.loaded_at = time.time()
+
+    def refresh(self) -> bool:
+        """Reload from the source, keeping the current prices if that fails"""
+        try:
+            self.update(read_prices(self.source))
+            return True
+        except Exception as e:
+            logger.warning(f"Could not refresh market prices from {self.source}: {e}")
+            return False
+
+    def start(self):
+        """Refresh from the source every `ttl` seconds on a daemon thread"""
+        if self.source is None or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._refresh_loop, name="price-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _refresh_loop(self):
+        while not self._stop.wait(self.ttl):
+            self.refresh()
+
+    def prices(self, snapshot: Optional[Dict] = None) -> np.ndarray:
+        """Price per crop (INR/quintal) with numeric snapshot entries overriding the table"""
+        if not snapshot:
+            return self._prices
+        prices = self._prices.copy()
+        for crop, price in snapshot.items():
+            positions = self._positions.get(crop)
+            if positions is not None and isinstance(price, (int, float)):
+                prices[positions] = price
+        return prices
+
+    def value_of(self, crop: str, column: np.ndarray, default=FALLBACK_PRICE):
+        """A crop's element of a column aligned with the table (prices, demand, ...)"""
+        positions = self._positions.get(crop)
+        return column[positions[0]].item() if positions is not None else default
+
+    def demand(self, prices: np.ndarray) -> np.ndarray:
+        """Demand class per crop from its price relative to the average crop price"""
+        average = prices[self._distinct].mean()
+        ratio = prices / average
+        return np.select(
+            [ratio > VERY_STRONG_DEMAND_RATIO, ratio > STRONG_DEMAND_RATIO, ratio < WEAK_DEMAND_RATIO],
+            ['Very Strong', 'Strong', 'Weak'],
+            default='Moderate'
+        )
+
+    def status(self) -> Dict:
+        return {
+            'source': self.source,
+            'ttl_seconds': self.ttl,
+            'loaded_at': self.loaded_at,
+            'prices': {crop: float(self._prices[p[0]]) for crop, p in self._positions.items()},
+        }
+
+    @classmethod
+    def from_env(cls, crops: List[str]) -> "PriceTable":
+        """Table backed by ML_MARKET_PRICES (path or URL), refreshed every ML_MARKET_PRICES_TTL seconds"""
+        source = os.environ.get("ML_MARKET_PRICES", DEFAULT_PRICES_PATH)
+        ttl = float(os.environ.get("ML_MARKET_PRICES_TTL", DEFAULT_PRICE_TTL_SECONDS))
+        return cls(crops, source=source, ttl=ttl)
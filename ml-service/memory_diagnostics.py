@@ -0,0 +1,229 @@
+import gc
+import logging
+import os
+import resource
+import sys
+import time
+import tracemalloc
+import types
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+import numpy as np
+from metrics import registry
+
+logger = logging.getLogger(__name__)
+
+MAX_SNAPSHOTS = 10
+DEFAULT_TRACE_FRAMES = 1
+SNAPSHOT_GROUPINGS = ('lineno', 'filename', 'traceback')
+
+# Shared objects that are not part of any artifact's footprint
+_SKIPPED_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType, types.MethodType)
+
+def deep_sizeof(obj) -> int:
+    """
+    Approximate bytes retained by `obj` and everything reachable from it.
+
+    numpy arrays count their data buffer once, however many views share it.
+    Extension objects that keep their buffers out of reach of the garbage
+    collector (e.g. fitted sklearn trees) are measured through their
+    pickled state.
+    """
+    seen = set()
+    states = []
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, _SKIPPED_TYPES):
+            continue
+        seen.add(id(item))
+        if isinstance(item, np.ndarray):
+            if isinstance(item.base, np.ndarray):
+                # A view: the data is counted with the array owning it
+                total += item.__sizeof__()
+                stack.append(item.base)
+                continue
+            # Owned data, or a buffer exported by another object (e.g. a tree's nodes)
+            total += item.__sizeof__() + item.nbytes
+            if item.dtype.hasobject:
+                stack.extend(item.ravel().tolist())
+            continue
+        total += sys.getsizeof(item)
+        referents = gc.get_referents(item)
+        if not referents and not hasattr(item, '__dict__') and type(item).__getstate__ is not object.__getstate__:
+            try:
+                referents = [item.__getstate__()]
+            except Exception:
+                referents = []
+            # Keep the state alive so its id is not reused while walking
+            states.extend(referents)
+        stack.extend(referents)
+    return total
+
+def resident_memory() -> Dict[str, int]:
+    """Current and peak resident set size of the process in bytes"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak *= 1 if sys.platform == 'darwin' else 1024  # kilobytes on Linux
+    try:
+        with open('/proc/self/statm') as f:
+            current = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        current = peak
+    return {'rss_bytes': current, 'peak_rss_bytes': peak}
+
+class MemoryDiagnostics:
+    """
+    Memory footprint of loaded artifacts and allocation snapshots.
+
+    Artifacts are registered by name when they are loaded and measured on
+    demand. Snapshots need tracemalloc, which slows allocations down, so
+    tracing is only on between start_tracing() and stop_tracing().
+    """
+
+    def __init__(self, max_snapshots: int = MAX_SNAPSHOTS):
+        self.max_snapshots = max_snapshots
+        self.artifacts = {}
+        self.snapshots = OrderedDict()
+
+    def register(self, name: str, obj):
+        if obj is not None:
+            self.artifacts[name] = obj
+
+    def artifact_sizes(self) -> Dict[str, int]:
+        return {name: deep_sizeof(obj) for name, obj in self.artifacts.items()}
+
+    @property
+    def tracing(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start_tracing(self, frames: int = DEFAULT_TRACE_FRAMES):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def stop_tracing(self):
+        """Stop tracing; snapshots taken so far stay available"""
+        tracemalloc.stop()
+
+    def take_snapshot(self, name: Optional[str] = None) -> str:
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("Allocation tracing is not running")
+        name = name or time.strftime('%Y%m%d-%H%M%S')
+        self.snapshots.pop(name, None)
+        self.snapshots[name] = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+        ])
+        while len(self.snapshots) > self.max_snapshots:
+            self.snapshots.popitem(last=False)
+        return name
+
+    def diff(self, base: str, target: Optional[str] = None, group_by: str = 'lineno', limit: int = 20) -> Dict:
+        """Largest allocation changes from snapshot `base` to `target` (or to now)"""
+        if group_by not in SNAPSHOT_GROUPINGS:
+            raise ValueError(f"group_by must be one of {', '.join(SNAPSHOT_GROUPINGS)}")
+        if base not in self.snapshots or (target is not None and target not in self.snapshots):
+            raise KeyError(target if base in self.snapshots else base)
+        if target is None:
+            target = self.take_snapshot()
+
+        stats = self.snapshots[target].compare_to(self.snapshots[base], group_by)
+        return {
+            'base': base,
+            'target': target,
+            'size_diff_bytes': sum(stat.size_diff for stat in stats),
+            'count_diff': sum(stat.count_diff for stat in stats),
+            'top': [{
+                'location': str(stat.traceback) if group_by != 'traceback'
+                            else [str(frame) for frame in stat.traceback],
+                'size_bytes': stat.size,
+                'size_diff_bytes': stat.size_diff,
+                'count': stat.count,
+                'count_diff': stat.count_diff,
+            } for stat in stats[:limit]],
+        }
+
+    def status(self) -> Dict:
+        status = {**resident_memory(), 'tracing': self.tracing, 'snapshots': list(self.snapshots)}
+        if self.tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            status.update({'traced_bytes': current, 'traced_peak_bytes': peak})
+        return status
+
+# Allocated memory blocks per request. The counter is process wide, so
+# requests overlapping on the event loop are charged for each other's
+# allocations; averages over many requests are still meaningful.
+request_allocations = registry.histogram(
+    "ml_request_allocated_blocks",
+    "Python memory blocks allocated (net) while serving a request",
+    labels=("endpoint",),
+    buckets=(100, 1000, 10000, 100000, 1000000),
+)
+
+class AllocationMiddleware:
+    """ASGI middleware counting the memory blocks still allocated after each request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        before = sys.getallocatedblocks()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            # The router stores the matched endpoint in the scope
+            endpoint = scope.get("endpoint")
+            name = getattr(endpoint, "__name__", "unmatched")
+            request_allocations.observe(max(0, sys.getallocatedblocks() - before), endpoint=name)
+
+class StageMemoryReport:
+    """
+    Peak memory per named stage of a batch job such as training.
+
+    Python and numpy allocations are measured with tracemalloc (peak above
+    the level at the start of the stage); memory allocated directly by C
+    extensions is only visible in the resident set size.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name: str):
+        if not self.enabled:
+            yield
+            return
+        # Tracing stays on once started so later stages see the same baseline
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+        start_bytes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            current, peak = tracemalloc.get_traced_memory()
+            self.stages.append({
+                'stage': name,
+                'seconds': round(time.perf_counter() - start, 2),
+                'peak_traced_mb': round((peak - start_bytes) / 2 ** 20, 1),
+                'retained_traced_mb': round((current - start_bytes) / 2 ** 20, 1),
+                'rss_mb': round(resident_memory()['rss_bytes'] / 2 ** 20, 1),
+            })
+
+    def report(self) -> List[Dict]:
+        return list(self.stages)
+
+    def log(self):
+        if not self.stages:
+            return
+        logger.info("Peak memory per stage (MB above stage start, traced Python/numpy allocations):")
+        for stage in self.stages:
+            logger.info(f"  {stage['stage']:<28} peak {stage['peak_traced_mb']:>8.1f}  "
+                        f"retained {stage['retained_traced_mb']:>8.1f}  rss {stage['rss_mb']:>8.1f}  "
+                        f"({stage['seconds']}s)")
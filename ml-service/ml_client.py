@@ -0,0 +1,98 @@
+import http.client
+import json
+import socket
+from typing import Dict, Optional
+from binary_protocol import CONTENT_TYPE, SCHEMA_HEADER, SCHEMA_VERSION
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """HTTP/1.1 connection over a Unix domain socket"""
+
+    def __init__(self, socket_path: str, timeout: float = 10.0):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+class MLServiceError(Exception):
+    """Non-2xx response from the ML service"""
+
+    def __init__(self, status: int, body: bytes):
+        super().__init__(f"ML service error {status}: {body[:200]!r}")
+        self.status = status
+        self.body = body
+
+class MLServiceClient:
+    """
+    Client for the ML service over one persistent keep-alive connection,
+    either a Unix domain socket (`socket_path`) or TCP (`host`/`port`).
+    Not thread-safe: use one client per thread.
+    """
+
+    def __init__(self, socket_path: Optional[str] = None, host: str = "localhost", port: int = 8001,
+                 timeout: float = 10.0):
+        self.socket_path = socket_path
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._connection = None
+
+    def _connect(self) -> http.client.HTTPConnection:
+        if self.socket_path:
+            connection = UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+        else:
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        connection.connect()
+        connection.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        if not self.socket_path:
+            connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return connection
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None,
+                headers: Optional[Dict[str, str]] = None) -> bytes:
+        """Send one request, reconnecting once if the server closed the idle connection"""
+        for attempt in (0, 1):
+            if self._connection is None:
+                self._connection = self._connect()
+            try:
+                self._connection.request(method, path, body=body, headers=headers or {})
+                response = self._connection.getresponse()
+                data = response.read()
+            except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError):
+                self.close()
+                if attempt:
+                    raise
+                continue
+            if response.will_close:
+                self.close()
+            if response.status >= 300:
+                raise MLServiceError(response.status, data)
+            return data
+
+    def predict(self, request: Dict) -> Dict:
+        """POST a PredictRequest dict to /predict"""
+        body = json.dumps(request).encode()
+        data = self.request("POST", "/predict", body, {"Content-Type": "application/json"})
+        return json.loads(data)
+
+    def predict_packed(self, payload: bytes) -> Dict:
+        """POST a binary_protocol payload to /internal/predict"""
+        headers = {"Content-Type": CONTENT_TYPE, SCHEMA_HEADER: str(SCHEMA_VERSION)}
+        return json.loads(self.request("POST", "/internal/predict", payload, headers))
+
+    def health(self) -> Dict:
+        return json.loads(self.request("GET", "/health"))
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self) -> "MLServiceClient":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
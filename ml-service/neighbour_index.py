@@ -0,0 +1,95 @@
+import logging
+import os
+from typing import Dict, Iterable, Optional
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+from train import CROP_RECOMMENDATION_SCHEMA
+
+logger = logging.getLogger(__name__)
+
+NEIGHBOUR_DATA_PATH = os.path.join(os.path.dirname(__file__), "Crop_recommendation.csv")
+# Columns of Crop_recommendation.csv the index is built over, in query order
+NEIGHBOUR_FEATURES = ['N', 'P', 'K', 'temperature', 'humidity', 'ph', 'rainfall']
+DEFAULT_NEIGHBOURS = 15
+DEFAULT_LEAF_SIZE = 30
+# Keeps the vote weight of an exact match finite
+_DISTANCE_FLOOR = 1e-6
+
+class NeighbourIndex:
+    """
+    KD-tree over standardised labelled rows. A query's k nearest rows vote
+    for their crop with weight 1 / distance, and the vote shares rank the
+    crops. Queries are batched: one tree query and one scatter-add for the
+    whole batch. Rebuilding with extra rows is O(n log n), a few
+    milliseconds for the bundled dataset.
+    """
+
+    def __init__(self, values: np.ndarray, labels: np.ndarray, n_neighbours: int = DEFAULT_NEIGHBOURS,
+                 leaf_size: int = DEFAULT_LEAF_SIZE):
+        values = np.asarray(values, dtype=float)
+        labels = np.asarray(labels)
+        if len(values) == 0:
+            raise ValueError("Cannot build a neighbour index without rows")
+        self.values = values
+        self.labels = labels
+        self.classes, self.codes = np.unique(labels, return_inverse=True)
+        self.n_neighbours = min(n_neighbours, len(values))
+        self.leaf_size = leaf_size
+        self.mean = values.mean(axis=0)
+        self.scale = values.std(axis=0)
+        self.scale[self.scale == 0] = 1.0
+        self.tree = KDTree((values - self.mean) / self.scale, leaf_size=leaf_size)
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame, crops: Optional[Iterable[str]] = None, **kwargs) -> "NeighbourIndex":
+        """Index of a frame with NEIGHBOUR_FEATURES and a 'crop' column, optionally only some crops"""
+        frame = frame.dropna(subset=NEIGHBOUR_FEATURES + ['crop'])
+        if crops is not None:
+            frame = frame[frame['crop'].isin(list(crops))]
+        return cls(frame[NEIGHBOUR_FEATURES].to_numpy(dtype=float), frame['crop'].astype(str).to_numpy(), **kwargs)
+
+    @classmethod
+    def from_csv(cls, path: str = NEIGHBOUR_DATA_PATH, crops: Optional[Iterable[str]] = None,
+                 **kwargs) -> "NeighbourIndex":
+        """Index of Crop_recommendation.csv, with its labels mapped to catalog crop names"""
+        frame = pd.read_csv(path, usecols=NEIGHBOUR_FEATURES + ['label'])
+        label = frame.pop('label').astype(str).str.strip().str.lower()
+        frame['crop'] = label.map(CROP_RECOMMENDATION_SCHEMA['labels']).fillna(label.str.title())
+        index = cls.from_frame(frame, crops, **kwargs)
+        logger.info(f"Neighbour index over {len(index.values)} of {len(frame)} rows from {path} "
+                    f"({len(index.classes)} crops)")
+        return index
+
+    @classmethod
+    def from_env(cls, crops: Optional[Iterable[str]] = None) -> Optional["NeighbourIndex"]:
+        """Index of ML_NEIGHBOUR_DATA (the bundled dataset by default), None if the file is missing"""
+        path = os.environ.get("ML_NEIGHBOUR_DATA", NEIGHBOUR_DATA_PATH)
+        if not os.path.exists(path):
+            logger.info(f"No neighbour dataset at {path}, knn engine disabled")
+            return None
+        return cls.from_csv(path, crops)
+
+    def extend(self, values: np.ndarray, labels: np.ndarray) -> "NeighbourIndex":
+        """A new index with extra labelled rows (this one keeps serving until it is swapped in)"""
+        return NeighbourIndex(np.vstack([self.values, np.asarray(values, dtype=float)]),
+                              np.concatenate([self.labels, np.asarray(labels)]),
+                              self.n_neighbours, self.leaf_size)
+
+    def vote(self, values: np.ndarray) -> np.ndarray:
+        """(queries, classes) distance-weighted vote shares for rows of NEIGHBOUR_FEATURES values"""
+        values = np.atleast_2d(np.asarray(values, dtype=float))
+        # A missing value sits at the dataset mean, so it does not pull towards any crop
+        values = np.where(np.isnan(values), self.mean, values)
+        distances, neighbours = self.tree.query((values - self.mean) / self.scale, k=self.n_neighbours)
+        weights = 1.0 / np.maximum(distances, _DISTANCE_FLOOR)
+        n_classes = len(self.classes)
+        slots = np.arange(len(values))[:, None] * n_classes + self.codes[neighbours]
+        votes = np.bincount(slots.ravel(), weights=weights.ravel(), minlength=len(values) * n_classes)
+        votes = votes.reshape(len(values), n_classes)
+        return votes / votes.sum(axis=1, keepdims=True)
+
+    @staticmethod
+    def query_values(features: Dict) -> np.ndarray:
+        """Query row for a feature dict; missing values are NaN"""
+        return np.array([features.get(name, np.nan) for name in NEIGHBOUR_FEATURES], dtype=float)
@@ -0,0 +1,86 @@
+import numpy as np
+from typing import Dict, Optional
+
+# Orders /predict can rank recommendations in
+RANKING_MODES = ('suitability', 'pareto')
+# Ranking objectives of a recommendation; risk is minimised, the others maximised
+OBJECTIVES = ('suitability', 'profit', 'sustainability', 'risk')
+MAXIMISE = np.array([True, True, True, False])
+DEFAULT_WEIGHTS = {'suitability': 0.4, 'profit': 0.3, 'sustainability': 0.2, 'risk': 0.1}
+# Candidates compared against the front per step of the front search
+FRONT_BLOCK = 256
+
+def validate_weights(weights: Optional[Dict[str, float]]) -> Dict[str, float]:
+    """Weights over OBJECTIVES (missing ones count 0), or the defaults when none are given; ValueError otherwise"""
+    if not weights:
+        return dict(DEFAULT_WEIGHTS)
+    unknown = set(weights) - set(OBJECTIVES)
+    if unknown:
+        raise ValueError(f"Unknown objectives {sorted(unknown)}, expected {', '.join(OBJECTIVES)}")
+    if any(w < 0 for w in weights.values()) or not sum(weights.values()) > 0:
+        raise ValueError("Weights must be non-negative and not all zero")
+    return {name: float(weights.get(name, 0.0)) for name in OBJECTIVES}
+
+def normalise(objectives: np.ndarray) -> np.ndarray:
+    """(n, objectives) values mapped to [0, 1] per objective, 1 best (risk flipped)"""
+    values = np.where(MAXIMISE, objectives, -objectives)
+    low, high = values.min(axis=0), values.max(axis=0)
+    span = np.where(high > low, high - low, 1.0)
+    return (values - low) / span
+
+def _dominated(rows: np.ndarray, others: np.ndarray) -> np.ndarray:
+    """Mask of `rows` dominated by any of `others`"""
+    # One (rows, others) comparison per objective; reducing over a short last axis is slow
+    at_least = np.ones((len(rows), len(others)), dtype=bool)
+    better = np.zeros_like(at_least)
+    for k in range(rows.shape[1]):
+        at_least &= others[:, k] >= rows[:, k, None]
+        better |= others[:, k] > rows[:, k, None]
+    return (at_least & better).any(axis=1)
+
+def pareto_front(values: np.ndarray, block: int = FRONT_BLOCK) -> np.ndarray:
+    """
+    Mask of the non-dominated rows of `values` (all objectives maximised).
+
+    A row can only be dominated by a row with a larger sum, so rows are
+    visited in order of decreasing sum, a block at a time: each block is
+    checked against the front found so far and its survivors against each
+    other, which keeps the work near (rows x front size) comparisons, all
+    vectorized.
+    """
+    n, m = values.shape
+    order = np.argsort(-values.sum(axis=1), kind='stable')
+    ordered = values[order]
+    keep = np.zeros(n, dtype=bool)
+    front = np.empty((0, m))
+    for start in range(0, n, block):
+        # Rows the front already dominates need no comparison among themselves
+        survivors = start + np.flatnonzero(~_dominated(ordered[start:start + block], front))
+        chunk = ordered[survivors]
+        survivors = survivors[~_dominated(chunk, chunk)]
+        keep[survivors] = True
+        front = np.concatenate([front, ordered[survivors]])
+    mask = np.zeros(n, dtype=bool)
+    mask[order[keep]] = True
+    return mask
+
+def pareto_ranks(values: np.ndarray, min_ranked: Optional[int] = None) -> np.ndarray:
+    """
+    Non-domination rank of every row (0 for the Pareto front, 1 for the
+    front once that is removed, ...). With `min_ranked`, peeling stops once
+    that many rows are ranked and the rest are left at -1.
+    """
+    ranks = np.full(len(values), -1)
+    remaining = np.arange(len(values))
+    rank = 0
+    while remaining.size and (min_ranked is None or (ranks >= 0).sum() < min_ranked):
+        front = pareto_front(values[remaining])
+        ranks[remaining[front]] = rank
+        remaining = remaining[~front]
+        rank += 1
+    return ranks
+
+def weighted_scores(values: np.ndarray, weights: Dict[str, float]) -> np.ndarray:
+    """Scalarized score in [0, 1] of normalised objective rows"""
+    w = np.array([weights[name] for name in OBJECTIVES])
+    return values @ (w / w.sum())
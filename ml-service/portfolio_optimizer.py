@@ -0,0 +1,172 @@
+import numpy as np
+from scipy import sparse
+from scipy.optimize import linprog
+from typing import Dict, List, Optional
+from crop_predictor import CropPredictor
+
+ACRES_PER_HA = 2.471
+# Upper ends of the frontend's budget categories (INR per acre), as INR per hectare; high is open-ended
+BUDGET_PER_HA = {'low': 20000 * ACRES_PER_HA, 'medium': 40000 * ACRES_PER_HA, 'high': None}
+# Seasonal crop water need (mm) of the catalog's water requirement classes
+WATER_MM = {'Low': 450.0, 'Medium': 650.0, 'High': 1200.0, 'Very High': 1800.0}
+
+DEFAULT_CANDIDATES = 8
+MAX_CANDIDATES = 50
+DEFAULT_MAX_SHARE = 0.5
+DEFAULT_RISK_AVERSION = 0.5
+MAX_BATCH_FARMS = 1000
+
+class PortfolioOptimizer:
+    """
+    Allocation of a farm's area across its best candidate crops as a linear
+    program: maximise risk-adjusted profit, each hectare of crop c earning
+    profit_c * (1 - risk_aversion * risk_c), subject to
+
+        sum(x) <= area                               (land; the rest stays fallow)
+        sum(cost_c * x_c) <= budget                   (budget category or explicit budget)
+        sum(water_c * x_c) <= water_available * area  (when a water limit is given)
+        x_c <= max_share * area                       (diversification)
+
+    Per-hectare yield, profit and cultivation cost come from the rule
+    model, risk from the climate risk simulator's loss probability when
+    there is one (the suitability risk level otherwise). Farms solved
+    together form one block-diagonal program solved by HiGHS in one call.
+    """
+
+    def __init__(self, predictor: CropPredictor, risk_simulator=None):
+        self.predictor = predictor
+        self.risk_simulator = risk_simulator
+
+    def candidates(self, features: Dict, n_candidates: int = DEFAULT_CANDIDATES,
+                   market_snapshot: Optional[Dict] = None) -> Dict[str, np.ndarray]:
+        """Per-hectare economics, water need and risk of the farm's top candidates"""
+        predictor = self.predictor
+        scores = predictor.score(features, top_k=n_candidates, market_snapshot=market_snapshot).scores
+        idx = scores.idx
+        yields = predictor._predict_yields(scores)
+        prices = predictor.price_table.prices(market_snapshot)
+        revenue = yields * prices[idx] / 100
+        if self.risk_simulator is not None and idx.size:
+            risk = self.risk_simulator.loss_probabilities(features, idx, market_snapshot=market_snapshot)
+        else:
+            # Same thresholds as CropPredictor.get_risk_level
+            risk = np.where(scores.suitability > 0.8, 0.0, np.where(scores.suitability > 0.6, 0.5, 1.0))
+        return {
+            'idx': idx,
+            'suitability': scores.suitability,
+            'yield': yields,
+            'profit': predictor._calculate_profits(idx, yields, 1.0, prices).astype(float),
+            'cost': revenue * predictor._cost_factor[idx],
+            'water': np.array([WATER_MM.get(predictor.catalog.water_req[i], WATER_MM['Very High']) for i in idx]),
+            'risk': risk,
+        }
+
+    def allocate(self, farms: List[Dict]) -> List[Dict]:
+        """
+        Allocations for many farms. Each farm is a dict with 'features' and
+        optionally 'market_snapshot', 'candidates', 'max_share',
+        'risk_aversion', 'water_available_mm' and 'budget_inr'. Invalid
+        parameters raise ValueError; a farm whose program cannot be solved
+        gets an {'error': ...} entry instead of an allocation.
+        """
+        problems = [self._problem(farm) for farm in farms]
+        solved = [p for p in problems if p['c'].size]
+        if solved and not self._solve(solved) and len(solved) > 1:
+            # Some block failed; solve the farms one by one to tell which
+            for p in solved:
+                self._solve([p])
+        return [{'error': p['error']} if 'error' in p else self._answer(p) for p in problems]
+
+    @staticmethod
+    def _solve(problems: List[Dict]) -> bool:
+        """Solve `problems` as one block-diagonal program, storing each farm's areas (or error)"""
+        result = linprog(
+            np.concatenate([p['c'] for p in problems]),
+            A_ub=sparse.block_diag([p['A'] for p in problems], format='csr'),
+            b_ub=np.concatenate([p['b'] for p in problems]),
+            bounds=np.vstack([p['bounds'] for p in problems]),
+            method='highs',
+        )
+        if result.status != 0:
+            for p in problems:
+                p['error'] = f"Allocation failed: {result.message}"
+            return False
+        offsets = np.cumsum([0] + [p['c'].size for p in problems])
+        for p, start, end in zip(problems, offsets[:-1], offsets[1:]):
+            p['x'] = result.x[start:end]
+            p.pop('error', None)
+        return True
+
+    def _problem(self, farm: Dict) -> Dict:
+        features = farm['features']
+        area = float(features.get('area_ha') or 1.0)
+        max_share = farm.get('max_share', DEFAULT_MAX_SHARE)
+        risk_aversion = farm.get('risk_aversion', DEFAULT_RISK_AVERSION)
+        n_candidates = farm.get('candidates', DEFAULT_CANDIDATES)
+        if not 0 < max_share <= 1 or not 0 <= risk_aversion <= 1 or not area > 0 or not 1 <= n_candidates <= MAX_CANDIDATES:
+            raise ValueError(f"area_ha must be positive, max_share in (0, 1], risk_aversion in [0, 1] "
+                             f"and candidates 1-{MAX_CANDIDATES}")
+        for limit in ('budget_inr', 'water_available_mm'):
+            if farm.get(limit) is not None and not 0 <= farm[limit] < np.inf:
+                raise ValueError(f"{limit} must be a non-negative number")
+        crops = self.candidates(features, n_candidates, farm.get('market_snapshot'))
+
+        budget = farm.get('budget_inr')
+        if budget is None:
+            per_ha = BUDGET_PER_HA.get(str(features.get('budget_category', 'medium')).lower())
+            budget = per_ha * area if per_ha is not None else None
+        rows = [np.ones_like(crops['cost'])]
+        limits = [area]
+        if budget is not None:
+            rows.append(crops['cost'])
+            limits.append(budget)
+        if farm.get('water_available_mm') is not None:
+            rows.append(crops['water'])
+            limits.append(farm['water_available_mm'] * area)
+
+        adjusted = crops['profit'] * (1 - risk_aversion * crops['risk'])
+        return {
+            'area': area, 'budget': budget, 'crops': crops, 'adjusted': adjusted,
+            # linprog minimises; crops that would lose money are never worth planting
+            'c': -np.maximum(adjusted, 0.0),
+            'A': sparse.csr_matrix(np.vstack(rows)) if crops['idx'].size else None,
+            'b': np.array(limits),
+            'bounds': np.column_stack([np.zeros(crops['idx'].size), np.full(crops['idx'].size, max_share * area)]),
+            'x': np.zeros(crops['idx'].size),
+        }
+
+    def _answer(self, problem: Dict) -> Dict:
+        catalog = self.predictor.catalog
+        crops, area = problem['crops'], problem['area']
+        # Reported to 0.01 ha, rounding down so no constraint is exceeded (and solver crumbs vanish)
+        x = np.floor(problem['x'] * 100 + 1e-6) / 100
+        allocations = []
+        for c in np.flatnonzero(x > 0):
+            i = crops['idx'][c]
+            allocation = {
+                'crop': catalog.crops[i],
+                'area_ha': float(x[c]),
+                'share': round(float(x[c] / area), 3),
+                'suitability': round(float(crops['suitability'][c]), 3),
+                'predicted_yield_kg_per_ha': int(crops['yield'][c]),
+                'profit_per_ha_inr': int(crops['profit'][c]),
+                'cost_per_ha_inr': int(crops['cost'][c]),
+                'water_mm': float(crops['water'][c]),
+                'risk': round(float(crops['risk'][c]), 4),
+            }
+            if catalog.varieties[i]:
+                allocation['variety'] = catalog.varieties[i]
+            allocations.append(allocation)
+        allocations.sort(key=lambda a: a['area_ha'], reverse=True)
+        allocated = float(x.sum())
+        return {
+            'area_ha': area,
+            'allocated_ha': round(allocated, 2),
+            'fallow_ha': round(max(area - allocated, 0.0), 2),
+            'expected_profit_inr': int(x @ crops['profit']),
+            'risk_adjusted_profit_inr': int(x @ problem['adjusted']),
+            'cultivation_cost_inr': int(x @ crops['cost']),
+            'budget_inr': int(problem['budget']) if problem['budget'] is not None else None,
+            'water_use_mm': round(float(x @ crops['water'] / area), 1),
+            'allocations': allocations,
+        }
@@ -0,0 +1,242 @@
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+
+DEFAULT_PROFILE_DIR = os.environ.get("ML_PROFILE_DIR", "profiles")
+DEFAULT_INTERVAL_SECONDS = 0.005
+MAX_WINDOW_SECONDS = 300
+# Saved profiles kept on disk; older ones are deleted when new ones are saved
+MAX_KEPT_PROFILES = 500
+PROFILE_HEADER = "x-profile"
+# Executor threads that run request work off the event loop (engines.py)
+WORKER_THREAD_PREFIXES = ("engine", "shadow-engine")
+
+_PROFILE_NAME = re.compile(r'^[\w.-]+\.collapsed$')
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})".replace(';', ':')
+
+def _waiting_for_work(frame) -> bool:
+    """An idle executor thread blocks in its worker loop with no Python frame above it"""
+    code = frame.f_code
+    return code.co_name == '_worker' and code.co_filename.endswith(os.path.join('concurrent', 'futures', 'thread.py'))
+
+class SamplingProfiler:
+    """
+    Samples the stack of one thread from a background thread at a fixed
+    interval and aggregates the samples as collapsed stacks
+    ("root;caller;callee count" lines, the input format of flamegraph.pl
+    and speedscope). Busy threads whose name starts with one of
+    `thread_prefixes` (the engine executors) are sampled too, under a root
+    frame naming their pool, since the event loop only awaits their work.
+    Nothing runs while it is stopped.
+    """
+
+    def __init__(self, thread_id: int, interval: float = DEFAULT_INTERVAL_SECONDS,
+                 thread_prefixes=WORKER_THREAD_PREFIXES):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.thread_prefixes = tuple(thread_prefixes)
+        self.stacks = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self, duration: Optional[float] = None) -> "SamplingProfiler":
+        self._deadline = time.monotonic() + duration if duration else None
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "SamplingProfiler":
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            if self._deadline is not None and time.monotonic() >= self._deadline:
+                break
+            frames = sys._current_frames()
+            sampled = False
+            for frame, pool in self._sampled_frames(frames):
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if pool:
+                    stack.append(pool)
+                self.stacks[';'.join(reversed(stack))] += 1
+                sampled = True
+            if sampled:
+                self.samples += 1
+
+    def _sampled_frames(self, frames: Dict):
+        """(innermost frame, pool label or None) of every thread to record in this sample"""
+        frame = frames.get(self.thread_id)
+        if frame is not None:
+            yield frame, None
+        if not self.thread_prefixes:
+            return
+        for thread in threading.enumerate():
+            if thread.ident == self.thread_id or not thread.name.startswith(self.thread_prefixes):
+                continue
+            frame = frames.get(thread.ident)
+            if frame is not None and not _waiting_for_work(frame):
+                yield frame, thread.name.rsplit('_', 1)[0]
+
+    def collapsed(self) -> str:
+        return ''.join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+class ProfileController:
+    """
+    Decides which requests are profiled and stores the results.
+
+    Profiling is off until armed by the admin API: either a time window
+    (one profile of everything the event loop and engine threads ran) or a sampled fraction
+    of requests for a while, one profile each. Requests carrying an
+    `X-Profile: 1` header are profiled only when header profiling is
+    allowed (ML_PROFILE_ALLOW_HEADER=1). When nothing is armed the
+    middleware only reads the `armed` flag.
+    """
+
+    def __init__(self, output_dir: str = DEFAULT_PROFILE_DIR, allow_header: Optional[bool] = None,
+                 max_kept: int = MAX_KEPT_PROFILES):
+        self.output_dir = output_dir
+        self.max_kept = max_kept
+        if allow_header is None:
+            allow_header = os.environ.get("ML_PROFILE_ALLOW_HEADER") == "1"
+        self.allow_header = allow_header
+        self.fraction = 0.0
+        self.interval = DEFAULT_INTERVAL_SECONDS
+        self.sample_until = 0.0
+        self.window = None
+        self._lock = threading.Lock()
+        self._refresh()
+
+    def _refresh(self):
+        self.armed = self.allow_header or self.fraction > 0
+
+    def sample_requests(self, fraction: float, duration: float, interval: float = DEFAULT_INTERVAL_SECONDS):
+        """Profile `fraction` of requests for the next `duration` seconds"""
+        self.interval = interval
+        self.sample_until = time.monotonic() + duration
+        self.fraction = fraction
+        self._refresh()
+
+    def start_window(self, thread_id: int, duration: float, interval: float = DEFAULT_INTERVAL_SECONDS) -> str:
+        """Sample `thread_id` for `duration` seconds and save one profile at the end"""
+        with self._lock:
+            if self.window is not None:
+                raise RuntimeError("A profiling window is already running")
+            profiler = SamplingProfiler(thread_id, interval)
+            self.window = profiler
+        name = self._profile_name("window")
+        profiler.start(duration)
+
+        def finish():
+            profiler._thread.join()
+            self.save(profiler, name)
+            with self._lock:
+                self.window = None
+
+        threading.Thread(target=finish, name="profile-window", daemon=True).start()
+        return name
+
+    def disable(self):
+        self.fraction = 0.0
+        self.sample_until = 0.0
+        if self.window is not None:
+            self.window.stop()
+        self._refresh()
+
+    def should_profile(self, headers: List) -> bool:
+        if self.fraction > 0:
+            if time.monotonic() >= self.sample_until:
+                self.fraction = 0.0
+                self._refresh()
+            elif random.random() < self.fraction:
+                return True
+        if self.allow_header:
+            return (PROFILE_HEADER.encode(), b"1") in headers
+        return False
+
+    def _profile_name(self, label: str) -> str:
+        label = re.sub(r'[^\w.-]+', '_', label).strip('_') or 'request'
+        return f"{datetime.now().strftime('%Y%m%d-%H%M%S-%f')}-{label}.collapsed"
+
+    def save(self, profiler: SamplingProfiler, name: str) -> str:
+        os.makedirs(self.output_dir, exist_ok=True)
+        path = os.path.join(self.output_dir, name)
+        with open(path, "w") as f:
+            f.write(profiler.collapsed())
+        self._prune()
+        return path
+
+    def _prune(self):
+        """Delete the oldest saved profiles beyond `max_kept` (names start with their timestamp)"""
+        names = sorted(name for name in os.listdir(self.output_dir) if _PROFILE_NAME.match(name))
+        for name in names[:max(0, len(names) - self.max_kept)]:
+            try:
+                os.remove(os.path.join(self.output_dir, name))
+            except FileNotFoundError:
+                pass
+
+    def save_request(self, profiler: SamplingProfiler, path: str) -> str:
+        name = self._profile_name(path)
+        self.save(profiler, name)
+        return name
+
+    def list_profiles(self) -> List[Dict]:
+        if not os.path.isdir(self.output_dir):
+            return []
+        profiles = []
+        for name in sorted(os.listdir(self.output_dir), reverse=True):
+            if _PROFILE_NAME.match(name):
+                stat = os.stat(os.path.join(self.output_dir, name))
+                profiles.append({'name': name, 'bytes': stat.st_size, 'created': stat.st_mtime})
+        return profiles
+
+    def profile_path(self, name: str) -> Optional[str]:
+        """Path of a saved profile, or None for unknown or unsafe names"""
+        if not _PROFILE_NAME.match(name):
+            return None
+        path = os.path.join(self.output_dir, name)
+        return path if os.path.isfile(path) else None
+
+    def status(self) -> Dict:
+        return {
+            'armed': self.armed,
+            'header_profiling': self.allow_header,
+            'sample_fraction': self.fraction,
+            'sampling_seconds_left': max(0.0, round(self.sample_until - time.monotonic(), 1)) if self.fraction else 0.0,
+            'window_running': self.window is not None,
+            'output_dir': os.path.abspath(self.output_dir),
+        }
+
+class ProfilingMiddleware:
+    """ASGI middleware that samples the event loop and engine threads while a chosen request runs"""
+
+    def __init__(self, app, controller: ProfileController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if (not self.controller.armed or scope["type"] != "http" or scope["path"].startswith("/admin")
+                or not self.controller.should_profile(scope["headers"])):
+            return await self.app(scope, receive, send)
+
+        profiler = SamplingProfiler(threading.get_ident(), self.controller.interval).start()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            profiler.stop()
+            self.controller.save_request(profiler, scope["path"])
@@ -0,0 +1,290 @@
+import argparse
+import json
+import logging
+import os
+import struct
+import time
+import numpy as np
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import BaseModel
+from typing import Callable, Dict, List, Optional, Tuple
+from crop_catalog import YEAR_ROUND
+from crop_predictor import CropPredictor, top_k_indices
+from rotation_planner import DEFAULT_SEASONS
+
+logger = logging.getLogger(__name__)
+
+REGION_TILES_PATH = "models/region_tiles.bin"
+
+# Service area: mainland India
+LAT_RANGE = (6.0, 37.0)
+LON_RANGE = (68.0, 98.0)
+DEFAULT_STEP_DEG = 0.25
+# Cells per tile side; a tile's cells are stored together so a map view reads few pages
+TILE_CELLS = 16
+# Suitability is stored as a byte, 0..SCORE_SCALE
+SCORE_SCALE = 255
+
+MAGIC = b"CRTL"
+VERSION = 1
+_HEADER = struct.Struct("<4sHI")  # magic, version, metadata bytes
+_DATA_ALIGNMENT = 64
+
+LOOKUP_METHODS = ('nearest', 'bilinear')
+MAX_BATCH_POINTS = 10000
+
+# Typical soil profiles (same values as the frontend's soil defaults)
+SOIL_DEFAULTS = {
+    'Sandy': {'ph': 6.2, 'N': 180, 'P': 12, 'K': 110, 'organic_carbon': 0.4},
+    'Loamy': {'ph': 6.8, 'N': 280, 'P': 22, 'K': 180, 'organic_carbon': 0.8},
+    'Clayey': {'ph': 7.1, 'N': 320, 'P': 28, 'K': 220, 'organic_carbon': 1.0},
+    'Silty': {'ph': 6.6, 'N': 240, 'P': 18, 'K': 160, 'organic_carbon': 0.7},
+    'Peaty': {'ph': 5.8, 'N': 450, 'P': 35, 'K': 140, 'organic_carbon': 2.2},
+    'Black': {'ph': 7.8, 'N': 380, 'P': 25, 'K': 420, 'organic_carbon': 1.2},
+    'Red': {'ph': 6.4, 'N': 200, 'P': 15, 'K': 120, 'organic_carbon': 0.5},
+    'Alluvial': {'ph': 7.2, 'N': 350, 'P': 30, 'K': 280, 'organic_carbon': 1.1},
+}
+
+def default_soil_types(lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+    """Coarse soil zones: Thar sands, Indo-Gangetic alluvium, Deccan black soils, peninsular red soils"""
+    soil = np.full(lat.shape, 'Loamy', dtype=object)
+    soil[(lat >= 8) & (lat < 24) & (lon >= 76)] = 'Red'
+    soil[(lat >= 15) & (lat < 24) & (lon >= 73) & (lon < 80)] = 'Black'
+    soil[(lat >= 24) & (lat < 31) & (lon >= 74) & (lon < 89)] = 'Alluvial'
+    soil[(lat >= 24) & (lat < 30) & (lon < 74)] = 'Sandy'
+    return soil
+
+def default_climate_normals(lat: np.ndarray, lon: np.ndarray, season: str) -> Dict[str, np.ndarray]:
+    """
+    Approximate seasonal normals (temperature °C, humidity %, rainfall mm)
+    from latitude and longitude: cooler to the north, a wet monsoon west
+    coast and north-east, a dry north-west and a wet Rabi season in the
+    south-east. A placeholder for gridded normals passed as `climate`.
+    """
+    if season == 'Kharif':
+        temperature = 31.0 - 0.2 * (lat - 8)
+        rainfall = 150 + 100 * (lon >= 85) + 100 * ((lon < 76) & (lat < 20)) - 110 * ((lon < 75) & (lat >= 23))
+        humidity = 80 - 0.6 * (lat - 8) - 15 * ((lon < 75) & (lat >= 23))
+    else:
+        temperature = 26.0 - 0.45 * (lat - 8)
+        rainfall = 30 + 50 * ((lat < 14) & (lon >= 78)) - 15 * ((lon < 75) & (lat >= 23))
+        humidity = 65 - 0.5 * (lat - 8)
+    return {'temperature': temperature, 'humidity': humidity, 'rainfall': np.maximum(rainfall, 5.0)}
+
+class RegionGrid:
+    """Regular lat/lon grid; cell (i, j) is centred on (lat0 + i * step, lon0 + j * step)"""
+
+    def __init__(self, lat0: float, lon0: float, step: float, n_lat: int, n_lon: int):
+        self.lat0 = lat0
+        self.lon0 = lon0
+        self.step = step
+        self.n_lat = n_lat
+        self.n_lon = n_lon
+
+    @classmethod
+    def covering(cls, lat_range=LAT_RANGE, lon_range=LON_RANGE, step: float = DEFAULT_STEP_DEG) -> "RegionGrid":
+        n_lat = int(round((lat_range[1] - lat_range[0]) / step)) + 1
+        n_lon = int(round((lon_range[1] - lon_range[0]) / step)) + 1
+        return cls(lat_range[0], lon_range[0], step, n_lat, n_lon)
+
+    def centres(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(n_lat, n_lon) arrays of cell centre latitudes and longitudes"""
+        lats = self.lat0 + self.step * np.arange(self.n_lat)
+        lons = self.lon0 + self.step * np.arange(self.n_lon)
+        return np.meshgrid(lats, lons, indexing='ij')
+
+    def position(self, lat: np.ndarray, lon: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Fractional cell coordinates; ValueError outside the grid"""
+        i = (np.asarray(lat, dtype=float) - self.lat0) / self.step
+        j = (np.asarray(lon, dtype=float) - self.lon0) / self.step
+        half = 0.5
+        outside = (i < -half) | (i > self.n_lat - 1 + half) | (j < -half) | (j > self.n_lon - 1 + half)
+        if np.any(outside) or np.any(np.isnan(i)) or np.any(np.isnan(j)):
+            raise ValueError("Location outside the precomputed region grid")
+        return np.clip(i, 0, self.n_lat - 1), np.clip(j, 0, self.n_lon - 1)
+
+def build_region_scores(predictor: CropPredictor, grid: RegionGrid, seasons=DEFAULT_SEASONS,
+                        climate: Callable[..., Dict[str, np.ndarray]] = default_climate_normals,
+                        soils: Callable[..., np.ndarray] = default_soil_types) -> np.ndarray:
+    """
+    (seasons, n_lat, n_lon, catalog entries) suitability of every entry in
+    every cell. The cells of one soil type are scored in one pass as
+    (cells, 1) feature columns; entries that cannot be sown in a season score 0.
+    """
+    catalog = predictor.catalog
+    lat, lon = grid.centres()
+    soil = soils(lat, lon)
+    idx = np.arange(len(catalog))
+    scores = np.zeros((len(seasons), grid.n_lat, grid.n_lon, len(catalog)))
+    for s, season in enumerate(seasons):
+        normals = climate(lat, lon, season)
+        sown = np.array([season in entry['seasons'] or YEAR_ROUND in entry['seasons'] for entry in catalog.entries])
+        for soil_type in np.unique(soil):
+            cells = soil == soil_type
+            features = {**SOIL_DEFAULTS.get(soil_type, SOIL_DEFAULTS['Loamy']), 'soil_type': soil_type,
+                        'area_ha': 1.0, 'experience_years': 5}
+            for name, values in normals.items():
+                features[name] = np.broadcast_to(values, lat.shape)[cells][:, None]
+            factors = predictor.score_factors(features, idx=idx)
+            scores[s][cells] = np.where(sown, factors.suitability, 0.0)
+    return scores
+
+def write_region_tiles(path: str, scores: np.ndarray, grid: RegionGrid, crops: List[str],
+                       seasons=DEFAULT_SEASONS, tile: int = TILE_CELLS):
+    """
+    Header, JSON metadata, then bytes laid out as (season, tile row, tile
+    column, cell row, cell column, crop), padded to whole tiles.
+    """
+    n_seasons, n_lat, n_lon, n_crops = scores.shape
+    tiles_lat, tiles_lon = -(-n_lat // tile), -(-n_lon // tile)
+    padded = np.zeros((n_seasons, tiles_lat * tile, tiles_lon * tile, n_crops), dtype=np.uint8)
+    padded[:, :n_lat, :n_lon] = np.round(np.clip(scores, 0, 1) * SCORE_SCALE)
+    tiled = padded.reshape(n_seasons, tiles_lat, tile, tiles_lon, tile, n_crops).transpose(0, 1, 3, 2, 4, 5)
+
+    metadata = json.dumps({
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'lat0': grid.lat0, 'lon0': grid.lon0, 'step': grid.step, 'n_lat': n_lat, 'n_lon': n_lon,
+        'tile': tile, 'seasons': list(seasons), 'crops': list(crops), 'scale': SCORE_SCALE,
+    }).encode()
+    offset = _HEADER.size + len(metadata)
+    padding = -offset % _DATA_ALIGNMENT
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(metadata) + padding))
+        f.write(metadata + b" " * padding)
+        f.write(np.ascontiguousarray(tiled).tobytes())
+
+class RegionTiles:
+    """
+    Read-only, memory-mapped precomputed suitability tiles. Lookups touch at
+    most four cells whatever the grid size; batches are one fancy index.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            magic, version, metadata_size = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} region tile file")
+            metadata = json.loads(f.read(metadata_size))
+        self.path = path
+        self.metadata = metadata
+        self.grid = RegionGrid(metadata['lat0'], metadata['lon0'], metadata['step'],
+                               metadata['n_lat'], metadata['n_lon'])
+        self.tile = metadata['tile']
+        self.seasons = metadata['seasons']
+        self.crops = metadata['crops']
+        self.scale = metadata['scale']
+        tiles_lat = -(-self.grid.n_lat // self.tile)
+        tiles_lon = -(-self.grid.n_lon // self.tile)
+        self.data = np.memmap(path, dtype=np.uint8, mode='r', offset=_HEADER.size + metadata_size,
+                              shape=(len(self.seasons), tiles_lat, tiles_lon, self.tile, self.tile, len(self.crops)))
+        # Plain ndarray view of the mapping: indexing a memmap subclass is several times slower
+        self.data = self.data.view(np.ndarray)
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> Optional["RegionTiles"]:
+        """Tiles written by `python region_tiles.py` (ML_REGION_TILES); None when the file does not exist"""
+        path = path or os.environ.get("ML_REGION_TILES", REGION_TILES_PATH)
+        if not os.path.exists(path):
+            logger.info(f"No region tiles at {path}, region lookups disabled")
+            return None
+        return cls(path)
+
+    def _cells(self, season: int, i: np.ndarray, j: np.ndarray) -> np.ndarray:
+        """(points, crops) scores of integer cells"""
+        t = self.tile
+        return self.data[season, i // t, j // t, i % t, j % t].astype(float) / self.scale
+
+    def lookup(self, lat, lon, season: Optional[str] = None, method: str = 'nearest') -> np.ndarray:
+        """(points, crops) suitability at the given locations"""
+        if method not in LOOKUP_METHODS:
+            raise ValueError(f"method must be one of {', '.join(LOOKUP_METHODS)}")
+        season = season or self.seasons[0]
+        if season not in self.seasons:
+            raise ValueError(f"season must be one of {', '.join(self.seasons)}")
+        s = self.seasons.index(season)
+        fi, fj = self.grid.position(np.atleast_1d(lat), np.atleast_1d(lon))
+        if method == 'nearest':
+            return self._cells(s, np.rint(fi).astype(np.intp), np.rint(fj).astype(np.intp))
+
+        i0, j0 = np.floor(fi).astype(np.intp), np.floor(fj).astype(np.intp)
+        i1, j1 = np.minimum(i0 + 1, self.grid.n_lat - 1), np.minimum(j0 + 1, self.grid.n_lon - 1)
+        wi, wj = fi - i0, fj - j0
+        # The four corner cells of every point in one gather
+        corners = self._cells(s, np.concatenate([i0, i0, i1, i1]), np.concatenate([j0, j1, j0, j1]))
+        weights = np.concatenate([(1 - wi) * (1 - wj), (1 - wi) * wj, wi * (1 - wj), wi * wj])[:, None]
+        return (corners * weights).reshape(4, len(fi), -1).sum(axis=0)
+
+    def top_crops(self, scores: np.ndarray, top_k: int = 3) -> List[Dict]:
+        if not 1 <= top_k <= len(self.crops):
+            raise ValueError(f"top_k must be between 1 and {len(self.crops)}")
+        order = top_k_indices(scores, top_k)
+        return [{'crop': self.crops[c], 'suitability': round(float(scores[c]), 3)} for c in order if scores[c] > 0]
+
+def region_suitability(score: float) -> str:
+    """Coarse label of a location's best suitability, as in /predict's location_analysis"""
+    return "Good" if score > 0.7 else "Moderate"
+
+router = APIRouter(prefix="/region")
+
+class RegionPoint(BaseModel):
+    lat: float
+    lon: float
+
+class RegionBatchRequest(BaseModel):
+    points: List[RegionPoint]
+    season: Optional[str] = None
+    method: str = 'nearest'
+    top_k: int = 3
+
+def _tiles(request: Request) -> RegionTiles:
+    tiles = request.app.state.region_tiles
+    if tiles is None:
+        raise HTTPException(status_code=503, detail="Region tiles are not available")
+    return tiles
+
+def _region_answers(tiles: RegionTiles, lats, lons, season, method, top_k) -> List[Dict]:
+    try:
+        scores = tiles.lookup(lats, lons, season, method)
+        answers = []
+        for lat, lon, row in zip(lats, lons, scores):
+            best = float(row.max())
+            answers.append({'lat': lat, 'lon': lon, 'region_suitability': region_suitability(best),
+                            'best_suitability': round(best, 3), 'recommendations': tiles.top_crops(row, top_k)})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return answers
+
+@router.get("/suitability")
+async def region_lookup(request: Request, lat: float, lon: float, season: Optional[str] = None,
+                        method: str = 'nearest', top_k: int = 3):
+    """Precomputed best crops for the grid cell(s) around a location, without running a prediction"""
+    tiles = _tiles(request)
+    answer = _region_answers(tiles, [lat], [lon], season, method, top_k)[0]
+    return {**answer, 'season': season or tiles.seasons[0], 'method': method,
+            'grid_step_deg': tiles.grid.step, 'tiles_created': tiles.metadata.get('created')}
+
+@router.post("/suitability")
+async def region_lookup_batch(batch: RegionBatchRequest, request: Request):
+    """Region answers for many map points in one vectorized lookup"""
+    tiles = _tiles(request)
+    if len(batch.points) > MAX_BATCH_POINTS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_POINTS} points per request")
+    lats = [p.lat for p in batch.points]
+    lons = [p.lon for p in batch.points]
+    return {'season': batch.season or tiles.seasons[0], 'method': batch.method,
+            'results': _region_answers(tiles, lats, lons, batch.season, batch.method, batch.top_k)}
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Precompute regional crop suitability tiles")
+    parser.add_argument("--output", default=REGION_TILES_PATH)
+    parser.add_argument("--step", type=float, default=DEFAULT_STEP_DEG, help="Grid spacing in degrees")
+    args = parser.parse_args()
+
+    predictor = CropPredictor()
+    grid = RegionGrid.covering(step=args.step)
+    start = time.perf_counter()
+    scores = build_region_scores(predictor, grid)
+    write_region_tiles(args.output, scores, grid, predictor.catalog.names)
+    logger.info(f"Wrote {grid.n_lat} x {grid.n_lon} cells x {len(DEFAULT_SEASONS)} seasons to {args.output} "
+                f"({os.path.getsize(args.output) / 2 ** 20:.1f} MB, {time.perf_counter() - start:.1f}s)")
@@ -0,0 +1,181 @@
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from crop_catalog import YEAR_ROUND
+from crop_predictor import CropPredictor, MIN_SUITABILITY
+
+NUTRIENTS = ('N', 'P', 'K')
+
+# Soil nutrient levels (kg/ha) are rounded to this step so that different
+# sequences reaching similar soil share one DP state
+SOIL_STEP = {'N': 10.0, 'P': 5.0, 'K': 10.0}
+SOIL_MAX = {'N': 250.0, 'P': 150.0, 'K': 300.0}
+
+# Share of a crop's nutrient requirement removed from the soil by one harvest
+NUTRIENT_REMOVAL = 0.5
+# Nitrogen (kg/ha) left in the soil by a legume through fixation
+LEGUME_N_CREDIT = 40.0
+LEGUMES = {'Soybean', 'Groundnut', 'Chickpea', 'Pigeon Pea'}
+# Nutrients (kg/ha) restored between seasons by residues and mineralization
+SEASON_REPLENISHMENT = {'N': 10.0, 'P': 2.0, 'K': 5.0}
+# Yield multiplier for growing the same crop in consecutive seasons
+MONOCROP_FACTOR = 0.85
+
+FALLOW = 'Fallow'
+DEFAULT_SEASONS = ('Kharif', 'Rabi')
+# Longest plan a request may ask for
+MAX_YEARS = 10
+MAX_SEASONS = MAX_YEARS * len(DEFAULT_SEASONS)
+
+State = Tuple[float, float, float]
+
+def season_sequence(years: int, start: str = 'Kharif', seasons=DEFAULT_SEASONS) -> List[str]:
+    """Alternating season labels, e.g. Kharif, Rabi, Kharif, ... for `years` years"""
+    order = list(seasons)
+    offset = order.index(start)
+    return [order[(offset + i) % len(order)] for i in range(years * len(order))]
+
+def rotation_seasons(years: int = 3, start_season: str = 'Kharif', seasons: Optional[List[str]] = None) -> List[str]:
+    """
+    Seasons of a rotation request: `seasons` when given, otherwise `years`
+    alternating years from `start_season`. ValueError when out of bounds.
+    """
+    if seasons:
+        if len(seasons) > MAX_SEASONS:
+            raise ValueError(f"At most {MAX_SEASONS} seasons can be planned")
+        unknown = sorted(set(seasons) - set(DEFAULT_SEASONS))
+        if unknown:
+            raise ValueError(f"Unknown seasons {unknown}, expected {' or '.join(DEFAULT_SEASONS)}")
+        return list(seasons)
+    if not 1 <= years <= MAX_YEARS or start_season not in DEFAULT_SEASONS:
+        raise ValueError(f"years must be 1-{MAX_YEARS} and start_season {' or '.join(DEFAULT_SEASONS)}")
+    return season_sequence(years, start_season)
+
+class RotationPlanner:
+    """
+    Multi-season crop sequence planning by dynamic programming over
+    discretized soil states (N, P, K levels) and the previous crop.
+
+    Per-season crop scores depend only on the season and soil state, so
+    they are memoized and shared by every sequence reaching that state; the
+    search is O(seasons * states * crops) instead of crops ** seasons. It
+    runs as loops over the seasons (reachable states forward, best values
+    backward), so plan length is not bounded by the recursion limit.
+    """
+
+    def __init__(self, predictor: CropPredictor):
+        self.predictor = predictor
+        catalog = predictor.catalog
+        self._eligible = {}
+        self._removal = np.stack([getattr(catalog, f'{n}_min') for n in NUTRIENTS], axis=1) * NUTRIENT_REMOVAL
+        self._credit = np.zeros((len(catalog), len(NUTRIENTS)))
+        self._credit[[crop in LEGUMES for crop in catalog.crops], 0] = LEGUME_N_CREDIT
+        self._step = np.array([SOIL_STEP[n] for n in NUTRIENTS])
+        self._max = np.array([SOIL_MAX[n] for n in NUTRIENTS])
+        self._replenishment = np.array([SEASON_REPLENISHMENT[n] for n in NUTRIENTS])
+
+    def eligible(self, season: str) -> np.ndarray:
+        """Catalog positions of entries that can be sown in `season`"""
+        if season not in self._eligible:
+            requirements = self.predictor.crop_requirements
+            self._eligible[season] = np.array([
+                i for i, name in enumerate(self.predictor.catalog.names)
+                if season in requirements[name]['seasons'] or YEAR_ROUND in requirements[name]['seasons']
+            ], dtype=np.intp)
+        return self._eligible[season]
+
+    def discretize(self, levels: np.ndarray) -> List[State]:
+        """Soil states for an (n, NUTRIENTS) array of nutrient levels"""
+        levels = np.clip(np.round(levels / self._step) * self._step, 0, self._max)
+        return [tuple(row) for row in levels.tolist()]
+
+    def plan(self, features: Dict, seasons: List[str], previous_crops: Optional[List[str]] = None,
+             season_conditions: Optional[Dict[str, Dict]] = None,
+             market_snapshot: Optional[Dict] = None) -> Dict:
+        """Most profitable crop sequence for `seasons`, starting from the request's soil"""
+        catalog = self.predictor.catalog
+        season_conditions = season_conditions or {}
+        prices = self.predictor.price_table.prices(market_snapshot)
+        area = features.get('area_ha', 1)
+        scores = {}  # (season, state) -> (positions, suitability, yield, profit, next states)
+        best = {}    # (t, state, previous) -> (total profit from season t on, choice)
+
+        def season_scores(season: str, state: State):
+            key = (season, state)
+            if key not in scores:
+                idx = self.eligible(season)
+                season_features = {**features, **season_conditions.get(season, {}), **dict(zip(NUTRIENTS, state))}
+                factors = self.predictor.score_factors(season_features, idx=idx)
+                keep = factors.suitability > MIN_SUITABILITY
+                factors = factors.take(keep)
+                yields = self.predictor._predict_yields(factors)
+                profits = self.predictor._calculate_profits(factors.idx, yields, area, prices)
+                
+                # Soil after each crop (row 0: fallow), all crops in one array expression
+                levels = np.array(state) + self._replenishment
+                after = np.vstack([levels, levels - self._removal[factors.idx] + self._credit[factors.idx]])
+                scores[key] = (factors.idx.tolist(), factors.suitability, yields, profits.tolist(), self.discretize(after))
+            return scores[key]
+
+        def future(t: int, state: State, previous: Optional[int]) -> float:
+            return best[(t, state, previous)][0] if t < len(seasons) else 0.0
+
+        start = self.discretize(np.array([[features.get(n, 0) for n in NUTRIENTS]], dtype=float))[0]
+        previous = None
+        if previous_crops and previous_crops[-1] in catalog.names:
+            previous = catalog.index_of(previous_crops[-1])
+
+        # Forward: the (soil state, previous crop) pairs reachable at the start of each season
+        reachable = [[(start, previous)]]
+        for season in seasons[:-1]:
+            successors = {}
+            for state, _ in reachable[-1]:
+                idx, _, _, _, after = season_scores(season, state)
+                successors[(after[0], None)] = None
+                successors.update(dict.fromkeys(zip(after[1:], idx)))
+            reachable.append(list(successors))
+
+        # Backward: best total profit from each reachable pair to the end of the plan
+        for t in range(len(seasons) - 1, -1, -1):
+            for state, prior in reachable[t]:
+                idx, _, _, profits, after = season_scores(seasons[t], state)
+                
+                # Leaving the field fallow is always possible
+                choice = (None, after[0], 0.0)
+                value = future(t + 1, after[0], None)
+                for position, profit, soil in zip(idx, profits, after[1:]):
+                    if position == prior:
+                        profit = profit * MONOCROP_FACTOR
+                    total = profit + future(t + 1, soil, position)
+                    if total > value:
+                        value, choice = total, (position, soil, profit)
+                best[(t, state, prior)] = (value, choice)
+        total = future(0, start, previous)
+
+        # Walk the memoized choices forward to recover the plan
+        plan = []
+        state = start
+        for t, season in enumerate(seasons):
+            _, (position, after, profit) = best[(t, state, previous)]
+            entry = {'season': season, 'crop': FALLOW if position is None else catalog.crops[position]}
+            if position is not None:
+                idx, suitability, yields, _, _ = season_scores(season, state)
+                i = idx.index(position)
+                if catalog.varieties[position]:
+                    entry['variety'] = catalog.varieties[position]
+                entry.update({
+                    'suitability': round(float(suitability[i]), 3),
+                    'predicted_yield_kg_per_ha': int(yields[i] * (MONOCROP_FACTOR if position == previous else 1.0)),
+                    'estimated_profit_inr': int(profit),
+                })
+            else:
+                entry['estimated_profit_inr'] = 0
+            entry['soil_after'] = dict(zip(NUTRIENTS, after))
+            plan.append(entry)
+            state, previous = after, position
+
+        return {
+            'plan': plan,
+            'total_profit_inr': int(total),
+            'start_soil': dict(zip(NUTRIENTS, start)),
+            'states_evaluated': len(scores),
+        }
@@ -0,0 +1,54 @@
+import numpy as np
+from sklearn.base import BaseEstimator, RegressorMixin, clone
+from sklearn.linear_model import SGDRegressor
+from sklearn.preprocessing import StandardScaler
+from sklearn.utils.validation import check_is_fitted
+
+def _column(y) -> np.ndarray:
+    return np.asarray(y, dtype=float).reshape(-1, 1)
+
+class ScaledTargetRegressor(RegressorMixin, BaseEstimator):
+    """
+    Regressor trained on a standardized target that predicts in the target's
+    own units (e.g. kg/ha).
+
+    Unlike TransformedTargetRegressor both halves can be fitted chunk by
+    chunk: partial_fit_target updates the scaler during a first pass over the
+    data and partial_fit then trains the regressor on scaled targets, so a
+    dataset larger than memory can be streamed.
+    """
+
+    def __init__(self, regressor=None, scaler=None):
+        self.regressor = regressor
+        self.scaler = scaler
+
+    def _new_regressor(self):
+        return clone(self.regressor) if self.regressor is not None else SGDRegressor()
+
+    def _new_scaler(self):
+        return clone(self.scaler) if self.scaler is not None else StandardScaler()
+
+    def fit(self, X, y):
+        """Fit the scaler and the regressor on one in-memory dataset"""
+        self.scaler_ = self._new_scaler().fit(_column(y))
+        self.regressor_ = self._new_regressor().fit(X, self.scaler_.transform(_column(y)).ravel())
+        return self
+
+    def partial_fit_target(self, y):
+        """Update the target scaler with one chunk of targets"""
+        if not hasattr(self, 'scaler_'):
+            self.scaler_ = self._new_scaler()
+        self.scaler_.partial_fit(_column(y))
+        return self
+
+    def partial_fit(self, X, y):
+        """Update the regressor with one chunk; the scaler must already be fitted"""
+        check_is_fitted(self, 'scaler_')
+        if not hasattr(self, 'regressor_'):
+            self.regressor_ = self._new_regressor()
+        self.regressor_.partial_fit(X, self.scaler_.transform(_column(y)).ravel())
+        return self
+
+    def predict(self, X) -> np.ndarray:
+        check_is_fitted(self, 'regressor_')
+        return self.scaler_.inverse_transform(_column(self.regressor_.predict(X))).ravel()
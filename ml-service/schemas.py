@@ -0,0 +1,104 @@
+import numpy as np
+from pydantic import BaseModel
+from typing import List, Dict, Optional
+from fertilizer_optimizer import DEFAULT_STEP, nutrient_grid
+from pareto import RANKING_MODES, validate_weights
+from portfolio_optimizer import DEFAULT_CANDIDATES, DEFAULT_MAX_SHARE, DEFAULT_RISK_AVERSION
+from scoring_sessions import validate_session_id
+
+# Request bodies shared by both apps' endpoints and by the job API, which
+# validates each job item as the matching endpoint's request
+
+class Location(BaseModel):
+    lat: float
+    lon: float
+
+class Features(BaseModel):
+    # Soil fields left out are filled from the soil raster at the request's location
+    N: Optional[float] = None
+    P: Optional[float] = None
+    K: Optional[float] = None
+    ph: Optional[float] = None
+    temperature: float
+    humidity: float
+    rainfall: float
+    organic_carbon: Optional[float] = None
+    soil_type: Optional[str] = None
+    area_ha: float
+    farming_method: str
+    irrigation_type: str
+    previous_crops: List[str]
+    experience_years: int
+    budget_category: str
+    preferred_crops: List[str]
+
+class WeatherData(BaseModel):
+    temperature: float
+    humidity: float
+    rainfall: float
+    wind_speed: float
+    solar_radiation: float
+    pressure: float
+
+class ForecastData(BaseModel):
+    daily_forecast: List[Dict]
+    seasonal_outlook: str
+
+class PredictRequest(BaseModel):
+    location: Location
+    features: Features
+    market_snapshot: Dict[str, float]
+    weather_data: WeatherData
+    forecast_data: ForecastData
+    # "pareto": Pareto fronts over suitability, profit, sustainability and risk, ordered by `weights`
+    ranking: str = "suitability"
+    weights: Dict[str, float] = {}
+    # Client-chosen token: rule scoring recomputes only the factors changed since this session's last request
+    session_id: Optional[str] = None
+
+class FertilizerRequest(BaseModel):
+    features: Features
+    location: Optional[Location] = None
+    market_snapshot: Dict[str, float] = {}
+    target_crops: Optional[List[str]] = None
+    max_addition_kg_per_ha: Dict[str, float] = {}
+    step_kg_per_ha: float = DEFAULT_STEP
+    fertilizer_cost_per_kg: Dict[str, float] = {}
+    min_suitability: float = 0.5
+
+class RotationRequest(BaseModel):
+    features: Features
+    location: Optional[Location] = None
+    market_snapshot: Dict[str, float] = {}
+    years: int = 3
+    start_season: str = "Kharif"
+    seasons: Optional[List[str]] = None
+    season_conditions: Dict[str, Dict[str, float]] = {}
+
+class PortfolioRequest(BaseModel):
+    features: Features
+    location: Optional[Location] = None
+    market_snapshot: Dict[str, float] = {}
+    candidates: int = DEFAULT_CANDIDATES
+    max_share: float = DEFAULT_MAX_SHARE  # Largest share of the area one crop may take
+    risk_aversion: float = DEFAULT_RISK_AVERSION  # 0 ignores risk, 1 discounts profit by the full loss probability
+    water_available_mm: Optional[float] = None  # Seasonal water per hectare; unconstrained when not given
+    budget_inr: Optional[float] = None  # Overrides the budget implied by budget_category
+
+class PortfolioBatchRequest(BaseModel):
+    farms: List[PortfolioRequest]
+
+def validate_predict_request(request: PredictRequest):
+    """ValueError for options /predict rejects before scoring"""
+    if request.ranking not in RANKING_MODES:
+        raise ValueError(f"ranking must be one of {', '.join(RANKING_MODES)}")
+    validate_weights(request.weights)
+    validate_session_id(request.session_id)
+
+def fertilizer_additions(request: FertilizerRequest, crops: Dict) -> np.ndarray:
+    """What-if N/P/K additions of a fertilizer request, checking its target crops against `crops`"""
+    additions = nutrient_grid(request.max_addition_kg_per_ha, request.step_kg_per_ha)
+    unknown = [c for c in request.target_crops or [] if c not in crops]
+    if unknown:
+        raise ValueError(f"Unknown crops: {', '.join(unknown)}")
+    return additions
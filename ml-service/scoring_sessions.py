@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from crop_predictor import CropPredictor, CropScores, ScoredRecommendations
+from forecast_features import ForecastFeatures
+
+# Sessions kept at once (ML_SCORING_SESSIONS, 0 disables), memory they may hold together
+# (ML_SCORING_SESSION_MB) and seconds one may sit idle (ML_SCORING_SESSION_TTL)
+DEFAULT_MAX_SESSIONS = 256
+DEFAULT_MAX_SESSION_MB = 64
+DEFAULT_SESSION_TTL_SECONDS = 1800.0
+MAX_SESSION_ID_LENGTH = 128
+# Factor groups of a full rescoring
+ALL_FACTORS = tuple(CropScores.FACTOR_INPUTS) + ('forecast',)
+
+def validate_session_id(session_id: Optional[str]):
+    """ValueError unless the id is absent or a non-empty string of at most MAX_SESSION_ID_LENGTH characters"""
+    if session_id is not None and not 0 < len(session_id) <= MAX_SESSION_ID_LENGTH:
+        raise ValueError(f"session_id must be 1-{MAX_SESSION_ID_LENGTH} characters")
+
+class ScoringSessions:
+    """
+    Factor breakdowns of the whole catalog kept per client session, so a
+    follow-up request that edits a few form fields recomputes only the
+    factor groups those fields feed (CropScores.update) and re-ranks.
+    The answer is always the one fresh scoring would give; the session
+    only decides how much of it is reused. Sessions are evicted least
+    recently used first beyond `max_sessions` or `max_bytes` of factor
+    arrays (a session holds about 100 bytes per catalog entry), and after
+    `ttl` idle seconds.
+    """
+
+    def __init__(self, predictor: CropPredictor, max_sessions: int = DEFAULT_MAX_SESSIONS,
+                 max_bytes: int = DEFAULT_MAX_SESSION_MB << 20, ttl: float = DEFAULT_SESSION_TTL_SECONDS):
+        self.predictor = predictor
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.nbytes = 0
+        self._all = np.arange(len(predictor.catalog.names))
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    @classmethod
+    def from_env(cls, predictor: CropPredictor) -> Optional["ScoringSessions"]:
+        """Sessions sized by ML_SCORING_SESSIONS, ML_SCORING_SESSION_MB and ML_SCORING_SESSION_TTL; None when disabled"""
+        max_sessions = int(os.environ.get("ML_SCORING_SESSIONS", DEFAULT_MAX_SESSIONS))
+        max_bytes = int(float(os.environ.get("ML_SCORING_SESSION_MB", DEFAULT_MAX_SESSION_MB)) * (1 << 20))
+        ttl = float(os.environ.get("ML_SCORING_SESSION_TTL", DEFAULT_SESSION_TTL_SECONDS))
+        return cls(predictor, max_sessions, max_bytes, ttl) if max_sessions > 0 else None
+
+    def score(self, session_id: str, features: Dict, top_k: int = 5, forecast: Optional[ForecastFeatures] = None,
+              market_snapshot: Optional[Dict] = None) -> Tuple[ScoredRecommendations, List[str]]:
+        """Top-k recommendations for the session's latest request, and the factor groups recomputed for it"""
+        previous = self._get(session_id)
+        if previous is None:
+            scores = CropScores(self.predictor.catalog, features, self._all, forecast).complete()
+            recomputed = list(ALL_FACTORS)
+        else:
+            scores, recomputed = previous.update(features, forecast)
+        self._put(session_id, scores)
+        return self.predictor.rank(scores, features, top_k, market_snapshot), recomputed
+
+    def _get(self, session_id: str) -> Optional[CropScores]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None and now - entry[0] > self.ttl:
+                self._drop(session_id)
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._sessions.move_to_end(session_id)
+            self.hits += 1
+            return entry[2]
+
+    def _put(self, session_id: str, scores: CropScores):
+        now = time.monotonic()
+        nbytes = sum(getattr(scores, field).nbytes for field in CropScores.FIELDS if getattr(scores, field) is not None)
+        with self._lock:
+            if session_id in self._sessions:
+                self._drop(session_id)
+            self._sessions[session_id] = (now, nbytes, scores)
+            self.nbytes += nbytes
+            # Least recently used first, so idle sessions sit at the front; the newest always stays
+            while len(self._sessions) > 1:
+                oldest, (last_used, _, _) = next(iter(self._sessions.items()))
+                if now - last_used > self.ttl:
+                    self.expired += 1
+                elif len(self._sessions) > self.max_sessions or self.nbytes > self.max_bytes:
+                    self.evicted += 1
+                else:
+                    break
+                self._drop(oldest)
+
+    def _drop(self, session_id: str):
+        self.nbytes -= self._sessions.pop(session_id)[1]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {'sessions': len(self._sessions), 'bytes': self.nbytes, 'hits': self.hits,
+                    'misses': self.misses, 'expired': self.expired, 'evicted': self.evicted}
@@ -0,0 +1,223 @@
+import logging
+from datetime import datetime
+from fastapi import APIRouter, HTTPException, Request
+from typing import Dict, Optional
+import admin
+import region_tiles
+from binary_protocol import SCHEMA_HEADER, ProtocolError, decode_request
+from climate_risk import ClimateRiskSimulator
+from crop_catalog import CropCatalog
+from crop_predictor import CropPredictor
+from drift_monitor import DriftMonitor
+from engines import EngineRegistry
+from fertilizer_optimizer import FertilizerOptimizer
+from forecast_features import ForecastCache
+from market_prices import PriceTable
+from portfolio_optimizer import MAX_BATCH_FARMS, PortfolioOptimizer
+from rotation_planner import RotationPlanner, rotation_seasons
+from schemas import (
+    FertilizerRequest, PortfolioBatchRequest, PortfolioRequest, PredictRequest, RotationRequest,
+    fertilizer_additions
+)
+from scoring_sessions import ScoringSessions
+from soil_raster import SoilRaster, fill_soil
+
+logger = logging.getLogger(__name__)
+
+# Scoring subsystems and endpoints shared by app.py and app_simple.py; each app
+# builds one Services at import (app.state.services) and includes the router
+
+class Services:
+    """The rule-based predictor and everything scored with it, built once per worker"""
+
+    def __init__(self, catalog: CropCatalog, price_table: PriceTable, soil_raster: Optional[SoilRaster] = None):
+        self.catalog = catalog
+        # Market prices shared by all requests, refreshed in the background (ML_MARKET_PRICES)
+        self.price_table = price_table
+        # Soil properties by location for requests that leave them out (python soil_raster.py, ML_SOIL_RASTER)
+        self.soil_raster = soil_raster
+        self.crop_predictor = CropPredictor(catalog, price_table)
+        self.fertilizer_optimizer = FertilizerOptimizer(self.crop_predictor)
+        self.rotation_planner = RotationPlanner(self.crop_predictor)
+        # Aggregated forecasts shared by requests from the same location cell and day
+        self.forecast_cache = ForecastCache(self.crop_predictor.catalog)
+        # Per-session factor breakdowns for incremental what-if rescoring (ML_SCORING_SESSIONS, 0 disables)
+        self.scoring_sessions = ScoringSessions.from_env(self.crop_predictor)
+        # Monte Carlo weather scenarios behind each recommendation's climate_risk (ML_RISK_SCENARIOS, 0 disables)
+        self.risk_simulator = ClimateRiskSimulator.from_env(self.crop_predictor)
+        # Area split across candidate crops (/optimize/portfolio), discounting profit by the simulated risk
+        self.portfolio_optimizer = PortfolioOptimizer(self.crop_predictor, self.risk_simulator)
+        # Request inputs compared with the training data distribution (/admin/drift)
+        self.drift_monitor = DriftMonitor.load()
+
+    @classmethod
+    def load(cls) -> 'Services':
+        """Load the crop catalog and soil raster, start the price refresh and register the artifacts for /admin/memory"""
+        catalog = CropCatalog.load()
+        price_table = PriceTable.from_env(catalog.crops)
+        price_table.start()
+        services = cls(catalog, price_table, SoilRaster.load())
+        logger.info("Intelligent crop predictor initialized")
+        for name in ('catalog', 'crop_predictor', 'price_table', 'forecast_cache', 'drift_monitor',
+                     'scoring_sessions'):
+            admin.memory_diagnostics.register(name, getattr(services, name))
+        return services
+
+    def fill_soil(self, features: Dict, location) -> Dict[str, str]:
+        """Fill the soil fields left out of `features` at the (optional) request location"""
+        return fill_soil(features, self.soil_raster, location and location.lat, location and location.lon)
+
+    async def recommend(self, engines: EngineRegistry, request: PredictRequest, features: Dict,
+                        deadline: Optional[float] = None) -> Dict:
+        """/predict response for already validated, soil-filled features"""
+        forecast = self.forecast_cache.get(request.location.lat, request.location.lon,
+                                           request.forecast_data.daily_forecast)
+        # The configured primary engine answers; a sampled shadow engine may re-score in the background
+        if request.ranking == "pareto":
+            prediction = engines.get("pareto").predict(features, forecast=forecast,
+                                                       market_snapshot=request.market_snapshot, request=request)
+        else:
+            prediction = await engines.predict_async(features, forecast=forecast,
+                                                     market_snapshot=request.market_snapshot,
+                                                     request=request, deadline=deadline)
+        recommendations = prediction.recommendations
+        explanation = prediction.explanation
+        shap_features = prediction.shap_top_features
+
+        if not recommendations:
+            logger.warning("No crops met suitability threshold, using fallback")
+            recommendations = [{
+                "crop": "Rice",
+                "score": 0.6,
+                "predicted_yield_kg_per_ha": 3000,
+                "estimated_profit_inr": 25000,
+                "sustainability_score": 0.7,
+                "confidence": 0.7,
+                "risk_level": "Medium",
+                "season_suitability": "Kharif",
+                "water_requirement": "High",
+                "market_demand": "High"
+            }]
+            explanation = self.crop_predictor.generate_explanation("Rice", features)
+            shap_features = self.crop_predictor.get_feature_importance("Rice", features)
+
+        # Loss probability and yield/profit spread over simulated weather (ML_RISK_SCENARIOS)
+        if self.risk_simulator is not None:
+            self.risk_simulator.annotate(recommendations, features, request.weather_data.model_dump(), forecast,
+                                         request.market_snapshot)
+
+        return {
+            "model_version": prediction.model_version,
+            "engine": prediction.engine,
+            "degraded": prediction.degraded,
+            "timestamp": datetime.now().isoformat(),
+            "recommendations": recommendations,
+            "explanation": explanation,
+            "shap_top_features": shap_features,
+            "yield_shap_top_features": prediction.yield_shap_top_features,
+            "forecast_summary": forecast.summary if forecast is not None else None,
+            "session": prediction.session,
+            "location_analysis": {
+                "latitude": request.location.lat,
+                "longitude": request.location.lon,
+                "region_suitability": region_tiles.region_suitability(recommendations[0]["score"])
+            }
+        }
+
+router = APIRouter()
+
+def _services(request: Request) -> Services:
+    return request.app.state.services
+
+@router.post("/optimize/fertilizer")
+async def optimize_fertilizer(body: FertilizerRequest, request: Request):
+    """Cost-optimal N/P/K addition per crop over a grid of what-if scenarios"""
+    services = _services(request)
+    features = body.features.model_dump()
+    services.fill_soil(features, body.location)
+    try:
+        additions = fertilizer_additions(body, services.crop_predictor.crop_requirements)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    results = services.fertilizer_optimizer.optimize(
+        features, additions, target_crops=body.target_crops,
+        min_suitability=body.min_suitability, cost_per_kg=body.fertilizer_cost_per_kg,
+        market_snapshot=body.market_snapshot
+    )
+    return {"scenarios": len(additions), "results": results}
+
+def _portfolio_farm(services: Services, farm: PortfolioRequest) -> Dict:
+    """Allocation problem of one farm, with missing soil fields filled in"""
+    features = farm.features.model_dump()
+    services.fill_soil(features, farm.location)
+    return {'features': features, **farm.model_dump(exclude={'features', 'location'})}
+
+@router.post("/optimize/portfolio")
+async def optimize_portfolio(body: PortfolioRequest, request: Request):
+    """Split the farm's area across its best candidate crops for risk-adjusted profit within budget and water"""
+    services = _services(request)
+    try:
+        result = services.portfolio_optimizer.allocate([_portfolio_farm(services, body)])[0]
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if 'error' in result:
+        raise HTTPException(status_code=422, detail=result['error'])
+    return result
+
+@router.post("/optimize/portfolio/batch")
+async def optimize_portfolios(body: PortfolioBatchRequest, request: Request):
+    """Allocations for many farms, solved as one block-diagonal linear program"""
+    services = _services(request)
+    if not 1 <= len(body.farms) <= MAX_BATCH_FARMS:
+        raise HTTPException(status_code=400, detail=f"Send 1 to {MAX_BATCH_FARMS} farms")
+    try:
+        return {"results": services.portfolio_optimizer.allocate([_portfolio_farm(services, farm)
+                                                                  for farm in body.farms])}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/plan/rotation")
+async def plan_rotation(body: RotationRequest, request: Request):
+    """Most profitable multi-season crop sequence, accounting for soil nutrient carry-over"""
+    services = _services(request)
+    try:
+        seasons = rotation_seasons(body.years, body.start_season, body.seasons)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    features = body.features.model_dump()
+    services.fill_soil(features, body.location)
+    return services.rotation_planner.plan(
+        features, seasons, previous_crops=body.features.previous_crops,
+        season_conditions=body.season_conditions, market_snapshot=body.market_snapshot
+    )
+
+@router.get("/market/prices")
+async def market_prices(request: Request):
+    """Current shared price table (INR per quintal)"""
+    return _services(request).price_table.status()
+
+@router.post("/internal/predict")
+async def predict_packed(request: Request):
+    """Packed fast path for co-located backends (layout in binary_protocol)"""
+    services = _services(request)
+    try:
+        features = decode_request(await request.body(), request.headers.get(SCHEMA_HEADER))
+    except ProtocolError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    forecast = services.forecast_cache.get_array(features.get('lat'), features.get('lon'),
+                                                 features.forecast_start, features.forecast_days)
+    scored = services.crop_predictor.score(features, top_k=features.top_k, season=features.get('season'),
+                                           water_req=features.get('water_req'), forecast=forecast)
+    if not scored.recommendations:
+        return {"model_version": "v2.0.0-intelligent", "recommendations": [], "explanation": None, "shap_top_features": []}
+
+    return {
+        "model_version": "v2.0.0-intelligent",
+        "recommendations": scored.recommendations,
+        "explanation": scored.explanation(),
+        "shap_top_features": scored.feature_importance(),
+        "forecast_summary": forecast.summary if forecast is not None else None
+    }
@@ -0,0 +1,35 @@
+import argparse
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+# Co-located backends reuse connections, so keep idle ones open far longer
+# than uvicorn's 5 second default
+DEFAULT_KEEPALIVE_SECONDS = 75
+DEFAULT_BACKLOG = 2048
+
+def serving_options(argv=None) -> argparse.Namespace:
+    """Serving options from the command line, falling back to ML_SERVICE_* env vars"""
+    parser = argparse.ArgumentParser(description="Run the ML service")
+    parser.add_argument("--uds", default=os.environ.get("ML_SERVICE_SOCKET"),
+                        help="Listen on this Unix domain socket instead of TCP")
+    parser.add_argument("--host", default=os.environ.get("ML_SERVICE_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("ML_SERVICE_PORT", 8001)))
+    parser.add_argument("--keepalive", type=int,
+                        default=int(os.environ.get("ML_SERVICE_KEEPALIVE", DEFAULT_KEEPALIVE_SECONDS)),
+                        help="Seconds an idle keep-alive connection stays open")
+    parser.add_argument("--backlog", type=int, default=DEFAULT_BACKLOG)
+    return parser.parse_args(argv)
+
+def run(app, argv=None):
+    """Serve `app` over TCP, or over a Unix domain socket when --uds/ML_SERVICE_SOCKET is set"""
+    import uvicorn
+
+    options = serving_options(argv)
+    if options.uds:
+        logger.info(f"Serving on unix socket {options.uds}")
+        uvicorn.run(app, uds=options.uds, timeout_keep_alive=options.keepalive, backlog=options.backlog)
+    else:
+        uvicorn.run(app, host=options.host, port=options.port,
+                    timeout_keep_alive=options.keepalive, backlog=options.backlog)
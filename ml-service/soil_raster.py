@@ -0,0 +1,227 @@
+import argparse
+import json
+import logging
+import math
+import os
+import struct
+import time
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+from region_tiles import LAT_RANGE, LON_RANGE, SOIL_DEFAULTS, RegionGrid, default_soil_types
+
+logger = logging.getLogger(__name__)
+
+SOIL_RASTER_PATH = "models/soil_raster.bin"
+DEFAULT_STEP_DEG = 0.05
+
+SOIL_FIELDS = ('N', 'P', 'K', 'ph', 'organic_carbon')
+SOIL_TYPES = tuple(SOIL_DEFAULTS)
+FALLBACK_SOIL_TYPE = 'Loamy'
+# Soil type code of cells without a sample
+NO_SOIL_TYPE = 255
+# Values are stored as float32; looked up values are rounded back to this
+SOIL_DECIMALS = 4
+
+MAGIC = b"CSRL"
+VERSION = 1
+_HEADER = struct.Struct("<4sHI")  # magic, version, metadata bytes
+_DATA_ALIGNMENT = 64
+
+# Column names accepted by the CSV converter, mapped onto SOIL_FIELDS
+CSV_COLUMNS = {'latitude': 'lat', 'longitude': 'lon', 'pH': 'ph', 'oc': 'organic_carbon', 'soil': 'soil_type'}
+
+def write_soil_raster(path: str, grid: RegionGrid, values: np.ndarray, soil_codes: np.ndarray, source: str = ""):
+    """
+    Header, JSON metadata, then (n_lat, n_lon, fields) float32 values (NaN
+    where unknown) followed by (n_lat, n_lon) uint8 soil type codes.
+    """
+    metadata = json.dumps({
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'source': source,
+        'lat0': grid.lat0, 'lon0': grid.lon0, 'step': grid.step, 'n_lat': grid.n_lat, 'n_lon': grid.n_lon,
+        'fields': list(SOIL_FIELDS), 'soil_types': list(SOIL_TYPES),
+    }).encode()
+    offset = _HEADER.size + len(metadata)
+    padding = -offset % _DATA_ALIGNMENT
+    with open(path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, len(metadata) + padding))
+        f.write(metadata + b" " * padding)
+        f.write(np.ascontiguousarray(values, dtype=np.float32).tobytes())
+        f.write(np.ascontiguousarray(soil_codes, dtype=np.uint8).tobytes())
+
+def grid_from_samples(frame: pd.DataFrame, step: float) -> Tuple[RegionGrid, np.ndarray, np.ndarray]:
+    """Grid spanning the sampled points, and the (i, j) cell of every sample"""
+    lat_range = (math.floor(frame['lat'].min() / step) * step, math.ceil(frame['lat'].max() / step) * step)
+    lon_range = (math.floor(frame['lon'].min() / step) * step, math.ceil(frame['lon'].max() / step) * step)
+    grid = RegionGrid.covering(lat_range, lon_range, step)
+    i = np.rint((frame['lat'].to_numpy(float) - grid.lat0) / step).astype(np.intp)
+    j = np.rint((frame['lon'].to_numpy(float) - grid.lon0) / step).astype(np.intp)
+    return grid, i, j
+
+def raster_from_csv(path: str, step: float = DEFAULT_STEP_DEG) -> Tuple[RegionGrid, np.ndarray, np.ndarray]:
+    """
+    Grid a CSV of soil samples (lat, lon and any of N, P, K, ph,
+    organic_carbon, soil_type). Samples in the same cell are averaged; the
+    cell's soil type is its most frequent one.
+    """
+    frame = pd.read_csv(path).rename(columns=CSV_COLUMNS)
+    frame = frame.dropna(subset=['lat', 'lon'])
+    grid, i, j = grid_from_samples(frame, step)
+    cells = i * grid.n_lon + j
+    n_cells = grid.n_lat * grid.n_lon
+
+    values = np.full((n_cells, len(SOIL_FIELDS)), np.nan, dtype=np.float32)
+    for f, field in enumerate(SOIL_FIELDS):
+        if field not in frame:
+            continue
+        column = pd.to_numeric(frame[field], errors='coerce').to_numpy(float)
+        known = ~np.isnan(column)
+        counts = np.bincount(cells[known], minlength=n_cells)
+        sums = np.bincount(cells[known], weights=column[known], minlength=n_cells)
+        values[counts > 0, f] = sums[counts > 0] / counts[counts > 0]
+
+    soil_codes = np.full(n_cells, NO_SOIL_TYPE, dtype=np.uint8)
+    if 'soil_type' in frame:
+        codes = frame['soil_type'].map({name: c for c, name in enumerate(SOIL_TYPES)}).to_numpy()
+        known = ~pd.isna(codes)
+        votes = np.zeros((n_cells, len(SOIL_TYPES)), dtype=np.int64)
+        np.add.at(votes, (cells[known], codes[known].astype(np.intp)), 1)
+        voted = votes.sum(axis=1) > 0
+        soil_codes[voted] = votes[voted].argmax(axis=1)
+    logger.info(f"Gridded {len(frame)} samples from {path} into {int((soil_codes != NO_SOIL_TYPE).sum())} "
+                f"typed and {int((~np.isnan(values).all(axis=1)).sum())} measured cells")
+    return grid, values.reshape(grid.n_lat, grid.n_lon, -1), soil_codes.reshape(grid.n_lat, grid.n_lon)
+
+def raster_from_soil_zones(step: float = DEFAULT_STEP_DEG) -> Tuple[RegionGrid, np.ndarray, np.ndarray]:
+    """Baseline raster over the service area: the coarse soil zones with their typical profiles"""
+    grid = RegionGrid.covering(LAT_RANGE, LON_RANGE, step)
+    soil = default_soil_types(*grid.centres())
+    profiles = np.array([[SOIL_DEFAULTS[name][field] for field in SOIL_FIELDS] for name in SOIL_TYPES])
+    codes = np.vectorize(SOIL_TYPES.index, otypes=[np.uint8])(soil)
+    return grid, profiles[codes].astype(np.float32), codes
+
+class SoilRaster:
+    """
+    Read-only, memory-mapped gridded soil properties. A lookup reads one
+    cell (nearest centre); the mapping is shared through the page cache by
+    every process that opens the file.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as f:
+            magic, version, metadata_size = _HEADER.unpack(f.read(_HEADER.size))
+            if magic != MAGIC or version != VERSION:
+                raise ValueError(f"{path} is not a version {VERSION} soil raster")
+            metadata = json.loads(f.read(metadata_size))
+        self.path = path
+        self.metadata = metadata
+        self.grid = RegionGrid(metadata['lat0'], metadata['lon0'], metadata['step'],
+                               metadata['n_lat'], metadata['n_lon'])
+        self.fields = metadata['fields']
+        self.soil_types = metadata['soil_types']
+        offset = _HEADER.size + metadata_size
+        shape = (self.grid.n_lat, self.grid.n_lon)
+        # Plain ndarray views of the mapping: indexing a memmap subclass is several times slower
+        self.values = np.memmap(path, dtype=np.float32, mode='r', offset=offset,
+                                shape=shape + (len(self.fields),)).view(np.ndarray)
+        self.soil_codes = np.memmap(path, dtype=np.uint8, mode='r', offset=offset + self.values.nbytes,
+                                    shape=shape).view(np.ndarray)
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> Optional["SoilRaster"]:
+        """Raster written by `python soil_raster.py` (ML_SOIL_RASTER); None when the file does not exist"""
+        path = path or os.environ.get("ML_SOIL_RASTER", SOIL_RASTER_PATH)
+        if not os.path.exists(path):
+            logger.info(f"No soil raster at {path}, soil fields come from the request only")
+            return None
+        return cls(path)
+
+    def lookup_one(self, lat: float, lon: float) -> Dict:
+        """Known soil fields of the cell nearest to one location; empty outside the raster"""
+        grid = self.grid
+        if math.isnan(lat) or math.isnan(lon):
+            return {}
+        i = round((lat - grid.lat0) / grid.step)
+        j = round((lon - grid.lon0) / grid.step)
+        if not (0 <= i < grid.n_lat and 0 <= j < grid.n_lon):
+            return {}
+        soil = {field: round(v, SOIL_DECIMALS) for field, v in zip(self.fields, self.values[i, j].tolist()) if v == v}
+        code = int(self.soil_codes[i, j])
+        if code != NO_SOIL_TYPE:
+            soil['soil_type'] = self.soil_types[code]
+        return soil
+
+    def lookup(self, lat, lon) -> Tuple[np.ndarray, np.ndarray]:
+        """(points, fields) values (NaN unknown) and (points,) soil type codes for many locations"""
+        grid = self.grid
+        i = np.rint((np.atleast_1d(np.asarray(lat, dtype=float)) - grid.lat0) / grid.step)
+        j = np.rint((np.atleast_1d(np.asarray(lon, dtype=float)) - grid.lon0) / grid.step)
+        inside = (i >= 0) & (i < grid.n_lat) & (j >= 0) & (j < grid.n_lon)
+        i = np.where(inside, i, 0).astype(np.intp)
+        j = np.where(inside, j, 0).astype(np.intp)
+        values = np.where(inside[:, None], self.values[i, j], np.nan)
+        return values, np.where(inside, self.soil_codes[i, j], NO_SOIL_TYPE)
+
+def _is_static_default(features: Dict) -> bool:
+    """The soil values are exactly the frontend's static profile for the given soil type"""
+    profile = SOIL_DEFAULTS.get(features.get('soil_type'))
+    return profile is not None and all(features.get(field) == profile[field] for field in SOIL_FIELDS)
+
+def fill_soil_fields(features: Dict, soil: Dict) -> Dict[str, str]:
+    """
+    Fill missing soil fields of `features` in place from a raster cell
+    (`soil`), then from the typical profile of the soil type. Values that
+    are just the static profile of the stated soil type are replaced by
+    measured ones too. Returns the source of every filled field.
+    """
+    replace_defaults = _is_static_default(features)
+    filled = {}
+    if features.get('soil_type') is None:
+        features['soil_type'] = soil.get('soil_type', FALLBACK_SOIL_TYPE)
+        filled['soil_type'] = 'soil_raster' if 'soil_type' in soil else 'default'
+    profile = SOIL_DEFAULTS.get(features['soil_type'], SOIL_DEFAULTS[FALLBACK_SOIL_TYPE])
+    for field in SOIL_FIELDS:
+        if field in soil and (features.get(field) is None or replace_defaults):
+            features[field] = soil[field]
+            filled[field] = 'soil_raster'
+        elif features.get(field) is None:
+            features[field] = profile[field]
+            filled[field] = 'soil_type_profile'
+    return filled
+
+def fill_soil(features: Dict, raster: Optional[SoilRaster], lat: Optional[float] = None,
+              lon: Optional[float] = None) -> Dict[str, str]:
+    """fill_soil_fields from the raster cell at (lat, lon), when there is a raster and a location"""
+    needed = any(features.get(field) is None for field in ('soil_type',) + SOIL_FIELDS) or _is_static_default(features)
+    if not needed:
+        return {}
+    soil = raster.lookup_one(lat, lon) if raster is not None and lat is not None and lon is not None else {}
+    return fill_soil_fields(features, soil)
+
+def fill_soil_batch(features_list: List[Dict], raster: Optional[SoilRaster], lats, lons) -> List[Dict[str, str]]:
+    """fill_soil for many requests with one vectorized raster lookup"""
+    if raster is None or not len(features_list):
+        return [fill_soil_fields(features, {}) for features in features_list]
+    values, codes = raster.lookup(lats, lons)
+    filled = []
+    for features, row, code in zip(features_list, values.tolist(), codes.tolist()):
+        soil = {field: round(v, SOIL_DECIMALS) for field, v in zip(raster.fields, row) if v == v}
+        if code != NO_SOIL_TYPE:
+            soil['soil_type'] = raster.soil_types[code]
+        filled.append(fill_soil_fields(features, soil))
+    return filled
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Build the memory-mapped soil raster")
+    parser.add_argument("--csv", help="Soil samples (lat, lon, N, P, K, ph, organic_carbon, soil_type); "
+                                      "without it the coarse soil zones are rasterised")
+    parser.add_argument("--output", default=SOIL_RASTER_PATH)
+    parser.add_argument("--step", type=float, default=DEFAULT_STEP_DEG, help="Grid spacing in degrees")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    grid, values, soil_codes = raster_from_csv(args.csv, args.step) if args.csv else raster_from_soil_zones(args.step)
+    write_soil_raster(args.output, grid, values, soil_codes, source=args.csv or "soil zones")
+    logger.info(f"Wrote {grid.n_lat} x {grid.n_lon} soil cells to {args.output} "
+                f"({os.path.getsize(args.output) / 2 ** 20:.1f} MB, {time.perf_counter() - start:.1f}s)")
@@ -0,0 +1,66 @@
+import asyncio
+import httpx
+import pytest
+from fastapi import FastAPI
+from admission import AdmissionController, AdmissionMiddleware, Rejected
+
+def test_queue_is_bounded_and_fifo():
+    """Test waiters get slots in order and a full queue rejects immediately"""
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=1, max_wait=1.0)
+        await controller.acquire()
+        waiting = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(Rejected) as rejected:
+            await controller.acquire()
+        assert rejected.value.reason == "queue_full" and rejected.value.retry_after >= 1
+
+        controller.release(0.01)
+        await waiting
+        assert controller.active == 1 and not controller._waiters
+        controller.release(0.01)
+        assert controller.active == 0
+
+    asyncio.run(scenario())
+
+def test_rejects_when_estimated_wait_is_too_long():
+    """Test a slow average service time sheds load before the queue fills"""
+    async def scenario():
+        controller = AdmissionController(max_concurrency=1, max_queue=100, max_wait=0.5)
+        controller.service_time = 2.0
+        await controller.acquire()
+        with pytest.raises(Rejected) as rejected:
+            await controller.acquire()
+        assert rejected.value.reason == "wait_estimate"
+        assert rejected.value.retry_after == 2
+
+    asyncio.run(scenario())
+
+def test_middleware_sheds_predictions_but_not_health():
+    """Test overload returns 503 with Retry-After while /health is still served"""
+    app = FastAPI()
+    release = asyncio.Event()
+
+    @app.post("/predict")
+    async def predict():
+        await release.wait()
+        return {"ok": True}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "healthy"}
+
+    app.add_middleware(AdmissionMiddleware, controller=AdmissionController(max_concurrency=1, max_queue=1, max_wait=5))
+
+    async def scenario():
+        async with httpx.AsyncClient(app=app, base_url="http://test") as client:
+            first = asyncio.ensure_future(client.post("/predict"))
+            second = asyncio.ensure_future(client.post("/predict"))
+            await asyncio.sleep(0.05)
+            shed = await client.post("/predict")
+            assert shed.status_code == 503 and int(shed.headers["retry-after"]) >= 1
+            assert (await client.get("/health")).status_code == 200
+            release.set()
+            assert [r.status_code for r in await asyncio.gather(first, second)] == [200, 200]
+
+    asyncio.run(scenario())
@@ -0,0 +1,79 @@
+import pytest
+from fastapi.testclient import TestClient
+from app import app
+from binary_protocol import (
+    CONTENT_TYPE, NUMERIC_FIELDS, SCHEMA_HEADER, SCHEMA_VERSION, ProtocolError, decode_request, encode_request
+)
+from crop_predictor import CropPredictor
+
+client = TestClient(app)
+
+FEATURES = {
+    "lat": 22.57, "lon": 88.36, "N": 40, "P": 20, "K": 120, "ph": 6.8, "temperature": 28,
+    "humidity": 75, "rainfall": 80, "organic_carbon": 0.8, "area_ha": 2.5, "experience_years": 5,
+    "soil_type": "Loamy", "farming_method": "organic", "irrigation_type": "drip"
+}
+
+FORECAST = [
+    {"date": "2024-07-01", "temperature_max": 33, "temperature_min": 25, "rainfall": 12.5,
+     "humidity": 80, "wind_speed": 4.0, "description": "light rain", "weather_icon": "10d"},
+    {"date": "2024-07-02", "temperature_max": 37, "temperature_min": 27, "rainfall": 0.0,
+     "humidity": 70, "wind_speed": 3.0, "description": "clear sky", "weather_icon": "01d"},
+]
+
+def test_round_trip():
+    """Test packed fields decode to the values and categories that were sent"""
+    packed = decode_request(encode_request(FEATURES, top_k=3, daily_forecast=FORECAST), str(SCHEMA_VERSION))
+    assert packed.get("N") == 40.0
+    assert packed.get("soil_type") == "Loamy"
+    assert packed.get("season") is None
+    assert packed.top_k == 3
+    assert packed.forecast_start == "2024-07-01"
+    assert packed.forecast_days.shape == (2, 5)
+    assert packed.forecast_days[0, 2] == 12.5
+
+def test_packed_features_score_like_dict():
+    """Test the engine ranks packed features exactly like the feature dict"""
+    predictor = CropPredictor()
+    packed = decode_request(encode_request(FEATURES), str(SCHEMA_VERSION))
+    assert predictor.predict_crops(packed) == predictor.predict_crops(FEATURES)
+
+def test_rejects_malformed_payloads():
+    """Test version, length and code checks"""
+    payload = encode_request(FEATURES, daily_forecast=FORECAST)
+    with pytest.raises(ProtocolError):
+        decode_request(payload, "2")
+    with pytest.raises(ProtocolError):
+        decode_request(payload, None)
+    with pytest.raises(ProtocolError):
+        decode_request(payload[:-1], str(SCHEMA_VERSION))
+    bad_code = bytearray(payload)
+    bad_code[8 * len(NUMERIC_FIELDS)] = 99  # soil_type code
+    with pytest.raises(ProtocolError):
+        decode_request(bytes(bad_code), str(SCHEMA_VERSION))
+
+def test_packed_endpoint():
+    """Test the internal endpoint scores packed requests"""
+    response = client.post(
+        "/internal/predict", content=encode_request(FEATURES, top_k=3, daily_forecast=FORECAST),
+        headers={"Content-Type": CONTENT_TYPE, SCHEMA_HEADER: str(SCHEMA_VERSION)}
+    )
+    assert response.status_code == 200
+    data = response.json()
+    assert len(data["recommendations"]) == 3
+    assert data["forecast_summary"]["heat_stress_days"] == 1
+
+    response = client.post("/internal/predict", content=b"\x00" * 4, headers={SCHEMA_HEADER: "1"})
+    assert response.status_code == 400
+
+def test_packed_forecast_with_missing_fields():
+    """Test forecast fields absent from every day come back as None instead of breaking the JSON response"""
+    # Dated a year later so the cached aggregation of FORECAST is not reused
+    forecast = [{**{k: v for k, v in day.items() if k not in ("humidity", "wind_speed")},
+                 "date": day["date"].replace("2024", "2025")} for day in FORECAST]
+    response = client.post(
+        "/internal/predict", content=encode_request(FEATURES, daily_forecast=forecast),
+        headers={"Content-Type": CONTENT_TYPE, SCHEMA_HEADER: str(SCHEMA_VERSION)}
+    )
+    assert response.status_code == 200
+    assert response.json()["forecast_summary"]["humidity_mean"] is None
@@ -0,0 +1,57 @@
+import numpy as np
+from fastapi.testclient import TestClient
+from app_simple import app
+from climate_risk import RAINFALL_CV, ClimateRiskSimulator
+from crop_predictor import CropPredictor
+from forecast_features import ForecastFeatures, forecast_array
+from test_drift_monitor import PREDICT_REQUEST
+
+predictor = CropPredictor()
+simulator = ClimateRiskSimulator(predictor, n_scenarios=500)
+features = {"N": 90, "P": 42, "K": 43, "ph": 6.5, "temperature": 24, "humidity": 82, "rainfall": 120,
+            "organic_carbon": 0.8, "soil_type": "Loamy", "area_ha": 1.0, "experience_years": 5}
+
+def test_batched_scenarios_match_scalar_scoring():
+    """Test broadcasting scenarios gives the same yields as scoring each scenario alone"""
+    idx = np.array([predictor.catalog.index_of(name) for name in predictor.catalog.names[:4]])
+    temperatures = 24 + 2 * simulator._temperature_shock[:5]
+    batched = predictor._predict_yields(predictor.score_factors(dict(features, temperature=temperatures), idx=idx))
+    for s, temperature in enumerate(temperatures[:, 0]):
+        single = predictor._predict_yields(predictor.score_factors(dict(features, temperature=temperature), idx=idx))
+        np.testing.assert_array_equal(batched[s], single)
+
+def test_risk_summary_is_consistent_and_repeatable():
+    """Test percentiles are ordered, losses are probabilities and the draws are fixed"""
+    recommendations = predictor.score(features, top_k=3).recommendations
+    simulator.annotate(recommendations, features)
+    first = [r["climate_risk"] for r in recommendations]
+    for risk in first:
+        assert 0 <= risk["loss_probability"] <= 1
+        assert risk["yield_p10_kg_per_ha"] <= risk["yield_p50_kg_per_ha"] <= risk["yield_p90_kg_per_ha"]
+        assert risk["profit_p10_inr"] <= risk["profit_p50_inr"] <= risk["profit_p90_inr"]
+    simulator.annotate(recommendations, features)
+    assert [r["climate_risk"] for r in recommendations] == first
+
+    unknown = [{"crop": "Dragon Fruit"}]
+    simulator.annotate(unknown, features)
+    assert "climate_risk" not in unknown[0]
+
+def test_marginal_weather_raises_loss_probability():
+    """Test a crop near its rainfall limit loses money in more scenarios"""
+    rice = np.array([predictor.catalog.crops.index("Rice")])
+    wet = simulator.simulate(features, rice, {"temperature": 26, "rainfall": 400})[0]
+    marginal = simulator.simulate(features, rice, {"temperature": 26, "rainfall": 120})[0]
+    assert marginal["loss_probability"] > wet["loss_probability"]
+
+def test_dry_forecast_widens_rainfall_spread():
+    """Test forecast dry days increase the rainfall variation of the scenarios"""
+    days = [{"temperature_max": 32, "temperature_min": 22, "rainfall": 0.0, "humidity": 60, "wind_speed": 3}] * 7
+    temperature_sd, rainfall_cv = simulator.spread(ForecastFeatures(forecast_array(days), predictor.catalog))
+    assert rainfall_cv > RAINFALL_CV
+    assert temperature_sd > 0
+
+def test_predict_reports_climate_risk():
+    """Test /predict recommendations carry the simulated risk"""
+    response = TestClient(app).post("/predict", json=PREDICT_REQUEST)
+    assert response.status_code == 200
+    assert "loss_probability" in response.json()["recommendations"][0]["climate_risk"]
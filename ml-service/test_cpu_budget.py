@@ -0,0 +1,49 @@
+import os
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from threadpoolctl import threadpool_info
+from app_simple import app
+from conftest import ADMIN_HEADERS
+from cpu_budget import CpuBudget, available_cpus, limit_estimator_jobs
+
+def test_cores_are_divided_across_workers():
+    """Test each worker gets an even share of the CPUs, and at least one thread"""
+    assert CpuBudget(workers=4, cpus=list(range(16))).threads == 4
+    assert CpuBudget(workers=3, cpus=list(range(8))).threads == 2
+    assert CpuBudget(workers=8, cpus=[0, 1]).threads == 1
+    assert CpuBudget(workers=2, threads=3, cpus=list(range(8))).threads == 3
+
+def test_apply_limits_loaded_thread_pools():
+    """Test the native pools already loaded follow the budget"""
+    budget = CpuBudget(threads=1).apply()
+    assert os.environ["OMP_NUM_THREADS"] == "1"
+    assert all(pool["num_threads"] == 1 for pool in threadpool_info())
+    assert budget.layout()["threads_per_worker"] == 1
+
+def test_pinning_claims_free_slots_only(tmp_path):
+    """Test workers pin to distinct slots and run unpinned once the slots are taken"""
+    original = os.sched_getaffinity(0)
+    cpus = available_cpus()[:1]
+    try:
+        first = CpuBudget(workers=2, threads=1, pin=True, cpus=cpus, slot_dir=str(tmp_path)).apply()
+        second = CpuBudget(workers=2, threads=1, pin=True, cpus=cpus, slot_dir=str(tmp_path)).apply()
+        assert first.slot == 0 and first.pinned_cpus == cpus
+        assert second.slot is None and not second.layout()["pinned"]
+    finally:
+        os.sched_setaffinity(0, original)
+
+def test_estimator_jobs_are_limited():
+    """Test n_jobs is set on every pipeline step that has one"""
+    model = Pipeline([("scale", StandardScaler()), ("forest", RandomForestClassifier(n_jobs=-1))])
+    assert limit_estimator_jobs(model, 2) == 1
+    assert model.named_steps["forest"].n_jobs == 2
+    assert limit_estimator_jobs(None, 2) == 0
+
+def test_admin_cpu_layout():
+    """Test the admin endpoint reports this worker's layout"""
+    layout = TestClient(app, headers=ADMIN_HEADERS).get("/admin/cpu").json()
+    assert layout["pid"] == os.getpid()
+    assert layout["threads_per_worker"] >= 1 and layout["engine_threads"] >= 1
+    assert {"threads", "api", "library"} <= set(layout["threadpools"][0])
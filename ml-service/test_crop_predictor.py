@@ -0,0 +1,69 @@
+import numpy as np
+from crop_catalog import CropCatalog
+from crop_predictor import CropPredictor, top_k_indices
+
+FEATURES = {
+    "temperature": 26, "ph": 6.8, "rainfall": 90, "N": 60, "P": 30, "K": 50,
+    "soil_type": "Loamy", "area_ha": 2, "experience_years": 6
+}
+
+def test_default_catalog_loaded():
+    """Test the bundled catalog backs the legacy requirement dicts"""
+    predictor = CropPredictor()
+    assert len(predictor.catalog) == 12
+    assert predictor.crop_requirements["Rice"]["temp_range"] == (20, 35)
+    assert predictor.base_yields["Sugarcane"] == 70000
+    assert set(predictor.catalog.by_season["Rabi"]) == {
+        predictor.catalog.index_of(c) for c in ["Wheat", "Maize", "Groundnut", "Sunflower", "Chickpea", "Mustard", "Barley"]
+    }
+
+def test_top_k_indices_matches_stable_sort():
+    """Test partial selection returns the same order as a full stable sort"""
+    scores = np.array([0.5, 0.9, 0.5, 1.0, 0.9, 0.1, 0.5])
+    for k in range(1, 9):
+        expected = np.argsort(-scores, kind="stable")[:k]
+        assert list(top_k_indices(scores, k)) == list(expected)
+
+def test_candidates_prune_by_temperature_and_ph():
+    """Test bound checks drop entries that can only score zero"""
+    catalog = CropPredictor().catalog
+    positions = catalog.candidates(temperature=33, ph=6.5)
+    names = {catalog.names[i] for i in positions}
+    assert "Barley" not in names  # 12-22°C, optimum 17°C
+    assert "Rice" in names
+
+    rabi_low_water = catalog.candidates(temperature=20, ph=6.5, season="Rabi", water_req="Low")
+    assert {catalog.names[i] for i in rabi_low_water} == {"Groundnut", "Chickpea", "Mustard", "Barley"}
+
+def test_variety_catalog():
+    """Test variety-level entries are scored and reported with their crop"""
+    entries = [
+        {"crop": "Rice", "variety": "Rice IR64", "temp_range": [20, 35], "ph_range": [5.5, 7.0],
+         "rainfall_min": 100, "N_min": 40, "P_min": 20, "K_min": 20, "seasons": ["Kharif"],
+         "soil_types": ["Loamy"], "water_req": "High", "base_yield": 4500},
+        {"crop": "Rice", "variety": "Rice Swarna", "temp_range": [22, 32], "ph_range": [5.5, 7.0],
+         "rainfall_min": 80, "N_min": 40, "P_min": 20, "K_min": 20, "seasons": ["Kharif"],
+         "soil_types": ["Clayey"], "water_req": "High", "base_yield": 5000},
+        {"crop": "Barley", "variety": "Barley DWRB", "temp_range": [2, 8], "ph_range": [6.0, 7.8],
+         "rainfall_min": 30, "N_min": 50, "P_min": 25, "K_min": 25, "seasons": ["Rabi"],
+         "soil_types": ["Loamy"], "water_req": "Low", "base_yield": 2500},
+    ]
+    predictor = CropPredictor(CropCatalog(entries))
+
+    results = predictor.predict_crops(FEATURES, top_k=2)
+    assert [r["variety"] for r in results] == ["Rice IR64", "Rice Swarna"]
+    assert all(r["crop"] == "Rice" for r in results)
+    assert predictor.calculate_suitability_score("Barley DWRB", FEATURES) == 0.0
+
+def test_score_reuses_breakdown_for_importances():
+    """Test importances for every top-k crop come from the scoring breakdown"""
+    predictor = CropPredictor()
+    scored = predictor.score(FEATURES)
+    names = [r["crop"] for r in scored.recommendations]
+    assert len(names) == 5
+
+    for name in names:
+        assert scored.feature_importance(name) == predictor.get_feature_importance(name, FEATURES)
+        breakdown = scored.scores.breakdown(name)
+        assert set(breakdown) == {"temperature", "ph", "rainfall", "nutrients", "soil_match", "suitability"}
+    assert names[0] in scored.explanation()
@@ -0,0 +1,105 @@
+import json
+import numpy as np
+import pandas as pd
+from fastapi.testclient import TestClient
+from app_simple import app
+from conftest import ADMIN_HEADERS
+from drift_monitor import (
+    NUMERIC_FIELDS, DriftMonitor, NumericSketch, ReferenceBuilder, population_stability_index
+)
+from train import CROP_RECOMMENDATION_SCHEMA, iter_dataset_chunks, train_incremental
+from test_train import DATASET
+
+client = TestClient(app, headers=ADMIN_HEADERS)
+
+PREDICT_REQUEST = {
+    "location": {"lat": 22.5, "lon": 88.3},
+    "features": {
+        "N": 40, "P": 20, "K": 120, "ph": 6.8, "temperature": 28, "humidity": 75, "rainfall": 80,
+        "organic_carbon": 0.8, "soil_type": "Loamy", "area_ha": 2.5, "farming_method": "organic",
+        "irrigation_type": "drip", "previous_crops": [], "experience_years": 5, "budget_category": "medium",
+        "preferred_crops": []
+    },
+    "market_snapshot": {"Rice": 2000},
+    "weather_data": {"temperature": 28, "humidity": 75, "rainfall": 80, "wind_speed": 3,
+                     "solar_radiation": 200, "pressure": 1010},
+    "forecast_data": {"daily_forecast": [], "seasonal_outlook": "Normal"}
+}
+
+def reference_frame():
+    return pd.concat(iter_dataset_chunks(DATASET, schema=CROP_RECOMMENDATION_SCHEMA, chunksize=500))
+
+def test_sketch_matches_numpy():
+    """Test row-by-row and batch updates give numpy's mean, std, min and max"""
+    values = np.random.default_rng(0).normal(5, 2, size=(500, 3))
+    values[::7, 1] = np.nan
+    rows, batch = NumericSketch(3), NumericSketch(3)
+    for row in values:
+        rows.update_partial(row)
+    batch.update_batch(values[:200])
+    batch.update_batch(values[200:])
+    for sketch in (rows, batch):
+        np.testing.assert_allclose(sketch.mean, np.nanmean(values, axis=0))
+        np.testing.assert_allclose(sketch.std, np.nanstd(values, axis=0, ddof=1))
+        np.testing.assert_allclose(sketch.min, np.nanmin(values, axis=0))
+        assert sketch.count[1] == np.count_nonzero(~np.isnan(values[:, 1]))
+
+def test_non_finite_inputs_count_as_missing():
+    """Test NaN and infinite request values are skipped instead of poisoning the report"""
+    monitor = DriftMonitor()
+    features = dict(PREDICT_REQUEST["features"])
+    monitor.observe(features, PREDICT_REQUEST["weather_data"])
+    monitor.observe(dict(features, N=float("nan"), P=float("inf")),
+                    dict(PREDICT_REQUEST["weather_data"], rainfall=float("-inf")))
+    report = monitor.report()
+    json.dumps(report, allow_nan=False)
+    assert report["numeric"]["N"]["count"] == 1
+    assert report["numeric"]["N"]["mean"] == 40
+    assert report["numeric"]["P"]["max"] == 20
+    assert report["numeric"]["weather_rainfall"]["count"] == 1
+    assert report["numeric"]["K"]["count"] == 2
+
+def test_reference_inputs_show_no_drift_and_shifted_inputs_do():
+    """Test PSI stays near zero for training-like traffic and flags a shifted field"""
+    frame = reference_frame()
+    builder = ReferenceBuilder()
+    builder.add(frame)
+    monitor = DriftMonitor(builder.stats())
+    for row in frame.to_dict("records"):
+        weather = {"temperature": row["temperature"], "humidity": row["humidity"], "rainfall": row["rainfall"] + 150}
+        monitor.observe(row, weather)
+    report = monitor.report()
+    assert report["requests"] == len(frame)
+    assert report["numeric"]["N"]["psi"] < 0.1
+    assert report["numeric"]["weather_rainfall"]["status"] == "drift"
+    assert "weather_temperature" not in report["drifted_fields"]
+    assert report["numeric"]["weather_wind_speed"]["status"] == "no_reference"
+    assert population_stability_index(np.array([0.5, 0.5]), np.array([0.5, 0.5])) == 0
+
+def test_unseen_categories_are_reported():
+    """Test categorical values never seen in training are listed"""
+    builder = ReferenceBuilder()
+    builder.add(reference_frame())
+    monitor = DriftMonitor(builder.stats())
+    monitor.observe({**PREDICT_REQUEST["features"], "soil_type": "Moon dust"})
+    assert "Moon dust" in monitor.report()["categorical"]["soil_type"]["unseen_values"]
+
+def test_incremental_training_saves_reference(tmp_path, monkeypatch):
+    """Test streamed training writes bin edges from a sample of the whole file"""
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "models").mkdir()
+    train_incremental(DATASET, CROP_RECOMMENDATION_SCHEMA, chunksize=200)
+    stats = json.loads((tmp_path / "models" / "reference_stats.json").read_text())
+    assert set(stats["numeric"]) == set(NUMERIC_FIELDS)
+    # The file is sorted by crop, so edges from the first chunk alone would be badly skewed
+    assert max(stats["numeric"]["N"]["proportions"]) < 0.2
+    assert DriftMonitor.load(str(tmp_path / "models" / "reference_stats.json")).reference is not None
+
+def test_admin_drift_endpoints():
+    """Test predictions are observed and the window can be reset"""
+    client.post("/admin/drift/reset")
+    assert client.post("/predict", json=PREDICT_REQUEST).status_code == 200
+    report = client.get("/admin/drift").json()
+    assert report["requests"] == 1
+    assert report["numeric"]["weather_solar_radiation"]["mean"] == 200
+    assert client.post("/admin/drift/reset").json()["requests"] == 0
@@ -0,0 +1,127 @@
+import asyncio
+import time
+import pytest
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.pipeline import Pipeline
+import app_simple
+from conftest import ADMIN_HEADERS
+from crop_predictor import CropPredictor
+from crop_catalog import CropCatalog
+from engines import (
+    EngineRegistry, FunctionEngine, ParetoEngine, Prediction, RuleEngine, SklearnEngine, deadline_seconds
+)
+from train import CROP_RECOMMENDATION_SCHEMA, FEATURE_COLUMNS, build_preprocessor, iter_dataset_chunks
+from test_train import DATASET
+from test_drift_monitor import PREDICT_REQUEST
+from test_crop_predictor import FEATURES as VARIETY_FEATURES
+
+predictor = CropPredictor()
+features = {"N": 90, "P": 42, "K": 43, "ph": 6.5, "temperature": 21, "humidity": 82, "rainfall": 203,
+            "organic_carbon": 0.8, "soil_type": "Loamy", "farming_method": "conventional",
+            "irrigation_type": "rainfed", "area_ha": 1.0, "experience_years": 5}
+
+def reversed_rules(features, top_k=5, forecast=None, market_snapshot=None, request=None):
+    recommendations = predictor.score(features, top_k=top_k).recommendations[::-1]
+    return Prediction("reversed", "test", recommendations)
+
+def test_shadow_engine_records_agreement():
+    """Test a sampled shadow run is compared with the primary off the response path"""
+    engines = EngineRegistry(shadow="reversed", shadow_fraction=1.0)
+    engines.register(RuleEngine(predictor))
+    engines.register(FunctionEngine("reversed", "test", reversed_rules))
+
+    prediction = engines.predict(features, top_k=3)
+    assert prediction.engine == "rules" and len(prediction.recommendations) == 3
+    engines.wait_for_shadow_runs()
+
+    comparison = engines.status()["comparisons"][0]
+    assert comparison["comparisons"] == 1
+    assert comparison["mean_topk_overlap"] == 1.0
+    assert comparison["top1_agreement"] == 0.0
+
+def slow_rules(features, top_k=5, forecast=None, market_snapshot=None, request=None):
+    time.sleep(0.3)
+    return Prediction("slow", "test", predictor.score(features, top_k=top_k).recommendations)
+
+def test_deadline_falls_back_to_rules():
+    """Test a primary engine missing its deadline is answered by the fallback and counted"""
+    engines = EngineRegistry()
+    engines.register(FunctionEngine("slow", "test", slow_rules))
+    engines.fallback = RuleEngine(predictor)
+
+    start = time.perf_counter()
+    prediction = asyncio.run(engines.predict_async(features, deadline=0.05))
+    assert time.perf_counter() - start < 0.25
+    assert prediction.engine == "rules" and prediction.degraded
+    assert engines.degraded_count()["deadline"] >= 1
+
+    prediction = asyncio.run(engines.predict_async(features, deadline=5))
+    assert prediction.engine == "slow" and not prediction.degraded
+
+def test_deadline_from_header_or_environment(monkeypatch):
+    """Test the header wins over ML_PREDICT_DEADLINE_MS and bad values are rejected"""
+    assert deadline_seconds(None) is None
+    monkeypatch.setenv("ML_PREDICT_DEADLINE_MS", "800")
+    assert deadline_seconds(None) == 0.8
+    assert deadline_seconds(250) == 0.25
+    for bad in (0, -5, float("nan"), float("inf"), "nan"):
+        with pytest.raises(ValueError):
+            deadline_seconds(bad)
+    monkeypatch.setenv("ML_PREDICT_DEADLINE_MS", "nan")
+    with pytest.raises(ValueError):
+        deadline_seconds(None)
+
+    client = TestClient(app_simple.app)
+    monkeypatch.delenv("ML_PREDICT_DEADLINE_MS")
+    assert client.post("/predict", json=PREDICT_REQUEST, headers={"X-Deadline-Ms": "nan"}).status_code == 400
+    assert client.post("/predict", json=PREDICT_REQUEST, headers={"X-Deadline-Ms": "5000"}).status_code == 200
+
+def test_configure_rejects_unknown_engines():
+    """Test switching to an engine that is not registered fails and keeps the current one"""
+    engines = EngineRegistry()
+    engines.register(RuleEngine(predictor))
+    try:
+        engines.configure(primary="missing")
+        assert False, "expected KeyError"
+    except KeyError:
+        pass
+    assert engines.primary_name == "rules" and engines.shadow is None
+
+def test_sklearn_engine_ranks_by_class_probability():
+    """Test the classifier ranks crops and the rule model fills in the other fields"""
+    df = next(iter_dataset_chunks(DATASET, schema=CROP_RECOMMENDATION_SCHEMA, chunksize=800))
+    model = Pipeline([("preprocessor", build_preprocessor()),
+                      ("classifier", RandomForestClassifier(n_estimators=10, random_state=0))])
+    model.fit(df[FEATURE_COLUMNS], df["crop"].astype(str))
+
+    engine = SklearnEngine(model, None, predictor, FEATURE_COLUMNS)
+    prediction = engine.predict(features, top_k=3)
+    scores = [r["score"] for r in prediction.recommendations]
+    assert prediction.engine == "sklearn" and scores == sorted(scores, reverse=True)
+    assert prediction.recommendations[0]["crop"] == "Rice"
+    assert prediction.recommendations[0]["predicted_yield_kg_per_ha"] > 0
+    assert prediction.explanation
+
+def test_admin_engines_endpoint():
+    """Test the admin API reports and switches engines"""
+    client = TestClient(app_simple.app, headers=ADMIN_HEADERS)
+    status = client.get("/admin/engines").json()
+    assert status["primary"] == "rules" and "rules" in status["engines"]
+    assert client.post("/admin/engines", json={"primary": "missing"}).status_code == 404
+    assert client.post("/admin/engines", json={"shadow_fraction": 2}).status_code == 400
+
+def test_engines_explain_varieties():
+    """Test engines explain the top entry by its variety name in a variety-level catalog"""
+    entries = [
+        {"crop": "Rice", "variety": f"Rice {name}", "temp_range": [20, 35], "ph_range": [5.5, 7.0],
+         "rainfall_min": rainfall, "N_min": 40, "P_min": 20, "K_min": 20, "seasons": ["Kharif"],
+         "soil_types": ["Loamy"], "water_req": "High", "base_yield": 4500}
+        for name, rainfall in (("IR64", 100), ("Swarna", 80))
+    ]
+    variety_predictor = CropPredictor(CropCatalog(entries))
+    for engine in (RuleEngine(variety_predictor), ParetoEngine(variety_predictor)):
+        prediction = engine.predict(VARIETY_FEATURES, top_k=2)
+        top = prediction.recommendations[0]
+        assert top["crop"] == "Rice" and top["variety"] in prediction.explanation
+        assert prediction.shap_top_features
@@ -0,0 +1,62 @@
+import numpy as np
+from fastapi.testclient import TestClient
+from app import app
+import fertilizer_optimizer
+from crop_predictor import CropPredictor
+from fertilizer_optimizer import FertilizerOptimizer, nutrient_grid
+
+client = TestClient(app)
+
+FEATURES = {
+    "N": 20, "P": 15, "K": 20, "ph": 6.6, "temperature": 24, "humidity": 70, "rainfall": 120,
+    "organic_carbon": 0.8, "soil_type": "Loamy", "area_ha": 2, "farming_method": "conventional",
+    "irrigation_type": "rainfed", "previous_crops": [], "experience_years": 6,
+    "budget_category": "medium", "preferred_crops": []
+}
+
+def test_grid_covers_every_combination():
+    """Test the grid enumerates all additions including no addition"""
+    grid = nutrient_grid({"N": 20, "P": 10, "K": 0}, step=10)
+    assert grid.shape == (6, 3)
+    assert [0, 0, 0] in grid.tolist() and [20, 10, 0] in grid.tolist()
+
+def test_grid_matches_scalar_scoring():
+    """Test vectorized scenarios agree with the per-crop scoring functions"""
+    predictor = CropPredictor()
+    optimizer = FertilizerOptimizer(predictor)
+    additions = nutrient_grid({"N": 60, "P": 40, "K": 40}, step=20)
+    idx = np.arange(len(predictor.catalog))
+    outcome = optimizer.evaluate(FEATURES, additions, idx)
+
+    for s in (0, len(additions) // 2, len(additions) - 1):
+        features = dict(FEATURES, N=20 + additions[s, 0], P=15 + additions[s, 1], K=20 + additions[s, 2])
+        for c, name in enumerate(predictor.catalog.names):
+            suitability = predictor.calculate_suitability_score(name, features)
+            yield_kg_ha = predictor.predict_yield(name, features, suitability)
+            assert outcome["suitability"][s, c] == suitability
+            assert outcome["yield"][s, c] == yield_kg_ha
+            assert outcome["profit"][s, c] == predictor.calculate_profit(name, yield_kg_ha, 2)
+
+def test_chunked_evaluation_matches_one_pass(monkeypatch):
+    """Test scoring a few scenarios at a time picks the same amendments as scoring all at once"""
+    optimizer = FertilizerOptimizer(CropPredictor())
+    additions = nutrient_grid({"N": 60, "P": 40, "K": 40}, step=20)
+    whole = optimizer.optimize(FEATURES, additions, min_suitability=0.6)
+    monkeypatch.setattr(fertilizer_optimizer, "MAX_EVALUATION_CELLS", 50)
+    assert optimizer.optimize(FEATURES, additions, min_suitability=0.6) == whole
+
+def test_optimize_endpoint():
+    """Test the endpoint returns an amendment that beats no amendment for each crop"""
+    response = client.post("/optimize/fertilizer", json={
+        "features": FEATURES, "target_crops": ["Rice", "Maize"], "step_kg_per_ha": 20
+    })
+    assert response.status_code == 200
+    data = response.json()
+    assert data["scenarios"] == 7 * 5 * 5
+    for result in data["results"]:
+        assert result["viable"]
+        assert result["net_profit_inr"] >= result["baseline_profit_inr"] or result["baseline_suitability"] < 0.5
+        assert result["suitability"] >= 0.5
+
+    response = client.post("/optimize/fertilizer", json={"features": FEATURES, "target_crops": ["Kiwi"]})
+    assert response.status_code == 400
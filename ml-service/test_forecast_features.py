@@ -0,0 +1,86 @@
+import numpy as np
+from crop_predictor import CropPredictor
+from forecast_features import ForecastCache, forecast_array, summarize_forecast
+
+def _forecast(temperature_max, rainfall=5.0, start=1):
+    return [
+        {"date": f"2024-07-{start + i:02d}", "temperature_max": t, "temperature_min": t - 10,
+         "rainfall": rainfall, "humidity": 70, "wind_speed": 3.5, "description": "clear sky",
+         "weather_icon": "01d"}
+        for i, t in enumerate(temperature_max)
+    ]
+
+FEATURES = {
+    "temperature": 26, "ph": 6.5, "rainfall": 120, "N": 80, "P": 40, "K": 60,
+    "soil_type": "Loamy", "area_ha": 2, "experience_years": 6
+}
+
+def test_summarize_forecast():
+    """Test cumulative rain, stress days and temperature windows"""
+    days = forecast_array(_forecast([30, 36, 38, 33, 29], rainfall=0.5))
+    summary = summarize_forecast(days)
+    assert summary["days"] == 5
+    assert summary["rainfall_total"] == 2.5
+    assert summary["dry_days"] == 5
+    assert summary["heat_stress_days"] == 2
+    assert summary["temperature_max_peak"] == 38
+    assert summary["temperature_min_low"] == 19
+    assert summary["warmest_window_mean"] == round((36 + 38 + 33) / 3 - 5, 2)
+
+def test_missing_values_are_nan():
+    """Test absent or null fields do not break the array conversion"""
+    days = forecast_array([{"date": "2024-07-01", "temperature_max": 30, "rainfall": None}])
+    assert days.shape == (1, 5)
+    assert np.isnan(days[0, 2]) and np.isnan(days[0, 1])
+
+def test_cache_shares_forecast_within_cell():
+    """Test nearby farms with the same forecast date reuse one aggregation"""
+    predictor = CropPredictor()
+    cache = ForecastCache(predictor.catalog)
+    first = cache.get(22.51, 88.31, _forecast([31, 32, 33]))
+    assert cache.get(22.55, 88.36, _forecast([31, 32, 33])) is first
+    assert cache.get(23.60, 88.36, _forecast([31, 32, 33])) is not first
+    assert cache.get(22.51, 88.31, _forecast([31, 32, 33], start=2)) is not first
+    assert cache.get(22.51, 88.31, []) is None
+    assert cache.stats() == {"entries": 3, "hits": 1, "misses": 3}
+
+def test_heat_stress_lowers_suitability():
+    """Test forecast heat stress reduces the score of heat-sensitive crops"""
+    predictor = CropPredictor()
+    cache = ForecastCache(predictor.catalog)
+    hot = cache.get(22.5, 88.3, _forecast([40] * 7))
+
+    baseline = predictor.score(FEATURES, top_k=12)
+    forecast = predictor.score(FEATURES, top_k=12, forecast=hot)
+    base_scores = {r["crop"]: r["score"] for r in baseline.recommendations}
+    hot_scores = {r["crop"]: r["score"] for r in forecast.recommendations}
+
+    # Wheat tolerates up to 25°C, so every 40°C day is a stress day
+    assert hot_scores.get("Wheat", 0) < base_scores["Wheat"]
+    assert forecast.scores.breakdown(forecast.names()[0])["forecast"] <= 1.0
+    assert "forecast" not in baseline.scores.breakdown(baseline.names()[0])
+
+def test_fields_no_day_provides_are_none():
+    """Test all-missing forecast fields are reported as None rather than NaN, also through /predict"""
+    from fastapi.testclient import TestClient
+    from app_simple import app
+    from test_drift_monitor import PREDICT_REQUEST
+    days = [{"date": "2024-07-01", "temperature_max": 30, "temperature_min": 20}]
+    summary = summarize_forecast(forecast_array(days))
+    assert summary["humidity_mean"] is None and summary["wind_speed_max"] is None
+    assert summary["rainfall_max_day"] is None and summary["temperature_max_peak"] == 30
+    assert summarize_forecast(forecast_array([{"date": "2024-07-01"}]))["warmest_window_mean"] is None
+
+    request = {**PREDICT_REQUEST, "location": {"lat": 10.1, "lon": 70.1},
+               "forecast_data": {"daily_forecast": [{"date": "2024-07-01"}], "seasonal_outlook": "Normal"}}
+    response = TestClient(app).post("/predict", json=request)
+    assert response.status_code == 200
+    assert response.json()["forecast_summary"]["humidity_mean"] is None
+
+def test_undated_forecasts_are_not_cached():
+    """Test forecasts without a start date are aggregated per request"""
+    cache = ForecastCache(CropPredictor().catalog)
+    undated = [{"temperature_max": 31, "temperature_min": 21}]
+    first = cache.get(22.51, 88.31, undated)
+    assert cache.get(22.51, 88.31, [{"temperature_max": 40, "temperature_min": 30}]) is not first
+    assert cache.stats()["entries"] == 0
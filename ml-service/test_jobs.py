@@ -0,0 +1,133 @@
+import os
+import time
+import pytest
+from fastapi.testclient import TestClient
+import app_simple
+from jobs import FINISHED, JobManager, QueueFull
+from test_drift_monitor import PREDICT_REQUEST
+
+FEATURES = {**PREDICT_REQUEST["features"], "N": 90, "P": 42, "K": 43, "ph": 6.5, "temperature": 24,
+            "humidity": 82, "rainfall": 120}
+
+def wait(manager: JobManager, job_id: str, timeout: float = 60.0) -> dict:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        status = manager.status(job_id)
+        if status["state"] in FINISHED:
+            return status
+        time.sleep(0.05)
+    raise AssertionError(f"Job {job_id} did not finish")
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = JobManager(root=str(tmp_path), workers=2, chunk_items=2)
+    yield manager
+    manager.shutdown()
+
+def test_job_results_match_predict_and_page_across_chunks(manager):
+    """Test a bulk scoring job of /predict bodies answers like /predict, in order, paged over its result files"""
+    items = [{**PREDICT_REQUEST,
+              "features": {**FEATURES, "rainfall": rainfall},
+              "weather_data": {**PREDICT_REQUEST["weather_data"], "temperature": 24, "humidity": 82, "rainfall": rainfall}}
+             for rainfall in (40, 80, 120, 200, 300)]
+    status = wait(manager, manager.submit("predict", items)["id"])
+    assert status["state"] == "succeeded" and status["completed"] == 5 and status["progress"] == 1.0
+
+    client = TestClient(app_simple.app)
+    page = manager.results(status["id"], offset=1, limit=3)
+    assert page["next_offset"] == 4
+    for item, result in zip(items[1:4], page["results"]):
+        expected = client.post("/predict", json=item).json()
+        assert [r["crop"] for r in result["recommendations"]] == [r["crop"] for r in expected["recommendations"]]
+        assert result["explanation"] == expected["explanation"]
+    assert len(manager.results(status["id"], offset=4)["results"]) == 1
+
+def test_failing_items_do_not_fail_the_job(manager):
+    """Test what-if jobs record per-item errors next to the successful results"""
+    items = [{"features": FEATURES, "years": 2}, {"seasons": ["Kharif"]}, {"features": FEATURES, "years": 10 ** 7},
+             {**PREDICT_REQUEST, "ranking": "profit"}]
+    status = wait(manager, manager.submit("rotation", items[:3])["id"])
+    assert status["state"] == "succeeded" and status["failed_items"] == 2
+    plan, missing, too_long = manager.results(status["id"])["results"]
+    assert "error" not in plan and missing["error"].startswith("ValidationError")
+    assert too_long["error"].startswith("ValueError: years must be 1-10")
+    status = wait(manager, manager.submit("predict", items[3:])["id"])
+    assert manager.results(status["id"])["results"][0]["error"].startswith("ValueError: ranking")
+
+    with pytest.raises(ValueError):
+        manager.submit("yield", items)
+
+def test_queue_limit_cancel_and_restart(tmp_path, monkeypatch):
+    """Test a full queue rejects jobs, queued jobs cancel, and restarts fail unfinished jobs"""
+    manager = JobManager(root=str(tmp_path), max_queue=1)
+    monkeypatch.setattr(manager, "_ensure_runner", lambda: None)
+    job = manager.submit("predict", [PREDICT_REQUEST])
+    with pytest.raises(QueueFull):
+        manager.submit("predict", [PREDICT_REQUEST])
+
+    restarted = JobManager(root=str(tmp_path))
+    assert restarted.status(job["id"])["state"] == "failed"
+
+    assert manager.cancel(job["id"])["state"] == "cancelled"
+    manager._run_job(job["id"])
+    assert manager.status(job["id"])["state"] == "cancelled"
+
+def test_job_endpoints(manager, monkeypatch):
+    """Test submitting, polling and paging a fertilizer job over HTTP"""
+    monkeypatch.setattr(app_simple.app.state, "jobs", manager)
+    client = TestClient(app_simple.app)
+    response = client.post("/jobs", json={"kind": "fertilizer", "items": [
+        {"features": FEATURES, "target_crops": ["Rice"], "step_kg_per_ha": 20}] * 3})
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+    wait(manager, job_id)
+
+    assert client.get(f"/jobs/{job_id}").json()["progress"] == 1.0
+    assert job_id in [j["id"] for j in client.get("/jobs").json()["jobs"]]
+    results = client.get(f"/jobs/{job_id}/results", params={"limit": 2}).json()
+    assert len(results["results"]) == 2 and results["results"][0]["results"][0]["crop"] == "Rice"
+    assert client.get(f"/jobs/{job_id}/results", params={"limit": 0}).status_code == 400
+    assert client.delete(f"/jobs/{job_id}").json()["state"] == "succeeded"
+    assert client.get("/jobs/missing").status_code == 404
+    assert client.post("/jobs", json={"kind": "predict", "items": []}).status_code == 400
+
+def test_old_jobs_are_pruned_by_the_runner(tmp_path, monkeypatch):
+    """Test submitting never prunes; the runner deletes old finished jobs after each job"""
+    manager = JobManager(root=str(tmp_path), max_kept=1)
+    monkeypatch.setattr(manager, "_ensure_runner", lambda: None)
+    first = manager.submit("predict", [PREDICT_REQUEST])["id"]
+    manager._finish(first, "succeeded")
+    second = manager.submit("predict", [PREDICT_REQUEST])["id"]
+    manager._finish(second, "succeeded")
+    assert {j["id"] for j in manager.list()} == {first, second}
+
+    manager._queue.put(None)
+    manager._run()
+    assert [j["id"] for j in manager.list()] == [second]
+
+def test_workers_share_the_jobs_directory(tmp_path, monkeypatch):
+    """Test another worker's manager serves, lists and cancels a job without failing or pruning it"""
+    owner = JobManager(root=str(tmp_path), max_kept=1)
+    monkeypatch.setattr(owner, "_ensure_runner", lambda: None)
+    job = owner.submit("predict", [PREDICT_REQUEST])
+    owner._update(job["id"], state="running", started=time.time())
+    assert owner._owner_alive(owner.status(job["id"])) is False  # Its own pid: a restarted process
+    assert owner._owner_alive({**owner.status(job["id"]), "owner_pid": os.getppid()})
+
+    # A worker starting next to a live owner leaves its running job alone
+    monkeypatch.setattr(JobManager, "_owner_alive", lambda self, status: True)
+    other = JobManager(root=str(tmp_path), max_kept=1)
+    assert other.status(job["id"])["state"] == "running"
+    assert [j["id"] for j in other.list()] == [job["id"]]
+    other._prune()
+    assert other.status(job["id"])["state"] == "running"
+
+    # Cancelling through the other worker leaves a marker the owner's runner acts on
+    assert other.cancel(job["id"])["state"] == "running"
+    assert owner._cancel_requested(job["id"])
+    with pytest.raises(KeyError):
+        other.status("../missing")
+
+    # Without a live owner, a starting worker fails the job
+    monkeypatch.setattr(JobManager, "_owner_alive", lambda self, status: False)
+    assert JobManager(root=str(tmp_path)).status(job["id"])["state"] == "failed"
@@ -0,0 +1,61 @@
+import json
+import time
+from crop_predictor import CropPredictor
+from market_prices import PriceTable, read_prices
+
+CROPS = ["Rice", "Wheat", "Cotton", "Rice"]
+
+FEATURES = {
+    "temperature": 28, "ph": 6.8, "rainfall": 120, "N": 90, "P": 40, "K": 50,
+    "soil_type": "Loamy", "area_ha": 2, "experience_years": 6
+}
+
+def test_snapshot_overrides_table():
+    """Test snapshot prices apply to every entry of a crop without changing the table"""
+    table = PriceTable(CROPS, {"Rice": 2000, "Wheat": 2000, "Cotton": 5000})
+    prices = table.prices({"Rice": 2500, "msp": {"Rice": 2183}, "Unknown": 1})
+    assert list(prices) == [2500, 2000, 5000, 2500]
+    assert list(table.prices()) == [2000, 2000, 5000, 2000]
+    assert table.value_of("Barley", prices) == 2000.0
+
+def test_demand_classes():
+    """Test demand follows the price relative to the average distinct crop price"""
+    table = PriceTable(CROPS, {"Rice": 3000, "Wheat": 2000, "Cotton": 4000})
+    assert list(table.demand(table.prices())) == ["Moderate", "Weak", "Very Strong", "Moderate"]
+
+def test_predictor_profit_uses_snapshot():
+    """Test recommendations are priced from the request snapshot when given"""
+    predictor = CropPredictor()
+    base = {r["crop"]: r for r in predictor.predict_crops(FEATURES)}
+    crop = next(iter(base))
+    raised = predictor.price_table.value_of(crop, predictor.price_table.prices()) * 10
+    priced = {r["crop"]: r for r in predictor.predict_crops(FEATURES, market_snapshot={crop: raised})}
+    assert priced[crop]["estimated_profit_inr"] > base[crop]["estimated_profit_inr"]
+    assert priced[crop]["market_demand"] == "Very Strong"
+
+def test_background_refresh(tmp_path):
+    """Test the table reloads its source on the TTL and survives a bad file"""
+    source = tmp_path / "prices.json"
+    source.write_text(json.dumps({"prices": {"Rice": 2100}}))
+    table = PriceTable(CROPS, source=str(source), ttl=0.05)
+    assert table.value_of("Rice", table.prices()) == 2100
+
+    table.start()
+    try:
+        source.write_text(json.dumps({"prices": {"Rice": 2400}}))
+        deadline = time.time() + 5
+        while table.value_of("Rice", table.prices()) != 2400 and time.time() < deadline:
+            time.sleep(0.02)
+        assert table.value_of("Rice", table.prices()) == 2400
+
+        source.write_text("not json")
+        time.sleep(0.2)
+        assert table.value_of("Rice", table.prices()) == 2400
+    finally:
+        table.stop()
+
+def test_read_csv_prices(tmp_path):
+    """Test crop,price CSV files are accepted"""
+    source = tmp_path / "prices.csv"
+    source.write_text("crop,price\nRice,2050\nWheat,2125\n")
+    assert read_prices(str(source)) == {"Rice": 2050.0, "Wheat": 2125.0}
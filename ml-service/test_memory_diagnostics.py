@@ -0,0 +1,65 @@
+import numpy as np
+from fastapi.testclient import TestClient
+import admin
+from app_simple import app
+from conftest import ADMIN_HEADERS
+from memory_diagnostics import MemoryDiagnostics, StageMemoryReport, deep_sizeof
+from train import CROP_RECOMMENDATION_SCHEMA, train_incremental
+from test_train import DATASET
+
+client = TestClient(app, headers=ADMIN_HEADERS)
+
+def test_deep_sizeof_counts_shared_buffers_once():
+    """Test views of an array do not count its data again"""
+    data = np.zeros(100000)
+    single = deep_sizeof([data])
+    assert single > data.nbytes
+    assert deep_sizeof([data, data[10:], data.reshape(100, 1000)]) < single + 1000
+    assert deep_sizeof({"a": data, "b": data.copy()}) > 2 * data.nbytes
+
+def test_snapshot_diff_shows_new_allocations():
+    """Test a diff between two snapshots points at the allocating line"""
+    diagnostics = MemoryDiagnostics()
+    diagnostics.start_tracing()
+    try:
+        diagnostics.take_snapshot("before")
+        retained = [bytearray(1000) for _ in range(1000)]
+        diff = diagnostics.diff("before", group_by="lineno", limit=5)
+    finally:
+        diagnostics.stop_tracing()
+    assert diff["size_diff_bytes"] >= 1000000
+    assert "test_memory_diagnostics.py" in diff["top"][0]["location"]
+    assert len(retained) == 1000
+
+def test_admin_memory_endpoints():
+    """Test the admin API reports artifacts and diffs snapshots"""
+    report = client.get("/admin/memory").json()
+    assert report["rss_bytes"] > 0
+    assert report["artifacts"]["crop_predictor"]["bytes"] > 0
+
+    assert client.post("/admin/memory/snapshots", json={"name": "a"}).status_code == 409
+    client.post("/admin/memory/tracing", json={"enabled": True})
+    try:
+        assert client.post("/admin/memory/snapshots", json={"name": "a"}).status_code == 200
+        client.get("/health")
+        diff = client.get("/admin/memory/diff", params={"base": "a", "limit": 3})
+        assert diff.status_code == 200 and len(diff.json()["top"]) <= 3
+        assert client.get("/admin/memory/diff", params={"base": "missing"}).status_code == 404
+    finally:
+        client.post("/admin/memory/tracing", json={"enabled": False})
+        admin.memory_diagnostics.snapshots.clear()
+
+def test_request_allocations_metric():
+    """Test requests are counted in the allocation histogram on /metrics"""
+    client.get("/health")
+    body = client.get("/metrics").text
+    assert 'ml_request_allocated_blocks_count{endpoint="health_check"}' in body
+
+def test_stage_memory_report(tmp_path, monkeypatch):
+    """Test training records peak memory for each stage"""
+    monkeypatch.chdir(tmp_path)
+    report = StageMemoryReport()
+    train_incremental(DATASET, CROP_RECOMMENDATION_SCHEMA, chunksize=200, memory_report=report)
+    stages = [stage["stage"] for stage in report.report()]
+    assert stages == ["fit scalers (pass 1)", "incremental fit", "evaluate", "save artifacts"]
+    assert all(stage["peak_traced_mb"] >= 0 for stage in report.report())
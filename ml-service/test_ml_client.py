@@ -0,0 +1,21 @@
+import os
+import tempfile
+from binary_protocol import encode_request
+from benchmark_transport import SAMPLE_REQUEST, start_server, wait_until_ready
+from ml_client import MLServiceClient
+
+def test_client_over_unix_socket():
+    """Test the service answers over a Unix domain socket on one connection"""
+    socket_path = os.path.join(tempfile.mkdtemp(), "ml.sock")
+    server = start_server("app_simple:app", ["--uds", socket_path])
+    try:
+        with MLServiceClient(socket_path=socket_path) as client:
+            wait_until_ready(client)
+            connection = client._connection
+            assert client.predict(SAMPLE_REQUEST)["recommendations"]
+            features = dict(SAMPLE_REQUEST["features"], **SAMPLE_REQUEST["location"])
+            assert client.predict_packed(encode_request(features))["recommendations"]
+            assert client._connection is connection  # kept alive between requests
+    finally:
+        server.terminate()
+        server.wait()
@@ -0,0 +1,46 @@
+import numpy as np
+from sklearn.neighbors import KNeighborsClassifier
+from crop_predictor import CropPredictor
+from engines import NeighbourEngine
+from neighbour_index import NeighbourIndex
+from test_train import DATASET
+
+predictor = CropPredictor()
+features = {"N": 90, "P": 42, "K": 43, "ph": 6.5, "temperature": 21, "humidity": 82, "rainfall": 203,
+            "organic_carbon": 0.8, "soil_type": "Loamy", "farming_method": "conventional",
+            "irrigation_type": "rainfed", "area_ha": 1.0, "experience_years": 5}
+
+def test_votes_match_brute_force_neighbours():
+    """Test KD-tree votes agree with a brute-force distance-weighted kNN"""
+    index = NeighbourIndex.from_csv(DATASET)
+    queries = index.values[::37] + np.random.default_rng(0).normal(0, 1, size=(len(index.values[::37]), 7))
+    shares = index.vote(queries)
+    np.testing.assert_allclose(shares.sum(axis=1), 1.0)
+
+    brute = KNeighborsClassifier(n_neighbors=index.n_neighbours, weights="distance", algorithm="brute")
+    brute.fit((index.values - index.mean) / index.scale, index.labels)
+    expected = brute.predict_proba((queries - index.mean) / index.scale)
+    np.testing.assert_allclose(shares, expected, atol=1e-9)
+
+def test_extend_adds_labelled_rows():
+    """Test a rebuilt index answers with the new rows"""
+    index = NeighbourIndex.from_csv(DATASET, crops=["Rice", "Maize"])
+    assert list(index.classes) == ["Maize", "Rice"]
+    far_away = np.array([[5, 5, 5, 45, 10, 9.5, 20]] * 20, dtype=float)
+    extended = index.extend(far_away, np.array(["Chickpea"] * 20))
+    assert len(extended.values) == len(index.values) + 20
+    shares = extended.vote(far_away[:1])[0]
+    assert extended.classes[shares.argmax()] == "Chickpea"
+
+def test_engine_ranks_catalog_crops_and_batches():
+    """Test the engine ranks by vote share and a batch matches single requests"""
+    engine = NeighbourEngine(NeighbourIndex.from_csv(DATASET, crops=predictor.catalog.crops), predictor)
+    prediction = engine.predict(features, top_k=3)
+    scores = [r["score"] for r in prediction.recommendations]
+    assert prediction.engine == "knn" and scores == sorted(scores, reverse=True)
+    assert prediction.recommendations[0]["crop"] == "Rice"
+    assert prediction.recommendations[0]["predicted_yield_kg_per_ha"] > 0
+
+    batch = [features, dict(features, temperature=30, humidity=20, rainfall=70), dict(features, N=20, P=60, K=80)]
+    predictions = engine.predict_batch(batch, top_k=3)
+    assert [p.recommendations for p in predictions] == [engine.predict(f, top_k=3).recommendations for f in batch]
@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from app_simple import app
+from crop_predictor import CropPredictor
+from engines import ParetoEngine
+from pareto import normalise, pareto_front, pareto_ranks, validate_weights, weighted_scores
+from test_drift_monitor import PREDICT_REQUEST
+
+def brute_force_ranks(values: np.ndarray) -> np.ndarray:
+    ranks = np.full(len(values), -1)
+    rank = 0
+    while (ranks < 0).any():
+        remaining = np.flatnonzero(ranks < 0)
+        for i in remaining:
+            others = values[remaining]
+            if not ((others >= values[i]).all(axis=1) & (others > values[i]).any(axis=1)).any():
+                ranks[i] = rank
+        rank += 1
+    return ranks
+
+def test_ranks_match_brute_force():
+    """Test the blocked front search agrees with pairwise comparison, ties and duplicates included"""
+    values = np.random.default_rng(0).integers(0, 6, size=(400, 4)).astype(float)
+    expected = brute_force_ranks(values)
+    np.testing.assert_array_equal(pareto_ranks(values), expected)
+    np.testing.assert_array_equal(pareto_front(values, block=7), expected == 0)
+
+    partial = pareto_ranks(values, min_ranked=50)
+    assert (partial >= 0).sum() >= 50
+    np.testing.assert_array_equal(partial[partial >= 0], expected[partial >= 0])
+
+def test_normalised_objectives_flip_risk():
+    """Test lower risk scores higher and weights order by the chosen objectives"""
+    objectives = np.array([[0.9, 1000.0, 0.5, 0.4], [0.5, 5000.0, 0.9, 0.1]])
+    values = normalise(objectives)
+    np.testing.assert_array_equal(values, [[1, 0, 0, 0], [0, 1, 1, 1]])
+    assert weighted_scores(values, validate_weights({"suitability": 1}))[0] == 1.0
+    assert weighted_scores(values, validate_weights({"profit": 1, "risk": 1}))[1] == 1.0
+    with pytest.raises(ValueError):
+        validate_weights({"yield": 1})
+    with pytest.raises(ValueError):
+        validate_weights({"profit": 0})
+
+def test_engine_returns_the_whole_front():
+    """Test every first-front candidate is returned and none of them is dominated"""
+    predictor = CropPredictor()
+    engine = ParetoEngine(predictor)
+    features = PREDICT_REQUEST["features"]
+    prediction = engine.predict(features, top_k=2)
+    ranks = [r["pareto_rank"] for r in prediction.recommendations]
+    assert ranks == sorted(ranks) and len(prediction.recommendations) >= 2
+
+    scores = predictor.score_factors(features)
+    scores = scores.take(scores.suitability > 0.1)
+    ranked = pareto_ranks(normalise(engine.objectives(features, scores)))
+    assert ranks.count(0) == (ranked == 0).sum()
+    best = predictor.score(features, top_k=1).recommendations[0]
+    assert best["crop"] in [r["crop"] for r in prediction.recommendations]
+
+def test_predict_ranking_mode():
+    """Test /predict ranks by Pareto front on request and rejects unknown modes and weights"""
+    client = TestClient(app)
+    response = client.post("/predict", json={**PREDICT_REQUEST, "ranking": "pareto", "weights": {"profit": 1}})
+    assert response.status_code == 200
+    recommendations = response.json()["recommendations"]
+    front = [r for r in recommendations if r["pareto_rank"] == 0]
+    assert [r["weighted_score"] for r in front] == sorted((r["weighted_score"] for r in front), reverse=True)
+    assert client.post("/predict", json={**PREDICT_REQUEST, "ranking": "profit"}).status_code == 400
+    assert client.post("/predict", json={**PREDICT_REQUEST, "ranking": "pareto",
+                                         "weights": {"profit": -1}}).status_code == 400
@@ -0,0 +1,68 @@
+import numpy as np
+from fastapi.testclient import TestClient
+from app_simple import app
+from climate_risk import ClimateRiskSimulator
+from crop_predictor import CropPredictor
+from portfolio_optimizer import BUDGET_PER_HA, PortfolioOptimizer
+from test_fertilizer_optimizer import FEATURES
+
+predictor = CropPredictor()
+optimizer = PortfolioOptimizer(predictor, ClimateRiskSimulator(predictor, n_scenarios=500))
+
+def test_allocation_respects_constraints():
+    """Test land, diversification, budget and water limits all hold"""
+    farm = {"features": dict(FEATURES, area_ha=4.0, budget_category="low"), "max_share": 0.4,
+            "water_available_mm": 600}
+    result = optimizer.allocate([farm])[0]
+    assert result["allocated_ha"] <= 4.0 and result["budget_inr"] == int(BUDGET_PER_HA["low"] * 4.0)
+    assert result["cultivation_cost_inr"] <= result["budget_inr"]
+    assert result["water_use_mm"] <= 600
+    assert all(a["share"] <= 0.4 for a in result["allocations"])
+    assert len(result["allocations"]) >= 3
+
+def test_unconstrained_farm_plants_the_best_crop():
+    """Test without diversification or limits the whole area goes to the best risk-adjusted crop"""
+    farm = {"features": dict(FEATURES, budget_category="high"), "max_share": 1.0, "risk_aversion": 0.0}
+    result = optimizer.allocate([farm])[0]
+    crops = optimizer.candidates(farm["features"])
+    best = predictor.catalog.crops[crops["idx"][np.argmax(crops["profit"])]]
+    assert [(a["crop"], a["share"]) for a in result["allocations"]] == [(best, 1.0)]
+
+def test_batch_matches_single_farm_solves():
+    """Test the block-diagonal program gives every farm its own optimum"""
+    farms = [{"features": dict(FEATURES, area_ha=area, N=n), "water_available_mm": water}
+             for area, n, water in [(1.0, 20, None), (3.5, 60, 700), (8.0, 90, 500)]]
+    batch = optimizer.allocate(farms)
+    for farm, result in zip(farms, batch):
+        assert result["risk_adjusted_profit_inr"] == optimizer.allocate([farm])[0]["risk_adjusted_profit_inr"]
+
+def test_portfolio_endpoints():
+    """Test single and batched allocation over HTTP"""
+    client = TestClient(app)
+    response = client.post("/optimize/portfolio", json={"features": FEATURES, "max_share": 0.5})
+    assert response.status_code == 200
+    assert response.json()["allocated_ha"] <= FEATURES["area_ha"]
+    batch = client.post("/optimize/portfolio/batch", json={"farms": [{"features": FEATURES}] * 2})
+    assert len(batch.json()["results"]) == 2
+    assert client.post("/optimize/portfolio", json={"features": FEATURES, "max_share": 0}).status_code == 400
+    assert client.post("/optimize/portfolio/batch", json={"farms": []}).status_code == 400
+
+def test_bad_limits_are_rejected_and_failures_stay_per_farm(monkeypatch):
+    """Test negative limits are invalid input, and a farm that cannot be solved does not fail its batch"""
+    client = TestClient(app)
+    for limit in ("budget_inr", "water_available_mm"):
+        response = client.post("/optimize/portfolio", json={"features": FEATURES, limit: -1})
+        assert response.status_code == 400
+        assert client.post("/optimize/portfolio/batch", json={"farms": [{"features": FEATURES, limit: -1}]}).status_code == 400
+
+    build = optimizer._problem
+    def infeasible_second_farm(farm):
+        problem = build(farm)
+        if farm["features"]["area_ha"] == 3.0:
+            problem["b"][0] = -1.0  # Less than no land
+        return problem
+    monkeypatch.setattr(optimizer, "_problem", infeasible_second_farm)
+    farms = [{"features": dict(FEATURES, area_ha=area)} for area in (2.0, 3.0, 4.0)]
+    first, failed, last = optimizer.allocate(farms)
+    assert failed["error"].startswith("Allocation failed")
+    assert first["allocated_ha"] > 0 and last["allocated_ha"] > 0
@@ -0,0 +1,92 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from fastapi import HTTPException, Request
+from fastapi.testclient import TestClient
+import admin
+from admin import require_admin
+from app_simple import app
+from conftest import ADMIN_HEADERS
+from profiler import ProfileController, SamplingProfiler
+
+client = TestClient(app, headers=ADMIN_HEADERS)
+
+def _busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+def test_sampler_collapses_stacks():
+    """Test samples of a busy thread aggregate into collapsed stack lines"""
+    profiler = SamplingProfiler(threading.get_ident(), interval=0.001).start()
+    _busy(0.1)
+    profiler.stop()
+    assert profiler.samples > 10
+    stack, count = profiler.collapsed().splitlines()[0].rsplit(" ", 1)
+    assert "_busy (test_profiler.py" in stack and int(count) > 0
+
+def test_sampler_follows_engine_threads():
+    """Test busy engine executor threads are sampled under their pool name and idle ones are not"""
+    with ThreadPoolExecutor(max_workers=2, thread_name_prefix="engine") as pool:
+        pool.submit(lambda: None).result()
+        profiler = SamplingProfiler(threading.get_ident(), interval=0.001).start()
+        pool.submit(_busy, 0.1).result()
+        profiler.stop()
+    engine_stacks = [stack for stack in profiler.stacks if stack.startswith("engine;")]
+    assert any("_busy (test_profiler.py" in stack for stack in engine_stacks)
+    assert not any(stack.rsplit(";", 1)[-1].startswith("_worker (thread.py") for stack in engine_stacks)
+
+def test_controller_is_idle_by_default(tmp_path):
+    """Test nothing is armed until sampling is requested"""
+    controller = ProfileController(str(tmp_path), allow_header=False)
+    assert not controller.armed
+    controller.sample_requests(1.0, duration=60)
+    assert controller.armed and controller.should_profile([])
+    controller.disable()
+    assert not controller.armed
+    assert controller.profile_path("../app.py") is None
+
+def test_old_profiles_are_pruned(tmp_path):
+    """Test only the newest `max_kept` profiles stay on disk"""
+    controller = ProfileController(str(tmp_path), allow_header=False, max_kept=3)
+    profiler = SamplingProfiler(threading.get_ident())
+    names = [controller.save_request(profiler, f"/predict{i}") for i in range(5)]
+    assert [p["name"] for p in controller.list_profiles()] == names[:1:-1]
+
+def test_sampled_requests_are_saved(tmp_path, monkeypatch):
+    """Test the admin API arms sampling and serves the saved profiles"""
+    monkeypatch.setattr(admin.profile_controller, "output_dir", str(tmp_path))
+    response = client.post("/admin/profiler", json={"mode": "sample", "fraction": 1.0, "duration_s": 30, "interval_ms": 1})
+    assert response.status_code == 200
+    try:
+        assert client.get("/health").status_code == 200
+    finally:
+        client.delete("/admin/profiler")
+
+    profiles = client.get("/admin/profiles").json()["profiles"]
+    # Admin requests are never profiled, so only the /health request was saved
+    assert [p["name"][-len("-health.collapsed"):] for p in profiles] == ["-health.collapsed"]
+    download = client.get(f"/admin/profiles/{profiles[0]['name']}")
+    assert download.status_code == 200
+    assert client.get("/admin/profiles/missing.collapsed").status_code == 404
+
+def test_admin_token(monkeypatch):
+    """Test admin endpoints require the configured token"""
+    monkeypatch.setenv("ML_ADMIN_TOKEN", "secret")
+    assert client.get("/admin/profiler").status_code == 403
+    assert client.get("/admin/profiler", headers={"X-Admin-Token": "secret"}).status_code == 200
+
+def test_admin_without_token_only_answers_localhost(monkeypatch):
+    """Test admin endpoints fail closed for remote clients when no token is configured"""
+    monkeypatch.delenv("ML_ADMIN_TOKEN")
+    assert client.get("/admin/profiler").status_code == 403
+
+    def request(client_address):
+        return Request({"type": "http", "headers": [], "client": client_address})
+
+    for host in ("127.0.0.1", "::1"):
+        require_admin(request((host, 50000)), None)
+    for address in (("10.0.0.5", 50000), ("localhost.example.com", 50000), None):
+        with pytest.raises(HTTPException):
+            require_admin(request(address), None)
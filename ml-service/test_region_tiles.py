@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+import app_simple
+from crop_predictor import CropPredictor
+from region_tiles import (
+    SOIL_DEFAULTS, RegionGrid, RegionTiles, build_region_scores, default_climate_normals, default_soil_types,
+    write_region_tiles
+)
+
+predictor = CropPredictor()
+grid = RegionGrid.covering(lat_range=(20.0, 24.0), lon_range=(84.0, 89.0), step=0.5)
+
+@pytest.fixture(scope="module")
+def tiles(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("tiles") / "region_tiles.bin")
+    scores = build_region_scores(predictor, grid)
+    write_region_tiles(path, scores, grid, predictor.catalog.names, tile=4)
+    return RegionTiles(path), scores
+
+def test_tiles_round_trip_cell_scores(tiles):
+    """Test every cell reads back its precomputed scores (to byte precision)"""
+    region, scores = tiles
+    lat, lon = grid.centres()
+    for s, season in enumerate(region.seasons):
+        looked_up = region.lookup(lat.ravel(), lon.ravel(), season)
+        np.testing.assert_allclose(looked_up, scores[s].reshape(-1, len(region.crops)), atol=0.5 / 255)
+
+def test_cells_match_a_full_prediction(tiles):
+    """Test a cell holds what the rule model gives for its soil and climate"""
+    region, scores = tiles
+    lat, lon = np.array([22.0]), np.array([86.0])
+    soil = default_soil_types(lat, lon)[0]
+    normals = {k: float(v[0]) for k, v in default_climate_normals(lat, lon, "Kharif").items()}
+    features = {**SOIL_DEFAULTS[soil], **normals, "soil_type": soil, "area_ha": 1.0, "experience_years": 5}
+    best = predictor.score(features, top_k=1, season="Kharif").recommendations[0]
+    top = region.top_crops(region.lookup(22.0, 86.0, "Kharif")[0], 1)[0]
+    assert top["crop"] in (best["crop"], best.get("variety"))
+    assert abs(top["suitability"] - best["score"]) < 0.01
+
+def test_bilinear_interpolates_between_cells(tiles):
+    """Test bilinear lookups agree with cells at centres and average at midpoints"""
+    region, _ = tiles
+    np.testing.assert_allclose(region.lookup(21.0, 85.0, "Rabi", "bilinear"), region.lookup(21.0, 85.0, "Rabi"))
+    midpoint = region.lookup(21.25, 85.0, "Rabi", "bilinear")
+    np.testing.assert_allclose(midpoint, (region.lookup(21.0, 85.0, "Rabi") + region.lookup(21.5, 85.0, "Rabi")) / 2)
+    with pytest.raises(ValueError):
+        region.lookup(30.0, 85.0)
+    with pytest.raises(ValueError):
+        region.lookup(21.0, 85.0, method="cubic")
+
+def test_region_endpoints(tiles, monkeypatch):
+    """Test single and batched region lookups over HTTP"""
+    monkeypatch.setattr(app_simple.app.state, "region_tiles", tiles[0])
+    client = TestClient(app_simple.app)
+    answer = client.get("/region/suitability", params={"lat": 22.0, "lon": 86.0, "season": "Rabi"}).json()
+    assert answer["season"] == "Rabi" and answer["region_suitability"] in ("Good", "Moderate")
+    assert len(answer["recommendations"]) == 3
+
+    batch = client.post("/region/suitability", json={
+        "points": [{"lat": 22.0, "lon": 86.0}, {"lat": 20.3, "lon": 88.9}], "method": "bilinear", "top_k": 2})
+    assert [len(r["recommendations"]) for r in batch.json()["results"]] == [2, 2]
+    assert client.get("/region/suitability", params={"lat": 40.0, "lon": 86.0}).status_code == 400
+    n_crops = len(tiles[0].crops)
+    for top_k in (-50, 0, n_crops + 1):
+        assert client.get("/region/suitability", params={"lat": 22.0, "lon": 86.0, "top_k": top_k}).status_code == 400
+    assert client.post("/region/suitability", json={"points": [{"lat": 22.0, "lon": 86.0}], "top_k": 0}).status_code == 400
+    assert client.get("/region/suitability", params={"lat": 22.0, "lon": 86.0, "top_k": n_crops}).status_code == 200
+
+    monkeypatch.setattr(app_simple.app.state, "region_tiles", None)
+    assert client.get("/region/suitability", params={"lat": 22.0, "lon": 86.0}).status_code == 503
@@ -0,0 +1,95 @@
+import itertools
+import numpy as np
+from fastapi.testclient import TestClient
+from app import app
+from crop_predictor import CropPredictor
+from rotation_planner import (
+    FALLOW, MAX_SEASONS, MAX_YEARS, MONOCROP_FACTOR, NUTRIENTS, RotationPlanner, rotation_seasons, season_sequence
+)
+
+client = TestClient(app)
+
+FEATURES = {
+    "N": 60, "P": 40, "K": 60, "ph": 6.8, "temperature": 26, "humidity": 70, "rainfall": 120,
+    "organic_carbon": 0.8, "soil_type": "Loamy", "area_ha": 2, "farming_method": "conventional",
+    "irrigation_type": "rainfed", "previous_crops": ["Rice"], "experience_years": 6,
+    "budget_category": "medium", "preferred_crops": []
+}
+CONDITIONS = {"Rabi": {"temperature": 18, "rainfall": 60}}
+
+def test_season_sequence():
+    """Test seasons alternate from the requested start"""
+    assert season_sequence(2) == ["Kharif", "Rabi", "Kharif", "Rabi"]
+    assert season_sequence(1, start="Rabi") == ["Rabi", "Kharif"]
+
+def _score_one(planner, season, state, previous, position):
+    """Profit and next soil state of one season's choice, or None if not allowed"""
+    if state is None:
+        state = planner.discretize(np.array([[FEATURES[n] for n in NUTRIENTS]], dtype=float))[0]
+    features = {**FEATURES, **CONDITIONS.get(season, {}), **dict(zip(NUTRIENTS, state))}
+    levels = np.array(state) + planner._replenishment
+    if position is None:
+        return 0.0, planner.discretize(levels[None, :])[0]
+    scores = planner.predictor.score_factors(features, idx=np.array([position]))
+    if not scores.suitability[0] > 0.1:
+        return None
+    yields = planner.predictor._predict_yields(scores)
+    profit = float(planner.predictor._calculate_profits(scores.idx, yields, FEATURES["area_ha"])[0])
+    if position == previous:
+        profit *= MONOCROP_FACTOR
+    after = levels - planner._removal[position] + planner._credit[position]
+    return profit, planner.discretize(after[None, :])[0]
+
+def test_plan_matches_exhaustive_search():
+    """Test the DP finds the same best total as enumerating every sequence"""
+    planner = RotationPlanner(CropPredictor())
+    seasons = ["Kharif", "Rabi", "Kharif"]
+    result = planner.plan(FEATURES, seasons, previous_crops=["Rice"], season_conditions=CONDITIONS)
+
+    # Replay every sequence of (fallow or eligible crop) choices season by season
+    best = 0
+    options = [[None] + list(planner.eligible(season)) for season in seasons]
+    for sequence in itertools.product(*options):
+        total, state, previous = 0.0, None, planner.predictor.catalog.index_of("Rice")
+        valid = True
+        for season, position in zip(seasons, sequence):
+            single = _score_one(planner, season, state, previous, position)
+            if single is None:
+                valid = False
+                break
+            profit, state = single
+            total += profit
+            previous = position
+        if valid:
+            best = max(best, total)
+
+    assert abs(result["total_profit_inr"] - int(best)) <= 1
+    assert len(result["plan"]) == 3
+    assert all(entry["crop"] == FALLOW or "suitability" in entry for entry in result["plan"])
+
+def test_legume_restores_nitrogen():
+    """Test legumes leave more nitrogen behind than cereals"""
+    planner = RotationPlanner(CropPredictor())
+    catalog = planner.predictor.catalog
+    after = planner._credit - planner._removal
+    assert after[catalog.index_of("Chickpea"), 0] > after[catalog.index_of("Wheat"), 0]
+
+def test_rotation_endpoint():
+    """Test the endpoint plans two years of alternating seasons"""
+    response = client.post("/plan/rotation", json={
+        "features": FEATURES, "years": 2, "season_conditions": CONDITIONS
+    })
+    assert response.status_code == 200
+    data = response.json()
+    assert [entry["season"] for entry in data["plan"]] == ["Kharif", "Rabi", "Kharif", "Rabi"]
+    # Per-season profits are truncated to whole rupees
+    assert abs(data["total_profit_inr"] - sum(entry["estimated_profit_inr"] for entry in data["plan"])) <= 4
+
+    assert client.post("/plan/rotation", json={"features": FEATURES, "years": 50}).status_code == 400
+
+def test_explicit_seasons_are_bounded():
+    """Test explicit season lists are capped and checked, and the longest allowed plan is solved"""
+    assert client.post("/plan/rotation", json={"features": FEATURES, "seasons": ["Kharif", "Rabi"] * 1500}).status_code == 400
+    assert client.post("/plan/rotation", json={"features": FEATURES, "seasons": ["Kharif", "Monsoon"]}).status_code == 400
+    result = RotationPlanner(CropPredictor()).plan(FEATURES, rotation_seasons(MAX_YEARS))
+    assert len(result["plan"]) == MAX_SEASONS
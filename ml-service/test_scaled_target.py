@@ -0,0 +1,21 @@
+import numpy as np
+from sklearn.linear_model import LinearRegression
+from scaled_target import ScaledTargetRegressor
+
+def test_fit_and_partial_fit_predict_in_target_units():
+    """Test both training paths recover a linear target in its own units"""
+    rng = np.random.default_rng(0)
+    X = rng.normal(size=(2000, 3))
+    y = 4000 + X @ np.array([300.0, -150.0, 50.0])
+
+    fitted = ScaledTargetRegressor(LinearRegression()).fit(X, y)
+    np.testing.assert_allclose(fitted.predict(X[:5]), y[:5])
+
+    streamed = ScaledTargetRegressor()
+    for chunk in np.array_split(np.arange(len(y)), 4):
+        streamed.partial_fit_target(y[chunk])
+    for _ in range(5):
+        for chunk in np.array_split(np.arange(len(y)), 4):
+            streamed.partial_fit(X[chunk], y[chunk])
+    np.testing.assert_allclose(streamed.predict(X[:5]), y[:5], rtol=0.01)
+    assert streamed.scaler_.n_samples_seen_ == len(y)
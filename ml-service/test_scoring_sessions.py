@@ -0,0 +1,70 @@
+import numpy as np
+from fastapi.testclient import TestClient
+from app_simple import app
+from crop_predictor import CropPredictor, CropScores
+from scoring_sessions import ALL_FACTORS, ScoringSessions
+from test_crop_predictor import FEATURES
+from test_drift_monitor import PREDICT_REQUEST
+
+predictor = CropPredictor()
+ALL = np.arange(len(predictor.catalog))
+
+def test_update_recomputes_only_changed_factors():
+    """Test a partial update matches fresh scoring and names just the affected factor groups"""
+    previous = CropScores(predictor.catalog, FEATURES, ALL).complete()
+    for edit, expected in [({"N": 10}, ["nutrients"]), ({"temperature": 18, "ph": 7.4}, ["temperature", "ph"]),
+                           ({"soil_type": "Clayey"}, ["soil"]), ({"rainfall": 40, "K": 90}, ["rainfall", "nutrients"]),
+                           ({"area_ha": 5}, [])]:
+        features = {**FEATURES, **edit}
+        updated, recomputed = previous.update(features)
+        fresh = CropScores(predictor.catalog, features, ALL).complete()
+        assert recomputed == expected
+        for field in CropScores.FIELDS:
+            np.testing.assert_array_equal(getattr(updated, field), getattr(fresh, field))
+        assert updated.area_ha == features["area_ha"] and previous.features is FEATURES
+
+def test_session_answers_match_fresh_scoring():
+    """Test follow-up requests in a session rank exactly as fresh requests do"""
+    sessions = ScoringSessions(predictor)
+    first, recomputed = sessions.score("form", FEATURES)
+    assert recomputed == list(ALL_FACTORS)
+    assert first.recommendations == predictor.score(FEATURES).recommendations
+    for edit in ({"N": 5}, {"N": 5, "ph": 5.2}, {"soil_type": "Sandy", "temperature": 31}):
+        features = {**FEATURES, **edit}
+        scored, recomputed = sessions.score("form", features, top_k=3)
+        assert scored.recommendations == predictor.score(features, top_k=3).recommendations
+        assert len(recomputed) < len(ALL_FACTORS)
+    assert sessions.stats()["hits"] == 3
+
+def test_sessions_are_bounded():
+    """Test least recently used sessions go first, by count, by memory and after the idle timeout"""
+    sessions = ScoringSessions(predictor, max_sessions=2)
+    for session_id in ("a", "b", "a", "c"):
+        sessions.score(session_id, FEATURES)
+    assert sessions.score("a", FEATURES)[1] == []
+    assert sessions.score("b", FEATURES)[1] == list(ALL_FACTORS)
+    assert sessions.stats()["evicted"] == 2
+
+    one_session = sessions.stats()["bytes"] // 2
+    sessions = ScoringSessions(predictor, max_bytes=one_session)
+    sessions.score("a", FEATURES)
+    sessions.score("b", FEATURES)
+    assert sessions.stats()["sessions"] == 1 and sessions.stats()["bytes"] == one_session
+
+    sessions = ScoringSessions(predictor, ttl=0.0)
+    sessions.score("a", FEATURES)
+    assert sessions.score("a", FEATURES)[1] == list(ALL_FACTORS)
+    assert sessions.stats()["expired"] == 1
+
+def test_predict_session_mode():
+    """Test /predict reports what a session request recomputed and rejects bad session ids"""
+    client = TestClient(app)
+    request = {**PREDICT_REQUEST, "session_id": "test-predict-session-mode"}
+    assert client.post("/predict", json=request).json()["session"]["recomputed"] == list(ALL_FACTORS)
+    edited = {**request, "features": {**PREDICT_REQUEST["features"], "N": 5}}
+    response = client.post("/predict", json=edited).json()
+    assert response["session"] == {"id": "test-predict-session-mode", "recomputed": ["nutrients"]}
+    fresh = client.post("/predict", json={**edited, "session_id": None}).json()
+    assert fresh["session"] is None and fresh["explanation"] == response["explanation"]
+    assert [r["score"] for r in fresh["recommendations"]] == [r["score"] for r in response["recommendations"]]
+    assert client.post("/predict", json={**request, "session_id": "x" * 200}).status_code == 400
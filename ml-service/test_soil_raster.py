@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+import app_simple
+from soil_raster import (
+    SOIL_DEFAULTS, SoilRaster, fill_soil, fill_soil_batch, raster_from_csv, raster_from_soil_zones,
+    write_soil_raster
+)
+from test_drift_monitor import PREDICT_REQUEST
+
+SAMPLES = """lat,lon,N,P,K,pH,organic_carbon,soil_type
+22.50,88.30,300,20,200,6.0,0.9,Alluvial
+22.51,88.31,320,,220,6.4,1.1,Alluvial
+22.49,88.29,,,,,,Clayey
+22.60,88.50,150,10,100,5.5,0.3,Sandy
+"""
+
+@pytest.fixture(scope="module")
+def raster(tmp_path_factory):
+    directory = tmp_path_factory.mktemp("soil")
+    (directory / "samples.csv").write_text(SAMPLES)
+    grid, values, codes = raster_from_csv(str(directory / "samples.csv"), step=0.05)
+    path = str(directory / "soil_raster.bin")
+    write_soil_raster(path, grid, values, codes)
+    return SoilRaster(path)
+
+def test_samples_are_gridded_per_cell(raster):
+    """Test samples in one cell are averaged, the soil type is the majority and gaps stay unknown"""
+    assert raster.lookup_one(22.5, 88.3) == {"N": 310.0, "P": 20.0, "K": 210.0, "ph": 6.2,
+                                              "organic_carbon": 1.0, "soil_type": "Alluvial"}
+    assert raster.lookup_one(22.6, 88.5)["soil_type"] == "Sandy"
+    assert raster.lookup_one(22.5, 88.5) == {}
+    assert raster.lookup_one(30.0, 88.3) == {}
+
+def test_batch_lookup_matches_single_lookups(raster):
+    """Test the vectorized lookup answers like per-point lookups, including outside the raster"""
+    lats, lons = np.array([22.5, 22.6, 22.55, 40.0, np.nan]), np.array([88.3, 88.5, 88.4, 88.3, 88.3])
+    features = [{} for _ in lats]
+    fill_soil_batch(features, raster, lats, lons)
+    for lat, lon, filled in zip(lats, lons, features):
+        single = {}
+        fill_soil(single, raster, lat, lon)
+        assert filled == single
+
+def test_fill_keeps_measured_values_and_replaces_static_defaults(raster):
+    """Test only missing or static default soil fields are taken from the raster"""
+    measured = {"N": 100, "P": 5, "K": 50, "ph": 7.5, "organic_carbon": 0.2, "soil_type": "Red"}
+    assert fill_soil(dict(measured), raster, 22.5, 88.3) == {}
+
+    defaults = {**SOIL_DEFAULTS["Loamy"], "soil_type": "Loamy"}
+    assert set(fill_soil(defaults, raster, 22.5, 88.3)) == {"N", "P", "K", "ph", "organic_carbon"}
+    assert defaults["N"] == 310.0 and defaults["soil_type"] == "Loamy"
+
+    partial = {"N": 90, "soil_type": None}
+    filled = fill_soil(partial, raster, 22.6, 88.5)
+    assert partial["N"] == 90 and partial["soil_type"] == "Sandy" and filled["ph"] == "soil_raster"
+    unlocated = {"soil_type": "Black"}
+    assert fill_soil(unlocated, None)["K"] == "soil_type_profile" and unlocated["K"] == SOIL_DEFAULTS["Black"]["K"]
+
+def test_soil_zone_raster():
+    """Test the baseline raster puts the Deccan on black soil"""
+    grid, values, codes = raster_from_soil_zones(step=0.5)
+    i, j = round((19.0 - grid.lat0) / grid.step), round((76.0 - grid.lon0) / grid.step)
+    assert list(SOIL_DEFAULTS)[codes[i, j]] == "Black"
+    assert values[i, j, 0] == SOIL_DEFAULTS["Black"]["N"]
+
+def test_predict_fills_missing_soil_fields(raster, monkeypatch):
+    """Test /predict accepts requests without soil fields and reports what it filled"""
+    monkeypatch.setattr(app_simple.services, "soil_raster", raster)
+    request = {**PREDICT_REQUEST, "features": {k: v for k, v in PREDICT_REQUEST["features"].items()
+                                                if k not in ("N", "P", "K", "ph", "organic_carbon", "soil_type")}}
+    response = TestClient(app_simple.app).post("/predict", json=request)
+    assert response.status_code == 200
+    assert response.json()["soil_filled"] == {"soil_type": "soil_raster", "N": "soil_raster", "P": "soil_raster",
+                                              "K": "soil_raster", "ph": "soil_raster", "organic_carbon": "soil_raster"}
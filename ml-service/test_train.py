@@ -0,0 +1,66 @@
+import logging
+import os
+import pickle
+import pandas as pd
+from scaled_target import ScaledTargetRegressor
+from train import (
+    CROP_RECOMMENDATION_SCHEMA, iter_dataset_chunks, prepare_chunk, train_incremental
+)
+
+DATASET = os.path.join(os.path.dirname(__file__), "Crop_recommendation.csv")
+
+def test_crop_recommendation_chunks():
+    """Test the bundled dataset is mapped, imputed and typed chunk by chunk"""
+    chunks = list(iter_dataset_chunks(DATASET, schema=CROP_RECOMMENDATION_SCHEMA, chunksize=250))
+    assert len(chunks) == 3
+
+    df = pd.concat(chunks, ignore_index=True)
+    assert "Rice" in set(df["crop"].astype(str))
+    assert "Pigeon Pea" in set(df["crop"].astype(str))
+    assert df["N"].dtype == "float32"
+    assert df["yield_kg_per_ha"].notna().all()
+    assert (df["soil_type"] == "Loamy").all()
+    # The truncated last row has no label and is dropped
+    assert len(df) == 734
+
+def test_prepare_chunk_imputes_missing_yield():
+    """Test missing yields are filled without touching known ones"""
+    chunk = pd.DataFrame({
+        "N": [40, 50], "P": [20, 25], "K": [30, 35], "ph": [6.5, 9.5],
+        "temperature": [25, 30], "humidity": [70, 60], "rainfall": [120, 80],
+        "label": ["rice", "maize"], "yield_kg_per_ha": [4200.0, None],
+    })
+
+    prepared = prepare_chunk(chunk, CROP_RECOMMENDATION_SCHEMA)
+    assert prepared.loc[0, "yield_kg_per_ha"] == 4200.0
+    assert 100 <= prepared.loc[1, "yield_kg_per_ha"] <= 80000
+    assert list(prepared["crop"].astype(str)) == ["Rice", "Maize"]
+
+def test_train_incremental(tmp_path, monkeypatch, caplog):
+    """Test streaming training produces loadable artifacts"""
+    caplog.set_level(logging.INFO, logger="train")
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "models").mkdir()
+    (tmp_path / "models" / "tree_explainer.pkl").write_bytes(b"stale")
+    crop_model, yield_model, accuracy, _ = train_incremental(
+        DATASET, CROP_RECOMMENDATION_SCHEMA, chunksize=200, epochs=2
+    )
+
+    assert (tmp_path / "models" / "crop_model.pkl").exists()
+    assert not (tmp_path / "models" / "tree_explainer.pkl").exists()
+    assert accuracy > 0.5
+    # One validation summary per pass: scalers, two epochs, evaluation
+    assert sum("Dataset validation passed" in r.getMessage() for r in caplog.records) == 4
+    assert sum("No yield column" in r.getMessage() for r in caplog.records) == 4
+
+    sample = pd.DataFrame([{
+        "N": 80, "P": 40, "K": 40, "ph": 6.5, "temperature": 22, "humidity": 80,
+        "rainfall": 220, "organic_carbon": 0.8, "soil_type": "Loamy",
+        "farming_method": "conventional", "irrigation_type": "rainfed",
+        "area_ha": 1.0, "experience_years": 5,
+    }])
+    assert crop_model.predict(sample)[0] in crop_model.classes_
+    assert yield_model.predict(sample)[0] > 0
+    assert isinstance(yield_model.named_steps["regressor"], ScaledTargetRegressor)
+    with open(tmp_path / "models" / "yield_model.pkl", "rb") as f:
+        assert pickle.load(f).predict(sample)[0] == yield_model.predict(sample)[0]
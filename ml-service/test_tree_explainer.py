@@ -0,0 +1,134 @@
+import itertools
+import math
+import numpy as np
+import pandas as pd
+from sklearn.base import clone
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestClassifier
+from sklearn.linear_model import SGDClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+from tree_explainer import TreeContributions, TreeExplainer, TreePaths, _class_distribution, _class_distributions, top_features
+
+def _pipelines():
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "N": rng.uniform(0, 140, 300),
+        "ph": rng.uniform(4.5, 8.5, 300),
+        "soil_type": rng.choice(["Clayey", "Loamy", "Sandy"], 300),
+    })
+    crop = np.where(df["N"] > 70, "Rice", np.where(df["ph"] > 6.5, "Wheat", "Maize"))
+    yields = 2000 + 20 * df["N"] + 300 * (df["soil_type"] == "Loamy")
+
+    def preprocessor():
+        return ColumnTransformer([
+            ("num", StandardScaler(), ["N", "ph"]),
+            ("cat", OneHotEncoder(handle_unknown="ignore"), ["soil_type"]),
+        ])
+
+    crop_model = Pipeline([
+        ("preprocessor", preprocessor()),
+        ("classifier", RandomForestClassifier(n_estimators=10, max_depth=6, random_state=0)),
+    ]).fit(df, crop)
+    yield_model = Pipeline([
+        ("preprocessor", preprocessor()),
+        ("regressor", GradientBoostingRegressor(n_estimators=20, max_depth=3, random_state=0)),
+    ]).fit(df, yields)
+    return df, crop_model, yield_model
+
+def _background(crop_model, df):
+    return np.asarray(crop_model.named_steps["preprocessor"].transform(df.iloc[:50]), dtype=float)
+
+def test_attributions_add_up_to_predictions():
+    """Test grouped attributions plus the base value reproduce both models"""
+    df, crop_model, yield_model = _pipelines()
+    explainer = TreeExplainer(crop_model, yield_model, background=_background(crop_model, df))
+    assert explainer.source_features == ["N", "ph", "soil_type"]
+
+    sample = df.iloc[[0]]
+    x = explainer.transform(sample)[0]
+    crop = crop_model.predict(sample)[0]
+    output = explainer.classes.index(crop)
+
+    crop_phi = explainer.explain_crop(x, crop)
+    proba = crop_model.predict_proba(sample)[0][output]
+    assert math.isclose(sum(crop_phi.values()) + explainer.crop_trees.expected_value[output], proba, abs_tol=1e-9)
+
+    yield_phi = explainer.explain_yield(x)
+    assert math.isclose(sum(yield_phi.values()) + explainer.yield_base_value, yield_model.predict(sample)[0], rel_tol=1e-9)
+
+    importance = explainer.global_importance["yield_model"]
+    assert max(importance, key=importance.get) == "N"
+    assert top_features(yield_phi, n=1)[0]["feature"] == "N"
+
+def test_shap_values_match_brute_force():
+    """Test the flattened-path algorithm against the Shapley definition"""
+    _, crop_model, _ = _pipelines()
+    forest = crop_model.named_steps["classifier"]
+    n_features = forest.n_features_in_
+    paths = TreePaths(forest.estimators_, [_class_distribution] * len(forest.estimators_),
+                      scale=1.0 / len(forest.estimators_), n_features=n_features)
+
+    def conditional(tree, node, x, subset, output):
+        if tree.children_left[node] == -1:
+            value = tree.value[node, 0]
+            return value[output] / value.sum()
+        feature, left, right = tree.feature[node], tree.children_left[node], tree.children_right[node]
+        if feature in subset:
+            return conditional(tree, left if x[feature] <= tree.threshold[node] else right, x, subset, output)
+        cover = tree.weighted_n_node_samples
+        return (cover[left] * conditional(tree, left, x, subset, output)
+                + cover[right] * conditional(tree, right, x, subset, output)) / cover[node]
+
+    x = np.array([1.2, -0.3, 0.0, 1.0, 0.0])
+    output = 1
+    value = lambda subset: np.mean([conditional(e.tree_, 0, x, set(subset), output) for e in forest.estimators_])
+    expected = np.zeros(n_features)
+    for i in range(n_features):
+        others = [j for j in range(n_features) if j != i]
+        for k in range(n_features):
+            weight = math.factorial(k) * math.factorial(n_features - k - 1) / math.factorial(n_features)
+            for subset in itertools.combinations(others, k):
+                expected[i] += weight * (value(subset + (i,)) - value(subset))
+
+    assert np.allclose(paths.shap_values(x, output), expected, atol=1e-12)
+
+def test_split_contributions_follow_each_tree_path():
+    """Test precomputed split contributions against walking every tree from the root"""
+    df, crop_model, _ = _pipelines()
+    forest = crop_model.named_steps["classifier"]
+    trees = TreeContributions(forest.estimators_, [_class_distributions] * len(forest.estimators_),
+                              scale=1.0 / len(forest.estimators_), n_features=forest.n_features_in_)
+    x = np.asarray(crop_model.named_steps["preprocessor"].transform(df.iloc[[3]]), dtype=float)[0]
+    output = 2
+
+    expected = np.zeros(forest.n_features_in_)
+    for estimator in forest.estimators_:
+        tree, node = estimator.tree_, 0
+        value = lambda node: tree.value[node, 0, output] / tree.value[node, 0].sum()
+        while tree.children_left[node] != -1:
+            child = tree.children_left[node] if x[tree.feature[node]] <= tree.threshold[node] else tree.children_right[node]
+            expected[tree.feature[node]] += (value(child) - value(node)) / len(forest.estimators_)
+            node = child
+
+    assert np.allclose(trees.contributions(x, output), expected, atol=1e-12)
+    assert np.allclose(trees.predict(x), forest.predict_proba(x[None])[0], atol=1e-12)
+
+def test_explainer_matches_only_its_models():
+    """Test an explainer is not reused for models from another training run"""
+    df, crop_model, yield_model = _pipelines()
+    explainer = TreeExplainer(crop_model, yield_model)
+    assert explainer.matches(crop_model, yield_model)
+
+    retrained = clone(crop_model).set_params(classifier__random_state=1).fit(df, crop_model.predict(df))
+    assert not explainer.matches(retrained, yield_model)
+
+    relabelled = clone(crop_model).fit(df, np.where(df["N"] > 70, "Rice", "Wheat"))
+    assert not explainer.matches(relabelled, yield_model)
+
+    older_layout = TreeExplainer(crop_model, yield_model)
+    del older_layout.crop_trees
+    assert not older_layout.matches(crop_model, yield_model)
+
+    linear = Pipeline([("preprocessor", crop_model.named_steps["preprocessor"]), ("classifier", SGDClassifier())])
+    assert not explainer.matches(linear, yield_model)
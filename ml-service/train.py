@@ -6,6 +6,13 @@ from sklearn.preprocessing import StandardScaler, LabelEncoder, OneHotEncoder
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
 from sklearn.metrics import classification_report, accuracy_score, mean_squared_error, r2_score
+from sklearn.linear_model import SGDClassifier, SGDRegressor
+from tree_explainer import TreeExplainer
+from scaled_target import ScaledTargetRegressor
+from memory_diagnostics import StageMemoryReport
+from drift_monitor import ReferenceBuilder, save_reference_stats
+import argparse
+import os
 import pickle
 import json
 from datetime import datetime
@@ -15,31 +22,146 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-def load_custom_dataset():
+# Model input columns shared by the in-memory and streaming training paths
+NUMERIC_FEATURES = [
+    'N', 'P', 'K', 'ph', 'temperature', 'humidity', 'rainfall',
+    'organic_carbon', 'area_ha', 'experience_years'
+]
+CATEGORICAL_FEATURES = ['soil_type', 'farming_method', 'irrigation_type']
+FEATURE_COLUMNS = [
+    'N', 'P', 'K', 'ph', 'temperature', 'humidity', 'rainfall', 'organic_carbon',
+    'soil_type', 'farming_method', 'irrigation_type', 'area_ha', 'experience_years'
+]
+
+# Known category levels so chunks can be encoded without seeing the whole file
+CATEGORY_LEVELS = {
+    'soil_type': ['Alluvial', 'Black', 'Clayey', 'Loamy', 'Peaty', 'Red', 'Sandy', 'Silty'],
+    'farming_method': ['conventional', 'mixed', 'organic'],
+    'irrigation_type': ['drip', 'irrigated', 'rainfed', 'sprinkler'],
+}
+
+# Training rows averaged into the precomputed global feature importances
+EXPLAINER_BACKGROUND_ROWS = 200
+
+# Compact on-disk dtypes used when reading real datasets
+DATASET_DTYPES = {
+    'N': 'float32', 'P': 'float32', 'K': 'float32', 'ph': 'float32',
+    'temperature': 'float32', 'humidity': 'float32', 'rainfall': 'float32',
+    'organic_carbon': 'float32', 'area_ha': 'float32', 'experience_years': 'float32',
+    'yield_kg_per_ha': 'float32',
+}
+
+# Physical bounds applied to every real or synthetic row
+FEATURE_BOUNDS = {
+    'N': (0, 500), 'P': (0, 200), 'K': (0, 500), 'ph': (3.0, 10.0),
+    'temperature': (-5, 55), 'humidity': (0, 100), 'rainfall': (0, 5000),
+    'organic_carbon': (0.0, 10.0), 'area_ha': (0.01, 1000), 'experience_years': (0, 80),
+}
+
+# Schema of the bundled Crop_recommendation.csv (N, P, K, temperature, humidity,
+# ph, rainfall, label). Farm-level columns it lacks are imputed with defaults.
+CROP_RECOMMENDATION_SCHEMA = {
+    'columns': {'label': 'crop'},
+    'labels': {
+        'rice': 'Rice', 'maize': 'Maize', 'chickpea': 'Chickpea',
+        'kidneybeans': 'Kidney Beans', 'pigeonpeas': 'Pigeon Pea',
+        'mothbeans': 'Moth Beans', 'mungbean': 'Mung Bean', 'blackgram': 'Black Gram',
+        'lentil': 'Lentil', 'pomegranate': 'Pomegranate', 'banana': 'Banana',
+        'mango': 'Mango', 'grapes': 'Grapes', 'watermelon': 'Watermelon',
+        'muskmelon': 'Muskmelon', 'apple': 'Apple', 'orange': 'Orange',
+        'papaya': 'Papaya', 'coconut': 'Coconut', 'cotton': 'Cotton',
+        'jute': 'Jute', 'coffee': 'Coffee',
+    },
+    'defaults': {
+        'organic_carbon': 0.8, 'soil_type': 'Loamy', 'farming_method': 'conventional',
+        'irrigation_type': 'rainfed', 'area_ha': 1.0, 'experience_years': 5,
+    },
+}
+
+# Schema of a dataset that already uses the model's column names
+NATIVE_SCHEMA = {'columns': {}, 'labels': {}, 'defaults': {}}
+
+DATASET_SCHEMAS = {
+    'native': NATIVE_SCHEMA,
+    'crop_recommendation': CROP_RECOMMENDATION_SCHEMA,
+}
+
+def load_custom_dataset(path=None, schema=NATIVE_SCHEMA):
     """
     Load a custom dataset if provided by the user.
-    This function should be modified to load your specific dataset.
+    The file is read in chunks with compact dtypes and each chunk is
+    renamed, imputed and validated with the given schema.
     Return None if no custom dataset is available.
     """
-    try:
-        # Try to load user's custom dataset
-        # Replace this with your actual dataset loading logic
-        # Examples:
-        # df = pd.read_csv('your_dataset.csv')
-        # df = pd.read_excel('your_dataset.xlsx')
-        # df = pd.read_json('your_dataset.json')
-        
-        # For now, return None to use synthetic data
-        # When you have a dataset, uncomment and modify the following:
-        # df = pd.read_csv('crop_recommendation.csv')
-        # logger.info(f"Loaded custom dataset with {len(df)} samples")
-        # return df
-        
+    if path is None:
         return None
+    try:
+        chunks = list(iter_dataset_chunks(path, schema=schema))
+        if not chunks:
+            return None
+        df = pd.concat(chunks, ignore_index=True)
+        logger.info(f"Loaded custom dataset with {len(df)} samples")
+        return df
     except Exception as e:
         logger.warning(f"Could not load custom dataset: {e}")
         return None
 
+def iter_dataset_chunks(path, schema=NATIVE_SCHEMA, chunksize=100000, seed=42):
+    """Yield validated, model-ready DataFrame chunks from a CSV file"""
+    column_map = schema.get('columns', {})
+    source_dtypes = {}
+    for source, target in list(column_map.items()) + [(c, c) for c in DATASET_DTYPES]:
+        if target in DATASET_DTYPES:
+            source_dtypes[source] = DATASET_DTYPES[target]
+    rng = np.random.default_rng(seed)
+
+    # Validation is logged once per pass over the file, not once per chunk
+    n_rows = n_chunks = 0
+    synthetic_yield = False
+    reader = pd.read_csv(path, chunksize=chunksize, dtype=source_dtypes)
+    for chunk in reader:
+        if not synthetic_yield and 'yield_kg_per_ha' not in [column_map.get(c, c) for c in chunk.columns]:
+            logger.warning("No yield column found. Yield predictions will use synthetic data.")
+            synthetic_yield = True
+        chunk = prepare_chunk(chunk, schema, rng, log=False)
+        n_chunks += 1
+        if len(chunk):
+            n_rows += len(chunk)
+            yield chunk
+    logger.info(f"Dataset validation passed for {path}: {n_rows} rows in {n_chunks} chunks")
+
+def prepare_chunk(chunk, schema=NATIVE_SCHEMA, rng=None, log=True):
+    """Rename, impute, normalise and validate one chunk with vectorized operations"""
+    chunk = chunk.rename(columns=schema.get('columns', {}))
+
+    for column, default in schema.get('defaults', {}).items():
+        if column not in chunk.columns:
+            chunk[column] = default
+        else:
+            chunk[column] = chunk[column].fillna(default)
+
+    labels = schema.get('labels')
+    if labels and 'crop' in chunk.columns:
+        crop = chunk['crop'].astype('string').str.strip().str.lower()
+        chunk['crop'] = crop.map(labels).fillna(crop.str.title())
+
+    if not validate_dataset(chunk, rng=rng, log=log):
+        raise ValueError("Dataset chunk failed validation")
+
+    # Rows without a label or any core measurement are unusable
+    chunk = chunk.dropna(subset=['crop'] + NUMERIC_FEATURES)
+
+    for column, (low, high) in FEATURE_BOUNDS.items():
+        chunk[column] = chunk[column].clip(low, high)
+    for column in DATASET_DTYPES:
+        chunk[column] = chunk[column].astype(DATASET_DTYPES[column])
+    for column in CATEGORICAL_FEATURES:
+        chunk[column] = pd.Categorical(chunk[column], categories=CATEGORY_LEVELS[column])
+    chunk = chunk.dropna(subset=CATEGORICAL_FEATURES)
+    chunk['crop'] = chunk['crop'].astype('category')
+
+    return chunk.reset_index(drop=True)
+
 def create_comprehensive_dataset(n_samples=15000):
     """Create a comprehensive synthetic crop dataset for training"""
     np.random.seed(42)
@@ -222,8 +344,8 @@ def calculate_yield_factors(row, crop_params):
     
     return np.prod(factors)
 
-def validate_dataset(df):
-    """Validate that the dataset has the required columns and structure"""
+def validate_dataset(df, rng=None, log=True):
+    """Validate that the dataset has the required columns and structure (log=False: only errors are logged)"""
     required_columns = [
         'N', 'P', 'K', 'ph', 'temperature', 'humidity', 'rainfall', 
         'organic_carbon', 'soil_type', 'farming_method', 'irrigation_type', 
@@ -238,91 +360,92 @@ def validate_dataset(df):
     
     # Check for yield column (optional)
     if 'yield_kg_per_ha' not in df.columns:
-        logger.warning("No yield column found. Yield predictions will use synthetic data.")
+        if log:
+            logger.warning("No yield column found. Yield predictions will use synthetic data.")
         # Generate synthetic yield data
-        df['yield_kg_per_ha'] = df.apply(lambda row: generate_synthetic_yield(row), axis=1)
+        df['yield_kg_per_ha'] = generate_synthetic_yield(df, rng)
+    elif df['yield_kg_per_ha'].isna().any():
+        missing = df['yield_kg_per_ha'].isna()
+        df.loc[missing, 'yield_kg_per_ha'] = generate_synthetic_yield(df[missing], rng)
     
-    logger.info(f"Dataset validation passed. Shape: {df.shape}")
+    if log:
+        logger.info(f"Dataset validation passed. Shape: {df.shape}")
     return True
 
-def generate_synthetic_yield(row):
-    """Generate synthetic yield based on crop and conditions"""
-    base_yields = {
-        'Rice': 4500, 'Wheat': 3200, 'Maize': 4000, 'Cotton': 2800,
-        'Sugarcane': 65000, 'Soybean': 2200, 'Groundnut': 2800,
-        'Sunflower': 1800, 'Chickpea': 1500, 'Pigeon Pea': 1200,
-        'Mustard': 1600, 'Barley': 2800
-    }
-    
-    base_yield = base_yields.get(row['crop'], 3000)
-    
+# Base yields (kg/ha) used when a dataset has no yield column
+SYNTHETIC_BASE_YIELDS = {
+    'Rice': 4500, 'Wheat': 3200, 'Maize': 4000, 'Cotton': 2800,
+    'Sugarcane': 65000, 'Soybean': 2200, 'Groundnut': 2800,
+    'Sunflower': 1800, 'Chickpea': 1500, 'Pigeon Pea': 1200,
+    'Mustard': 1600, 'Barley': 2800
+}
+
+def generate_synthetic_yield(df, rng=None):
+    """Generate synthetic yields for every row based on crop and conditions"""
+    rng = rng if rng is not None else np.random.default_rng()
+    n = len(df)
+
+    base_yield = df['crop'].map(SYNTHETIC_BASE_YIELDS).astype('float64').fillna(3000).to_numpy()
+    ph = df['ph'].to_numpy(dtype='float64')
+
     # Simple yield calculation based on basic factors
-    ph_factor = 1.0 if 6.0 <= row['ph'] <= 7.5 else 0.8
-    temp_factor = 0.9 + np.random.normal(0, 0.1)
-    random_factor = np.random.normal(1.0, 0.2)
-    
+    ph_factor = np.where((ph >= 6.0) & (ph <= 7.5), 1.0, 0.8)
+    temp_factor = 0.9 + rng.normal(0, 0.1, n)
+    random_factor = rng.normal(1.0, 0.2, n)
+
     yield_estimate = base_yield * ph_factor * temp_factor * random_factor
-    return max(100, min(80000, yield_estimate))
+    return pd.Series(np.clip(yield_estimate, 100, 80000), index=df.index, dtype='float32')
+
+def build_preprocessor(categories='auto'):
+    """Create the scaling and one-hot encoding transformer shared by both models"""
+    numeric_transformer = StandardScaler()
+    categorical_transformer = OneHotEncoder(drop='first', sparse_output=False, categories=categories)
+    
+    return ColumnTransformer(
+        transformers=[
+            ('num', numeric_transformer, NUMERIC_FEATURES),
+            ('cat', categorical_transformer, CATEGORICAL_FEATURES)
+        ]
+    )
 
 def preprocess_data(df):
     """Preprocess the comprehensive dataset"""
     # Separate features and targets
-    feature_columns = [
-        'N', 'P', 'K', 'ph', 'temperature', 'humidity', 'rainfall', 'organic_carbon',
-        'soil_type', 'farming_method', 'irrigation_type', 'area_ha', 'experience_years'
-    ]
-    
-    X = df[feature_columns].copy()
+    X = df[FEATURE_COLUMNS].copy()
     y_crop = df['crop'].copy()
     y_yield = df['yield_kg_per_ha'].copy()
     
-    # Create preprocessing pipeline
-    numeric_features = [
-        'N', 'P', 'K', 'ph', 'temperature', 'humidity', 'rainfall', 
-        'organic_carbon', 'area_ha', 'experience_years'
-    ]
-    categorical_features = ['soil_type', 'farming_method', 'irrigation_type']
-    
-    # Create transformers
-    numeric_transformer = StandardScaler()
-    categorical_transformer = OneHotEncoder(drop='first', sparse_output=False)
-    
-    # Combine transformers
-    preprocessor = ColumnTransformer(
-        transformers=[
-            ('num', numeric_transformer, numeric_features),
-            ('cat', categorical_transformer, categorical_features)
-        ]
-    )
+    preprocessor = build_preprocessor()
     
     return X, y_crop, y_yield, preprocessor
 
-def train_models():
+def train_models(data_path=None, schema=NATIVE_SCHEMA, memory_report=None):
     """Train comprehensive crop recommendation models"""
+    memory = memory_report or StageMemoryReport(enabled=False)
     logger.info("Attempting to load custom dataset...")
     
-    # Try to load custom dataset first
-    df = load_custom_dataset()
-    
-    if df is not None:
-        logger.info("Custom dataset loaded successfully!")
-        if not validate_dataset(df):
-            logger.error("Custom dataset validation failed. Falling back to synthetic data.")
-            df = None
-    
-    # If no custom dataset, create synthetic data
-    if df is None:
-        logger.info("Creating comprehensive synthetic dataset...")
-        df = create_comprehensive_dataset(n_samples=20000)
+    with memory.stage("load data"):
+        # Try to load custom dataset first (chunks are validated while loading)
+        df = load_custom_dataset(data_path, schema)
+        data_source = "custom" if df is not None else "synthetic"
+        
+        if df is not None:
+            logger.info("Custom dataset loaded successfully!")
+        
+        # If no custom dataset, create synthetic data
+        if df is None:
+            logger.info("Creating comprehensive synthetic dataset...")
+            df = create_comprehensive_dataset(n_samples=20000)
     
     logger.info(f"Training with dataset containing {len(df)} samples")
     logger.info("Preprocessing data...")
-    X, y_crop, y_yield, preprocessor = preprocess_data(df)
-    
-    # Split the data
-    X_train, X_test, y_crop_train, y_crop_test, y_yield_train, y_yield_test = train_test_split(
-        X, y_crop, y_yield, test_size=0.2, random_state=42, stratify=y_crop
-    )
+    with memory.stage("preprocess and split"):
+        X, y_crop, y_yield, preprocessor = preprocess_data(df)
+        
+        # Split the data
+        X_train, X_test, y_crop_train, y_crop_test, y_yield_train, y_yield_test = train_test_split(
+            X, y_crop, y_yield, test_size=0.2, random_state=42, stratify=y_crop
+        )
     
     logger.info("Training crop classification model...")
     # Create and train the crop classification model
@@ -338,19 +461,22 @@ def train_models():
         ))
     ])
     
-    crop_model.fit(X_train, y_crop_train)
+    with memory.stage("fit crop model"):
+        crop_model.fit(X_train, y_crop_train)
     
     # Evaluate crop model
     logger.info("Evaluating crop classification model...")
-    y_crop_pred = crop_model.predict(X_test)
-    crop_accuracy = accuracy_score(y_crop_test, y_crop_pred)
+    with memory.stage("evaluate crop model"):
+        y_crop_pred = crop_model.predict(X_test)
+        crop_accuracy = accuracy_score(y_crop_test, y_crop_pred)
     
     logger.info(f"Crop model accuracy: {crop_accuracy:.3f}")
     logger.info("\nCrop Classification Report:")
     logger.info(classification_report(y_crop_test, y_crop_pred))
     
     # Cross-validation for crop model
-    crop_cv_scores = cross_val_score(crop_model, X_train, y_crop_train, cv=5)
+    with memory.stage("cross-validate crop model"):
+        crop_cv_scores = cross_val_score(crop_model, X_train, y_crop_train, cv=5)
     logger.info(f"Crop model CV scores: {crop_cv_scores}")
     logger.info(f"Crop model average CV score: {crop_cv_scores.mean():.3f} (+/- {crop_cv_scores.std() * 2:.3f})")
     
@@ -367,50 +493,45 @@ def train_models():
         ))
     ])
     
-    yield_model.fit(X_train, y_yield_train)
+    with memory.stage("fit yield model"):
+        yield_model.fit(X_train, y_yield_train)
     
     # Evaluate yield model
     logger.info("Evaluating yield prediction model...")
-    y_yield_pred = yield_model.predict(X_test)
+    with memory.stage("evaluate yield model"):
+        y_yield_pred = yield_model.predict(X_test)
     yield_rmse = np.sqrt(mean_squared_error(y_yield_test, y_yield_pred))
     yield_r2 = r2_score(y_yield_test, y_yield_pred)
     
     logger.info(f"Yield model RMSE: {yield_rmse:.2f}")
     logger.info(f"Yield model R²: {yield_r2:.3f}")
     
-    # Save models and preprocessor
-    logger.info("Saving model artifacts...")
-    
-    # Create models directory if it doesn't exist
-    import os
-    os.makedirs("models", exist_ok=True)
-    
-    # Save the crop classification model
-    with open("models/crop_model.pkl", "wb") as f:
-        pickle.dump(crop_model, f)
-    
-    # Save the yield prediction model
-    with open("models/yield_model.pkl", "wb") as f:
-        pickle.dump(yield_model, f)
-    
-    # Save just the preprocessor for inference
-    with open("models/preprocessor.pkl", "wb") as f:
-        pickle.dump(preprocessor, f)
+    with memory.stage("save artifacts"):
+        save_artifacts(crop_model, yield_model, preprocessor)
+        # Input distribution the service's drift monitor compares requests with
+        reference = ReferenceBuilder()
+        reference.add(df)
+        save_reference_stats(reference.stats())
+    
+    # Precompute per-node split contributions for request-time attributions
+    # and global importances as mean |SHAP| over a sample of training rows
+    logger.info("Precomputing tree explainer and global feature importances...")
+    with memory.stage("tree explainer"):
+        background = X_train.sample(n=min(EXPLAINER_BACKGROUND_ROWS, len(X_train)), random_state=42)
+        explainer = TreeExplainer(crop_model, yield_model, background=np.asarray(preprocessor.transform(background), dtype=float))
+        save_explainer(explainer)
     
     # Save model metadata
     metadata = {
         "version": "v2.1.0",
         "training_date": datetime.now().isoformat(),
-        "data_source": "custom" if load_custom_dataset() is not None else "synthetic",
+        "data_source": data_source,
         "crop_accuracy": float(crop_accuracy),
         "crop_cv_mean": float(crop_cv_scores.mean()),
         "crop_cv_std": float(crop_cv_scores.std()),
         "yield_rmse": float(yield_rmse),
         "yield_r2": float(yield_r2),
-        "features": [
-            'N', 'P', 'K', 'ph', 'temperature', 'humidity', 'rainfall', 'organic_carbon',
-            'soil_type', 'farming_method', 'irrigation_type', 'area_ha', 'experience_years'
-        ],
+        "features": FEATURE_COLUMNS,
         "target_classes": list(crop_model.classes_),
         "crop_model_type": "RandomForestClassifier",
         "yield_model_type": "GradientBoostingRegressor",
@@ -419,11 +540,14 @@ def train_models():
         "dataset_info": {
             "total_samples": len(df),
             "crops_distribution": df['crop'].value_counts().to_dict()
-        }
+        },
+        "global_feature_importance": explainer.global_importance
     }
+    if memory.enabled:
+        metadata["memory_report"] = memory.report()
     
-    with open("models/model_metadata.json", "w") as f:
-        json.dump(metadata, f, indent=2)
+    save_metadata(metadata)
+    memory.log()
     
     logger.info("Model training completed successfully!")
     logger.info(f"Crop model accuracy: {crop_accuracy:.3f}")
@@ -435,25 +559,210 @@ def train_models():
     logger.info(f"Total samples: {len(df)}")
     logger.info(f"Unique crops: {df['crop'].unique()}")
     logger.info(f"Soil types: {df['soil_type'].unique()}")
-    logger.info(f"Data source: {'Custom dataset' if load_custom_dataset() is not None else 'Synthetic data'}")
+    logger.info(f"Data source: {'Custom dataset' if data_source == 'custom' else 'Synthetic data'}")
+    
+    return crop_model, yield_model, crop_accuracy, yield_r2
+
+def save_artifacts(crop_model, yield_model, preprocessor):
+    """Pickle the trained models and preprocessor into models/"""
+    logger.info("Saving model artifacts...")
+    
+    # Create models directory if it doesn't exist
+    os.makedirs("models", exist_ok=True)
+    
+    # Save the crop classification model
+    with open("models/crop_model.pkl", "wb") as f:
+        pickle.dump(crop_model, f)
+    
+    # Save the yield prediction model
+    with open("models/yield_model.pkl", "wb") as f:
+        pickle.dump(yield_model, f)
+    
+    # Save just the preprocessor for inference
+    with open("models/preprocessor.pkl", "wb") as f:
+        pickle.dump(preprocessor, f)
+
+def save_explainer(explainer):
+    """Pickle the split contributions used for request-time attributions"""
+    with open("models/tree_explainer.pkl", "wb") as f:
+        pickle.dump(explainer, f)
+
+def remove_explainer():
+    """Drop an explainer left by an earlier run; the linear incremental models have none"""
+    try:
+        os.remove("models/tree_explainer.pkl")
+    except FileNotFoundError:
+        pass
+
+def save_metadata(metadata):
+    """Write model metadata next to the pickled artifacts"""
+    with open("models/model_metadata.json", "w") as f:
+        json.dump(metadata, f, indent=2)
+
+def is_holdout(chunk_offset, n_rows, test_every=5):
+    """Deterministic hold-out mask: every `test_every`-th row of the stream is test data"""
+    return (np.arange(chunk_offset, chunk_offset + n_rows) % test_every) == 0
+
+def train_incremental(data_path, schema=NATIVE_SCHEMA, chunksize=100000, epochs=1, memory_report=None):
+    """
+    Train on a CSV larger than memory by streaming it in chunks.
+    
+    Pass 1 fits the scalers and collects the crop classes, further passes
+    feed each chunk to estimators that support partial_fit; the evaluation
+    pass also builds the drift reference statistics. Only one chunk is
+    resident at a time, so peak memory is bounded by `chunksize`.
+    """
+    memory = memory_report or StageMemoryReport(enabled=False)
+    categories = [CATEGORY_LEVELS[c] for c in CATEGORICAL_FEATURES]
+    preprocessor = None
+    yield_regressor = ScaledTargetRegressor(SGDRegressor(alpha=1e-4, random_state=42))
+    reference = ReferenceBuilder()
+    classes = set()
+    crop_counts = {}
+    n_samples = 0
+    
+    logger.info(f"Pass 1: fitting scalers over {data_path} in chunks of {chunksize}")
+    with memory.stage("fit scalers (pass 1)"):
+        for chunk in iter_dataset_chunks(data_path, schema=schema, chunksize=chunksize):
+            if preprocessor is None:
+                preprocessor = build_preprocessor(categories).fit(chunk[FEATURE_COLUMNS])
+            else:
+                preprocessor.named_transformers_['num'].partial_fit(chunk[NUMERIC_FEATURES])
+            yield_regressor.partial_fit_target(chunk['yield_kg_per_ha'])
+            reference.sample(chunk)
+            for crop, count in chunk['crop'].value_counts().items():
+                if count:
+                    classes.add(crop)
+                    crop_counts[crop] = crop_counts.get(crop, 0) + int(count)
+            n_samples += len(chunk)
+    
+    if preprocessor is None:
+        raise ValueError(f"No usable rows found in {data_path}")
+    classes = np.array(sorted(classes))
+    logger.info(f"Pass 1 complete: {n_samples} samples, {len(classes)} crops")
+    
+    classifier = SGDClassifier(loss='log_loss', alpha=1e-4, random_state=42)
+    
+    with memory.stage("incremental fit"):
+        for epoch in range(epochs):
+            logger.info(f"Pass {epoch + 2}: incremental fit (epoch {epoch + 1}/{epochs})")
+            offset = 0
+            for chunk in iter_dataset_chunks(data_path, schema=schema, chunksize=chunksize):
+                train_mask = ~is_holdout(offset, len(chunk))
+                offset += len(chunk)
+                if not train_mask.any():
+                    continue
+                X_chunk = preprocessor.transform(chunk.loc[train_mask, FEATURE_COLUMNS])
+                y_crop = chunk.loc[train_mask, 'crop'].astype(str).to_numpy()
+                y_yield = chunk.loc[train_mask, 'yield_kg_per_ha'].to_numpy(dtype='float64')
+                classifier.partial_fit(X_chunk, y_crop, classes=classes)
+                yield_regressor.partial_fit(X_chunk, y_yield)
+    
+    # Streamed evaluation on the hold-out rows
+    correct = 0
+    n_test = 0
+    squared_error = 0.0
+    yield_sum = 0.0
+    yield_sq_sum = 0.0
+    offset = 0
+    with memory.stage("evaluate"):
+        for chunk in iter_dataset_chunks(data_path, schema=schema, chunksize=chunksize):
+            reference.add(chunk)
+            test_mask = is_holdout(offset, len(chunk))
+            offset += len(chunk)
+            if not test_mask.any():
+                continue
+            X_chunk = preprocessor.transform(chunk.loc[test_mask, FEATURE_COLUMNS])
+            y_crop = chunk.loc[test_mask, 'crop'].astype(str).to_numpy()
+            y_yield = chunk.loc[test_mask, 'yield_kg_per_ha'].to_numpy(dtype='float64')
+            y_pred = yield_regressor.predict(X_chunk)
+            correct += int((classifier.predict(X_chunk) == y_crop).sum())
+            squared_error += float(((y_yield - y_pred) ** 2).sum())
+            yield_sum += float(y_yield.sum())
+            yield_sq_sum += float((y_yield ** 2).sum())
+            n_test += len(y_crop)
+    
+    crop_accuracy = correct / n_test if n_test else 0.0
+    yield_rmse = float(np.sqrt(squared_error / n_test)) if n_test else 0.0
+    total_ss = yield_sq_sum - (yield_sum ** 2) / n_test if n_test else 0.0
+    yield_r2 = 1 - squared_error / total_ss if total_ss > 0 else 0.0
+    
+    logger.info(f"Crop model accuracy: {crop_accuracy:.3f}")
+    logger.info(f"Yield model RMSE: {yield_rmse:.2f}")
+    logger.info(f"Yield model R²: {yield_r2:.3f}")
+    
+    # Assemble the fitted pieces into the same artifact shapes the service loads
+    crop_model = Pipeline([('preprocessor', preprocessor), ('classifier', classifier)])
+    yield_model = Pipeline([('preprocessor', preprocessor), ('regressor', yield_regressor)])
+    
+    with memory.stage("save artifacts"):
+        save_artifacts(crop_model, yield_model, preprocessor)
+        save_reference_stats(reference.stats())
+        remove_explainer()
     
+    metadata = {
+        "version": "v2.1.0",
+        "training_date": datetime.now().isoformat(),
+        "data_source": "custom",
+        "training_mode": "incremental",
+        "chunksize": chunksize,
+        "epochs": epochs,
+        "crop_accuracy": float(crop_accuracy),
+        "yield_rmse": yield_rmse,
+        "yield_r2": float(yield_r2),
+        "features": FEATURE_COLUMNS,
+        "target_classes": list(classes),
+        "crop_model_type": "SGDClassifier",
+        "yield_model_type": "SGDRegressor",
+        "n_samples": n_samples,
+        "unique_crops": len(classes),
+        "dataset_info": {
+            "total_samples": n_samples,
+            "crops_distribution": crop_counts
+        }
+    }
+    if memory.enabled:
+        metadata["memory_report"] = memory.report()
+    save_metadata(metadata)
+    memory.log()
+    
+    logger.info("Incremental training completed successfully!")
     return crop_model, yield_model, crop_accuracy, yield_r2
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the crop recommendation models")
+    parser.add_argument("--data", help="CSV dataset to train on (synthetic data is used if omitted)")
+    parser.add_argument("--schema", choices=sorted(DATASET_SCHEMAS), default="native",
+                        help="Column layout of --data, e.g. crop_recommendation for Crop_recommendation.csv")
+    parser.add_argument("--chunksize", type=int, default=None,
+                        help="Stream --data in chunks of this many rows and train incrementally")
+    parser.add_argument("--epochs", type=int, default=1, help="Passes over the data in incremental mode")
+    parser.add_argument("--memory-report", action="store_true",
+                        help="Report peak memory per training stage (traces allocations, slower)")
+    args = parser.parse_args()
+    
     print("""
     Crop Recommendation Model Training
     =================================
     
     To use your own dataset:
-    1. Place your dataset file in this directory
-    2. Modify the load_custom_dataset() function to load your file
-    3. Ensure your dataset has the required columns:
+    1. Pass it with --data your_dataset.csv (add --schema crop_recommendation
+       for files laid out like Crop_recommendation.csv)
+    2. Ensure your dataset has the required columns:
        - N, P, K, ph, temperature, humidity, rainfall, organic_carbon
        - soil_type, farming_method, irrigation_type
        - area_ha, experience_years, crop
        - yield_kg_per_ha (optional - will be generated if missing)
+    3. For datasets larger than memory add --chunksize 500000 to stream
+       the file and train incrementally
     
     If no custom dataset is found, synthetic data will be used.
     """)
     
-    train_models()
+    schema = DATASET_SCHEMAS[args.schema]
+    memory_report = StageMemoryReport(enabled=args.memory_report)
+    if args.data and args.chunksize:
+        train_incremental(args.data, schema, chunksize=args.chunksize, epochs=args.epochs,
+                          memory_report=memory_report)
+    else:
+        train_models(args.data, schema, memory_report=memory_report)
@@ -0,0 +1,353 @@
+import numpy as np
+from typing import Dict, List, Optional
+from sklearn.ensemble import GradientBoostingRegressor, RandomForestClassifier
+
+class TreePaths:
+    """
+    Root-to-leaf paths of a fitted tree ensemble flattened into arrays.
+
+    Splits on the same feature along a path are merged into a single element
+    holding the interval (lower, upper] an input must fall in to follow the
+    path, and the product of the cover ratios of those splits (the fraction
+    of training data that follows the path). Leaves are grouped into blocks
+    by path length so no padding is stored; element arrays are laid out
+    (path position, leaf) so each position is contiguous.
+    """
+
+    def __init__(self, estimators, leaf_values, scale: float = 1.0, n_features: Optional[int] = None):
+        by_length = {}
+        for estimator, leaf_value in zip(estimators, leaf_values):
+            tree = estimator.tree_
+            for leaf, path in self._tree_paths(tree):
+                by_length.setdefault(len(path), []).append((path, leaf_value(tree, leaf) * scale))
+
+        self.width = max(by_length, default=0)
+        self.n_features = n_features
+        self.blocks = {}
+        for d, leaves in sorted(by_length.items()):
+            n_leaves = len(leaves)
+            features = np.empty((d, n_leaves), dtype=np.int16)
+            lower = np.empty((d, n_leaves))
+            upper = np.empty((d, n_leaves))
+            zero_fraction = np.empty((d, n_leaves))
+            for i, (path, _) in enumerate(leaves):
+                for j, (feature, bounds) in enumerate(sorted(path.items())):
+                    features[j, i] = feature
+                    lower[j, i], upper[j, i], zero_fraction[j, i] = bounds
+            values = np.array([value for _, value in leaves], dtype=float).reshape(n_leaves, -1)
+            self.blocks[d] = (features, lower, upper, zero_fraction, values)
+        if self.n_features is None:
+            self.n_features = max((int(block[0].max()) + 1 for block in self.blocks.values() if block[0].size), default=0)
+        self.n_outputs = next(iter(self.blocks.values()))[4].shape[1] if self.blocks else 1
+
+        # Shapley weights k! (d - k - 1)! / d! indexed by [path length d, subset size k]
+        self.weights = np.zeros((self.width + 1, max(self.width, 1)))
+        for d in range(1, self.width + 1):
+            for k in range(d):
+                self.weights[d, k] = np.exp(
+                    _log_factorial(k) + _log_factorial(d - k - 1) - _log_factorial(d)
+                )
+
+        # Leaves of each block that contribute to each output (e.g. class);
+        # zero-valued leaves are skipped, None means every leaf contributes
+        self._active = {}
+        for d, (_, _, _, _, values) in self.blocks.items():
+            active = []
+            for c in range(self.n_outputs):
+                rows = np.flatnonzero(values[:, c] != 0)
+                active.append(None if rows.size == values.shape[0] else rows)
+            self._active[d] = active
+
+        # Path-dependent expectation of the ensemble output
+        self.expected_value = np.zeros(self.n_outputs)
+        for _, _, _, zero_fraction, values in self.blocks.values():
+            self.expected_value += np.prod(zero_fraction, axis=0) @ values
+
+    @staticmethod
+    def _tree_paths(tree):
+        """Yield (leaf, {feature: (lower, upper, zero_fraction)}) for every leaf"""
+        left, right = tree.children_left, tree.children_right
+        feature, threshold = tree.feature, tree.threshold
+        cover = tree.weighted_n_node_samples
+        stack = [(0, {})]
+        while stack:
+            node, path = stack.pop()
+            if left[node] == -1:
+                yield node, path
+                continue
+            f = int(feature[node])
+            for child, goes_left in ((left[node], True), (right[node], False)):
+                lower, upper, zero_fraction = path.get(f, (-np.inf, np.inf, 1.0))
+                if goes_left:  # sklearn sends x <= threshold to the left child
+                    upper = min(upper, threshold[node])
+                else:
+                    lower = max(lower, threshold[node])
+                child_path = dict(path)
+                child_path[f] = (lower, upper, zero_fraction * cover[child] / cover[node])
+                stack.append((child, child_path))
+
+    def shap_values(self, x: np.ndarray, output: int = 0) -> np.ndarray:
+        """
+        Exact path-dependent TreeSHAP values of one (already transformed) input.
+
+        For a leaf with path features U, value v, cover ratios z and
+        indicators o (does x follow the path on that feature), the leaf adds
+
+            v * (o_i - z_i) * sum_k w(k, |U|) * e_k(U \\ {i})
+
+        to feature i, where e_k sums prod(o over S) * prod(z over the rest) for
+        |S| = k. The e_k are the coefficients of prod_j (o_j t + z_j); they are
+        built once per leaf and the factor for i is divided back out. Leaves
+        with equal path length are processed together as arrays, so the cost
+        is O(leaves * depth^2) element operations in O(depth^2) NumPy calls.
+        """
+        phi = np.zeros(self.n_features)
+        for d, block in self.blocks.items():
+            rows = self._active[d][output]
+            if rows is not None and rows.size == 0:
+                continue
+            self._accumulate(phi, x, block, rows, d, output)
+        return phi
+
+    def _accumulate(self, phi: np.ndarray, x: np.ndarray, block, rows, d: int, output: int):
+        """Add the contributions of the leaves of one path-length block"""
+        features, lower, upper, z, values = block
+        values = values[:, output]
+        if rows is not None:
+            features, lower, upper, z = features[:, rows], lower[:, rows], upper[:, rows], z[:, rows]
+            values = values[rows]
+        xf = x[features]
+        o = (xf > lower) & (xf <= upper)
+        weights = self.weights[d, :d]
+
+        # Coefficients of prod_j (o_j t + z_j), one row per degree
+        coef = np.zeros((d + 1, features.shape[1]))
+        coef[0] = 1.0
+        for j in range(d):
+            shifted = coef[:j + 1] * o[j]
+            coef[:j + 1] *= z[j]
+            coef[1:j + 2] += shifted
+
+        # o_i = 1: synthetic division of the product by (t + z_i), highest degree first
+        q = np.repeat(coef[d:d + 1], d, axis=0)
+        unwound = weights[d - 1] * q
+        for k in range(d - 1, 0, -1):
+            q = coef[k] - z * q
+            unwound += weights[k - 1] * q
+
+        # o_i = 0: the factor is the constant z_i, so (o_i - z_i) * (product / z_i) = -product
+        contribution = np.where(o, (1 - z) * unwound, -(weights @ coef[:d]))
+        contribution *= values
+        phi += np.bincount(features.ravel(), contribution.ravel(), minlength=self.n_features)
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        """Ensemble output (before any base value) for one transformed input"""
+        total = np.zeros(self.n_outputs)
+        for features, lower, upper, _, values in self.blocks.values():
+            xf = x[features]
+            hits = np.all((xf > lower) & (xf <= upper), axis=0)
+            total += values[hits].sum(axis=0)
+        return total
+
+class TreeContributions:
+    """
+    Split contributions of a fitted tree ensemble, precomputed per node.
+
+    Every node stores, per output, the change in the node value from its
+    parent, charged to the parent's split feature (Saabas attributions, the
+    fast approximation of path-dependent TreeSHAP). An input's attributions
+    are the sums along the one root-to-leaf path it follows in each tree, so
+    a request costs O(trees * depth) instead of TreePaths' O(leaves *
+    depth^2); they still add up exactly to the ensemble output minus
+    expected_value. Node arrays of all trees are concatenated, with child
+    indices into the concatenation and -1 children at leaves.
+    """
+
+    def __init__(self, estimators, node_values, scale: float = 1.0, n_features: Optional[int] = None):
+        offsets = np.cumsum([0] + [estimator.tree_.node_count for estimator in estimators])
+        self.roots = offsets[:-1]
+        self.feature = np.empty(offsets[-1], dtype=np.int16)
+        self.threshold = np.empty(offsets[-1])
+        self.left = np.empty(offsets[-1], dtype=np.int32)
+        self.right = np.empty(offsets[-1], dtype=np.int32)
+        # Split feature of each node's parent (0 at roots, whose delta is 0)
+        self.parent_feature = np.zeros(offsets[-1], dtype=np.int16)
+        values = []
+        for estimator, node_value, start in zip(estimators, node_values, self.roots):
+            tree = estimator.tree_
+            nodes = slice(start, start + tree.node_count)
+            internal = tree.children_left != -1
+            self.feature[nodes] = np.where(internal, tree.feature, 0)
+            self.threshold[nodes] = tree.threshold
+            self.left[nodes] = np.where(internal, tree.children_left + start, -1)
+            self.right[nodes] = np.where(internal, tree.children_right + start, -1)
+            self.parent_feature[tree.children_left[internal] + start] = tree.feature[internal]
+            self.parent_feature[tree.children_right[internal] + start] = tree.feature[internal]
+            values.append(node_value(tree) * scale)
+        values = np.concatenate(values).reshape(offsets[-1], -1)
+        self.n_outputs = values.shape[1]
+        self.n_features = n_features if n_features is not None else int(self.feature.max()) + 1
+
+        # Node value minus parent value, laid out (output, node) so one output is contiguous
+        self.delta = np.zeros((self.n_outputs, offsets[-1]))
+        for parent_children in (self.left, self.right):
+            parents = np.flatnonzero(parent_children >= 0)
+            children = parent_children[parents]
+            self.delta[:, children] = (values[children] - values[parents]).T
+        self.expected_value = values[self.roots].sum(axis=0)
+
+    def _path_nodes(self, x: np.ndarray) -> np.ndarray:
+        """Every non-root node on the paths `x` follows, one step of all trees at a time"""
+        # Compared in float32 like sklearn's own tree traversal
+        x = np.asarray(x, dtype=np.float32)
+        nodes = self.roots[self.left[self.roots] >= 0]
+        steps = []
+        while nodes.size:
+            nodes = np.where(x[self.feature[nodes]] <= self.threshold[nodes], self.left[nodes], self.right[nodes])
+            steps.append(nodes)
+            nodes = nodes[self.left[nodes] >= 0]
+        return np.concatenate(steps) if steps else nodes
+
+    def contributions(self, x: np.ndarray, output: int = 0) -> np.ndarray:
+        """Attributions of one (already transformed) input for one output, per model column"""
+        nodes = self._path_nodes(x)
+        return np.bincount(self.parent_feature[nodes], self.delta[output, nodes], minlength=self.n_features)
+
+    def predict(self, x: np.ndarray) -> np.ndarray:
+        """Ensemble output (before any base value) for one transformed input"""
+        return self.expected_value + self.delta[:, self._path_nodes(x)].sum(axis=1)
+
+def _log_factorial(n: int) -> float:
+    return float(np.sum(np.log(np.arange(1, n + 1)))) if n > 1 else 0.0
+
+def source_feature_groups(preprocessor) -> List[str]:
+    """Source feature name for every output column of a fitted ColumnTransformer"""
+    groups = []
+    for name, transformer, columns in preprocessor.transformers_:
+        if name == 'remainder' or transformer == 'drop':
+            continue
+        if hasattr(transformer, 'categories_'):
+            drop_idx = getattr(transformer, 'drop_idx_', None)
+            for i, (column, categories) in enumerate(zip(columns, transformer.categories_)):
+                n_out = len(categories) - (1 if drop_idx is not None and drop_idx[i] is not None else 0)
+                groups.extend([column] * n_out)
+        else:
+            groups.extend(columns)
+    return groups
+
+class TreeExplainer:
+    """
+    Attributions for the crop classifier and yield regressor pipelines.
+
+    Requests are explained from split contributions precomputed per node
+    (TreeContributions), a few hundred microseconds per model; the global
+    importances computed once from background rows use exact path-dependent
+    TreeSHAP (TreePaths), which is too slow for the request path.
+    """
+
+    def __init__(self, crop_model, yield_model, background: Optional[np.ndarray] = None):
+        self.preprocessor = crop_model.named_steps['preprocessor']
+        classifier = crop_model.named_steps['classifier']
+        regressor = yield_model.named_steps['regressor']
+        if not isinstance(classifier, RandomForestClassifier) or not isinstance(regressor, GradientBoostingRegressor):
+            raise TypeError("TreeExplainer needs a RandomForestClassifier and a GradientBoostingRegressor")
+
+        self.classes = list(classifier.classes_)
+        self.fingerprint = _fingerprint(classifier, regressor)
+        self.groups = source_feature_groups(self.preprocessor)
+        self.source_features = list(dict.fromkeys(self.groups))
+        n_columns = len(self.groups)
+        self._group_matrix = np.zeros((n_columns, len(self.source_features)))
+        for column, source in enumerate(self.groups):
+            self._group_matrix[column, self.source_features.index(source)] = 1.0
+
+        # Forest probability = mean over trees of the normalized node class distribution
+        self.crop_trees = TreeContributions(
+            classifier.estimators_,
+            [_class_distributions] * len(classifier.estimators_),
+            scale=1.0 / len(classifier.estimators_),
+            n_features=n_columns,
+        )
+        # Boosted prediction = init + learning_rate * sum of tree outputs
+        self.yield_trees = TreeContributions(
+            regressor.estimators_[:, 0],
+            [_regression_values] * regressor.estimators_.shape[0],
+            scale=regressor.learning_rate,
+            n_features=n_columns,
+        )
+        init = 0.0 if regressor.init_ == 'zero' else float(regressor.init_.predict(np.zeros((1, n_columns)))[0])
+        self.yield_base_value = init + float(self.yield_trees.expected_value[0])
+
+        self.global_importance = {}
+        if background is not None:
+            self.global_importance = self.compute_global_importance(classifier, regressor, background)
+
+    def matches(self, crop_model, yield_model) -> bool:
+        """Whether the explainer was built from these fitted pipelines (not an older training run or layout)"""
+        classifier = crop_model.named_steps.get('classifier')
+        regressor = yield_model.named_steps.get('regressor')
+        if not isinstance(classifier, RandomForestClassifier) or not isinstance(regressor, GradientBoostingRegressor):
+            return False
+        return (hasattr(self, 'crop_trees') and self.classes == list(classifier.classes_)
+                and getattr(self, 'fingerprint', None) == _fingerprint(classifier, regressor))
+
+    def transform(self, frame) -> np.ndarray:
+        """Model input columns for a DataFrame of raw features"""
+        return np.asarray(self.preprocessor.transform(frame), dtype=float)
+
+    def _grouped(self, phi: np.ndarray) -> Dict[str, float]:
+        return dict(zip(self.source_features, phi @ self._group_matrix))
+
+    def explain_crop(self, x: np.ndarray, crop: str) -> Dict[str, float]:
+        """Attributions of the forest's probability for `crop`, per source feature"""
+        return self._grouped(self.crop_trees.contributions(x, self.classes.index(crop)))
+
+    def explain_yield(self, x: np.ndarray) -> Dict[str, float]:
+        """Attributions of the predicted yield (kg/ha), per source feature"""
+        return self._grouped(self.yield_trees.contributions(x, 0))
+
+    def compute_global_importance(self, classifier, regressor, background: np.ndarray) -> Dict[str, Dict[str, float]]:
+        """Mean absolute exact TreeSHAP value over background rows, normalized per model"""
+        n_columns = len(self.groups)
+        crop_paths = TreePaths(classifier.estimators_, [_class_distribution] * len(classifier.estimators_),
+                               scale=1.0 / len(classifier.estimators_), n_features=n_columns)
+        yield_paths = TreePaths(regressor.estimators_[:, 0], [_regression_value] * regressor.estimators_.shape[0],
+                                scale=regressor.learning_rate, n_features=n_columns)
+        crop_total = np.zeros(len(self.source_features))
+        yield_total = np.zeros(len(self.source_features))
+        for x in background:
+            output = int(np.argmax(self.crop_trees.predict(x)))
+            crop_total += np.abs(crop_paths.shap_values(x, output) @ self._group_matrix)
+            yield_total += np.abs(yield_paths.shap_values(x, 0) @ self._group_matrix)
+        return {
+            'crop_model': _normalized(self.source_features, crop_total),
+            'yield_model': _normalized(self.source_features, yield_total),
+        }
+
+def _fingerprint(classifier, regressor) -> tuple:
+    """Node count and root split of every tree, enough to tell two fitted ensembles apart"""
+    trees = [e.tree_ for e in classifier.estimators_] + [e.tree_ for e in regressor.estimators_[:, 0]]
+    return tuple((int(t.node_count), int(t.feature[0]), float(t.threshold[0])) for t in trees)
+
+def _class_distribution(tree, leaf: int) -> np.ndarray:
+    value = tree.value[leaf, 0]
+    return value / value.sum()
+
+def _regression_value(tree, leaf: int) -> np.ndarray:
+    return tree.value[leaf, 0]
+
+def _class_distributions(tree) -> np.ndarray:
+    values = tree.value[:, 0]
+    return values / values.sum(axis=1, keepdims=True)
+
+def _regression_values(tree) -> np.ndarray:
+    return tree.value[:, 0]
+
+def _normalized(names: List[str], totals: np.ndarray) -> Dict[str, float]:
+    total = totals.sum()
+    return {name: round(float(value / total), 4) if total else 0.0 for name, value in zip(names, totals)}
+
+def top_features(attributions: Dict[str, float], n: int = 5) -> List[Dict]:
+    """Largest attributions by magnitude, in the shap_top_features layout"""
+    ranked = sorted(attributions.items(), key=lambda item: abs(item[1]), reverse=True)
+    return [{'feature': name, 'impact': round(float(value), 4)} for name, value in ranked[:n]]